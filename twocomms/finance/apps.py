@@ -5,3 +5,6 @@ class FinanceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'finance'
     verbose_name = 'Фінансовий кабінет'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -5,7 +5,7 @@
 """
 from __future__ import annotations
 
-import datetime as dt
+from decimal import Decimal
 
 from django.core.exceptions import DisallowedHost
 from django.utils import timezone
@@ -33,48 +33,32 @@ def finance_shell_context(request):
     # Імпорти всередині, щоб уникнути навантаження на не-fin запити.
     try:
         from .models import get_default_company
-        from .services import balances as balance_service
         from .services import serializers as ser
         from .services import warehouse_link
-        from .services import consignment as consignment_service
+        from .services.sidebar_summary import get_sidebar_summary
     except Exception:
         return {}
 
     try:
         company = get_default_company()
-        today = timezone.localdate()
-        # Прогноз на місяць вперед від сьогодні. Рахуємо лише від сьогодні,
-        # щоб прострочені (ще не погашені) планові не задвоювали суму:
-        # якщо повторюване зобов'язання 2500/міс мало прострочений платіж
-        # І свіжий — панель показувала 5000 замість 2500.
-        horizon = today + dt.timedelta(days=30)
-
-        total = balance_service.total_actual_balance(company)
-        planned = balance_service.planned_totals(company, today, horizon)
+        # Баланси, планові на 30 дн, борг/заморожене в контрагентах — з
+        # матеріалізованого зведення (перераховуються лише змінені групи).
+        summary = get_sidebar_summary(company)
+        total = summary.total_balance
+        planned = {'income': summary.planned_income, 'expense': summary.planned_expense}
         forecast = (total + planned['income'] + planned['expense'])
-        accounts = balance_service.account_sidebar_data(company)
-
-        # Дати найближчого планового доходу/витрати (для сайдбару на телефоні).
-        from .models import Transaction as _Txn
-        from .services.timeutil import day_end as _day_end
+        accounts = [{**item, 'balance': Decimal(item['balance'])} for item in summary.accounts]
 
-        def _nearest_planned(ttype):
-            t = (_Txn.objects.filter(
-                    company=company, status=_Txn.STATUS_PLANNED, type=ttype,
-                    date_actual__lte=_day_end(horizon))
-                 .exclude(excluded_from_reports=True)
-                 .order_by('date_actual').first())
-            if t is None or not t.date_actual:
-                return ''
-            return timezone.localtime(t.date_actual).strftime('%d.%m')
+        def _short_date(value):
+            return timezone.localtime(value).strftime('%d.%m') if value else ''
 
-        next_income_date = _nearest_planned(_Txn.TYPE_INCOME)
-        next_expense_date = _nearest_planned(_Txn.TYPE_EXPENSE)
+        next_income_date = _short_date(summary.next_income_at)
+        next_expense_date = _short_date(summary.next_expense_at)
         frozen = warehouse_link.frozen_in_warehouse()
         # «Заморожено в контрагентах» = собівартість товару під реалізацію + борг
         # магазинів (усі гроші, що «висять» у контрагентів).
-        frozen_consignment = consignment_service.consignment_frozen_total(company)
-        resellers_debt = consignment_service.resellers_debt_total(company)
+        frozen_consignment = summary.consignment_frozen
+        resellers_debt = summary.resellers_debt
         counterparties_total = frozen_consignment + resellers_debt
 
         return {
@@ -0,0 +1,37 @@
+"""Звірка матеріалізованого зведення лівої панелі (SidebarSummary).
+
+Перераховує всі групи зведення з нуля і показує поля, що розійшлися зі
+збереженими (дрейф через QuerySet.update, ручні правки в БД тощо). Брудні
+групи дрейфом не вважаються — вони й так перерахуються при читанні.
+
+Запуск:  python manage.py finance_reconcile_sidebar [--dry-run]
+"""
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from finance.models import Company
+from finance.services.sidebar_summary import reconcile_sidebar_summary
+
+
+class Command(BaseCommand):
+    help = 'Звіряє зведення лівої панелі з фактичними даними і виправляє дрейф'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Лише показати, не змінювати')
+
+    def handle(self, *args, **opts):
+        dry = opts.get('dry_run')
+        drifted = 0
+        for company in Company.objects.order_by('id'):
+            drift = reconcile_sidebar_summary(company, fix=not dry)
+            for field, (stored, fresh) in sorted(drift.items()):
+                if field == 'accounts':
+                    self.stdout.write(f'{company.name[:30]:30} accounts: список рахунків змінився')
+                else:
+                    self.stdout.write(f'{company.name[:30]:30} {field}: {stored} → {fresh}')
+            if drift:
+                drifted += 1
+
+        prefix = '[dry-run] ' if dry else ''
+        self.stdout.write(self.style.SUCCESS(f'{prefix}Компаній з дрейфом: {drifted}'))
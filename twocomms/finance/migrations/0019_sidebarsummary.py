@@ -0,0 +1,39 @@
+# Generated by Django 5.2.11 on 2026-10-19 00:43
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0018_counterpartycard_obligationsettlement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SidebarSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('as_of', models.DateField(blank=True, null=True)),
+                ('total_balance', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=18)),
+                ('accounts', models.JSONField(blank=True, default=list)),
+                ('planned_income', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=18)),
+                ('planned_expense', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=18)),
+                ('next_income_at', models.DateTimeField(blank=True, null=True)),
+                ('next_expense_at', models.DateTimeField(blank=True, null=True)),
+                ('resellers_debt', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=18)),
+                ('consignment_frozen', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=18)),
+                ('balances_dirty', models.BooleanField(default=True)),
+                ('planned_dirty', models.BooleanField(default=True)),
+                ('consignment_dirty', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('company', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='sidebar_summary', to='finance.company')),
+            ],
+            options={
+                'verbose_name': 'Зведення панелі',
+                'verbose_name_plural': 'Зведення панелі',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.11 on 2026-10-19 03:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0019_sidebarsummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sidebarsummary',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
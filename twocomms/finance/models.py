@@ -36,6 +36,7 @@ from .models_ops import (  # noqa: F401
     FinancialMetric,
     IntegrationConnection,
     RuleApplication,
+    SidebarSummary,
 )
 from .models_settings import (  # noqa: F401
     UserSettings,
@@ -56,7 +57,7 @@ __all__ = [
     'Attachment', 'ObligationSettlement', 'RecurrenceRule', 'Transaction',
     'Invoice', 'InvoiceItem',
     'AuditLog', 'AutomationRule', 'BudgetPlan', 'FinancialMetric',
-    'IntegrationConnection', 'RuleApplication',
+    'IntegrationConnection', 'RuleApplication', 'SidebarSummary',
     'UserSettings', 'PushSubscription', 'NotificationLog',
     'Reseller', 'ConsignmentShipment', 'ConsignmentItem',
     'ResellerPayment', 'ConsignmentSale',
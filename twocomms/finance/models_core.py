@@ -168,6 +168,8 @@ class Account(models.Model):
         self.current_balance = balance
         if save:
             Account.objects.filter(pk=self.pk).update(current_balance=balance)
+            from .services.sidebar_summary import mark_sidebar_dirty
+            mark_sidebar_dirty(self.company_id, 'balances')
         return balance
 
 
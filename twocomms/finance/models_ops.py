@@ -216,3 +216,39 @@ class AuditLog(models.Model):
 
     def __str__(self):
         return f'{self.action} {self.entity_type}#{self.entity_id}'
+
+
+class SidebarSummary(models.Model):
+    """Матеріалізовані цифри лівої панелі (баланси, планові, контрагенти).
+
+    Оновлюється частинами: сигнали позначають брудною лише зачеплену групу
+    (``*_dirty``) і збільшують ``version``, а перерахунок відбувається при
+    наступному читанні й знімає прапорці лише за незмінної ``version``.
+    Див. services/sidebar_summary.py і команду finance_reconcile_sidebar.
+    """
+
+    company = models.OneToOneField(Company, on_delete=models.CASCADE, related_name='sidebar_summary')
+    # Локальна дата, від якої рахувалось вікно планових (прогноз на 30 дн).
+    as_of = models.DateField(blank=True, null=True)
+    total_balance = models.DecimalField(max_digits=18, decimal_places=2, default=Decimal('0'))
+    accounts = models.JSONField(default=list, blank=True)
+    planned_income = models.DecimalField(max_digits=18, decimal_places=2, default=Decimal('0'))
+    planned_expense = models.DecimalField(max_digits=18, decimal_places=2, default=Decimal('0'))
+    next_income_at = models.DateTimeField(blank=True, null=True)
+    next_expense_at = models.DateTimeField(blank=True, null=True)
+    resellers_debt = models.DecimalField(max_digits=18, decimal_places=2, default=Decimal('0'))
+    consignment_frozen = models.DecimalField(max_digits=18, decimal_places=2, default=Decimal('0'))
+    balances_dirty = models.BooleanField(default=True)
+    planned_dirty = models.BooleanField(default=True)
+    consignment_dirty = models.BooleanField(default=True)
+    # Лічильник позначок брудності: перерахунок, під час якого групу знову
+    # позначили, не повинен знімати прапорці.
+    version = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Зведення панелі'
+        verbose_name_plural = 'Зведення панелі'
+
+    def __str__(self):
+        return f'Зведення панелі {self.company_id}'
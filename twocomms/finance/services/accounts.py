@@ -10,6 +10,7 @@ from django.utils import timezone
 from ..models import Account, Transaction, get_default_company
 from . import audit as audit_service
 from . import balances as balance_service
+from .sidebar_summary import mark_sidebar_dirty
 
 
 def create_account(*, user, name, currency='UAH', type='bank',
@@ -75,6 +76,7 @@ def reorder_accounts(ordered_ids, *, user) -> None:
     company = get_default_company()
     for index, acc_id in enumerate(ordered_ids):
         Account.objects.filter(company=company, id=acc_id).update(sort_order=index)
+    mark_sidebar_dirty(company.id, 'balances')
 
 
 @db_transaction.atomic
@@ -0,0 +1,156 @@
+"""Матеріалізоване зведення лівої панелі кабінету (SidebarSummary).
+
+Раніше finance_shell_context на кожен рендер перераховував суму балансів
+(з конвертацією по кожному рахунку), планові за 30 днів (по кожній плановій
+транзакції), найближчі планові дати, борг магазинів і заморожене під
+реалізацію. Тепер ці цифри лежать в одному рядку SidebarSummary:
+
+- ``balances``     — total_balance + accounts (рахунки/курси валют);
+- ``planned``      — planned_income/expense, next_*_at, resellers_debt
+                     (транзакції; вікно зсувається щодня → as_of);
+- ``consignment``  — consignment_frozen (позиції під реалізацію).
+
+Сигнали (finance.signals) лише позначають групу брудною одним UPDATE і
+збільшують ``version``; перераховується тільки вона і лише при наступному
+читанні. Перерахунок знімає прапорці UPDATE-ом з умовою на прочитану
+``version``, тож позначка, зроблена під час перерахунку, не губиться. Дрейф
+(зміни через QuerySet.update, ручні правки в БД) ловить
+finance_reconcile_sidebar.
+"""
+from __future__ import annotations
+
+import datetime as dt
+from decimal import Decimal
+
+from django.db import transaction as db_transaction
+from django.db.models import F
+from django.utils import timezone
+
+from ..models import SidebarSummary, Transaction
+from . import balances as balance_service
+from . import consignment as consignment_service
+from .timeutil import day_end
+
+PLANNED_HORIZON_DAYS = 30
+PARTS = ('balances', 'planned', 'consignment')
+
+
+def mark_sidebar_dirty(company_id, *parts) -> None:
+    """Позначає групи зведення брудними (одразу і ще раз після коміту)."""
+    if not company_id:
+        return
+    parts = parts or PARTS
+    flags = {f'{part}_dirty': True for part in parts}
+
+    def _mark():
+        SidebarSummary.objects.filter(company_id=company_id).update(version=F('version') + 1, **flags)
+
+    _mark()
+    db_transaction.on_commit(_mark)
+
+
+def _nearest_planned(company, ttype, horizon):
+    txn = (Transaction.objects.filter(
+                company=company, status=Transaction.STATUS_PLANNED, type=ttype,
+                date_actual__lte=day_end(horizon))
+           .exclude(excluded_from_reports=True)
+           .order_by('date_actual')
+           .only('date_actual')
+           .first())
+    return txn.date_actual if txn else None
+
+
+def compute_part(company, part: str, today=None) -> dict:
+    """Свіжі значення полів однієї групи зведення."""
+    today = today or timezone.localdate()
+    if part == 'balances':
+        accounts = []
+        for item in balance_service.account_sidebar_data(company):
+            accounts.append({**item, 'balance': str(item['balance'])})
+        return {
+            'total_balance': balance_service.total_actual_balance(company),
+            'accounts': accounts,
+        }
+    if part == 'planned':
+        # Прогноз рахуємо лише від сьогодні, щоб прострочені планові не
+        # задвоювали суму повторюваних зобов'язань.
+        horizon = today + dt.timedelta(days=PLANNED_HORIZON_DAYS)
+        planned = balance_service.planned_totals(company, today, horizon)
+        return {
+            'as_of': today,
+            'planned_income': planned['income'],
+            'planned_expense': planned['expense'],
+            'next_income_at': _nearest_planned(company, Transaction.TYPE_INCOME, horizon),
+            'next_expense_at': _nearest_planned(company, Transaction.TYPE_EXPENSE, horizon),
+            'resellers_debt': consignment_service.resellers_debt_total(company),
+        }
+    if part == 'consignment':
+        return {'consignment_frozen': consignment_service.consignment_frozen_total(company)}
+    raise ValueError(f'Unknown sidebar summary part: {part}')
+
+
+def refresh_sidebar_summary(summary: SidebarSummary, parts=PARTS, today=None) -> SidebarSummary:
+    """Перераховує групи ``parts``; прапорці знімає, лише якщо ``version`` не змінилась.
+
+    ``summary.version`` має бути прочитана до розрахунку: якщо тим часом
+    mark_sidebar_dirty позначив зведення знову, нові значення записуються, але
+    групи лишаються брудними до наступного читання.
+    """
+    values = {}
+    for part in parts:
+        values.update(compute_part(summary.company, part, today=today))
+    values['updated_at'] = timezone.now()
+    flags = {f'{part}_dirty': False for part in parts}
+    rows = SidebarSummary.objects.filter(pk=summary.pk)
+    if rows.filter(version=summary.version).update(**values, **flags):
+        values.update(flags)
+    else:
+        rows.update(**values)
+    for field, value in values.items():
+        setattr(summary, field, value)
+    return summary
+
+
+def get_sidebar_summary(company, today=None) -> SidebarSummary:
+    """Зведення компанії; перераховує лише брудні/застарілі групи."""
+    today = today or timezone.localdate()
+    summary, _ = SidebarSummary.objects.select_related('company').get_or_create(company=company)
+    stale = [part for part in PARTS if getattr(summary, f'{part}_dirty')]
+    if summary.as_of != today and 'planned' not in stale:
+        stale.append('planned')
+    if stale:
+        refresh_sidebar_summary(summary, stale, today=today)
+    return summary
+
+
+def _normalize(values: dict) -> dict:
+    normalized = {}
+    for field, value in values.items():
+        if isinstance(value, Decimal):
+            value = value.quantize(Decimal('0.01'))
+        normalized[field] = value
+    return normalized
+
+
+def reconcile_sidebar_summary(company, *, fix: bool = True, today=None) -> dict:
+    """Порівнює збережене зведення зі свіжим розрахунком.
+
+    Повертає ``{поле: (збережене, свіже)}`` для полів, що розійшлися (брудні
+    групи не вважаються дрейфом). При ``fix`` — перезаписує зведення.
+    """
+    today = today or timezone.localdate()
+    summary, _ = SidebarSummary.objects.get_or_create(company=company)
+    drift = {}
+    for part in PARTS:
+        fresh = _normalize(compute_part(company, part, today=today))
+        if getattr(summary, f'{part}_dirty') or (part == 'planned' and summary.as_of != today):
+            continue
+        for field, value in fresh.items():
+            stored = getattr(summary, field)
+            if isinstance(stored, Decimal):
+                stored = stored.quantize(Decimal('0.01'))
+            if stored != value:
+                drift[field] = (stored, value)
+    if fix:
+        refresh_sidebar_summary(summary, PARTS, today=today)
+    return drift
@@ -0,0 +1,27 @@
+"""Сигнали фінкабінету: позначають брудними групи зведення лівої панелі."""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Account, ConsignmentItem, CurrencyRate, Transaction
+from .services.sidebar_summary import mark_sidebar_dirty
+
+
+@receiver([post_save, post_delete], sender=Transaction)
+def transaction_changed(sender, instance, **kwargs):
+    # Фактичні змінюють баланси, планові — прогноз і борг магазинів.
+    mark_sidebar_dirty(instance.company_id, 'balances', 'planned')
+
+
+@receiver([post_save, post_delete], sender=Account)
+def account_changed(sender, instance, **kwargs):
+    mark_sidebar_dirty(instance.company_id, 'balances')
+
+
+@receiver([post_save, post_delete], sender=CurrencyRate)
+def currency_rate_changed(sender, instance, **kwargs):
+    mark_sidebar_dirty(instance.company_id, 'balances', 'planned')
+
+
+@receiver([post_save, post_delete], sender=ConsignmentItem)
+def consignment_item_changed(sender, instance, **kwargs):
+    mark_sidebar_dirty(instance.company_id, 'consignment')
@@ -1,16 +1,24 @@
-"""Тести лівої панелі: прогноз майбутніх платежів і собівартість складу."""
+"""Тести лівої панелі: прогноз майбутніх платежів, собівартість складу, зведення."""
 from __future__ import annotations
 
 import datetime as dt
 from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
-from finance.models import Account, Transaction, get_default_company
+from finance.context_processors import finance_shell_context
+from finance.models import Account, SidebarSummary, Transaction, get_default_company
 from finance.services import balances as b
 from finance.services import transactions as txn_service
+from finance.services import sidebar_summary
+from finance.services.sidebar_summary import mark_sidebar_dirty, reconcile_sidebar_summary
 
 User = get_user_model()
 
@@ -59,3 +67,80 @@ class PlannedForecastTests(TestCase):
         horizon = timezone.localdate() + dt.timedelta(days=30)
         planned = b.planned_totals(self.company, None, horizon)
         self.assertEqual(planned['income'], Decimal('0.00'))
+
+
+class SidebarSummaryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('fin_sb', 'sb@x.com', 'x')
+        self.company = get_default_company()
+        self.acc = Account.objects.create(company=self.company, name='Банк', currency='UAH',
+                                          initial_balance=Decimal('1000'),
+                                          current_balance=Decimal('1000'))
+        self.factory = RequestFactory()
+
+    def _context(self):
+        request = self.factory.get('/', HTTP_HOST='fin.twocomms.shop')
+        request.user = self.user
+        with override_settings(ALLOWED_HOSTS=['fin.twocomms.shop']):
+            return finance_shell_context(request)
+
+    def test_summary_follows_transactions_and_accounts(self):
+        self._context()
+        txn_service.create_transaction(user=self.user, type=Transaction.TYPE_INCOME,
+                                       amount=Decimal('250'), account=self.acc,
+                                       date_actual=timezone.now())
+        txn_service.create_transaction(user=self.user, type=Transaction.TYPE_EXPENSE,
+                                       amount=Decimal('40'), account=self.acc,
+                                       status=Transaction.STATUS_PLANNED,
+                                       date_actual=timezone.now() + dt.timedelta(days=3))
+        Account.objects.create(company=self.company, name='Каса', currency='UAH',
+                               initial_balance=Decimal('10'), current_balance=Decimal('10'))
+
+        ctx = self._context()
+        summary = SidebarSummary.objects.get(company=self.company)
+        self.assertEqual(summary.total_balance, Decimal('1260.00'))
+        self.assertEqual(summary.planned_expense, Decimal('-40.00'))
+        self.assertEqual([acc['name'] for acc in ctx['fin_accounts']], ['Банк', 'Каса'])
+        self.assertTrue(ctx['fin_planned_next_expense_date'])
+
+    def test_render_query_count_does_not_grow_with_data(self):
+        self._context()
+        with CaptureQueriesContext(connection) as small:
+            self._context()
+        for idx in range(5):
+            acc = Account.objects.create(company=self.company, name=f'Рахунок {idx}', currency='UAH')
+            txn_service.create_transaction(user=self.user, type=Transaction.TYPE_INCOME,
+                                           amount=Decimal('5'), account=acc,
+                                           status=Transaction.STATUS_PLANNED,
+                                           date_actual=timezone.now() + dt.timedelta(days=idx + 1))
+        self._context()
+        with CaptureQueriesContext(connection) as large:
+            self._context()
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_mark_during_refresh_keeps_the_group_dirty(self):
+        self._context()
+        mark_sidebar_dirty(self.company.id, 'balances')
+        compute_part = sidebar_summary.compute_part
+
+        def racing_compute(company, part, today=None):
+            values = compute_part(company, part, today=today)
+            mark_sidebar_dirty(company.id, 'balances')  # зміна прийшла, поки рахували
+            return values
+
+        with patch.object(sidebar_summary, 'compute_part', side_effect=racing_compute):
+            sidebar_summary.get_sidebar_summary(self.company)
+        self.assertTrue(SidebarSummary.objects.get(company=self.company).balances_dirty)
+
+        sidebar_summary.get_sidebar_summary(self.company)
+        self.assertFalse(SidebarSummary.objects.get(company=self.company).balances_dirty)
+
+    def test_reconcile_command_detects_and_fixes_drift(self):
+        self._context()
+        # Обхід сигналів: пряма зміна балансу без recalc.
+        Account.objects.filter(pk=self.acc.pk).update(current_balance=Decimal('777'))
+        out = StringIO()
+        call_command('finance_reconcile_sidebar', stdout=out)
+        self.assertIn('total_balance', out.getvalue())
+        self.assertEqual(SidebarSummary.objects.get(company=self.company).total_balance, Decimal('777.00'))
+        self.assertEqual(reconcile_sidebar_summary(self.company, fix=False), {})
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ManagementConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'management'
+
+    def ready(self):
+        # Сигнали інвалідації кешів (метрики складу менеджерів тощо)
+        from . import signals  # noqa: F401
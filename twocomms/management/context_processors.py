@@ -10,6 +10,7 @@ from management.models import Client, ClientFollowUp, DuplicateReview, NightlySc
 from management.services.followup_state import get_effective_callback_state
 from management.services.payouts import get_manager_payout_summary
 from management.services.roster import management_role_label
+from management.services.shell_metrics import read_shell_metrics, store_shell_metrics
 
 
 def _is_management_host(request):
@@ -20,7 +21,27 @@ def _is_management_host(request):
     return host.startswith("management.")
 
 
+def _shell_duplicate_scope(user, profile) -> str:
+    if getattr(user, "is_staff", False) and not getattr(profile, "is_manager", False):
+        return "all"
+    return "own"
+
+
 def build_management_shell_metrics(user, profile=None):
+    """Метрики shell з кешу fragments; див. services.shell_metrics."""
+    scope = _shell_duplicate_scope(user, profile)
+    metrics = read_shell_metrics(user.pk, scope)
+    if metrics is None:
+        metrics = compute_management_shell_metrics(user, profile)
+        store_shell_metrics(user.pk, scope, metrics)
+    try:
+        payout_url = reverse("management_payouts")
+    except NoReverseMatch:
+        payout_url = ""
+    return {**metrics, "management_shell_payout_url": payout_url}
+
+
+def compute_management_shell_metrics(user, profile=None):
     from datetime import timedelta as _td
     # Не використовуємо created_at__date: на проді (MySQL без tz-таблиць)
     # CONVERT_TZ → NULL і лічильник завжди показує 0. Фільтруємо діапазоном.
@@ -73,14 +94,10 @@ def build_management_shell_metrics(user, profile=None):
         elif state.code in {"scheduled", "due_now"} and state.due_at and state.due_at.date() == today:
             today_callbacks += 1
     duplicate_reviews_qs = DuplicateReview.objects.filter(status=DuplicateReview.Status.OPEN)
-    if not (getattr(user, "is_staff", False) and not getattr(profile, "is_manager", False)):
+    if _shell_duplicate_scope(user, profile) == "own":
         duplicate_reviews_qs = duplicate_reviews_qs.filter(owner=user)
     duplicate_reviews = duplicate_reviews_qs.count()
     payout_summary = get_manager_payout_summary(user)
-    try:
-        payout_url = reverse("management_payouts")
-    except NoReverseMatch:
-        payout_url = ""
 
     return {
         "management_shell_daily_zone": daily_zone,
@@ -95,7 +112,6 @@ def build_management_shell_metrics(user, profile=None):
         "management_shell_duplicate_reviews": duplicate_reviews,
         "management_shell_payout_available": payout_summary["available"],
         "management_shell_has_active_payout_request": payout_summary["has_active_request"],
-        "management_shell_payout_url": payout_url,
         "management_shell_secondary_counts": {
             "today_callbacks": today_callbacks,
             "urgent_callbacks": urgent_callbacks,
@@ -0,0 +1,89 @@
+"""Бенчмарк каталогу IG-бота: розмір контексту та латентність індексу.
+
+Порівнює старий підхід (увесь каталог одним рядком, обрізаний до 16k символів)
+з retrieval-підходом (top-k товарів під запит), а також міряє час побудови
+BM25-індексу і час одного пошуку.
+
+Запуск:
+    python manage.py benchmark_bot_catalog
+    python manage.py benchmark_bot_catalog --query "худі харків" --query "чорна футболка"
+    python manage.py benchmark_bot_catalog --top-k 5 --repeat 200
+"""
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from management.services import bot_catalog
+
+DEFAULT_QUERIES = (
+    "яке у вас є худі?",
+    "чорна футболка з принтом",
+    "hudi kharkiv",
+    "скільки коштує лонгслів",
+    "що у вас є?",
+)
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+class Command(BaseCommand):
+    help = "Міряє розмір контексту каталогу бота та латентність побудови/пошуку індексу."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--query", action="append", default=[], help="Запит (можна кілька разів)")
+        parser.add_argument("--top-k", type=int, default=bot_catalog.TOP_K, help="Скільки товарів у контексті")
+        parser.add_argument("--repeat", type=int, default=50, help="Повторів кожного запиту")
+
+    def handle(self, *args, **opts):
+        queries = opts["query"] or list(DEFAULT_QUERIES)
+        top_k = max(1, int(opts["top_k"]))
+        repeat = max(1, int(opts["repeat"]))
+
+        t0 = time.perf_counter()
+        index = bot_catalog._build(bot_catalog.catalog_version())
+        build_ms = (time.perf_counter() - t0) * 1000
+
+        # Старий формат: шапка + до 250 рядків, обрізаних на MAX_CHARS.
+        legacy = "\n".join(["Каталог TwoComms (актуальні товари, ціни в грн):", *index.lines[:250]])
+        legacy_chars = min(len(legacy), bot_catalog.MAX_CHARS)
+        legacy_products = legacy[: bot_catalog.MAX_CHARS].count("\n")
+
+        self.stdout.write(f"Товарів в індексі: {len(index)}, термінів: {len(index.postings)}")
+        self.stdout.write(f"Побудова індексу: {build_ms:.1f} мс")
+        self.stdout.write(
+            f"Старий контекст: {legacy_chars} символів (~{legacy_chars // 4} токенів), "
+            f"товарів до обрізання: {legacy_products}/{len(index)}"
+        )
+
+        sizes = []
+        latencies = []
+        for query in queries:
+            per_query = []
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                index.search(query, top_k)
+                per_query.append((time.perf_counter() - t0) * 1000)
+            latencies.extend(per_query)
+            context = bot_catalog.get_catalog_context(query=query, top_k=top_k)
+            sizes.append(len(context))
+            hits = [index.product_ids[doc] for doc, _score in index.search(query, top_k)]
+            self.stdout.write(
+                f"  «{query}»: {len(context)} символів, збігів {len(hits)}, "
+                f"p50 {statistics.median(per_query):.3f} мс"
+            )
+
+        avg_size = statistics.mean(sizes) if sizes else 0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Retrieval-контекст: у середньому {avg_size:.0f} символів "
+                f"(~{avg_size / 4:.0f} токенів, {avg_size / max(legacy_chars, 1):.1%} від старого); "
+                f"пошук p50 {_percentile(latencies, 50):.3f} мс, p95 {_percentile(latencies, 95):.3f} мс"
+            )
+        )
@@ -5,7 +5,16 @@ from django.utils import timezone
 
 from management.models import CommandRunLog
 from management.services.roster import management_subjects_queryset
-from management.services.snapshots import persist_nightly_snapshot
+from management.services.snapshot_engine import iter_dates, run_nightly_snapshots
+
+MAX_BACKFILL_DAYS = 366
+
+
+def _parse_date(raw: str, option: str) -> date:
+    try:
+        return date.fromisoformat(raw)
+    except ValueError as exc:
+        raise CommandError(f"Invalid {option}. Use YYYY-MM-DD.") from exc
 
 
 class Command(BaseCommand):
@@ -13,20 +22,44 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("--date", dest="date", help="Snapshot local date in YYYY-MM-DD format.")
+        parser.add_argument("--from", dest="date_from", help="Backfill range start (YYYY-MM-DD, inclusive).")
+        parser.add_argument("--to", dest="date_to", help="Backfill range end (YYYY-MM-DD, inclusive).")
         parser.add_argument("--user-id", dest="user_id", type=int, help="Process only one management user.")
+        parser.add_argument("--workers", dest="workers", type=int, default=1, help="Worker processes for backfills.")
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Recompute snapshots even when their inputs have not changed.",
+        )
 
     def handle(self, *args, **options):
         snapshot_date_raw = options.get("date")
+        date_from_raw = options.get("date_from")
+        date_to_raw = options.get("date_to")
         user_id = options.get("user_id")
-        if snapshot_date_raw:
-            try:
-                snapshot_date = date.fromisoformat(snapshot_date_raw)
-            except ValueError as exc:
-                raise CommandError("Invalid --date. Use YYYY-MM-DD.") from exc
+        workers = max(1, int(options.get("workers") or 1))
+
+        if snapshot_date_raw and (date_from_raw or date_to_raw):
+            raise CommandError("Use either --date or --from/--to.")
+        if date_from_raw or date_to_raw:
+            if not (date_from_raw and date_to_raw):
+                raise CommandError("--from and --to must be used together.")
+            date_from = _parse_date(date_from_raw, "--from")
+            date_to = _parse_date(date_to_raw, "--to")
+            if date_from > date_to:
+                raise CommandError("--from must not be after --to.")
+            if (date_to - date_from).days + 1 > MAX_BACKFILL_DAYS:
+                raise CommandError(f"Backfill range is limited to {MAX_BACKFILL_DAYS} days.")
         else:
-            snapshot_date = timezone.localdate() - timedelta(days=1)
+            if snapshot_date_raw:
+                date_from = _parse_date(snapshot_date_raw, "--date")
+            else:
+                date_from = timezone.localdate() - timedelta(days=1)
+            date_to = date_from
+        dates = iter_dates(date_from, date_to)
 
-        run_key = f"compute_nightly_scores:{snapshot_date.isoformat()}:{user_id or 'all'}"
+        range_label = date_from.isoformat() if date_from == date_to else f"{date_from.isoformat()}..{date_to.isoformat()}"
+        run_key = f"compute_nightly_scores:{range_label}:{user_id or 'all'}"
         run_log, _ = CommandRunLog.objects.update_or_create(
             run_key=run_key,
             defaults={
@@ -36,8 +69,10 @@ class Command(BaseCommand):
                 "warnings_count": 0,
                 "error_excerpt": "",
                 "meta": {
-                    "snapshot_date": snapshot_date.isoformat(),
+                    "snapshot_date": date_from.isoformat(),
+                    "date_to": date_to.isoformat(),
                     "scope": "single-user" if user_id else "all-management-users",
+                    "workers": workers,
                 },
                 "finished_at": None,
             },
@@ -46,27 +81,35 @@ class Command(BaseCommand):
         queryset = management_subjects_queryset().order_by("id")
         if user_id:
             queryset = queryset.filter(id=user_id)
+        owner_ids = list(queryset.values_list("id", flat=True))
 
-        processed = 0
         try:
-            for owner in queryset:
-                persist_nightly_snapshot(owner=owner, snapshot_date=snapshot_date, job_run=run_log)
-                processed += 1
+            stats = run_nightly_snapshots(
+                owner_ids=owner_ids,
+                dates=dates,
+                job_run=run_log,
+                workers=workers,
+                force=bool(options.get("force")),
+            )
             run_log.meta = {
                 **(run_log.meta or {}),
-                "snapshot_date": snapshot_date.isoformat(),
-                "processed_user_ids": list(queryset.values_list("id", flat=True)),
+                "processed_user_ids": owner_ids,
+                "computed": stats.computed,
+                "skipped_unchanged": stats.skipped,
             }
             run_log.save(update_fields=["meta"])
-            run_log.mark_finished(status=CommandRunLog.Status.SUCCESS, rows_processed=processed)
+            run_log.mark_finished(status=CommandRunLog.Status.SUCCESS, rows_processed=stats.owner_days)
         except Exception as exc:
             run_log.mark_finished(
                 status=CommandRunLog.Status.FAILED,
-                rows_processed=processed,
+                rows_processed=0,
                 error_excerpt=str(exc)[:500],
             )
             raise
 
         self.stdout.write(
-            self.style.SUCCESS(f"Built {processed} nightly snapshot(s) for {snapshot_date.isoformat()}.")
+            self.style.SUCCESS(
+                f"Built {stats.computed} nightly snapshot(s) for {range_label}"
+                f" ({stats.skipped} unchanged skipped)."
+            )
         )
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from management.models import CommandRunLog
+from management.services.dedupe_index import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the duplicate-detection key index from clients and leads."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", dest="chunk_size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        run_log = CommandRunLog.objects.create(
+            command_name="rebuild_dedupe_index",
+            run_key=f"rebuild_dedupe_index:{timezone.now().isoformat()}",
+            meta={"mode": "full-rebuild"},
+        )
+        try:
+            with transaction.atomic():
+                counts = rebuild_index(chunk_size=max(100, int(options.get("chunk_size") or 2000)))
+        except Exception as exc:
+            run_log.mark_finished(status=CommandRunLog.Status.FAILED, rows_processed=0, error_excerpt=str(exc)[:500])
+            raise
+        run_log.meta = {**(run_log.meta or {}), **counts}
+        run_log.save(update_fields=["meta"])
+        run_log.mark_finished(
+            status=CommandRunLog.Status.SUCCESS,
+            rows_processed=counts["clients"] + counts["leads"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Indexed {counts['clients']} client(s) and {counts['leads']} lead(s): {counts['entries']} key(s)."
+            )
+        )
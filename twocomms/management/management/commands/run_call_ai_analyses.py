@@ -1,36 +1,32 @@
 """
-Cron-воркер авто ШІ-аналізу записів дзвінків.
-
-Запускається крон-джобом кожні 1–2 хв. Бере CallRecord зі статусом
-ai_status=pending, які:
-  - мають generalCallID,
-  - завершилися щонайменше ANALYSIS_DELAY_SECONDS тому (щоб запис устиг
-    зʼявитися у провайдера),
-  - тривали >= MEANINGFUL_SECONDS.
-
-Для кожного: атомарно бере «лок» (ai_status=running, ai_locked_at, ai_attempts++),
-викликає синхронний analyze_call (тут таймаути не страшні — це фон), і ставить
-ai_status=done / error. Ретраї обмежені MAX_ATTEMPTS. Денний кеп захищає від
-вигорання квоти Gemini.
-
-Ідемпотентно: stale-лок (running старше STALE_LOCK_MINUTES) перепідбирається —
-страховка від падіння процесу.
+Воркер авто ШІ-аналізу записів дзвінків.
+
+Обробляє чергу services/call_analysis_jobs.py (CallRecord.ai_*): записи,
+поставлені вебхуком (ai_status=pending, дзвінок завершився щонайменше
+ANALYSIS_DELAY_SECONDS тому й тривав >= MEANINGFUL_SECONDS), і ті, що
+поставлено явно (enqueue_call_analysis, ai_next_attempt_at настав).
+
+Режими:
+  (без прапорців) один прогін для cron кожні 1–2 хв;
+  --forever       окремий процес-демон: опитує чергу кожні --interval секунд.
+
+Кожен запис береться в оренду одним умовним UPDATE (ai_claimed_by,
+ai_lease_until, ai_attempts++); --workers записів аналізуються паралельно.
+Невдача → повтор за графіком (ai_next_attempt_at), після MAX_ATTEMPTS — error.
+Оренда, що прострочилась (процес упав), перепідбирається. Денний кеп захищає
+від вигорання квоти Gemini.
 """
 from __future__ import annotations
 
 import os
-from datetime import timedelta
+import time
 
 from django.core.management.base import BaseCommand
-from django.db import transaction
+from django.db import close_old_connections
 from django.utils import timezone
 
-from management.models import CallAIAnalysis, CallRecord
-
-ANALYSIS_DELAY_SECONDS = 90
-MEANINGFUL_SECONDS = 30
-MAX_ATTEMPTS = 3
-STALE_LOCK_MINUTES = 15
+from management.models import CallAIAnalysis
+from management.services import call_analysis_jobs as jobs
 
 
 def _daily_cap() -> int:
@@ -41,90 +37,54 @@ def _daily_cap() -> int:
 
 
 class Command(BaseCommand):
-    help = "Прогнати чергу авто ШІ-аналізу записів дзвінків (для cron)."
+    help = "Прогнати чергу авто ШІ-аналізу записів дзвінків (cron або --forever)."
 
     def add_arguments(self, parser):
         parser.add_argument("--limit", type=int, default=15, help="Скільки записів за один прогін.")
+        parser.add_argument("--workers", type=int, default=jobs.DEFAULT_WORKERS,
+                            help="Скільки дзвінків аналізувати одночасно.")
+        parser.add_argument("--forever", action="store_true", help="Окремий воркер-демон.")
+        parser.add_argument("--interval", type=float, default=15.0,
+                            help="Пауза між опитуваннями черги в режимі --forever, с.")
         parser.add_argument("--dry-run", action="store_true", help="Лише показати кандидатів.")
 
     def handle(self, *args, **options):
         limit = max(1, int(options["limit"]))
-        dry = bool(options["dry_run"])
+        workers = max(1, int(options["workers"]))
+        if options["dry_run"]:
+            ids = jobs.due_call_job_ids(limit)
+            self.stdout.write(f"Кандидати: {ids}" if ids else "Немає записів для аналізу.")
+            return
+        if not options["forever"]:
+            self._run_once(limit, workers)
+            return
+        interval = max(1.0, float(options["interval"]))
+        while True:
+            close_old_connections()
+            try:
+                processed = self._run_once(limit, workers)
+            except Exception as exc:  # демон не падає через один прогін
+                self.stderr.write(f"прогін упав: {exc!r}")
+                processed = 0
+            if not processed:
+                time.sleep(interval)
+
+    def _run_once(self, limit: int, workers: int) -> int:
         now = timezone.now()
-        cutoff = now - timedelta(seconds=ANALYSIS_DELAY_SECONDS)
-        stale = now - timedelta(minutes=STALE_LOCK_MINUTES)
-
-        # Денний кеп: скільки done+error за сьогодні.
         start_day = timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0)
         done_today = CallAIAnalysis.objects.filter(created_at__gte=start_day).count()
         cap = _daily_cap()
         if done_today >= cap:
             self.stdout.write(f"Денний кеп досягнуто ({done_today}/{cap}). Пропуск.")
-            return
+            return 0
 
-        candidates = (
-            CallRecord.objects.filter(ai_status=CallRecord.AiStatus.PENDING)
-            .exclude(external_call_id="")
-            .filter(duration_seconds__gte=MEANINGFUL_SECONDS)
-            .filter(created_at__lte=cutoff)
-            .order_by("created_at")[: limit * 2]
-        )
-        # Підхопити «завислі» running.
-        stale_running = list(
-            CallRecord.objects.filter(
-                ai_status=CallRecord.AiStatus.RUNNING, ai_locked_at__lte=stale
-            ).order_by("ai_locked_at")[:limit]
-        )
-
-        ids = [r.id for r in list(candidates) + stale_running][:limit]
-        if not ids:
+        stats = jobs.run_call_jobs(min(limit, cap - done_today), workers=workers)
+        processed = sum(stats.values())
+        if not processed:
             self.stdout.write("Немає записів для аналізу.")
-            return
-        if dry:
-            self.stdout.write(f"Кандидати: {ids}")
-            return
-
-        from management.services.call_ai_analysis import CallAIAnalysisError, analyze_call
-
-        processed = 0
-        for rec_id in ids:
-            if done_today + processed >= cap:
-                break
-            # Атомарний лок.
-            with transaction.atomic():
-                rec = CallRecord.objects.select_for_update().filter(id=rec_id).first()
-                if not rec:
-                    continue
-                if rec.ai_status not in (CallRecord.AiStatus.PENDING, CallRecord.AiStatus.RUNNING):
-                    continue
-                if rec.ai_status == CallRecord.AiStatus.RUNNING and rec.ai_locked_at and rec.ai_locked_at > stale:
-                    continue  # ще обробляється іншим процесом
-                if rec.ai_attempts >= MAX_ATTEMPTS:
-                    rec.ai_status = CallRecord.AiStatus.ERROR
-                    rec.save(update_fields=["ai_status", "updated_at"])
-                    continue
-                rec.ai_status = CallRecord.AiStatus.RUNNING
-                rec.ai_locked_at = timezone.now()
-                rec.ai_attempts = (rec.ai_attempts or 0) + 1
-                rec.save(update_fields=["ai_status", "ai_locked_at", "ai_attempts", "updated_at"])
-
-            # Поза транзакцією — довгий мережевий виклик.
-            try:
-                analysis = analyze_call(rec.external_call_id, force=True)
-                ok = analysis.status == CallAIAnalysis.Status.DONE
-            except CallAIAnalysisError as exc:
-                ok = False
-                self.stderr.write(f"#{rec_id}: {exc}")
-            except Exception as exc:  # не валимо весь прогін
-                ok = False
-                self.stderr.write(f"#{rec_id}: unexpected {exc}")
-
-            rec.refresh_from_db(fields=["ai_attempts"])
-            rec.ai_status = CallRecord.AiStatus.DONE if ok else (
-                CallRecord.AiStatus.PENDING if rec.ai_attempts < MAX_ATTEMPTS else CallRecord.AiStatus.ERROR
-            )
-            rec.save(update_fields=["ai_status", "updated_at"])
-            processed += 1
-            self.stdout.write(f"#{rec_id}: {'done' if ok else 'retry/error'}")
-
-        self.stdout.write(f"Готово: оброблено {processed}.")
+            return 0
+        self.stdout.write(
+            "Готово: оброблено {total} (done {done}, повтор {retry}, чекають запис {waiting}, "
+            "помилка {error}).".format(total=processed, **stats)
+        )
+        return processed
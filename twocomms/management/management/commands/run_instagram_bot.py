@@ -32,6 +32,7 @@ HB_ALIVE_WINDOW = 45                   # демон вважається жив
 SPAWN_LOCK_KEY = "ig_bot_spawn_lock"
 PID_FILE = "tmp/ig_bot.pid"
 CONV_REFRESH_EVERY = 120               # фонове оновлення списку тредів, c
+IDLE_AFTER_WORK = 0.1                  # пауза між колами, коли черга не порожня
 
 
 def _daemon_alive() -> bool:
@@ -150,18 +151,19 @@ class Command(BaseCommand):
                             "restart.txt змінено — демон перезавантажується для нового коду")
                     break
                 enabled = False
+                handled = 0
                 try:
                     s = InstagramBotSettings.load()
                     enabled = s.is_enabled
                     interval = max(2, s.poll_interval_seconds or 3)
                     if enabled:
-                        # 1) Воркер черги — дешево (локальна БД), щоразу.
-                        bot.process_pending(s)
+                        # 1) Воркер черги — пул потоків (bot.WORKER_POOL_SIZE), щоразу.
+                        handled = bot.process_pending(s)
                         # 2) Резервний інгест із IG — лише якщо увімкнено й настав час.
                         now = time.time()
                         if s.receive_via_poll and (now - last_poll) >= interval:
                             bot.poll_ingest(s)
-                            bot.process_pending(s)
+                            handled += bot.process_pending(s)
                             last_poll = now
                     # heartbeat для UI навіть коли зупинено (агент онлайн)
                     s.heartbeat_at = tz.now()
@@ -170,8 +172,13 @@ class Command(BaseCommand):
                     bot.log("error", "daemon_loop", repr(exc))
                 finally:
                     cache.set(HB_KEY, time.time(), HB_ALIVE_WINDOW * 3)
-                # працює — кожні ~1.5 c (низька латентність черги); зупинено — рідше
-                time.sleep(1.5 if enabled else 5)
+                # Щойно щось обробили — у черзі може бути наступне від тих самих
+                # відправників, тож одразу йдемо на нове коло. Порожня черга —
+                # ~1.5 c (низька латентність); зупинено — рідше.
+                if enabled and handled:
+                    time.sleep(IDLE_AFTER_WORK)
+                else:
+                    time.sleep(1.5 if enabled else 5)
         finally:
             stop_event.set()
             # Звільняємо heartbeat одразу, щоб watchdog підняв новий демон без
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from management.models import LeadParsingJob
+from management.parser_runner import DEFAULT_LOOKAHEAD, DEFAULT_WORKERS, run_parser_job
+from management.parser_service import parser_dashboard_job
+
+
+class Command(BaseCommand):
+    help = "Прогнати активну (або вказану) сесію парсингу Google Places конвеєрним раннером."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--job-id", type=int, help="Сесія парсингу; за замовчуванням — активна.")
+        parser.add_argument("--max-steps", type=int, help="Максимум кроків (сторінок) за запуск.")
+        parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Паралельних HTTP-запитів до Places.")
+        parser.add_argument(
+            "--lookahead",
+            type=int,
+            default=DEFAULT_LOOKAHEAD,
+            help="На скільки наступних запитів (keyword × місто × тип) тягнути першу сторінку наперед.",
+        )
+
+    def handle(self, *args, **options):
+        job = parser_dashboard_job(job_id=options.get("job_id"))
+        if not job:
+            raise CommandError("Сесію парсингу не знайдено.")
+        if job.status != LeadParsingJob.Status.RUNNING:
+            self.stdout.write(f"Сесія #{job.id} не активна ({job.status}).")
+            return
+
+        job = run_parser_job(
+            job,
+            max_steps=options.get("max_steps"),
+            workers=max(1, int(options["workers"])),
+            lookahead=max(0, int(options["lookahead"])),
+        )
+        self.stdout.write(
+            f"Сесія #{job.id}: {job.status}, запитів {job.request_count}/{job.request_limit}, "
+            f"додано {job.added_to_moderation}, дублів {job.duplicate_skipped}."
+        )
@@ -1,11 +1,14 @@
+from datetime import timedelta
+
 from django.contrib.auth import get_user_model
 from django.core.management.base import BaseCommand
 from django.db.models import Q
 from django.utils import timezone
 
-from management.models import ClientFollowUp, CommandRunLog
+from management.models import ClientFollowUp, CommandRunLog, Report
 from management.services.analytics_v7 import record_followup_notified
 from management.services.followups import build_reminder_digest
+from management.services.roster_metrics import get_roster_metrics
 
 
 class Command(BaseCommand):
@@ -18,7 +21,7 @@ class Command(BaseCommand):
             meta={"mode": "digest"},
         )
         User = get_user_model()
-        users = (
+        users = list(
             User.objects.filter(is_active=True)
             .filter(Q(is_staff=True) | Q(userprofile__is_manager=True))
             .distinct()
@@ -26,8 +29,19 @@ class Command(BaseCommand):
         rows_processed = 0
         warnings_count = 0
         now = timezone.now()
+        roster_metrics = get_roster_metrics(users, now=now)
+        day_start = timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0)
+        reported_ids = set(
+            Report.objects.filter(owner__in=users, created_at__gte=day_start, created_at__lt=day_start + timedelta(days=1))
+            .values_list("owner_id", flat=True)
+        )
         for user in users:
-            digest = build_reminder_digest(user, now=now)
+            digest = build_reminder_digest(
+                user,
+                now=now,
+                stats=roster_metrics.get(user.id),
+                report_sent=user.id in reported_ids,
+            )
             followup_ids = [item.get("followup_id") for item in digest["reminders"] if item.get("followup_id")]
             if followup_ids:
                 for followup in ClientFollowUp.objects.filter(id__in=followup_ids):
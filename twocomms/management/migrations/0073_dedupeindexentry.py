@@ -0,0 +1,145 @@
+import re
+from unicodedata import normalize as unicode_normalize
+from urllib.parse import urlsplit
+
+from django.db import migrations, models
+
+# Заморожена копія виведення ключів (management.services.dedupe_index на момент
+# міграції): подальші зміни сервісу не повинні змінювати історичний backfill.
+LEGAL_ENTITY_TOKENS = {"тов", "тзов", "фоп", "llc", "ltd", "inc", "corp", "company"}
+UA_LAT = {
+    "а": "a", "б": "b", "в": "v", "г": "h", "ґ": "g", "д": "d", "е": "e", "є": "ie",
+    "ж": "zh", "з": "z", "и": "y", "і": "i", "ї": "i", "й": "i", "к": "k", "л": "l",
+    "м": "m", "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t", "у": "u",
+    "ф": "f", "х": "kh", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "shch", "ь": "",
+    "ю": "iu", "я": "ia", "’": "", "ʼ": "", "'": "",
+    "ё": "e", "ъ": "", "ы": "y", "э": "e",
+}
+PLATFORM_HOSTS = {
+    "instagram.com", "facebook.com", "fb.com", "t.me", "telegram.me", "tiktok.com",
+    "prom.ua", "rozetka.com.ua", "olx.ua", "linktr.ee", "taplink.cc", "youtube.com",
+    "google.com", "maps.google.com", "goo.gl", "maps.app.goo.gl", "wa.me", "viber.com",
+}
+MAX_KEY_LENGTH = 191
+
+
+def name_fold(shop_name):
+    value = unicode_normalize("NFKC", str(shop_name or "")).lower().strip()
+    value = re.sub(r"[^\w\s]", " ", value)
+    base = " ".join(token for token in value.split() if token and token not in LEGAL_ENTITY_TOKENS)
+    return "".join(UA_LAT.get(ch, ch) for ch in base).replace(" ", "")
+
+
+def name_trigrams(folded):
+    if not folded:
+        return set()
+    if len(folded) < 3:
+        return {folded}
+    return {folded[i:i + 3] for i in range(len(folded) - 2)}
+
+
+def website_host_key(website_url):
+    value = (website_url or "").strip().lower()
+    if not value:
+        return ""
+    parsed = urlsplit(value if "://" in value else f"https://{value}")
+    host = (parsed.netloc or parsed.path).lower()
+    path = re.sub(r"/+$", "", (parsed.path if parsed.netloc else "") or "")
+    if host.startswith("www."):
+        host = host[4:]
+    value = f"{host}{path}".strip("/")
+    if not value:
+        return ""
+    parsed = urlsplit(f"https://{value}")
+    host = (parsed.hostname or "").lower()
+    if host.startswith("m."):
+        host = host[2:]
+    if host in PLATFORM_HOSTS:
+        segment = next((part for part in parsed.path.split("/") if part), "")
+        return f"{host}/{segment.lower()}" if segment else ""
+    return host
+
+
+def entry_keys(*, shop_name="", phone_normalized="", phone_last7="", website_url="", place_id=""):
+    keys = set()
+    if phone_normalized:
+        keys.add(f"p:{phone_normalized}"[:MAX_KEY_LENGTH])
+    if phone_last7:
+        keys.add(f"l:{phone_last7}"[:MAX_KEY_LENGTH])
+    folded = name_fold(shop_name)
+    if folded:
+        keys.add(f"n:{folded}"[:MAX_KEY_LENGTH])
+        keys.update(f"t:{gram}" for gram in name_trigrams(folded))
+    host = website_host_key(website_url)
+    if host:
+        keys.add(f"w:{host}"[:MAX_KEY_LENGTH])
+    if place_id:
+        keys.add(f"g:{place_id}"[:MAX_KEY_LENGTH])
+    return keys
+
+
+def backfill_dedupe_index(apps, schema_editor):
+    Client = apps.get_model("management", "Client")
+    ManagementLead = apps.get_model("management", "ManagementLead")
+    DedupeIndexEntry = apps.get_model("management", "DedupeIndexEntry")
+
+    batch = []
+
+    def flush():
+        DedupeIndexEntry.objects.bulk_create(batch, ignore_conflicts=True)
+        batch.clear()
+
+    sources = (
+        ("client", Client.objects.only("id", "shop_name", "phone_normalized", "phone_last7", "website_url")),
+        (
+            "lead",
+            ManagementLead.objects.only(
+                "id", "shop_name", "phone_normalized", "phone_last7", "website_url", "google_place_id"
+            ),
+        ),
+    )
+    for kind, queryset in sources:
+        for obj in queryset.order_by("id").iterator(chunk_size=2000):
+            keys = entry_keys(
+                shop_name=obj.shop_name,
+                phone_normalized=obj.phone_normalized,
+                phone_last7=obj.phone_last7,
+                website_url=obj.website_url,
+                place_id=getattr(obj, "google_place_id", ""),
+            )
+            batch.extend(DedupeIndexEntry(kind=kind, object_id=obj.id, key=key) for key in keys)
+            if len(batch) >= 2000:
+                flush()
+    if batch:
+        flush()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management', '0072_managementlead_needs_disambiguation_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DedupeIndexEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('client', 'Клієнт'), ('lead', 'Лід')], max_length=8)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('key', models.CharField(max_length=191)),
+            ],
+            options={
+                'verbose_name': 'Ключ індексу дублів',
+                'verbose_name_plural': 'Ключі індексу дублів',
+                'indexes': [
+                    models.Index(fields=['key'], name='mgmt_dedupe_key'),
+                    models.Index(fields=['kind', 'object_id'], name='mgmt_dedupe_object'),
+                ],
+                'constraints': [
+                    models.UniqueConstraint(fields=('kind', 'object_id', 'key'), name='mgmt_dedupe_entry_unique'),
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_dedupe_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.11 on 2026-10-19 01:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management', '0073_dedupeindexentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='instagrambotmessage',
+            name='claim_token',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=32),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.11 on 2026-10-19 01:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management', '0074_instagrambotmessage_claim_token'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='callrecord',
+            name='ai_claimed_by',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='callrecord',
+            name='ai_last_error',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='callrecord',
+            name='ai_lease_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='callrecord',
+            name='ai_next_attempt_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -1497,6 +1497,35 @@ class DuplicateReview(models.Model):
         return f"{self.incoming_shop_name} [{self.zone}]"
 
 
+class DedupeIndexEntry(models.Model):
+    """Блокувальний ключ дедуплікації (телефон, триграма назви, домен сайту…).
+
+    Підтримується сигналами Client/ManagementLead; див. services.dedupe_index.
+    """
+
+    class Kind(models.TextChoices):
+        CLIENT = "client", _("Клієнт")
+        LEAD = "lead", _("Лід")
+
+    kind = models.CharField(max_length=8, choices=Kind.choices)
+    object_id = models.PositiveBigIntegerField()
+    key = models.CharField(max_length=191)
+
+    class Meta:
+        verbose_name = _("Ключ індексу дублів")
+        verbose_name_plural = _("Ключі індексу дублів")
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "object_id", "key"], name="mgmt_dedupe_entry_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["key"], name="mgmt_dedupe_key"),
+            models.Index(fields=["kind", "object_id"], name="mgmt_dedupe_object"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}:{self.object_id} {self.key}"
+
+
 class ClientInteractionAttempt(models.Model):
     class VerificationLevel(models.TextChoices):
         SELF_REPORTED = "self_reported", _("Самозвіт")
@@ -2452,6 +2481,12 @@ class CallRecord(models.Model):
     ai_status = models.CharField(max_length=20, choices=AiStatus.choices, default=AiStatus.NONE, db_index=True)
     ai_attempts = models.PositiveSmallIntegerField(default=0)
     ai_locked_at = models.DateTimeField(null=True, blank=True)
+    # Черга ШІ-аналізу (services/call_analysis_jobs.py): хто забрав запис,
+    # до коли діє його оренда і коли дозволено наступну спробу.
+    ai_claimed_by = models.CharField(max_length=64, blank=True, default="", db_index=True)
+    ai_lease_until = models.DateTimeField(null=True, blank=True)
+    ai_next_attempt_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    ai_last_error = models.TextField(blank=True, default="")
     payload = models.JSONField(default=dict, blank=True, verbose_name=_("Payload"))
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -3724,6 +3759,8 @@ class InstagramBotMessage(models.Model):
     # JSON-список URL зображень-вкладень (для мультимодального аналізу Gemini).
     attachments = models.TextField(blank=True, default="")
     attempts = models.PositiveIntegerField(default=0)
+    # Мітка пачки, якою воркер забрав рядок (один UPDATE на пачку).
+    claim_token = models.CharField(max_length=32, blank=True, default="", db_index=True)
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     processed_at = models.DateTimeField(null=True, blank=True)
 
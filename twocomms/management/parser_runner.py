@@ -0,0 +1,261 @@
+"""
+Конвеєрний раннер парсингу Google Places для одного job.
+
+parser_run_step обробляє одну сторінку за виклик і живе в циклі опитування
+браузера: запит → запис у БД → пауза next_step_not_before → наступний запит,
+тож мережева затримка, запис у БД і пауза складаються послідовно. Раннер
+проганяє той самий крок у циклі, але:
+
+  * HTTP до Places іде в пулі потоків (PlacesPrefetcher): наступна сторінка
+    запитується, щойно прийшов nextPageToken, а перша сторінка наступних
+    позицій (тип × keyword × місто) — наперед, поки поточна пишеться в БД;
+  * темп задає спільний бюджет запитів (_RateBudget, requests_per_minute job,
+    старт-до-старту), а не пауза після кожного кроку;
+  * стан дедуплікації (parser_service.ParserRunState) будується раз на прогін
+    і далі оновлюється інкрементально.
+
+Окремого details-запиту немає: PLACES_FIELD_MASK уже повертає телефон, сайт і
+адресу в searchText, тож «деталі» місця приходять разом зі сторінкою.
+
+Усі запити раннера рахуються проти залишку request_limit job, а наперед він
+запитує лише поки в залишку є запас на lookahead. Відповіді, які не
+знадобились (job зупинили / досягнуто цілі), відкидаються, але самі запити
+при закритті пулу дописуються в request_count job.
+"""
+from __future__ import annotations
+
+import copy
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any
+
+from django.db.models import F
+from django.utils import timezone
+
+from . import parser_service as ps
+from .models import LeadParsingJob, LeadParsingQueryState
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 3
+DEFAULT_LOOKAHEAD = 2
+
+
+class _RateBudget:
+    """Спільний для потоків темп запитів: старти не частіше ніж раз на ``interval`` с."""
+
+    def __init__(self, interval: float, *, clock=time.monotonic, sleep=time.sleep):
+        self.interval = max(0.0, float(interval))
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+    def acquire(self, not_before: float = 0.0) -> float:
+        """Резервує слот і чекає на нього. Повертає, скільки секунд чекали."""
+        with self._lock:
+            now = self._clock()
+            start = max(now, self._next_at, not_before)
+            self._next_at = start + self.interval
+        delay = start - now
+        if delay > 0:
+            self._sleep(delay)
+        return max(0.0, delay)
+
+
+def _request_key(spec: dict[str, Any], page_token: str) -> tuple:
+    return (
+        str(spec.get("text_query") or "").strip(),
+        str(spec.get("city") or "").strip(),
+        ps.sanitize_places_included_type(spec.get("included_type")),
+        bool(spec.get("strict_type_filtering")),
+        page_token or "",
+    )
+
+
+class PlacesPrefetcher:
+    """Пул запитів searchText із ланцюжковим prefetch сторінок.
+
+    ``fetch`` має сигнатуру _places_search_text і віддає готову відповідь,
+    якщо її вже отримано наперед. Усі запити списуються з ``max_requests``
+    (залишок request_limit job); наперед запитуємо, лише поки залишок
+    більший за ``reserve``. Запити, віддані через ``fetch``, рахує
+    parser_run_step; надіслані наперед і не використані ``close()`` дописує
+    в ``request_count`` job ``job_id`` (F-вираз).
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        *,
+        interval: float,
+        max_requests: int,
+        workers: int = DEFAULT_WORKERS,
+        reserve: int = 0,
+        budget: _RateBudget | None = None,
+        job_id: int | None = None,
+    ):
+        self.api_key = api_key
+        self.budget = budget or _RateBudget(interval)
+        self.job_id = job_id
+        self.sent = 0
+        self.consumed = 0
+        self._remaining = max(0, int(max_requests))
+        self.reserve = max(0, int(reserve))
+        self._pool = ThreadPoolExecutor(max_workers=max(1, int(workers)), thread_name_prefix="places")
+        self._lock = threading.Lock()
+        self._futures: dict[tuple, Future] = {}
+        self._requested: set[tuple] = set()
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self) -> int:
+        """Зупиняє пул і списує з job надіслані, але не використані запити."""
+        with self._lock:
+            self._closed = True
+            self._futures.clear()
+        # Ще не розпочаті скасовуються, а ті, що вже в роботі, треба дочекатися,
+        # інакше їх не буде в ``sent``.
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        unconsumed = max(0, self.sent - self.consumed)
+        if unconsumed and self.job_id:
+            LeadParsingJob.objects.filter(pk=self.job_id).update(request_count=F("request_count") + unconsumed)
+        return unconsumed
+
+    def _submit_locked(self, spec: dict[str, Any], page_token: str, *, speculative: bool, not_before: float = 0.0):
+        key = _request_key(spec, page_token)
+        if self._closed:
+            return None
+        if speculative and (key in self._requested or self._remaining <= self.reserve):
+            return None
+        self._remaining -= 1
+        self._requested.add(key)
+        future = self._pool.submit(self._request, dict(spec), page_token, not_before)
+        self._futures[key] = future
+        return future
+
+    def _request(self, spec: dict[str, Any], page_token: str, not_before: float):
+        self.budget.acquire(not_before)
+        with self._lock:
+            if self._closed:  # поки чекали слот, прогін завершився
+                return [], ""
+            self.sent += 1
+        places, next_page_token = ps._places_search_text(
+            self.api_key,
+            str(spec.get("text_query") or ""),
+            str(spec.get("city") or ""),
+            page_token,
+            request_spec=spec,
+        )
+        next_index = int(spec.get("page_index") or 0) + 1
+        if next_page_token and next_index < ps.QUERY_PAGE_HARD_CAP:
+            with self._lock:
+                self._submit_locked(
+                    {**spec, "page_index": next_index},
+                    next_page_token,
+                    speculative=True,
+                    not_before=time.monotonic() + ps.PAGE_TOKEN_DELAY_SECONDS,
+                )
+        return places, next_page_token
+
+    def prefetch(self, spec: dict[str, Any]) -> bool:
+        """Ставить наперед першу сторінку запиту (далі сторінки тягнуться ланцюжком)."""
+        with self._lock:
+            return self._submit_locked(spec, "", speculative=True) is not None
+
+    def fetch(
+        self,
+        api_key: str,
+        text_query: str,
+        city: str,
+        page_token: str = "",
+        request_spec: dict[str, Any] | None = None,
+    ) -> tuple[list[dict[str, Any]], str]:
+        spec = {"text_query": text_query, "city": city, **(request_spec or {})}
+        with self._lock:
+            future = self._futures.pop(_request_key(spec, page_token), None)
+            if future is None:
+                future = self._submit_locked(spec, page_token, speculative=False)
+            if future is not None:
+                self.consumed += 1  # цей запит зарахує parser_run_step
+        if future is None:  # пул уже закрито
+            return ps._places_search_text(api_key, text_query, city, page_token, request_spec=request_spec)
+        return future.result()
+
+
+def _closed_queries(job: LeadParsingJob) -> set[tuple[str, str, str]]:
+    return set(
+        LeadParsingQueryState.objects.filter(
+            job=job,
+            status__in=(LeadParsingQueryState.Status.EXHAUSTED, LeadParsingQueryState.Status.ANOMALY),
+        ).values_list("keyword", "city", "included_type")
+    )
+
+
+def _prefetch_ahead(job: LeadParsingJob, prefetcher: PlacesPrefetcher, api_key: str, lookahead: int):
+    """Перша сторінка поточної позиції (якщо ще не почата) і ``lookahead`` наступних."""
+    probe = copy.copy(job)
+    closed = _closed_queries(job)
+    specs = []
+    if not probe.next_page_token:
+        specs.append(ps._coerce_request_spec(probe, api_key))
+    for _ in range(max(0, lookahead)):
+        if not ps._advance_position(probe):
+            break
+        specs.append(ps._build_request_spec(probe, api_key))
+    for spec in specs:
+        identity = (spec.get("keyword") or "", spec.get("city") or "", ps.sanitize_places_included_type(spec.get("included_type")))
+        if identity not in closed:
+            prefetcher.prefetch(spec)
+
+
+def run_parser_job(
+    job: LeadParsingJob,
+    *,
+    max_steps: int | None = None,
+    workers: int = DEFAULT_WORKERS,
+    lookahead: int = DEFAULT_LOOKAHEAD,
+    sleep=time.sleep,
+) -> LeadParsingJob:
+    """Проганяє job кроками parser_run_step, поки він RUNNING (або ``max_steps``).
+
+    Зупиняється й тоді, коли крок не відбувся (job веде інший процес).
+    """
+    try:
+        api_key = ps.get_maps_api_key()
+    except ps.ParsingServiceError:
+        return ps.parser_run_step(job)  # крок сам зафіксує помилку конфігурації
+
+    run_state = ps.ParserRunState(job)
+    steps = 0
+    with PlacesPrefetcher(
+        api_key,
+        interval=ps._rate_interval(job).total_seconds(),
+        max_requests=int(job.request_limit or 0) - int(job.request_count or 0),
+        workers=workers,
+        reserve=lookahead,
+        job_id=job.pk,
+    ) as prefetcher:
+        while job.status == LeadParsingJob.Status.RUNNING and (max_steps is None or steps < max_steps):
+            if job.retry_state and job.next_step_not_before:
+                delay = (job.next_step_not_before - timezone.now()).total_seconds()
+                if delay > 0:
+                    sleep(delay)
+            try:
+                _prefetch_ahead(job, prefetcher, api_key, lookahead)
+            except Exception:  # prefetch — лише оптимізація
+                logger.exception("parser prefetch failed for job #%s", job.id)
+            previous_finish = job.last_step_finished_at
+            job = ps.parser_run_step(job, fetch_places=prefetcher.fetch, run_state=run_state, paced=False)
+            steps += 1
+            if job.last_step_finished_at == previous_finish:
+                break
+    job.refresh_from_db(fields=["request_count"])
+    return job
@@ -15,6 +15,7 @@ from django.utils import timezone
 from .lead_services import split_terms
 from .models import (
     Client,
+    DedupeIndexEntry,
     LeadParsingJob,
     LeadParsingQueryState,
     LeadParsingResult,
@@ -23,6 +24,7 @@ from .models import (
     normalize_phone,
 )
 from .parser_usage import CURRENT_FIELD_MASK_VERSION
+from .services.dedupe_index import DedupeQuery, lookup_candidates
 
 PLACES_TEXT_SEARCH_URL = "https://places.googleapis.com/v1/places:searchText"
 GEOCODE_URL = "https://maps.googleapis.com/maps/api/geocode/json"
@@ -764,6 +766,39 @@ def _recent_history_cutoff(job: LeadParsingJob):
     return timezone.now() - timedelta(days=int(job.history_lookback_days))
 
 
+def _history_queries(prepared_places: list[PreparedPlace]) -> list[DedupeQuery]:
+    return [
+        DedupeQuery(phone=place.phone_normalized, place_id=place.place_id)
+        for place in prepared_places
+        if place.phone_normalized or place.place_id
+    ]
+
+
+def _collect_recent_history(queries: list[DedupeQuery], cutoff) -> tuple[set[str], set[str], set[str], set[str]]:
+    """(клієнти, активні ліди, відхилені ліди, Place ID) зі збігами після cutoff."""
+    recent_client_phones: set[str] = set()
+    recent_active_lead_phones: set[str] = set()
+    recent_rejected_phones: set[str] = set()
+    recent_place_ids: set[str] = set()
+    # Один запит до індексу дублів на всю пачку замість окремих
+    # вибірок по клієнтах, активних/відхилених лідах і Place ID.
+    for matches in lookup_candidates(queries, created_since=cutoff):
+        for match in matches:
+            obj = match.obj
+            if match.kind == DedupeIndexEntry.Kind.CLIENT:
+                if match.exact_phone:
+                    recent_client_phones.add(obj.phone_normalized)
+                continue
+            if match.exact_phone:
+                if obj.status == ManagementLead.Status.REJECTED:
+                    recent_rejected_phones.add(obj.phone_normalized)
+                else:
+                    recent_active_lead_phones.add(obj.phone_normalized)
+            if match.place_match:
+                recent_place_ids.add(obj.google_place_id)
+    return recent_client_phones, recent_active_lead_phones, recent_rejected_phones, recent_place_ids
+
+
 def _build_duplicate_batch_state(job: LeadParsingJob, prepared_places: list[PreparedPlace]) -> DuplicateBatchState:
     place_ids = {place.place_id for place in prepared_places if place.place_id}
     phones = {place.phone_normalized for place in prepared_places if place.phone_normalized}
@@ -784,43 +819,106 @@ def _build_duplicate_batch_state(job: LeadParsingJob, prepared_places: list[Prep
         )
 
     cutoff = _recent_history_cutoff(job)
-    recent_client_phones: set[str] = set()
-    recent_active_lead_phones: set[str] = set()
-    recent_rejected_phones: set[str] = set()
-    recent_place_ids: set[str] = set()
-
-    if cutoff:
-        if phones:
-            recent_client_phones = set(
-                Client.objects.filter(phone_normalized__in=phones, created_at__gte=cutoff).values_list("phone_normalized", flat=True)
-            )
-            lead_base = ManagementLead.objects.filter(phone_normalized__in=phones, created_at__gte=cutoff)
-            recent_active_lead_phones = set(
-                lead_base.exclude(status=ManagementLead.Status.REJECTED).values_list("phone_normalized", flat=True)
-            )
-            recent_rejected_phones = set(
-                lead_base.filter(status=ManagementLead.Status.REJECTED).values_list("phone_normalized", flat=True)
-            )
-        if place_ids:
-            recent_place_ids = set(
-                ManagementLead.objects.filter(
-                    google_place_id__in=place_ids,
-                    created_at__gte=cutoff,
-                )
-                .exclude(google_place_id="")
-                .values_list("google_place_id", flat=True)
-            )
+    history: tuple[set[str], set[str], set[str], set[str]] = (set(), set(), set(), set())
+    if cutoff and (phones or place_ids):
+        history = _collect_recent_history(_history_queries(prepared_places), cutoff)
 
     return DuplicateBatchState(
         job_place_ids=job_place_ids,
         job_phones=job_phones,
-        recent_client_phones=recent_client_phones,
-        recent_active_lead_phones=recent_active_lead_phones,
-        recent_rejected_phones=recent_rejected_phones,
-        recent_place_ids=recent_place_ids,
+        recent_client_phones=history[0],
+        recent_active_lead_phones=history[1],
+        recent_rejected_phones=history[2],
+        recent_place_ids=history[3],
     )
 
 
+class ParserRunState:
+    """Стан дедуплікації на весь прогін раннера (parser_runner.run_parser_job).
+
+    Place ID і телефони поточного job читаються з БД один раз і далі
+    поповнюються через _mark_seen; збіги з історією кешуються по ключу, тож
+    кожен телефон / Place ID шукається в індексі дублів лише раз за прогін.
+    Після невдалого кроку (відкат транзакції) стан скидається й
+    перечитується.
+    """
+
+    def __init__(self, job: LeadParsingJob):
+        self.job_id = job.id
+        self.cutoff = _recent_history_cutoff(job)
+        self.job_place_ids: set[str] = set()
+        self.job_phones: set[str] = set()
+        self._loaded = False
+        self._phone_history: dict[str, str] = {}
+        self._place_history: dict[str, bool] = {}
+
+    def reset(self):
+        self._loaded = False
+        self.job_place_ids = set()
+        self.job_phones = set()
+
+    def _ensure_loaded(self, job: LeadParsingJob):
+        if self._loaded:
+            return
+        for place_id, phone in LeadParsingResult.objects.filter(job=job).values_list("place_id", "phone"):
+            if place_id:
+                self.job_place_ids.add(place_id)
+            if phone:
+                self.job_phones.add(phone)
+        self._loaded = True
+
+    def _resolve_history(self, prepared_places: list[PreparedPlace]):
+        pending = [
+            place
+            for place in prepared_places
+            if (place.phone_normalized and place.phone_normalized not in self._phone_history)
+            or (place.place_id and place.place_id not in self._place_history)
+        ]
+        if not pending:
+            return
+        clients, active, rejected, place_ids = _collect_recent_history(_history_queries(pending), self.cutoff)
+        for place in pending:
+            if place.phone_normalized:
+                self._phone_history.setdefault(place.phone_normalized, "")
+            if place.place_id:
+                self._place_history.setdefault(place.place_id, False)
+        # Порядок важливий: клієнт > активний лід > відхилений (як у _parser_duplicate_state).
+        for phone in rejected:
+            self._phone_history[phone] = "rejected"
+        for phone in active:
+            self._phone_history[phone] = "lead"
+        for phone in clients:
+            self._phone_history[phone] = "client"
+        for place_id in place_ids:
+            self._place_history[place_id] = True
+
+    def batch_for(self, job: LeadParsingJob, prepared_places: list[PreparedPlace]) -> DuplicateBatchState:
+        self._ensure_loaded(job)
+        batch = DuplicateBatchState(
+            job_place_ids=self.job_place_ids,
+            job_phones=self.job_phones,
+            recent_client_phones=set(),
+            recent_active_lead_phones=set(),
+            recent_rejected_phones=set(),
+            recent_place_ids=set(),
+        )
+        if not self.cutoff:
+            return batch
+        self._resolve_history(prepared_places)
+        buckets = {
+            "client": batch.recent_client_phones,
+            "lead": batch.recent_active_lead_phones,
+            "rejected": batch.recent_rejected_phones,
+        }
+        for place in prepared_places:
+            kind = self._phone_history.get(place.phone_normalized) if place.phone_normalized else ""
+            if kind:
+                buckets[kind].add(place.phone_normalized)
+            if place.place_id and self._place_history.get(place.place_id):
+                batch.recent_place_ids.add(place.place_id)
+        return batch
+
+
 def _parser_duplicate_state(
     job: LeadParsingJob,
     prepared: PreparedPlace,
@@ -1130,6 +1228,7 @@ def _apply_places_success(
     request_spec: dict[str, Any],
     step_started_at,
     step_finished_at,
+    run_state: ParserRunState | None = None,
 ) -> LeadParsingJob:
     keyword = str(request_spec.get("keyword") or _current_keyword(job)).strip()
     city = str(request_spec.get("city") or _current_city(job)).strip()
@@ -1183,9 +1282,14 @@ def _apply_places_success(
         job.save()
         return job
 
-    batch = _build_duplicate_batch_state(job, prepared_places)
-    seen_job_place_ids = set(batch.job_place_ids)
-    seen_job_phones = set(batch.job_phones)
+    if run_state is not None:
+        batch = run_state.batch_for(job, prepared_places)
+        seen_job_place_ids = run_state.job_place_ids
+        seen_job_phones = run_state.job_phones
+    else:
+        batch = _build_duplicate_batch_state(job, prepared_places)
+        seen_job_place_ids = set(batch.job_place_ids)
+        seen_job_phones = set(batch.job_phones)
     added_count = 0
 
     for prepared in prepared_places:
@@ -1639,9 +1743,25 @@ def parser_stop_job(job_id: int | str, *, reason_code: str = "user_stop") -> Lea
         return job
 
 
-def parser_run_step(job: LeadParsingJob) -> LeadParsingJob:
+def parser_run_step(
+    job: LeadParsingJob,
+    *,
+    fetch_places=None,
+    run_state: ParserRunState | None = None,
+    paced: bool = True,
+) -> LeadParsingJob:
+    """Один крок парсингу: одна сторінка Places + запис результатів.
+
+    ``fetch_places`` (сигнатура як у _places_search_text) і ``run_state``
+    підставляє конвеєрний раннер (parser_runner); ``paced=False`` — темп
+    задає раннер своїм бюджетом запитів, тож next_step_not_before
+    враховується лише для backoff після помилок.
+    """
     step_started_at = timezone.now()
     request_spec: dict[str, Any] | None = None
+    fetch_places = fetch_places or _places_search_text
+    if run_state is not None and run_state.job_id != job.id:
+        run_state = None
 
     with transaction.atomic():
         lock = _runtime_lock_for_update()
@@ -1681,7 +1801,11 @@ def parser_run_step(job: LeadParsingJob) -> LeadParsingJob:
             _sync_runtime_lock(lock, None)
             return locked_job
 
-        if locked_job.next_step_not_before and now < locked_job.next_step_not_before:
+        if (
+            locked_job.next_step_not_before
+            and now < locked_job.next_step_not_before
+            and (paced or locked_job.retry_state)
+        ):
             return locked_job
 
         if locked_job.is_step_in_progress:
@@ -1716,7 +1840,7 @@ def parser_run_step(job: LeadParsingJob) -> LeadParsingJob:
         city = str(request_spec.get("city") or _current_city(locked_job)).strip()
         next_page_token = locked_job.next_page_token or ""
         request_was_sent = True
-        places, returned_next_page_token = _places_search_text(
+        places, returned_next_page_token = fetch_places(
             api_key,
             query,
             city,
@@ -1743,10 +1867,13 @@ def parser_run_step(job: LeadParsingJob) -> LeadParsingJob:
                     request_spec=request_spec,
                     step_started_at=locked_job.last_step_started_at or step_started_at,
                     step_finished_at=timezone.now(),
+                    run_state=run_state,
                 )
             _sync_runtime_lock(lock, updated_job if updated_job.status in ACTIVE_STATUSES else None)
             return updated_job
     except ParsingServiceError as exc:
+        if run_state is not None:
+            run_state.reset()
         with transaction.atomic():
             lock = _runtime_lock_for_update()
             locked_job = LeadParsingJob.objects.select_for_update().get(id=job.id)
@@ -1778,6 +1905,8 @@ def parser_run_step(job: LeadParsingJob) -> LeadParsingJob:
             _sync_runtime_lock(lock, updated_job if updated_job.status in ACTIVE_STATUSES else None)
             return updated_job
     except Exception as exc:
+        if run_state is not None:
+            run_state.reset()
         with transaction.atomic():
             lock = _runtime_lock_for_update()
             locked_job = LeadParsingJob.objects.select_for_update().get(id=job.id)
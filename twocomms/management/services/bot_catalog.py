@@ -1,7 +1,16 @@
 """
 Каталог для бота: компактний контекст про товари (ціни, наявність, кольори,
-посилання), який підставляється в system_instruction Gemini. Кешується, щоб
-не смикати БД на кожне повідомлення.
+посилання), який підставляється в system_instruction Gemini.
+
+Замість дампу всього каталогу (раніше до 250 товарів / 16k символів, решта
+обрізалась) бот отримує лише top-k товарів, релевантних поточній розмові.
+Для цього тримаємо локальний BM25-індекс по товарах і їх кольорових
+варіантах: назва, категорія, кольори, bot_vision-описи принтів. Токенізатор
+транслітерує кирилицю в латиницю й згортає варіанти написання (kh/h, ya/ia…),
+тож «худі харків», «hudi kharkiv» і «харківське худі» знаходять один товар.
+
+Індекс кешується й перебудовується, коли змінюється версія каталогу
+(лічильники storefront, які бампаються сигналами Product/варіантів/категорій).
 
 Джерела:
 - storefront.Product (status=published): назва, ціна (final_price), категорія, slug.
@@ -9,31 +18,178 @@
 """
 from __future__ import annotations
 
+import math
+import re
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+
 from django.core.cache import cache
-from django.db.models import Sum
 
-CACHE_KEY = "ig_bot_catalog_ctx"
-CACHE_TTL = 600          # 10 хв
-MAX_PRODUCTS = 250
-MAX_CHARS = 16000
+CACHE_KEY = "ig_bot_catalog_index"
+CACHE_TTL = 600          # 10 хв (страховка, якщо сигнал версії не спрацював)
+TOP_K = 8
+MIN_RESULTS = 5          # для загальних питань («що у вас є?») — топ за замовчуванням
+MAX_CHARS = 16000        # запобіжник: top-k рядків ніколи не мають сюди дорости
 SITE = "https://twocomms.shop"
 
+BM25_K1 = 1.2
+BM25_B = 0.75
+STEM_LEN = 5
+
+# Ваги полів: назва й принт важать більше, ніж кольори.
+FIELD_WEIGHTS = {"title": 3, "category": 2, "print": 2, "colors": 1}
+
+# укр/рос → лат транслітерація.
+_UA_LAT = {
+    "а": "a", "б": "b", "в": "v", "г": "h", "ґ": "g", "д": "d", "е": "e", "є": "ie",
+    "ж": "zh", "з": "z", "и": "y", "і": "i", "ї": "i", "й": "i", "к": "k", "л": "l",
+    "м": "m", "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t", "у": "u",
+    "ф": "f", "х": "kh", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "shch", "ь": "",
+    "ю": "iu", "я": "ia", "’": "", "ʼ": "", "'": "",
+    "ё": "e", "ъ": "", "ы": "y", "э": "e",
+}
+
+# Згортання різних латинських написань одного звуку (клієнти пишуть як завгодно).
+_LATIN_FOLDS = (
+    ("shch", "sch"),
+    ("kh", "h"),
+    ("yu", "u"), ("iu", "u"),
+    ("ya", "a"), ("ia", "a"),
+    ("ye", "e"), ("ie", "e"),
+    ("y", "i"),
+    ("w", "v"),
+)
+
+# Англомовні/сленгові назви виробів → канонічна форма після транслітерації.
+_SYNONYMS = {
+    "hoodie": "hudi", "hoody": "hudi", "hood": "hudi",
+    "tshirt": "futbolka", "tee": "futbolka", "shirt": "futbolka",
+    "longsleeve": "longslif", "longslive": "longslif",
+    "sweatshirt": "svitshot", "svitshot": "svitshot",
+}
+
+
+_TOKEN_RE = re.compile(r"[\w’ʼ'-]+", re.UNICODE)
+
+
+def _translit(value: str) -> str:
+    return "".join(_UA_LAT.get(ch, ch) for ch in value)
+
+
+def normalize_token(raw: str) -> str:
+    """Один токен → транслітерована, згорнута, обрізана до стему форма."""
+    tok = _translit(raw.lower()).replace("-", "")
+    tok = re.sub(r"[^a-z0-9]", "", tok)
+    if not tok:
+        return ""
+    tok = _SYNONYMS.get(tok, tok)
+    if tok.isdigit():
+        return tok
+    for src, dst in _LATIN_FOLDS:
+        tok = tok.replace(src, dst)
+    return tok[:STEM_LEN]
+
+
+_STOPWORDS = {
+    normalize_token(word)
+    for word in (
+        "а і й в у з на та це що чи ви ми я вас мене мені хочу є не до за по від "
+        "для як про або купити ціна скільки привіт добрий доброго день дня будь ласка "
+        "дякую the and for with is"
+    ).split()
+}
+
+
+def tokenize(text: str) -> list[str]:
+    out = []
+    for raw in _TOKEN_RE.findall(text or ""):
+        tok = normalize_token(raw)
+        if len(tok) < 2 or tok in _STOPWORDS:
+            continue
+        out.append(tok)
+    return out
+
+
+@dataclass
+class CatalogIndex:
+    """BM25-індекс: документ = товар (з усіма кольоровими варіантами)."""
+
+    version: str
+    product_ids: list[int] = field(default_factory=list)
+    lines: list[str] = field(default_factory=list)
+    postings: dict[str, list[tuple[int, int]]] = field(default_factory=dict)
+    doc_len: list[int] = field(default_factory=list)
+    avgdl: float = 0.0
+
+    def __len__(self) -> int:
+        return len(self.product_ids)
+
+    def add(self, product_id: int, line: str, fields: dict[str, str]) -> None:
+        doc = len(self.product_ids)
+        terms: Counter = Counter()
+        for name, text in fields.items():
+            weight = FIELD_WEIGHTS.get(name, 1)
+            for tok in tokenize(text):
+                terms[tok] += weight
+        self.product_ids.append(product_id)
+        self.lines.append(line)
+        self.doc_len.append(sum(terms.values()))
+        for tok, tf in terms.items():
+            self.postings.setdefault(tok, []).append((doc, tf))
 
-def _build() -> str:
+    def finalize(self) -> "CatalogIndex":
+        self.avgdl = (sum(self.doc_len) / len(self.doc_len)) if self.doc_len else 0.0
+        return self
+
+    def search(self, query: str, k: int = TOP_K) -> list[tuple[int, float]]:
+        """[(doc, score)] за спаданням релевантності; лише score > 0."""
+        n = len(self.product_ids)
+        if not n:
+            return []
+        scores: dict[int, float] = defaultdict(float)
+        for tok in set(tokenize(query)):
+            posting = self.postings.get(tok)
+            if not posting:
+                continue
+            df = len(posting)
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for doc, tf in posting:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len[doc] / (self.avgdl or 1))
+                scores[doc] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:k]
+
+
+def catalog_version() -> str:
+    """Версія каталогу: лічильники storefront, які бампаються сигналами
+    Product / ProductColorVariant / ProductColorImage / Color / Category."""
+    try:
+        from storefront.services.catalog_helpers import (
+            get_public_category_version,
+            get_public_product_order_version,
+        )
+
+        return f"{get_public_product_order_version()}:{get_public_category_version()}"
+    except Exception:
+        return "0:0"
+
+
+def _build(version: str) -> CatalogIndex:
+    index = CatalogIndex(version=version)
     try:
         from storefront.models import Product, ProductStatus
         from productcolors.models import ProductColorVariant
     except Exception:
-        return ""
+        return index.finalize()
 
     qs = (
         Product.objects.filter(status=ProductStatus.PUBLISHED)
         .select_related("category")
-        .order_by("-featured", "-id")[:MAX_PRODUCTS]
+        .order_by("-featured", "-id")
     )
     products = list(qs)
     if not products:
-        return ""
+        return index.finalize()
     ids = [p.id for p in products]
 
     # Кольори + залишки + візуальні відбитки по варіантах одним запитом.
@@ -59,7 +215,6 @@ def _build() -> str:
             if seg not in fp_by_product[v.product_id]:
                 fp_by_product[v.product_id].append(seg)
 
-    lines = ["Каталог TwoComms (актуальні товари, ціни в грн):"]
     for p in products:
         try:
             price = p.final_price
@@ -79,22 +234,65 @@ def _build() -> str:
         fps = fp_by_product.get(p.id, [])
         fp_s = (" | принт: " + "; ".join(fps[:3])) if fps else ""
         url = f"{SITE}/product/{p.slug}/"
-        lines.append(f"• id={p.id} | {p.title} — {price} грн{disc} [{cat}]{colors_s}{avail}{fp_s} | {url}")
-
-    text = "\n".join(lines)
-    if len(text) > MAX_CHARS:
-        text = text[:MAX_CHARS] + "\n…(перелік скорочено)"
-    return text
+        line = f"• id={p.id} | {p.title} — {price} грн{disc} [{cat}]{colors_s}{avail}{fp_s} | {url}"
+        index.add(
+            p.id,
+            line,
+            {
+                "title": p.title or "",
+                "category": cat,
+                "colors": " ".join(colors),
+                "print": " ".join(fps),
+            },
+        )
+    return index.finalize()
 
 
-def get_catalog_context(force: bool = False) -> str:
+def get_catalog_index(force: bool = False) -> CatalogIndex:
+    version = catalog_version()
+    key = f"{CACHE_KEY}:{version}"
     if not force:
-        cached = cache.get(CACHE_KEY)
-        if cached is not None:
+        cached = cache.get(key)
+        if isinstance(cached, CatalogIndex):
             return cached
     try:
-        text = _build()
+        index = _build(version)
     except Exception:
-        text = ""
-    cache.set(CACHE_KEY, text, CACHE_TTL)
+        index = CatalogIndex(version=version).finalize()
+    cache.set(key, index, CACHE_TTL)
+    return index
+
+
+def search_catalog(query: str, k: int = TOP_K, force: bool = False) -> list[int]:
+    """ID товарів, релевантних запиту (за спаданням)."""
+    index = get_catalog_index(force=force)
+    return [index.product_ids[doc] for doc, _score in index.search(query, k)]
+
+
+def get_catalog_context(force: bool = False, query: str | None = None, top_k: int = TOP_K) -> str:
+    """Блок каталогу для system_instruction: лише top-k товарів під запит.
+
+    Без запиту (або коли збігів мало) доповнюємо топом каталогу за
+    замовчуванням (featured → новіші), щоб на загальні питання бот мав що
+    запропонувати.
+    """
+    index = get_catalog_index(force=force)
+    if not len(index):
+        return ""
+    docs = [doc for doc, _score in index.search(query or "", top_k)]
+    target = min(top_k, MIN_RESULTS)
+    for doc in range(len(index)):
+        if len(docs) >= target:
+            break
+        if doc not in docs:
+            docs.append(doc)
+
+    lines = [
+        "Каталог TwoComms (релевантні розмові товари, ціни в грн; "
+        f"повний каталог: {SITE}/catalog/):"
+    ]
+    lines.extend(index.lines[doc] for doc in docs)
+    text = "\n".join(lines)
+    if len(text) > MAX_CHARS:
+        text = text[:MAX_CHARS].rsplit("\n", 1)[0] + "\n…(перелік скорочено)"
     return text
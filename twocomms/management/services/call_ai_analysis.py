@@ -7,13 +7,16 @@
      не довіряємо фронту). Матч клієнта за номером, менеджера — за internalNumber.
   2. Якщо вже є готовий аналіз і не force — повертаємо кеш.
   3. Тягнемо mp3 server-side через BinotelClient.fetch_record_stream (обхід
-     15-хв посилання та mixed-content), читаємо в памʼять, перевіряємо розмір.
+     15-хв посилання та mixed-content), стрімимо у тимчасовий файл з обривом
+     на MAX_AUDIO_BYTES.
   4. Шлемо аудіо inline у Gemini generateContent з рубрикою оцінки у стилі
      Mosaic (адаптованою під один дзвінок) + опційний B2B-контекст менеджера.
      Просимо строгий JSON (responseMimeType=application/json).
   5. Парсимо, зберігаємо CallAIAnalysis (done) з метриками прогону.
 
-Аудіо локально НЕ зберігається — лише структурований розбор та метрики.
+Аудіо локально НЕ зберігається (тимчасовий файл видаляється одразу після
+виклику) — лише структурований розбор та метрики. Фонові аналізи йдуть через
+чергу services/call_analysis_jobs.py.
 Ключ Gemini — з ENV GEMINI_API (той самий, що використовує Instagram-бот),
 модель за замовчуванням gemini-3.5-flash. Бібліотека google.generativeai НЕ
 потрібна — прямий REST-виклик (як у services/instagram_bot.py).
@@ -25,8 +28,9 @@ import json
 import logging
 import os
 import re
-import threading
+import tempfile
 import time
+from contextlib import contextmanager
 from decimal import Decimal, InvalidOperation
 
 import requests
@@ -54,13 +58,17 @@ GENAI_BASE = "https://generativelanguage.googleapis.com/v1beta"
 # Inline-ліміт Gemini — 20 МБ на весь запит. Лишаємо запас на JSON/base64-оверхед
 # (base64 додає ~33%), тож кап на сирий mp3 ставимо консервативно.
 MAX_AUDIO_BYTES = 14 * 1024 * 1024
+DOWNLOAD_CHUNK_BYTES = 64 * 1024
 
 GEMINI_TIMEOUT = (10, 90)  # (connect, read) — аудіо-аналіз може йти десятки секунд
 CHAT_TIMEOUT = (8, 25)      # діалоговий бот: коротка відповідь — не висимо на завислій моделі
-BACKOFF_BASE = 2.0          # секунди, експоненційно між ретраями transient
+BACKOFF_BASE = 2.0          # секунди між ретраями порожньої відповіді
 # Жорсткий стеля часу на ВЕСЬ перебір пулу для чату: краще швидко впасти у фолбек/
 # ретрай повідомлення, ніж тримати клієнта (і чергу) у «processing» хвилинами.
 CHAT_DEADLINE_SECONDS = 75.0
+# Ролі без дедлайну (аудіо, аудит, чекер) чекають звільнення квоти між колами не
+# довше цього; якщо найближче звільнення пізніше — помилка одразу, без сну.
+MAX_REFILL_WAIT_SECONDS = 30.0
 
 
 
@@ -276,11 +284,13 @@ def upsert_call_record(client: BinotelClient, general_call_id: str) -> CallRecor
 def _call_combo(key_name: str, key_value: str, model: str, payload: dict,
                 n_attempts: int, grounded: bool, log: list, parse: bool = True,
                 timeout: tuple | None = None, log_cb=None) -> tuple[str, dict | None]:
-    """Один (key, model) кандидат із ретраями на transient.
+    """Один (key, model) кандидат.
 
-    Повертає ('ok', result) | ('key_429', None) | ('model_skip', None).
-    Кидає CallAIAnalysisError на 400 (fatal). Веде облік стану ключа/моделі.
-    log_cb (опц.) отримує короткий рядок про КОЖНУ спробу (для консолі бота).
+    Повертає ('ok', result) | ('key_429', None) | ('model_skip', None) |
+    ('model_busy', None). Кидає CallAIAnalysisError на 400 (fatal). Веде облік
+    стану ключа/моделі. n_attempts — ретраї лише на порожню відповідь: 503 не
+    ретраїмо на місці (модель іде в спільний backoff, повертаємось до неї в
+    наступному колі). log_cb (опц.) отримує короткий рядок про КОЖНУ спробу.
     """
     track = key_name in gemini_keys.ALL_KEYS
 
@@ -300,9 +310,7 @@ def _call_combo(key_name: str, key_value: str, model: str, payload: dict,
             log.append(f"{key_name}/{model}: transient {exc} (#{attempt + 1})")
             _emit(f"{key_name}/{model}: ⚠ перевантаження/503 ({dt:.1f}с) → інша модель")
             gemini_keys.mark_model_overloaded(model)
-            if attempt < n_attempts - 1:
-                time.sleep(BACKOFF_BASE * (2 ** attempt))
-            continue
+            return ("model_busy", None)
         except _GeminiEmpty as exc:
             dt = time.monotonic() - t0
             log.append(f"{key_name}/{model}: empty {exc} (#{attempt + 1})")
@@ -338,13 +346,14 @@ def _call_combo(key_name: str, key_value: str, model: str, payload: dict,
             dt = time.monotonic() - t0
             if track:
                 gemini_keys.mark_success(key_name)
+            gemini_keys.mark_model_ok(model)
             log.append(f"{key_name}/{model}: ok")
             _emit(f"{key_name}/{model}: ✅ відповідь за {dt:.1f}с")
             return ("ok", {
                 "parsed": parsed, "raw": parsed, "usage": usage, "model": model,
                 "meta": {"key": key_name, "used_model": model, "attempts": list(log)},
             })
-    return ("model_skip", None)  # transient вичерпано
+    return ("model_skip", None)  # порожні відповіді вичерпано
 
 
 def _run_with_pool(role: str, payload: dict, *, manual_key: str | None = None,
@@ -353,14 +362,16 @@ def _run_with_pool(role: str, payload: dict, *, manual_key: str | None = None,
                    log_cb=None) -> dict:
     """Прогоняє payload через пул ключів ролі та цепочку моделей.
 
-    Кругова стратегія: у кожному КРУЗІ — ручний ключ (якщо є) першим, далі весь
-    пул (own→borrow, sticky-впорядкований) по одному виклику на (key,model).
-    Якщо круг не дав 200 — експоненційна затримка (2с,4с,...) + скидання
-    overload-кешу моделей, і новий круг. Усього до max_rounds(role) кругів
-    (чат=3), тільки потім помилка.
+    Кругова стратегія: у кожному КРУЗІ — ручний ключ (якщо є) першим, далі пул
+    через планувальник gemini_keys.pick_slot: по одному виклику на (key, model)
+    у порядку model-major, без ключів у кулдауні, порожніх хвилинних відер і
+    платних моделей (стан спільний для всіх процесів через кеш). Між колами —
+    не фіксований sleep, а очікування до найближчого звільнення комбінації
+    (next_refill_at). Якщо нічого не звільниться в межах бюджету очікування —
+    падаємо одразу, без марного сну. Усього до max_rounds(role) кругів (чат=3).
 
     deadline_seconds: жорстка стеля часу на весь перебір (None → CHAT_DEADLINE для
-    ролі chat, інакше без стелі). Захищає від багатохвилинних зависань.
+    ролі chat, інакше без стелі; тоді очікування між колами ≤ MAX_REFILL_WAIT_SECONDS).
     log_cb: колбек, що отримує короткі рядки про кожну спробу (для консолі бота).
     """
     log: list[str] = []
@@ -375,6 +386,11 @@ def _run_with_pool(role: str, payload: dict, *, manual_key: str | None = None,
     def _over_deadline() -> bool:
         return deadline_seconds is not None and (time.monotonic() - t_start) >= deadline_seconds
 
+    def _wait_budget() -> float:
+        if deadline_seconds is None:
+            return MAX_REFILL_WAIT_SECONDS
+        return deadline_seconds - (time.monotonic() - t_start)
+
     def _emit(msg: str):
         if log_cb:
             try:
@@ -389,13 +405,15 @@ def _run_with_pool(role: str, payload: dict, *, manual_key: str | None = None,
             break
         if rounds > 1:
             _emit(f"коло {round_idx + 1}/{rounds} (моделі: {', '.join(models)})")
+        # Снапшот на початок кола: 503 під час кола не знімає модель з решти ключів.
+        skip_models = gemini_keys.blocked_models(role, fresh=round_idx == 0)
 
         if manual_key:
             for model in models:
                 if _over_deadline():
                     aborted = True
                     break
-                if gemini_keys.is_model_overloaded(model):
+                if model in skip_models:
                     continue
                 status, res = _call_combo("(manual)", manual_key, model, payload,
                                           n_attempts, grounded, log, parse, call_timeout, log_cb)
@@ -406,10 +424,18 @@ def _run_with_pool(role: str, payload: dict, *, manual_key: str | None = None,
             if aborted:
                 break
 
-        for key_name, key_value, model in gemini_keys.iter_attempts(role):
+        tried: set[tuple[str, str]] = set()
+        while True:
             if _over_deadline():
                 aborted = True
                 break
+            slot = gemini_keys.pick_slot(role, skip_models=skip_models, exclude=tried)
+            if slot is None:
+                break
+            key_name, key_value, model = slot
+            tried.add((key_name, model))
+            if not gemini_keys.reserve(key_name, model):
+                continue  # відро спорожніло між знімком і запитом (інший процес)
             status, res = _call_combo(key_name, key_value, model, payload,
                                       n_attempts, grounded, log, parse, call_timeout, log_cb)
             if status == "ok":
@@ -418,8 +444,16 @@ def _run_with_pool(role: str, payload: dict, *, manual_key: str | None = None,
             break
 
         if round_idx < rounds - 1:
-            gemini_keys.clear_model_overload()
-            time.sleep(gemini_keys.ROUND_BACKOFF_BASE * (2 ** round_idx))
+            ready_at = gemini_keys.next_refill_at(role)
+            if ready_at is None:
+                break
+            wait = max(0.0, ready_at - gemini_keys._clock())
+            if wait > _wait_budget():
+                log.append(f"найближче звільнення через {wait:.0f}с — поза бюджетом очікування")
+                break
+            if wait > 0:
+                _emit(f"⏳ чекаю {wait:.1f}с до звільнення квоти/моделі")
+                gemini_keys.wait_for_refill(wait)
 
     if aborted:
         _emit(f"⏱ дедлайн {deadline_seconds:.0f}с вичерпано — припиняю перебір")
@@ -490,13 +524,21 @@ def gemini_generate_text(payload: dict, *, role: str = "chat",
                           parse=False, log_cb=log_cb)
 
 
-def _gemini_analyze(audio_bytes: bytes, mime: str, manager_context: str, manager_snapshot: str = "") -> dict:
-    """Шле аудіо в Gemini (роль management) з ретраями та фолбеком моделей/ключів."""
-    payload = _build_payload(audio_bytes, mime, manager_context, manager_snapshot)
+def _gemini_analyze(audio, mime: str, manager_context: str, manager_snapshot: str = "") -> dict:
+    """Шле аудіо (bytes або відкритий файл) в Gemini (роль management) з ретраями
+    та фолбеком моделей/ключів."""
+    payload = _build_payload(audio, mime, manager_context, manager_snapshot)
     return _run_with_pool("management", payload)
 
 
-def _build_payload(audio_bytes: bytes, mime: str, manager_context: str, manager_snapshot: str = "") -> dict:
+def _b64_audio(audio) -> str:
+    if hasattr(audio, "read"):
+        audio.seek(0)
+        audio = audio.read()
+    return base64.b64encode(audio).decode()
+
+
+def _build_payload(audio, mime: str, manager_context: str, manager_snapshot: str = "") -> dict:
     text = "Проаналізуй цей запис телефонної розмови за наданою рубрикою. "
     if manager_context.strip():
         text += (
@@ -514,7 +556,7 @@ def _build_payload(audio_bytes: bytes, mime: str, manager_context: str, manager_
         text += "Снімку CRM немає — discrepancies поверни як []."
     user_parts = [
         {"text": text},
-        {"inline_data": {"mime_type": mime, "data": base64.b64encode(audio_bytes).decode()}},
+        {"inline_data": {"mime_type": mime, "data": _b64_audio(audio)}},
     ]
     return {
         "contents": [{"role": "user", "parts": user_parts}],
@@ -699,6 +741,32 @@ def _normalize_discrepancies(value) -> list:
     return out
 
 
+@contextmanager
+def _download_recording(client: BinotelClient, gcid: str):
+    """Стрімить mp3 у тимчасовий файл; дає (файл, розмір). Файл видаляється на
+    виході. Завеликий запис обриваємо на MAX_AUDIO_BYTES, не докачуючи."""
+    upstream, _url = client.fetch_record_stream(gcid)
+    size = 0
+    with tempfile.TemporaryFile(prefix="call-audio-") as spool:
+        try:
+            for chunk in upstream.iter_content(chunk_size=DOWNLOAD_CHUNK_BYTES):
+                if not chunk:
+                    continue
+                size += len(chunk)
+                if size > MAX_AUDIO_BYTES:
+                    raise CallAIAnalysisError(
+                        f"Запис завеликий (понад {MAX_AUDIO_BYTES // (1024*1024)} МБ) для inline-аналізу. "
+                        "Потрібен Files API (буде додано пізніше)."
+                    )
+                spool.write(chunk)
+        finally:
+            upstream.close()
+        if size <= 0:
+            raise CallAIAnalysisError("Порожній аудіофайл запису.")
+        spool.seek(0)
+        yield spool, size
+
+
 # ---------------------------------------------------------------------------
 # Публічний вхід
 # ---------------------------------------------------------------------------
@@ -740,22 +808,8 @@ def analyze_call(
 
     started = time.monotonic()
     try:
-        upstream, _url = client.fetch_record_stream(gcid)
-        try:
-            audio = upstream.content  # читаємо повністю в памʼять
-        finally:
-            upstream.close()
-
-        size = len(audio or b"")
-        if size <= 0:
-            raise CallAIAnalysisError("Порожній аудіофайл запису.")
-        if size > MAX_AUDIO_BYTES:
-            raise CallAIAnalysisError(
-                f"Запис завеликий ({size // (1024*1024)} МБ) для inline-аналізу. "
-                "Потрібен Files API (буде додано пізніше)."
-            )
-
-        out = _gemini_analyze(audio, "audio/mpeg", analysis.manager_context, _build_manager_snapshot(record))
+        with _download_recording(client, gcid) as (audio, size):
+            out = _gemini_analyze(audio, "audio/mpeg", analysis.manager_context, _build_manager_snapshot(record))
         parsed = out["parsed"]
         usage = out["usage"]
 
@@ -901,19 +955,14 @@ def notify_discrepancies(record: CallRecord, analysis: CallAIAnalysis) -> None:
 
 
 # ---------------------------------------------------------------------------
-# Миттєвий фоновий аналіз при збереженні клієнта (без cron, непомітно для менеджера)
+# Аналіз при збереженні клієнта (без cron-очікування, непомітно для менеджера)
 # ---------------------------------------------------------------------------
-_BG_DEADLINE_SECONDS = 300   # максимум чекаємо готовності запису
-_BG_FIRST_DELAY = 20         # перша пауза (даємо дзвінку завершитись)
-_BG_MAX_DELAY = 60
-
-
 def schedule_call_analysis(general_call_id: str) -> None:
-    """Запускає аналіз дзвінка у фоновому потоці одразу після збереження клієнта.
+    """Ставить дзвінок у чергу аналізу одразу після збереження клієнта.
 
     Менеджер не чекає й не бачить процес — відповідь повертається миттєво, а
-    розбір зʼявиться згодом (коли провайдер віддасть запис). Безпечно: будь-яка
-    помилка глушиться, воркер не падає.
+    розбір зробить воркер run_call_ai_analyses (коли провайдер віддасть запис).
+    Безпечно: будь-яка помилка глушиться.
     """
     gcid = (str(general_call_id or "")).strip()
     if not gcid:
@@ -924,10 +973,11 @@ def schedule_call_analysis(general_call_id: str) -> None:
     except Exception:
         return
     try:
-        t = threading.Thread(target=_bg_analyze, args=(gcid,), daemon=True)
-        t.start()
+        from management.services.call_analysis_jobs import enqueue_call_analysis
+
+        enqueue_call_analysis(gcid)
     except Exception:
-        logger.exception("schedule_call_analysis: failed to start thread")
+        logger.exception("schedule_call_analysis: failed to enqueue %s", gcid)
 
 
 def _recording_ready(gcid: str) -> bool:
@@ -940,35 +990,3 @@ def _recording_ready(gcid: str) -> bool:
         return False
     except Exception:
         return False
-
-
-def _bg_analyze(gcid: str) -> None:
-    from django.db import close_old_connections
-
-    close_old_connections()
-    try:
-        deadline = time.monotonic() + _BG_DEADLINE_SECONDS
-        delay = _BG_FIRST_DELAY
-        while time.monotonic() < deadline:
-            time.sleep(delay)
-            close_old_connections()
-            # Уже проаналізовано іншим шляхом? — виходимо.
-            rec = CallRecord.objects.filter(provider="binotel", external_call_id=gcid).first()
-            if rec and rec.ai_analyses.filter(status=CallAIAnalysis.Status.DONE).exists():
-                return
-            if _recording_ready(gcid):
-                try:
-                    analysis = analyze_call(gcid, force=False)
-                    if analysis.status == CallAIAnalysis.Status.DONE:
-                        CallRecord.objects.filter(
-                            provider="binotel", external_call_id=gcid
-                        ).update(ai_status=CallRecord.AiStatus.DONE)
-                    return
-                except Exception:
-                    logger.info("bg call analysis failed for %s", gcid)
-                    return
-            delay = min(_BG_MAX_DELAY, int(delay * 1.5))
-    except Exception:
-        logger.exception("bg call analysis loop error for %s", gcid)
-    finally:
-        close_old_connections()
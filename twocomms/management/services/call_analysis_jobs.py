@@ -0,0 +1,251 @@
+"""
+Черга ШІ-аналізу дзвінків у БД.
+
+Роль «задачі» виконує сам CallRecord: ai_status (pending → running → done /
+error), ai_attempts, ai_claimed_by + ai_lease_until (оренда воркера),
+ai_next_attempt_at (коли дозволено наступну спробу), ai_last_error.
+
+  * enqueue_call_analysis — ставить дзвінок у чергу (замість фонового потоку
+    всередині Passenger-воркера, що спав між ретраями й губився при рестарті);
+  * claim_call_jobs — атомарно (один умовний UPDATE) забирає готові до
+    обробки записи; прострочена оренда (воркер помер) перепідбирається;
+  * run_call_jobs — обробляє пачку кількома потоками. Невдача → повтор за
+    експоненційним графіком (і не раніше, ніж звільниться ключ Gemini), після
+    MAX_ATTEMPTS — error.
+
+Запускає чергу management-команда run_call_ai_analyses (cron або --forever).
+"""
+from __future__ import annotations
+
+import logging
+import os
+import socket
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.db import connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from management.models import CallAIAnalysis, CallRecord
+from management.services import gemini_keys
+
+logger = logging.getLogger("binotel")
+
+ANALYSIS_DELAY_SECONDS = 90      # запис зʼявляється у провайдера не одразу
+ENQUEUE_DELAY_SECONDS = 20       # дзвінок щойно привʼязали до клієнта — дати йому завершитись
+MEANINGFUL_SECONDS = 30
+MAX_ATTEMPTS = 3
+LEASE_SECONDS = 15 * 60
+RETRY_BASE_SECONDS = 120         # 2 хв, 4 хв, ...
+RECORDING_WAIT_SECONDS = 300     # скільки чекаємо появи запису, не витрачаючи спроб
+RECORDING_POLL_SECONDS = 30
+DEFAULT_WORKERS = 3
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()[:40]}:{os.getpid()}"
+
+
+def enqueue_call_analysis(general_call_id: str, *, delay_seconds: int = ENQUEUE_DELAY_SECONDS):
+    """Ставить дзвінок у чергу аналізу. Повертає CallRecord або None.
+
+    Записи, що вже аналізуються або проаналізовані, не чіпаємо.
+    """
+    gcid = (str(general_call_id or "")).strip()
+    if not gcid:
+        return None
+    record, _created = CallRecord.objects.get_or_create(provider="binotel", external_call_id=gcid)
+    if record.ai_status in (CallRecord.AiStatus.RUNNING, CallRecord.AiStatus.DONE):
+        return record
+    due = timezone.now() + timedelta(seconds=max(0, int(delay_seconds)))
+    CallRecord.objects.filter(id=record.id).exclude(
+        ai_status__in=(CallRecord.AiStatus.RUNNING, CallRecord.AiStatus.DONE)
+    ).update(
+        ai_status=CallRecord.AiStatus.PENDING,
+        ai_attempts=0,
+        ai_next_attempt_at=due,
+        ai_last_error="",
+        updated_at=timezone.now(),
+    )
+    record.refresh_from_db()
+    return record
+
+
+def _due_q(now) -> Q:
+    """Записи, які вже можна забирати."""
+    cutoff = now - timedelta(seconds=ANALYSIS_DELAY_SECONDS)
+    pending = Q(ai_status=CallRecord.AiStatus.PENDING) & (
+        Q(ai_next_attempt_at__lte=now)
+        # Поставлені вебхуком: чекаємо появи запису й відсікаємо короткі дзвінки.
+        | Q(ai_next_attempt_at__isnull=True, created_at__lte=cutoff,
+            duration_seconds__gte=MEANINGFUL_SECONDS)
+    )
+    stale = Q(ai_status=CallRecord.AiStatus.RUNNING) & (
+        Q(ai_lease_until__lte=now)
+        | Q(ai_lease_until__isnull=True, ai_locked_at__lte=now - timedelta(seconds=LEASE_SECONDS))
+    )
+    return (pending | stale) & Q(ai_attempts__lt=MAX_ATTEMPTS) & ~Q(external_call_id="")
+
+
+def fail_exhausted(now=None) -> int:
+    """Записи, що вичерпали спроби (і не в живій оренді), → error."""
+    now = now or timezone.now()
+    return (
+        CallRecord.objects.filter(ai_attempts__gte=MAX_ATTEMPTS)
+        .filter(
+            Q(ai_status=CallRecord.AiStatus.PENDING)
+            | Q(ai_status=CallRecord.AiStatus.RUNNING, ai_lease_until__lte=now)
+        )
+        .update(ai_status=CallRecord.AiStatus.ERROR, ai_claimed_by="", ai_lease_until=None,
+                updated_at=now)
+    )
+
+
+def due_call_job_ids(limit: int, now=None) -> list[int]:
+    now = now or timezone.now()
+    return list(
+        CallRecord.objects.filter(_due_q(now))
+        .order_by("created_at")
+        .values_list("id", flat=True)[:limit]
+    )
+
+
+def claim_call_jobs(limit: int, *, worker: str = "", now=None) -> list[CallRecord]:
+    """Атомарно забирає до ``limit`` готових записів в оренду цього воркера.
+
+    Умова відбору повторюється в самому UPDATE, тож два воркери ніколи не
+    отримають той самий запис. Свої рядки пачка впізнає за токеном у
+    ai_claimed_by.
+    """
+    if limit <= 0:
+        return []
+    now = now or timezone.now()
+    ids = due_call_job_ids(limit, now)
+    if not ids:
+        return []
+    token = f"{(worker or worker_name())[:47]}:{uuid.uuid4().hex[:16]}"
+    claimed = CallRecord.objects.filter(_due_q(now), id__in=ids).update(
+        ai_status=CallRecord.AiStatus.RUNNING,
+        ai_claimed_by=token,
+        ai_locked_at=now,
+        ai_lease_until=now + timedelta(seconds=LEASE_SECONDS),
+        ai_attempts=F("ai_attempts") + 1,
+        updated_at=now,
+    )
+    if not claimed:
+        return []  # гонка — забрав інший воркер
+    return list(CallRecord.objects.filter(ai_claimed_by=token).order_by("created_at"))
+
+
+def _retry_at(attempts: int, now):
+    due = now + timedelta(seconds=RETRY_BASE_SECONDS * (2 ** max(0, attempts - 1)))
+    # Пул Gemini вичерпано — немає сенсу будити задачу раніше, ніж звільниться ключ.
+    try:
+        if not gemini_keys.has_available_key("management", now):
+            cooldown = gemini_keys.soonest_cooldown("management", now)
+            if cooldown and cooldown > due:
+                due = cooldown
+    except Exception:
+        pass
+    return due
+
+
+def _finish(record: CallRecord, **fields) -> bool:
+    """Записує результат, лише якщо оренда ще наша (інакше запис уже забрали)."""
+    fields.setdefault("ai_claimed_by", "")
+    fields.setdefault("ai_lease_until", None)
+    fields["updated_at"] = timezone.now()
+    return bool(
+        CallRecord.objects.filter(id=record.id, ai_claimed_by=record.ai_claimed_by).update(**fields)
+    )
+
+
+def process_call_job(record: CallRecord) -> str:
+    """Обробляє один забраний запис. Повертає 'done' | 'waiting' | 'retry' | 'error'."""
+    from management.services import call_ai_analysis as caa
+
+    now = timezone.now()
+    gcid = record.external_call_id
+    young = record.created_at and (now - record.created_at).total_seconds() < RECORDING_WAIT_SECONDS
+    if young and not caa._recording_ready(gcid):
+        # Запис ще не готовий — це не спроба аналізу, просто чекаємо.
+        _finish(
+            record,
+            ai_status=CallRecord.AiStatus.PENDING,
+            ai_attempts=max(0, record.ai_attempts - 1),
+            ai_next_attempt_at=now + timedelta(seconds=RECORDING_POLL_SECONDS),
+        )
+        return "waiting"
+
+    error = ""
+    try:
+        analysis = caa.analyze_call(gcid, force=False)
+        ok = analysis.status == CallAIAnalysis.Status.DONE
+        error = "" if ok else (analysis.error or "Аналіз не виконано.")
+    except Exception as exc:  # не валимо воркер
+        ok = False
+        error = str(exc) or exc.__class__.__name__
+        logger.info("call-ai job #%s failed: %s", record.id, exc)
+
+    if ok:
+        _finish(record, ai_status=CallRecord.AiStatus.DONE, ai_next_attempt_at=None, ai_last_error="")
+        return "done"
+    if record.ai_attempts < MAX_ATTEMPTS:
+        _finish(
+            record,
+            ai_status=CallRecord.AiStatus.PENDING,
+            ai_next_attempt_at=_retry_at(record.ai_attempts, timezone.now()),
+            ai_last_error=error[:2000],
+        )
+        return "retry"
+    _finish(record, ai_status=CallRecord.AiStatus.ERROR, ai_next_attempt_at=None, ai_last_error=error[:2000])
+    return "error"
+
+
+def run_call_jobs(limit: int, *, workers: int = DEFAULT_WORKERS, worker: str = "") -> dict:
+    """Обробляє до ``limit`` записів, до ``workers`` одночасно.
+
+    Потоки забирають записи порціями за вільними слотами, тож довгий аналіз
+    одного дзвінка не тримає решту. Повертає лічильники за результатами.
+    """
+    worker = worker or worker_name()
+    stats = {"done": 0, "waiting": 0, "retry": 0, "error": 0}
+    fail_exhausted()
+    claimed = 0
+
+    def _run(record):
+        try:
+            return process_call_job(record)
+        finally:
+            if workers > 1:
+                connections.close_all()
+
+    if workers <= 1:
+        while claimed < limit:
+            batch = claim_call_jobs(1, worker=worker)
+            if not batch:
+                break
+            claimed += 1
+            stats[_run(batch[0])] += 1
+        return stats
+
+    inflight = set()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="call-ai") as pool:
+        while True:
+            free = min(workers - len(inflight), limit - claimed)
+            if free > 0:
+                batch = claim_call_jobs(free, worker=worker)
+                claimed += len(batch)
+                inflight.update(pool.submit(_run, record) for record in batch)
+            if not inflight:
+                break
+            done, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    stats[future.result()] += 1
+                except Exception:
+                    logger.exception("call-ai job worker crashed")
+                    stats["error"] += 1
+    return stats
@@ -1,18 +1,15 @@
 from dataclasses import dataclass
 
-from django.db.models import Q
 from django.utils import timezone
 
 from management.models import (
     Client,
+    DedupeIndexEntry,
     DuplicateReview,
     ManagementLead,
-    build_phone_last7,
-    normalize_name_for_match,
-    normalize_phone,
-    normalize_website_for_match,
 )
 from .client_entry import candidate_owner_display
+from .dedupe_index import DedupeQuery, lookup_candidates
 
 
 class DedupeZone:
@@ -29,11 +26,14 @@ class DedupeDecision:
 
 
 PARTIAL_PHONE_MATCH_SCORE = 0.2
+SAME_HOST_MATCH_SCORE = 0.5
 MATCH_SIGNAL_LABELS = {
     "phone": "Телефон",
     "phone_partial": "Схожий номер",
     "website": "Сайт",
+    "website_host": "Той самий домен",
     "name": "Назва",
+    "name_similar": "Схожа назва",
 }
 
 
@@ -53,16 +53,28 @@ def _format_dt(dt_value) -> str:
         return "—"
 
 
-def _build_match_signals(*, exact_phone: bool, partial_phone: bool, exact_website: bool, exact_name: bool) -> list[str]:
+def _build_match_signals(
+    *,
+    exact_phone: bool,
+    partial_phone: bool,
+    exact_website: bool,
+    exact_name: bool,
+    similar_name: bool = False,
+    same_host: bool = False,
+) -> list[str]:
     signals: list[str] = []
     if exact_phone:
         signals.append("phone")
-    elif partial_phone and (exact_website or exact_name):
+    elif partial_phone and (exact_website or exact_name or similar_name):
         signals.append("phone_partial")
     if exact_website:
         signals.append("website")
+    elif same_host:
+        signals.append("website_host")
     if exact_name:
         signals.append("name")
+    elif similar_name:
+        signals.append("name_similar")
     return signals
 
 
@@ -81,12 +93,16 @@ def _client_candidate_payload(
     exact_website: bool,
     exact_name: bool,
     is_shared_phone: bool,
+    similar_name: bool = False,
+    same_host: bool = False,
 ) -> dict:
     matched_on = _build_match_signals(
         exact_phone=exact_phone,
         partial_phone=partial_phone,
         exact_website=exact_website,
         exact_name=exact_name,
+        similar_name=similar_name,
+        same_host=same_host,
     )
     return {
         "kind": "client",
@@ -99,6 +115,7 @@ def _client_candidate_payload(
         "exact_phone": bool(exact_phone),
         "exact_name": bool(exact_name),
         "exact_website": bool(exact_website),
+        "similar_name": bool(similar_name),
         "matched_on": matched_on,
         "signal_summary": _signal_summary(matched_on),
         "owner_display": candidate_owner_display(client.owner),
@@ -120,12 +137,16 @@ def _lead_candidate_payload(
     exact_website: bool,
     exact_name: bool,
     is_shared_phone: bool,
+    similar_name: bool = False,
+    same_host: bool = False,
 ) -> dict:
     matched_on = _build_match_signals(
         exact_phone=exact_phone,
         partial_phone=partial_phone,
         exact_website=exact_website,
         exact_name=exact_name,
+        similar_name=similar_name,
+        same_host=same_host,
     )
     return {
         "kind": "lead",
@@ -138,6 +159,7 @@ def _lead_candidate_payload(
         "exact_phone": bool(exact_phone),
         "exact_name": bool(exact_name),
         "exact_website": bool(exact_website),
+        "similar_name": bool(similar_name),
         "matched_on": matched_on,
         "signal_summary": _signal_summary(matched_on),
         "owner_display": candidate_owner_display(lead.added_by),
@@ -159,113 +181,47 @@ def _collect_candidates(
     exclude_client_ids: list[int] | None = None,
     exclude_lead_ids: list[int] | None = None,
 ) -> list[dict]:
-    phone_normalized = normalize_phone(phone)
-    phone_last7 = build_phone_last7(phone_normalized or phone)
-    name_key = normalize_name_for_match(shop_name)
-    website_key = normalize_website_for_match(website_url)
-    candidates: list[dict] = []
-    exclude_client_ids = exclude_client_ids or []
-    exclude_lead_ids = exclude_lead_ids or []
-    candidate_filter = Q()
-
-    if phone_normalized:
-        candidate_filter |= Q(phone_normalized=phone_normalized)
-    if phone_last7:
-        candidate_filter |= Q(phone_last7=phone_last7)
-    if name_key:
-        candidate_filter |= Q(normalized_name_match_key=name_key)
-    if website_key:
-        candidate_filter |= Q(website_match_key=website_key)
-
-    if not candidate_filter:
+    query = DedupeQuery(shop_name=shop_name, phone=phone, website_url=website_url)
+    if not query.keys:
         return []
+    owner_id = getattr(owner, "id", None) if owner else None
+    found = lookup_candidates(
+        [query],
+        exclude_client_ids=exclude_client_ids,
+        exclude_lead_ids=exclude_lead_ids,
+    )[0]
 
-    client_qs = (
-        Client.objects.exclude(id__in=exclude_client_ids)
-        .filter(candidate_filter)
-        .select_related("owner")
-    )
-    for client in client_qs:
-        exact_name = bool(name_key and client.normalized_name_match_key and client.normalized_name_match_key == name_key)
-        exact_phone = bool(client.phone_normalized and client.phone_normalized == phone_normalized)
-        partial_phone = bool(
-            not exact_phone
-            and phone_last7
-            and client.phone_last7
-            and client.phone_last7 == phone_last7
-        )
-        exact_website = bool(website_key and client.website_match_key and client.website_match_key == website_key)
-        name_score = 1.0 if exact_name else 0.0
-        phone_score = 1.0 if exact_phone else PARTIAL_PHONE_MATCH_SCORE if partial_phone else 0.0
-        owner_score = 1.0 if owner and client.owner_id == getattr(owner, "id", None) else 0.0
-        source_score = 1.0 if exact_website else 0.0
-        score = _candidate_score(
-            name_match_score=name_score,
-            phone_match_score=phone_score,
-            owner_match_score=owner_score,
-            source_link_score=source_score,
-        )
-        matched_on = _build_match_signals(
-            exact_phone=exact_phone,
-            partial_phone=partial_phone,
-            exact_website=exact_website,
-            exact_name=exact_name,
-        )
-        if score <= 0 or not matched_on:
+    candidates: list[dict] = []
+    for match in found:
+        obj = match.obj
+        is_client = match.kind == DedupeIndexEntry.Kind.CLIENT
+        if not is_client and obj.status == ManagementLead.Status.REJECTED:
             continue
-        candidates.append(_client_candidate_payload(
-            client,
-            score=score,
-            partial_phone=partial_phone,
-            exact_website=exact_website,
-            exact_name=exact_name,
-            is_shared_phone=bool(client.is_shared_phone),
-            exact_phone=exact_phone,
-        ))
-
-    lead_qs = (
-        ManagementLead.objects.exclude(status=ManagementLead.Status.REJECTED)
-        .exclude(id__in=exclude_lead_ids)
-        .filter(candidate_filter)
-        .select_related("added_by")
-    )
-    for lead in lead_qs:
-        exact_name = bool(name_key and lead.normalized_name_match_key and lead.normalized_name_match_key == name_key)
-        exact_phone = bool(lead.phone_normalized and lead.phone_normalized == phone_normalized)
-        partial_phone = bool(
-            not exact_phone
-            and phone_last7
-            and lead.phone_last7
-            and lead.phone_last7 == phone_last7
-        )
-        exact_website = bool(website_key and lead.website_match_key and lead.website_match_key == website_key)
-        name_score = 1.0 if exact_name else 0.0
-        phone_score = 1.0 if exact_phone else PARTIAL_PHONE_MATCH_SCORE if partial_phone else 0.0
-        owner_score = 1.0 if owner and lead.added_by_id == getattr(owner, "id", None) else 0.0
-        source_score = 1.0 if exact_website else 0.0
+        phone_score = 1.0 if match.exact_phone else PARTIAL_PHONE_MATCH_SCORE if match.partial_phone else 0.0
+        candidate_owner_id = obj.owner_id if is_client else obj.added_by_id
+        owner_score = 1.0 if owner_id and candidate_owner_id == owner_id else 0.0
+        source_score = 1.0 if match.exact_website else SAME_HOST_MATCH_SCORE if match.same_host else 0.0
         score = _candidate_score(
-            name_match_score=name_score,
+            name_match_score=match.name_score,
             phone_match_score=phone_score,
             owner_match_score=owner_score,
             source_link_score=source_score,
         )
-        matched_on = _build_match_signals(
-            exact_phone=exact_phone,
-            partial_phone=partial_phone,
-            exact_website=exact_website,
-            exact_name=exact_name,
+        payload_fn = _client_candidate_payload if is_client else _lead_candidate_payload
+        payload = payload_fn(
+            obj,
+            score=score,
+            exact_phone=match.exact_phone,
+            partial_phone=match.partial_phone,
+            exact_website=match.exact_website,
+            exact_name=match.exact_name,
+            similar_name=match.similar_name,
+            same_host=match.same_host,
+            is_shared_phone=bool(obj.is_shared_phone),
         )
-        if score <= 0 or not matched_on:
+        if score <= 0 or not payload["matched_on"]:
             continue
-        candidates.append(_lead_candidate_payload(
-            lead,
-            score=score,
-            partial_phone=partial_phone,
-            exact_website=exact_website,
-            exact_name=exact_name,
-            is_shared_phone=bool(lead.is_shared_phone),
-            exact_phone=exact_phone,
-        ))
+        candidates.append(payload)
 
     candidates.sort(
         key=lambda item: (
@@ -301,7 +257,7 @@ def evaluate_duplicate_zone(
     strongest = candidates[0]
     if strongest["exact_phone"]:
         zone = DedupeZone.REVIEW if strongest["is_shared_phone"] else DedupeZone.AUTO_BLOCK
-    elif strongest.get("exact_name") or strongest.get("exact_website"):
+    elif strongest["matched_on"]:
         zone = DedupeZone.SUGGESTION
     else:
         zone = DedupeZone.CLEAR
@@ -0,0 +1,339 @@
+"""Індекс блокувальних ключів для пошуку дублів клієнтів і лідів.
+
+Замість OR-фільтрів по Client і ManagementLead на кожну перевірку тримаємо
+окрему таблицю DedupeIndexEntry: для кожного запису — набір ключів
+
+    p:<E.164 телефон>   l:<останні 7 цифр>   n:<назва, транслітерована>
+    t:<триграма назви>  w:<домен сайту>      g:<Google Place ID>
+
+Пошук кандидатів — один запит ``key IN (...)`` навіть для цілої сторінки
+парсера (``lookup_candidates``), далі два запити за самими рядками
+кандидатів. Триграми транслітерованої назви дають нечіткий збіг
+(«Арбер» / «Arber shop»), схожість рахується коефіцієнтом Дайса.
+Надто часті триграми («магазин», «shop») — стоп-слова: їхні postings
+не вибираються і в блокуванні не враховуються (MAX_TRIGRAM_POSTINGS).
+Їхній набір рахується одним GROUP BY по всьому індексу і кешується на
+COMMON_TRIGRAMS_TTL секунд, а не перераховується на кожен пошук.
+
+Індекс оновлюють сигнали post_save/post_delete (management.signals);
+``rebuild_dedupe_index`` перебудовує його повністю.
+"""
+from __future__ import annotations
+
+import math
+from collections import defaultdict
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from management.models import (
+    Client,
+    DedupeIndexEntry,
+    ManagementLead,
+    build_phone_last7,
+    normalize_name_for_match,
+    normalize_phone,
+    normalize_website_for_match,
+)
+from management.services.network_resolver import network_match_key
+
+NAME_SIMILARITY_THRESHOLD = 0.6
+# Частка триграм запиту, яку має мати кандидат, щоб потрапити в блок.
+TRIGRAM_BLOCK_RATIO = 0.5
+# Триграма, що є в більшій кількості записів, не несе сигналу і не вибирається.
+MAX_TRIGRAM_POSTINGS = 500
+COMMON_TRIGRAMS_TTL = 60 * 60
+COMMON_TRIGRAMS_CACHE_KEY = "dedupe_index:common_trigrams:{limit}"
+MAX_KEY_LENGTH = 191
+
+# Платформи, де домен спільний для всіх магазинів: ключ — домен + перший сегмент шляху.
+PLATFORM_HOSTS = {
+    "instagram.com", "facebook.com", "fb.com", "t.me", "telegram.me", "tiktok.com",
+    "prom.ua", "rozetka.com.ua", "olx.ua", "linktr.ee", "taplink.cc", "youtube.com",
+    "google.com", "maps.google.com", "goo.gl", "maps.app.goo.gl", "wa.me", "viber.com",
+}
+
+# Поля, зміна яких змінює ключі (для пропуску зайвих оновлень у сигналах).
+INDEXED_FIELDS = frozenset({
+    "shop_name", "normalized_name_match_key", "phone", "phone_normalized", "phone_last7",
+    "website_url", "website_match_key", "google_place_id",
+})
+
+
+def name_fold(shop_name: str) -> str:
+    return network_match_key(shop_name or "")
+
+
+def name_trigrams(folded: str) -> set[str]:
+    if not folded:
+        return set()
+    if len(folded) < 3:
+        return {folded}
+    return {folded[i:i + 3] for i in range(len(folded) - 2)}
+
+
+def name_similarity(left: str, right: str) -> float:
+    """Коефіцієнт Дайса по триграмах транслітерованих назв (0..1)."""
+    a, b = name_trigrams(name_fold(left)), name_trigrams(name_fold(right))
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+def website_host_key(website_url: str) -> str:
+    value = normalize_website_for_match(website_url)
+    if not value:
+        return ""
+    parsed = urlsplit(f"https://{value}")
+    host = (parsed.hostname or "").lower()
+    if host.startswith("m."):
+        host = host[2:]
+    if host in PLATFORM_HOSTS:
+        segment = next((part for part in parsed.path.split("/") if part), "")
+        return f"{host}/{segment.lower()}" if segment else ""
+    return host
+
+
+def _clip(key: str) -> str:
+    return key[:MAX_KEY_LENGTH]
+
+
+def entry_keys(*, shop_name: str = "", phone_normalized: str = "", phone_last7: str = "", website_url: str = "", place_id: str = "") -> set[str]:
+    keys: set[str] = set()
+    if phone_normalized:
+        keys.add(_clip(f"p:{phone_normalized}"))
+    if phone_last7:
+        keys.add(_clip(f"l:{phone_last7}"))
+    folded = name_fold(shop_name)
+    if folded:
+        keys.add(_clip(f"n:{folded}"))
+        keys.update(f"t:{gram}" for gram in name_trigrams(folded))
+    host = website_host_key(website_url)
+    if host:
+        keys.add(_clip(f"w:{host}"))
+    if place_id:
+        keys.add(_clip(f"g:{place_id}"))
+    return keys
+
+
+def keys_for_client(client: Client) -> set[str]:
+    return entry_keys(
+        shop_name=client.shop_name,
+        phone_normalized=client.phone_normalized,
+        phone_last7=client.phone_last7,
+        website_url=client.website_url,
+    )
+
+
+def keys_for_lead(lead: ManagementLead) -> set[str]:
+    return entry_keys(
+        shop_name=lead.shop_name,
+        phone_normalized=lead.phone_normalized,
+        phone_last7=lead.phone_last7,
+        website_url=lead.website_url,
+        place_id=lead.google_place_id,
+    )
+
+
+def _entries(kind: str, object_id: int, keys: set[str]) -> list[DedupeIndexEntry]:
+    return [DedupeIndexEntry(kind=kind, object_id=object_id, key=key) for key in sorted(keys)]
+
+
+def index_client(client: Client) -> None:
+    DedupeIndexEntry.objects.filter(kind=DedupeIndexEntry.Kind.CLIENT, object_id=client.pk).delete()
+    DedupeIndexEntry.objects.bulk_create(_entries(DedupeIndexEntry.Kind.CLIENT, client.pk, keys_for_client(client)))
+
+
+def index_lead(lead: ManagementLead) -> None:
+    DedupeIndexEntry.objects.filter(kind=DedupeIndexEntry.Kind.LEAD, object_id=lead.pk).delete()
+    DedupeIndexEntry.objects.bulk_create(_entries(DedupeIndexEntry.Kind.LEAD, lead.pk, keys_for_lead(lead)))
+
+
+def unindex(kind: str, object_id: int) -> None:
+    DedupeIndexEntry.objects.filter(kind=kind, object_id=object_id).delete()
+
+
+def rebuild_index(*, chunk_size: int = 2000) -> dict[str, int]:
+    """Повна перебудова індексу з Client і ManagementLead."""
+    DedupeIndexEntry.objects.all().delete()
+    counts = {"clients": 0, "leads": 0, "entries": 0}
+    client_fields = ("id", "shop_name", "phone_normalized", "phone_last7", "website_url")
+    lead_fields = (*client_fields, "google_place_id")
+    sources = (
+        ("clients", DedupeIndexEntry.Kind.CLIENT, Client.objects.only(*client_fields), keys_for_client),
+        ("leads", DedupeIndexEntry.Kind.LEAD, ManagementLead.objects.only(*lead_fields), keys_for_lead),
+    )
+    for label, kind, queryset, keys_fn in sources:
+        batch: list[DedupeIndexEntry] = []
+        for obj in queryset.order_by("id").iterator(chunk_size=chunk_size):
+            counts[label] += 1
+            batch.extend(_entries(kind, obj.pk, keys_fn(obj)))
+            if len(batch) >= chunk_size:
+                DedupeIndexEntry.objects.bulk_create(batch)
+                counts["entries"] += len(batch)
+                batch = []
+        if batch:
+            DedupeIndexEntry.objects.bulk_create(batch)
+            counts["entries"] += len(batch)
+    reset_common_trigram_keys()
+    return counts
+
+
+@dataclass
+class DedupeQuery:
+    shop_name: str = ""
+    phone: str = ""
+    website_url: str = ""
+    place_id: str = ""
+
+    def __post_init__(self):
+        self.phone_normalized = normalize_phone(self.phone)
+        self.phone_last7 = build_phone_last7(self.phone_normalized or self.phone)
+        self.name_key = normalize_name_for_match(self.shop_name)
+        self.website_key = normalize_website_for_match(self.website_url)
+        self.host_key = website_host_key(self.website_url)
+        self.keys = entry_keys(
+            shop_name=self.shop_name,
+            phone_normalized=self.phone_normalized,
+            phone_last7=self.phone_last7,
+            website_url=self.website_url,
+            place_id=self.place_id,
+        )
+        self.trigram_keys = {key for key in self.keys if key.startswith("t:")}
+        self.exact_keys = self.keys - self.trigram_keys
+
+
+@dataclass
+class DedupeCandidate:
+    kind: str
+    obj: Client | ManagementLead
+    exact_phone: bool = False
+    partial_phone: bool = False
+    exact_name: bool = False
+    similar_name: bool = False
+    name_score: float = 0.0
+    exact_website: bool = False
+    same_host: bool = False
+    place_match: bool = False
+    matched_keys: set[str] = field(default_factory=set)
+
+    @property
+    def has_signal(self) -> bool:
+        return any((
+            self.exact_phone, self.partial_phone, self.exact_name, self.similar_name,
+            self.exact_website, self.same_host, self.place_match,
+        ))
+
+
+def _score_candidate(query: DedupeQuery, kind: str, obj, matched: set[str]) -> DedupeCandidate:
+    candidate = DedupeCandidate(kind=kind, obj=obj, matched_keys=matched)
+    candidate.exact_phone = bool(obj.phone_normalized and obj.phone_normalized == query.phone_normalized)
+    candidate.partial_phone = bool(
+        not candidate.exact_phone
+        and query.phone_last7
+        and obj.phone_last7
+        and obj.phone_last7 == query.phone_last7
+    )
+    candidate.exact_name = bool(query.name_key and obj.normalized_name_match_key and obj.normalized_name_match_key == query.name_key)
+    if candidate.exact_name:
+        candidate.name_score = 1.0
+    elif query.shop_name:
+        similarity = name_similarity(query.shop_name, obj.shop_name)
+        if similarity >= NAME_SIMILARITY_THRESHOLD:
+            candidate.similar_name = True
+            candidate.name_score = round(similarity, 4)
+    candidate.exact_website = bool(query.website_key and obj.website_match_key and obj.website_match_key == query.website_key)
+    candidate.same_host = bool(
+        not candidate.exact_website
+        and query.host_key
+        and f"w:{query.host_key}"[:MAX_KEY_LENGTH] in matched
+    )
+    candidate.place_match = bool(
+        kind == DedupeIndexEntry.Kind.LEAD
+        and query.place_id
+        and getattr(obj, "google_place_id", "") == query.place_id
+    )
+    return candidate
+
+
+def common_trigram_keys() -> frozenset[str]:
+    """Триграми з понад MAX_TRIGRAM_POSTINGS записами (кеш на COMMON_TRIGRAMS_TTL)."""
+    cache_key = COMMON_TRIGRAMS_CACHE_KEY.format(limit=MAX_TRIGRAM_POSTINGS)
+    common = cache.get(cache_key)
+    if common is None:
+        common = frozenset(
+            DedupeIndexEntry.objects.filter(key__startswith="t:")
+            .values("key")
+            .annotate(postings=Count("id"))
+            .filter(postings__gt=MAX_TRIGRAM_POSTINGS)
+            .values_list("key", flat=True)
+        )
+        cache.set(cache_key, common, COMMON_TRIGRAMS_TTL)
+    return common
+
+
+def reset_common_trigram_keys() -> None:
+    cache.delete(COMMON_TRIGRAMS_CACHE_KEY.format(limit=MAX_TRIGRAM_POSTINGS))
+
+
+def lookup_candidates(
+    queries: list[DedupeQuery],
+    *,
+    exclude_client_ids=None,
+    exclude_lead_ids=None,
+    created_since=None,
+) -> list[list[DedupeCandidate]]:
+    """Кандидати в дублі для кожного запиту; один запит до індексу на всю пачку.
+
+    ``created_since`` — лише записи, створені не раніше цього моменту
+    (фільтр у SQL-вибірці рядків кандидатів).
+    """
+    results: list[list[DedupeCandidate]] = [[] for _ in queries]
+    all_keys = set().union(*(query.keys for query in queries)) if queries else set()
+    if not all_keys:
+        return results
+
+    common = common_trigram_keys() if any(key.startswith("t:") for key in all_keys) else frozenset()
+    hits: dict[tuple[str, int], set[str]] = defaultdict(set)
+    postings = DedupeIndexEntry.objects.filter(key__in=all_keys - common).values_list("kind", "object_id", "key")
+    for kind, object_id, key in postings:
+        hits[(kind, object_id)].add(key)
+
+    # Блокування: точний ключ або достатньо спільних (не частих) триграм.
+    blocked: list[dict[tuple[str, int], set[str]]] = []
+    for query in queries:
+        trigram_keys = query.trigram_keys - common
+        min_shared = max(1, math.ceil(len(trigram_keys) * TRIGRAM_BLOCK_RATIO))
+        selected = {}
+        for ref, keys in hits.items():
+            matched = keys & query.keys
+            if matched & query.exact_keys or (trigram_keys and len(matched & trigram_keys) >= min_shared):
+                selected[ref] = matched
+        blocked.append(selected)
+
+    exclude_client_ids = set(exclude_client_ids or [])
+    exclude_lead_ids = set(exclude_lead_ids or [])
+    client_ids = {object_id for selected in blocked for kind, object_id in selected if kind == DedupeIndexEntry.Kind.CLIENT}
+    lead_ids = {object_id for selected in blocked for kind, object_id in selected if kind == DedupeIndexEntry.Kind.LEAD}
+    recent = {"created_at__gte": created_since} if created_since is not None else {}
+    rows = {}
+    if client_ids - exclude_client_ids:
+        clients = Client.objects.filter(id__in=client_ids - exclude_client_ids, **recent).select_related("owner")
+        for client in clients:
+            rows[(DedupeIndexEntry.Kind.CLIENT, client.id)] = client
+    if lead_ids - exclude_lead_ids:
+        leads = ManagementLead.objects.filter(id__in=lead_ids - exclude_lead_ids, **recent).select_related("added_by")
+        for lead in leads:
+            rows[(DedupeIndexEntry.Kind.LEAD, lead.id)] = lead
+
+    for position, (query, selected) in enumerate(zip(queries, blocked)):
+        for ref in sorted(selected):
+            obj = rows.get(ref)
+            if obj is None:
+                continue
+            candidate = _score_candidate(query, ref[0], obj, selected[ref])
+            if candidate.has_signal:
+                results[position].append(candidate)
+    return results
@@ -13,6 +13,11 @@
 
 Ручні ключі (InstagramBotSettings.custom_gemini_key, LeadCheckerSettings.
 gemini_api_key) обробляються на рівні викликаючого коду — вони пріоритетніші за пул.
+
+Планувальник (pick_slot / next_refill_at / wait_for_refill) тримає стан квот у
+спільному Django cache, тож демон бота, воркери й cron бачать однакові
+кулдауни ключів, перевантаження моделей і хвилинні відра запитів. GeminiKeyState
+лишається журналом для UI та джерелом стану, коли кеш порожній.
 """
 from __future__ import annotations
 
@@ -20,9 +25,12 @@ import datetime
 import logging
 import os
 import re
+import threading
+import time
 from zoneinfo import ZoneInfo
 
 from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
 
 from management.models import GeminiKeyState
@@ -99,8 +107,11 @@ MODEL_OVERLOAD_SECONDS = 60    # 503 → модель «перевантажен
 DEFAULT_MINUTE_COOLDOWN = 60   # per-minute 429 без retryDelay
 TOPUP_COOLDOWN_SECONDS = 6 * 3600  # платний проект без коштів
 
-# In-process кеш перевантажених моделей: {model: datetime_until_utc}.
-_model_overload: dict[str, datetime.datetime] = {}
+# Спільний стан квот у Django cache (див. розділ «Планувальник»).
+QUOTA_CACHE_PREFIX = "gemini_q"
+QUOTA_STATE_TTL = 2 * 24 * 3600
+# Комбінації, що звільняються майже одночасно, пробуємо в одному колі.
+REFILL_SLACK_SECONDS = 0.25
 
 # Модель повернула 429-платно (потрібен біллінг) → позначаємо недоступною на цей
 # період і ОДРАЗУ пропускаємо (не б'ємо її на решті ключів і в наступних викликах).
@@ -122,9 +133,21 @@ def role_model_chains() -> dict:
     return getattr(settings, "GEMINI_ROLE_MODEL_CHAINS", None) or DEFAULT_ROLE_MODEL_CHAINS
 
 
+def model_rpm_limits() -> dict:
+    """Локальні відра запитів {model: RPM на ключ}. Порожньо → не обмежуємо самі,
+    покладаємось на 429 від Google (ліміти free-tier різняться між проектами)."""
+    return getattr(settings, "GEMINI_MODEL_RPM", None) or {}
+
+
 # ---------------------------------------------------------------------------
 # Час / скидання квоти
 # ---------------------------------------------------------------------------
+_clock = time.time  # годинник планувальника (unix-секунди); тести підміняють
+
+
+def _ts(now: datetime.datetime | None = None) -> float:
+    return now.timestamp() if now is not None else _clock()
+
 def next_midnight_pt(now: datetime.datetime | None = None) -> datetime.datetime:
     """Наступна північ America/Los_Angeles у UTC — момент скидання денної квоти."""
     now = now or timezone.now()
@@ -184,6 +207,7 @@ def is_available(key_name: str, now: datetime.datetime | None = None) -> bool:
 
 
 def mark_success(key_name: str, now: datetime.datetime | None = None) -> GeminiKeyState:
+    ts = _ts(now)
     now = now or timezone.now()
     st = GeminiKeyState.get(key_name)
     _roll_day(st, now)
@@ -193,11 +217,14 @@ def mark_success(key_name: str, now: datetime.datetime | None = None) -> GeminiK
     st.last_ok_at = now
     st.requests_today = (st.requests_today or 0) + 1
     st.save()
+    _store_key_state(key_name, until=0.0, ok=ts)
+    notify_refill()
     return st
 
 
 def mark_429(key_name: str, scope: str, seconds: int,
              now: datetime.datetime | None = None, error: str = "") -> GeminiKeyState:
+    ts = _ts(now)
     now = now or timezone.now()
     st = GeminiKeyState.get(key_name)
     _roll_day(st, now)
@@ -211,23 +238,73 @@ def mark_429(key_name: str, scope: str, seconds: int,
     if error:
         st.last_error = error[:500]
     st.save()
+    _store_key_state(key_name, until=ts + (st.cooldown_until - now).total_seconds(),
+                     ok=st.last_ok_at.timestamp() if st.last_ok_at else 0.0)
     return st
 
 
+def _model_state_key(model: str) -> str:
+    return f"{QUOTA_CACHE_PREFIX}:model:{model}"
+
+
 def mark_model_overloaded(model: str, seconds: int = MODEL_OVERLOAD_SECONDS,
                           now: datetime.datetime | None = None) -> None:
-    now = now or timezone.now()
-    _model_overload[model] = now + datetime.timedelta(seconds=max(1, int(seconds)))
+    """503 на моделі: нові запити пропускають її `seconds` (until), а запити, що
+    вже перебирають пул, повертаються до неї через retry_at — 2с, 4с, 8с...
+    Ескалація лише коли попереднє вікно retry_at уже минуло (503 на інших ключах
+    у тому ж колі її не подвоюють)."""
+    ts = _ts(now)
+    seconds = max(1, int(seconds))
+    key = _model_state_key(model)
+    try:
+        entry = cache.get(key) or {}
+    except Exception:
+        entry = {}
+    streak = int(entry.get("streak", 0))
+    retry_at = float(entry.get("retry_at", 0.0))
+    if retry_at <= ts:
+        streak += 1
+        retry_at = ts + min(float(seconds), ROUND_BACKOFF_BASE * (2 ** (streak - 1)))
+    state = {
+        "until": max(float(entry.get("until", 0.0)), ts + seconds),
+        "retry_at": retry_at,
+        "streak": streak,
+    }
+    try:
+        cache.set(key, state, timeout=seconds * 2 + 5)
+    except Exception:
+        pass
 
 
 def is_model_overloaded(model: str, now: datetime.datetime | None = None) -> bool:
-    now = now or timezone.now()
-    until = _model_overload.get(model)
-    return bool(until and until > now)
+    try:
+        entry = cache.get(_model_state_key(model)) or {}
+    except Exception:
+        return False
+    return float(entry.get("until", 0.0)) > _ts(now)
+
+
+def mark_model_ok(model: str) -> None:
+    """Успішна відповідь моделі: знімаємо перевантаження і будимо очікувачів."""
+    try:
+        cache.delete(_model_state_key(model))
+    except Exception:
+        pass
+    notify_refill()
+
+
+def _known_models() -> set[str]:
+    models = set(FREE_QUOTA_MODELS) | set(FREE_GROUNDING_MODELS)
+    for chain in role_model_chains().values():
+        models.update(chain)
+    return models
 
 
 def clear_model_overload() -> None:
-    _model_overload.clear()
+    try:
+        cache.delete_many([_model_state_key(m) for m in _known_models()])
+    except Exception:
+        pass
 
 
 # ---------------------------------------------------------------------------
@@ -246,7 +323,6 @@ def mark_model_unavailable(model: str, seconds: int = PAID_MODEL_SKIP_SECONDS,
     until = now + datetime.timedelta(seconds=max(1, int(seconds)))
     _model_unavailable[model] = until
     try:
-        from django.core.cache import cache
         cache.set(_skip_cache_key(model), until.timestamp(), timeout=max(1, int(seconds)) + 5)
     except Exception:
         pass
@@ -258,7 +334,6 @@ def is_model_unavailable(model: str, now: datetime.datetime | None = None) -> bo
     if until is not None:
         return until > now
     try:
-        from django.core.cache import cache
         ts = cache.get(_skip_cache_key(model))
         if ts:
             return datetime.datetime.fromtimestamp(float(ts), tz=datetime.timezone.utc) > now
@@ -269,7 +344,6 @@ def is_model_unavailable(model: str, now: datetime.datetime | None = None) -> bo
 
 def clear_model_unavailable() -> None:
     try:
-        from django.core.cache import cache
         for m in list(_model_unavailable.keys()):
             cache.delete(_skip_cache_key(m))
     except Exception:
@@ -350,6 +424,204 @@ def soonest_cooldown(role: str, now: datetime.datetime | None = None) -> datetim
     return min(times) if times else None
 
 
+# ---------------------------------------------------------------------------
+# Планувальник: спільний стан квот у кеші
+# ---------------------------------------------------------------------------
+# Записи під QUOTA_CACHE_PREFIX:
+#   key:{KEY}                  {"until", "ok"} — кулдаун після 429 і остання удача (sticky)
+#   model:{model}              {"until", "retry_at", "streak"} — перевантаження (503)
+#   rpm:{KEY}:{model}:{хвилина} лічильник хвилинного відра (cache.incr — атомарний)
+# Увесь стан пулу ролі читається ОДНИМ get_many, тож вибір комбінації коштує один
+# похід у кеш незалежно від кількості ключів×моделей (iter_attempts робив
+# get_or_create GeminiKeyState на кожну комбінацію).
+_refill = threading.Condition()
+
+
+def _key_state_key(key_name: str) -> str:
+    return f"{QUOTA_CACHE_PREFIX}:key:{key_name}"
+
+
+def _bucket_key(key_name: str, model: str, window: int) -> str:
+    return f"{QUOTA_CACHE_PREFIX}:rpm:{key_name}:{model}:{window}"
+
+
+def _store_key_state(key_name: str, *, until: float, ok: float) -> None:
+    try:
+        cache.set(_key_state_key(key_name), {"until": float(until), "ok": float(ok)},
+                  timeout=QUOTA_STATE_TTL)
+    except Exception:
+        pass
+
+
+def _seed_key_states(key_names: list[str]) -> dict:
+    """Кеш порожній (рестарт, евікшн) → стан із GeminiKeyState одним запитом."""
+    states = {name: {"until": 0.0, "ok": 0.0} for name in key_names}
+    try:
+        for st in GeminiKeyState.objects.filter(key_name__in=key_names):
+            states[st.key_name] = {
+                "until": st.cooldown_until.timestamp() if st.cooldown_until else 0.0,
+                "ok": st.last_ok_at.timestamp() if st.last_ok_at else 0.0,
+            }
+    except Exception:
+        return states  # БД недоступна — вважаємо ключі вільними, але не кешуємо
+    try:
+        cache.set_many({_key_state_key(n): v for n, v in states.items()}, timeout=QUOTA_STATE_TTL)
+    except Exception:
+        pass
+    return states
+
+
+class _QuotaBoard:
+    """Знімок стану пулу ролі на момент `ts` (один get_many)."""
+
+    def __init__(self, role: str):
+        pool = role_key_pools().get(role, {"own": [], "borrow": []})
+        self.models = list(role_model_chains().get(role, ["gemini-2.5-flash"]))
+        self.rpm = model_rpm_limits()
+        self.ts = _clock()
+        self.window = int(self.ts // 60)
+        own = [kn for kn in pool.get("own", []) if _key_value(kn)]
+        borrow = [kn for kn in pool.get("borrow", []) if _key_value(kn) and kn not in own]
+        names = own + borrow
+        limited = [m for m in self.models if self.rpm.get(m)]
+
+        wanted = [_key_state_key(n) for n in names]
+        wanted += [_model_state_key(m) for m in self.models]
+        wanted += [_skip_cache_key(m) for m in self.models]
+        wanted += [_bucket_key(n, m, self.window) for m in limited for n in names]
+        try:
+            raw = cache.get_many(wanted)
+        except Exception:
+            raw = {}
+
+        self.keys = {n: raw[_key_state_key(n)] for n in names if _key_state_key(n) in raw}
+        missing = [n for n in names if n not in self.keys]
+        if missing:
+            self.keys.update(_seed_key_states(missing))
+        self.model_state = {m: raw.get(_model_state_key(m)) or {} for m in self.models}
+        self.unavailable_until = {}
+        for m in self.models:
+            local = _model_unavailable.get(m)
+            self.unavailable_until[m] = local.timestamp() if local else float(raw.get(_skip_cache_key(m)) or 0.0)
+        self.buckets = {(n, m): int(raw.get(_bucket_key(n, m, self.window)) or 0)
+                        for m in limited for n in names}
+
+        def _sticky(group):
+            return sorted(group, key=lambda n: self.keys[n]["ok"], reverse=True)
+
+        self.order = _sticky(own) + _sticky(borrow)
+
+    def model_release(self, model: str, fresh: bool) -> float:
+        entry = self.model_state.get(model) or {}
+        return float(entry.get("until" if fresh else "retry_at", 0.0))
+
+    def combo_ready_at(self, key_name: str, model: str) -> float:
+        ready = float(self.keys[key_name]["until"])
+        limit = self.rpm.get(model)
+        if limit and self.buckets.get((key_name, model), 0) >= int(limit):
+            ready = max(ready, (self.window + 1) * 60.0)
+        return ready
+
+
+def blocked_models(role: str, *, fresh: bool = True) -> set[str]:
+    """Моделі, які коло перебору пропускає цілком.
+
+    fresh (перше коло) — модель у вікні перевантаження (until, ~1 хв), як
+    overload-снапшот iter_attempts. Наступні кола — лише поки не настав retry_at
+    (2с, 4с, ... після останньої 503).
+    """
+    board = _QuotaBoard(role)
+    horizon = board.ts + REFILL_SLACK_SECONDS
+    return {m for m in board.models if board.model_release(m, fresh) > horizon}
+
+
+def pick_slot(role: str, *, skip_models=(), exclude=()) -> tuple[str, str, str] | None:
+    """Найкраща доступна комбінація (key_name, key_value, model) або None.
+
+    Порядок той самий, що в iter_attempts (model-major, own→borrow, sticky), але
+    ключі в кулдауні, порожні відра й платні моделі відкидаються за знімком
+    кешу — без HTTP-спроби. exclude — пари (key, model), вже спробувані в колі.
+    """
+    board = _QuotaBoard(role)
+    horizon = board.ts + REFILL_SLACK_SECONDS
+    for model in board.models:
+        if model in skip_models or board.unavailable_until[model] > board.ts:
+            continue
+        for key_name in board.order:
+            if (key_name, model) in exclude:
+                continue
+            if board.combo_ready_at(key_name, model) > horizon:
+                continue
+            return (key_name, _key_value(key_name), model)
+    return None
+
+
+def next_refill_at(role: str) -> float | None:
+    """Найближчий момент (unix-секунди), коли якась комбінація ролі стане
+    доступною для наступного кола. None — чекати нічого (немає ключів або всі
+    моделі платні)."""
+    board = _QuotaBoard(role)
+    times = []
+    for model in board.models:
+        if board.unavailable_until[model] > board.ts:
+            continue
+        release = board.model_release(model, fresh=False)
+        for key_name in board.order:
+            times.append(max(release, board.combo_ready_at(key_name, model)))
+    return min(times) if times else None
+
+
+def reserve(key_name: str, model: str) -> bool:
+    """Бере токен із хвилинного відра (key, model). False — відро порожнє: запит у
+    цю хвилину гарантовано отримав би 429, тож його не шлемо."""
+    limit = model_rpm_limits().get(model)
+    if not limit:
+        return True
+    bucket = _bucket_key(key_name, model, int(_clock() // 60))
+    try:
+        cache.add(bucket, 0, timeout=120)
+        used = cache.incr(bucket)
+    except ValueError:  # запис зник між add та incr
+        cache.set(bucket, 1, timeout=120)
+        used = 1
+    except Exception:
+        return True
+    return used <= int(limit)
+
+
+def notify_refill() -> None:
+    with _refill:
+        _refill.notify_all()
+
+
+def wait_for_refill(seconds: float) -> None:
+    """Чекає до `seconds`, але прокидається раніше, щойно інший потік процесу
+    отримав успішну відповідь (mark_success / mark_model_ok)."""
+    if seconds <= 0:
+        return
+    with _refill:
+        _refill.wait(timeout=seconds)
+
+
+def reset_quota_state() -> None:
+    """Скидає спільний стан планувальника (ключі, моделі, відра поточної хвилини)."""
+    names = set(ALL_KEYS)
+    for pool in role_key_pools().values():
+        names.update(pool.get("own", []))
+        names.update(pool.get("borrow", []))
+    models = _known_models()
+    window = int(_clock() // 60)
+    stale = [_key_state_key(n) for n in names]
+    stale += [_skip_cache_key(m) for m in models]
+    stale += [_bucket_key(n, m, window) for n in names for m in models]
+    try:
+        cache.delete_many(stale)
+    except Exception:
+        pass
+    clear_model_overload()
+    clear_model_unavailable()
+
+
 # ---------------------------------------------------------------------------
 # Статус для UI
 # ---------------------------------------------------------------------------
@@ -26,10 +26,13 @@ import re
 import time
 import urllib.error
 import urllib.request
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
 
 from django.core.cache import cache
-from django.db import IntegrityError, transaction
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Exists, F, Min, OuterRef
 from django.utils import timezone
 
 from management.models import (
@@ -45,11 +48,14 @@ GENAI = "https://generativelanguage.googleapis.com/v1beta"
 
 LOG_KEEP_ROWS = 500
 HISTORY_LIMIT = 12          # скільки останніх реплік даємо моделі
+CATALOG_QUERY_TURNS = 3     # скільки реплік клієнта йде в запит до індексу каталогу
 MAX_ATTEMPTS = 3            # ретраї обробки одного повідомлення
 PAGE_TOKEN_TTL = 1200
 HTTP_TIMEOUT = 12
 CONV_LIST_TIMEOUT = 30
 MSG_KEEP_ROWS = 2000        # підрізання історії
+# Паралельні розмови воркера черги (різні sender_id; один sender — послідовно).
+WORKER_POOL_SIZE = max(1, int(os.environ.get("IG_BOT_WORKERS", "4") or 4))
 
 # Керуючі теги, які модель може додавати у відповідь (вирізаються перед
 # відправкою клієнту). [STAGE:x] просуває воронку, [MANAGER] кличе людину.
@@ -723,6 +729,15 @@ def send_text_tagged(s: InstagramBotSettings, recipient_id: str, text: str, tag:
 # ---------------------------------------------------------------------------
 # Gemini
 # ---------------------------------------------------------------------------
+def _catalog_query(history: list[dict], match_hint: str | None = None) -> str:
+    """Запит до індексу каталогу: останні репліки клієнта (+ підказка матчингу фото)."""
+    turns = [h.get("text") or "" for h in history if h.get("role") == "user"]
+    parts = turns[-CATALOG_QUERY_TURNS:]
+    if match_hint:
+        parts.append(match_hint)
+    return " ".join(parts)
+
+
 def gemini_generate(
     s: InstagramBotSettings, history: list[dict], images: list[tuple[str, bytes]] | None = None,
     match_hint: str | None = None, memory_note: str | None = None,
@@ -767,7 +782,9 @@ def gemini_generate(
     try:
         from management.services.bot_catalog import get_catalog_context
 
-        catalog = get_catalog_context()
+        # Лише релевантні розмові товари (BM25 по останніх репліках клієнта),
+        # а не весь каталог у кожному запиті.
+        catalog = get_catalog_context(query=_catalog_query(history, match_hint))
         if catalog:
             sys_text += "\n\n" + catalog
     except Exception:
@@ -1127,26 +1144,112 @@ def _build_history(sender_id: str) -> list[dict]:
     return hist
 
 
-def _claim_next() -> InstagramBotMessage | None:
-    """Атомарно (умовний UPDATE) забирає найстаріше pending-вхідне."""
-    row = (
+def _claim_batch(limit: int, busy_senders=()) -> list[InstagramBotMessage]:
+    """Атомарно забирає до ``limit`` pending-вхідних (один умовний UPDATE).
+
+    На кожного відправника — лише його найстаріше pending, і лише якщо в нього
+    немає повідомлення в processing: так повідомлення одного sender_id
+    обробляються строго по черзі навіть між кількома воркерами (демон +
+    потік вебхука). Перевірка «зайнятості» — корельований NOT EXISTS у тому ж
+    запиті, що й вибір голів черги (один знімок БД), а самі голови
+    блокуються ``select_for_update(skip_locked=True)``: паралельний воркер
+    пропускає їх, а не забирає друге повідомлення того ж відправника.
+    Підзапит до тієї ж таблиці в самому UPDATE MySQL не дозволяє (1093),
+    тому умова стоїть у блокувальному SELECT. Свої рядки пачка впізнає за
+    claim_token.
+    """
+    if limit <= 0:
+        return []
+    sender_busy = InstagramBotMessage.objects.filter(
+        sender_id=OuterRef("sender_id"),
+        role=InstagramBotMessage.Role.USER,
+        status=InstagramBotMessage.Status.PROCESSING,
+    )
+    token = uuid.uuid4().hex
+    with transaction.atomic():
+        heads = (
+            InstagramBotMessage.objects.filter(
+                role=InstagramBotMessage.Role.USER,
+                status=InstagramBotMessage.Status.PENDING,
+            )
+            .exclude(sender_id__in=set(busy_senders))
+            .exclude(Exists(sender_busy))
+            .values("sender_id")
+            .annotate(head_id=Min("id"))
+            .order_by("head_id")[:limit]
+        )
+        ids = [row["head_id"] for row in heads]
+        if not ids:
+            return []
+        # Блокувальне читання бачить останній закомічений статус: голову,
+        # яку вже забрав інший воркер, тут буде відсіяно.
+        locked = list(
+            InstagramBotMessage.objects.select_for_update(skip_locked=True)
+            .filter(id__in=ids, status=InstagramBotMessage.Status.PENDING)
+            .values_list("id", flat=True)
+        )
+        if not locked:
+            return []  # гонка — забрав хтось інший
+        InstagramBotMessage.objects.filter(id__in=locked).update(
+            status=InstagramBotMessage.Status.PROCESSING,
+            attempts=F("attempts") + 1,
+            claim_token=token,
+        )
+    return list(
         InstagramBotMessage.objects.filter(
-            role=InstagramBotMessage.Role.USER,
-            status=InstagramBotMessage.Status.PENDING,
+            claim_token=token, status=InstagramBotMessage.Status.PROCESSING
         )
+        .select_related("client")
         .order_by("id")
-        .first()
     )
-    if not row:
-        return None
-    claimed = InstagramBotMessage.objects.filter(
-        id=row.id, status=InstagramBotMessage.Status.PENDING
-    ).update(status=InstagramBotMessage.Status.PROCESSING, attempts=row.attempts + 1)
-    if claimed == 1:
-        row.status = InstagramBotMessage.Status.PROCESSING
-        row.attempts += 1
-        return row
-    return None  # гонка — забрав хтось інший
+
+
+def run_sender_pool(claim_batch, handle, *, workers: int, max_items: int) -> int:
+    """Планувальник черги: до ``workers`` відправників паралельно.
+
+    ``claim_batch(limit, busy_senders)`` повертає забрані рядки (з ``sender_id``),
+    ``handle(row)`` обробляє один рядок і повертає True при успіху. Поки
+    повідомлення відправника в роботі, його sender_id передається як busy —
+    наступне від нього забирається лише після завершення попереднього. Виняток
+    у ``handle`` зупиняє забір нових рядків (вже запущені дообробляються).
+    Повертає кількість успішно оброблених.
+    """
+    handled = 0
+    claimed = 0
+    if workers <= 1:
+        while claimed < max_items:
+            rows = claim_batch(1, ())
+            if not rows:
+                break
+            claimed += 1
+            try:
+                if handle(rows[0]):
+                    handled += 1
+            except Exception:
+                break
+        return handled
+
+    stop = False
+    inflight: dict = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ig-bot") as pool:
+        while True:
+            free = min(workers - len(inflight), max_items - claimed)
+            if free > 0 and not stop:
+                rows = claim_batch(free, {row.sender_id for row in inflight.values()})
+                for row in rows:
+                    inflight[pool.submit(handle, row)] = row
+                claimed += len(rows)
+            if not inflight:
+                break
+            done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+            for future in done:
+                inflight.pop(future)
+                try:
+                    if future.result():
+                        handled += 1
+                except Exception:
+                    stop = True
+    return handled
 
 
 STALE_PROCESSING_SECONDS = 300  # повідомлення «зависло» у processing довше — реанімуємо
@@ -1359,9 +1462,11 @@ def _process_one(s: InstagramBotSettings, row: InstagramBotMessage) -> bool:
         source=row.source,
         processed_at=timezone.now(),
     )
-    s.replies_count = (s.replies_count or 0) + 1
+    # F-вираз: відповіді пишуть кілька воркерів одночасно.
     s.last_reply_at = timezone.now()
-    s.save(update_fields=["replies_count", "last_reply_at"])
+    InstagramBotSettings.objects.filter(pk=s.pk).update(
+        replies_count=F("replies_count") + 1, last_reply_at=s.last_reply_at
+    )
     log("success", "reply_sent", f"→ {row.sender_id}: {reply[:240]}")
     # Періодично оновлюємо стислу пам'ять про клієнта.
     if row.client_id:
@@ -1399,7 +1504,15 @@ def _process_one(s: InstagramBotSettings, row: InstagramBotMessage) -> bool:
     return True
 
 
-def process_pending(s: InstagramBotSettings | None = None, max_items: int = 15) -> int:
+def process_pending(
+    s: InstagramBotSettings | None = None, max_items: int = 15, workers: int | None = None
+) -> int:
+    """Обробляє чергу пулом воркерів (WORKER_POOL_SIZE, env IG_BOT_WORKERS).
+
+    Повільна відповідь Gemini одному клієнту більше не блокує інших: різні
+    відправники йдуть паралельно, повідомлення одного — послідовно.
+    ``workers=1`` — колишній послідовний режим у поточному потоці.
+    """
     s = s or InstagramBotSettings.load()
     if not s.is_enabled:
         return 0
@@ -1408,21 +1521,23 @@ def process_pending(s: InstagramBotSettings | None = None, max_items: int = 15)
         reclaim_stale_processing()
     except Exception as exc:
         log("warning", "reclaim", repr(exc))
-    handled = 0
-    for _ in range(max_items):
-        row = _claim_next()
-        if not row:
-            break
+    workers = max(1, workers or WORKER_POOL_SIZE)
+
+    def _handle(row: InstagramBotMessage) -> bool:
         try:
-            if _process_one(s, row):
-                handled += 1
+            return _process_one(s, row)
         except Exception as exc:
             log("error", "process", repr(exc))
             InstagramBotMessage.objects.filter(id=row.id).update(
                 status=InstagramBotMessage.Status.PENDING
             )
-            break
-    return handled
+            raise
+        finally:
+            if workers > 1:
+                # Потоки пулу мають власні з'єднання — не лишаємо їх висіти.
+                connections.close_all()
+
+    return run_sender_pool(_claim_batch, _handle, workers=workers, max_items=max_items)
 
 
 def pending_count() -> int:
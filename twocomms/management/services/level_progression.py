@@ -87,18 +87,20 @@ def calculate_user_metrics(user) -> dict:
     # Оброблені клієнти
     total_processed_clients = Client.objects.filter(owner=user).count()
 
-    # Тривалість роботи
-    work_duration_days = 0
-    if level and level.salary_start_date:
-        work_duration_days = (timezone.now().date() - level.salary_start_date).days
-
     return {
         'total_conversions': total_conversions,
         'total_processed_clients': total_processed_clients,
-        'work_duration_days': work_duration_days,
+        'work_duration_days': work_duration_days(level),
     }
 
 
+def work_duration_days(level) -> int:
+    """Кількість днів роботи від salary_start_date рівня."""
+    if level and level.salary_start_date:
+        return (timezone.now().date() - level.salary_start_date).days
+    return 0
+
+
 def check_condition(condition: dict, metrics: dict) -> tuple[bool, int, int]:
     """
     Перевірити одну умову
@@ -186,7 +188,19 @@ def get_progression_status(user) -> dict:
         - description: Опис вимог
     """
     level = get_current_level(user)
+    metrics = None
+    if level and get_next_level_requirements(level.level):
+        metrics = calculate_user_metrics(user)
+    return build_progression_status(level, metrics)
 
+
+def build_progression_status(level, metrics: dict | None) -> dict:
+    """
+    Статус прогресу з уже порахованих метрик (див. calculate_user_metrics).
+
+    Використовується і для одного користувача, і для пакетного розрахунку
+    по всьому складу менеджерів (services.roster_metrics).
+    """
     if not level:
         return {
             'current_level': None,
@@ -211,14 +225,15 @@ def get_progression_status(user) -> dict:
             'description': 'Максимальний рівень',
         }
 
-    metrics = calculate_user_metrics(user)
     conditions_data = requirements.get('conditions', {})
 
     # Розібрати умови
     conditions_list = parse_conditions_for_display(conditions_data, metrics)
 
-    # Перевірити загальний статус
-    can_promote, reason = check_auto_promotion_conditions(user)
+    # Перевірити загальний статус (як check_auto_promotion_conditions)
+    can_promote = False
+    if requirements.get('auto_check'):
+        can_promote, _, _ = check_condition(conditions_data, metrics)
 
     # Розрахувати прогрес
     progress_pct = calculate_progress_percentage(conditions_list)
@@ -1,14 +1,17 @@
 """Детермінований резолвер мереж лідів.
 
 Консолідація, НЕ паралельна система: переви використовує наявні ключі матчингу
-ManagementLead (normalized_name_match_key / website_match_key / phone_last7),
+ManagementLead (normalized_name_match_key / website_match_key / phone_normalized),
 додаючи лише транслітераційну нормалізацію (arber/арбер) і generic-детект.
+Кластери будуються в памʼяті (union-find), у БД — лише змінені привʼязки.
 """
 from __future__ import annotations
 
-from collections import defaultdict
+from collections import Counter, defaultdict
 
 from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
 from django.utils.text import slugify
 
 from management.models import (
@@ -55,6 +58,18 @@ def is_generic_name(name: str) -> bool:
 # джерела привʼязки, які резолвер може перезаписувати (не чіпає ручні/AI рішення)
 _AUTO_SOURCES = ("", "auto")
 
+BULK_CHUNK_SIZE = 500
+
+# Хости, спільні для різних бізнесів: домен НЕ є ознакою однієї мережі.
+_SHARED_HOSTS = {
+    "facebook.com", "fb.com", "t.me", "telegram.me", "tiktok.com", "youtube.com",
+    "linktr.ee", "taplink.cc", "wa.me", "viber.com", "google.com", "maps.google.com",
+    "goo.gl", "sites.google.com", "business.site", "prom.ua", "rozetka.com.ua",
+    "olx.ua", "instagram.com", "instagr.am",
+}
+_INSTAGRAM_HOSTS = {"instagram.com", "instagr.am"}
+_INSTAGRAM_RESERVED = {"p", "reel", "reels", "explore", "stories", "tv", "accounts"}
+
 
 def classify_cluster(leads: list) -> str:
     """standalone | generic | network. Generic (родова назва) НЕ зливаємо."""
@@ -73,76 +88,221 @@ def _unique_slug(base: str) -> str:
     return slug
 
 
-def _detach(lead: ManagementLead) -> None:
-    if lead.network_membership_source not in _AUTO_SOURCES:
-        return
-    if lead.network_id or lead.needs_disambiguation or lead.network_membership_source:
-        lead.network = None
-        lead.needs_disambiguation = False
-        lead.network_membership_source = ""
-        lead.save(update_fields=["network", "needs_disambiguation", "network_membership_source", "updated_at"])
+def _website_host(website_key: str) -> str:
+    return website_key.split("/", 1)[0]
 
 
-def _mark_generic(lead: ManagementLead) -> None:
-    if lead.network_membership_source not in _AUTO_SOURCES:
-        return
-    if lead.network_id or not lead.needs_disambiguation:
-        lead.network = None
-        lead.needs_disambiguation = True
-        lead.network_membership_source = ""
-        lead.save(update_fields=["network", "needs_disambiguation", "network_membership_source", "updated_at"])
+def instagram_handle(raw_url: str) -> str:
+    """Handle з посилання на Instagram (instagram.com/<handle>), інакше ""."""
+    key = normalize_website_for_match(raw_url)
+    host, _, path = key.partition("/")
+    if host.startswith("m."):
+        host = host[2:]
+    if host not in _INSTAGRAM_HOSTS:
+        return ""
+    handle = path.split("/", 1)[0].lstrip("@").split("?", 1)[0]
+    if not handle or handle in _INSTAGRAM_RESERVED:
+        return ""
+    return handle
+
 
+def lead_cluster_keys(lead: ManagementLead) -> list[tuple[str, str]]:
+    """Ключі, за якими ліди зливаються в один кластер.
 
-def _get_or_create_network(name_key: str, leads: list) -> LeadNetwork:
-    alias = NetworkAlias.objects.filter(key_type=NetworkAlias.KeyType.NAME, key_value=name_key).select_related("network").first()
-    if alias:
-        net = alias.network
+    Назва (з транслітерацією), нормалізований телефон (крім спільних номерів),
+    домен сайту (крім соцмереж/маркетплейсів) і Instagram-handle.
+    """
+    keys = [("name", network_match_key(lead.shop_name))]
+    if lead.phone_normalized and not lead.is_shared_phone:
+        keys.append(("phone", lead.phone_normalized))
+    handle = instagram_handle(lead.website_url)
+    if handle:
+        keys.append(("instagram", handle))
     else:
-        net = LeadNetwork.objects.create(
-            canonical_name=leads[0].shop_name,
-            slug=_unique_slug(leads[0].shop_name),
-            policy=LeadNetwork.Policy.NEEDS_REVIEW,
-        )
-        NetworkAlias.objects.create(network=net, key_type=NetworkAlias.KeyType.NAME, key_value=name_key, source="auto")
-    # website-алиаси (для матчингу нових лідів у Блоці B)
+        host = _website_host(normalize_website_for_match(lead.website_url))
+        if host and host not in _SHARED_HOSTS and not host.startswith("m."):
+            keys.append(("domain", host))
+    return [(kind, value) for kind, value in keys if value]
+
+
+class _UnionFind:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, item: int) -> int:
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a: int, b: int) -> None:
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+
+def build_clusters(leads: list) -> tuple[list[list], list]:
+    """(кластери, generic-ліди). Кластери — компоненти зв'язності за
+    lead_cluster_keys; ліди з родовою назвою не зливаються ні з ким."""
+    generic = [lead for lead in leads if is_generic_name(lead.shop_name)]
+    members = [lead for lead in leads if not is_generic_name(lead.shop_name)]
+    uf = _UnionFind(len(members))
+    first_seen: dict[tuple[str, str], int] = {}
+    for index, lead in enumerate(members):
+        for key in lead_cluster_keys(lead):
+            other = first_seen.setdefault(key, index)
+            if other != index:
+                uf.union(other, index)
+    grouped: dict[int, list] = defaultdict(list)
+    for index, lead in enumerate(members):
+        grouped[uf.find(index)].append(lead)
+    return list(grouped.values()), generic
+
+
+def _pick_network(leads: list, alias_map: dict[tuple[str, str], int]) -> int | None:
+    """Наявна мережа кластера: за алиасами назв / сайтів / Instagram; якщо
+    алиаси ведуть у кілька мереж — та, до якої вже привʼязано більше лідів."""
+    candidates: list[int] = []
     for lead in leads:
-        wkey = normalize_website_for_match(lead.website_url)
-        if wkey:
-            NetworkAlias.objects.get_or_create(
-                key_type=NetworkAlias.KeyType.WEBSITE, key_value=wkey,
-                defaults={"network": net, "source": "auto"},
-            )
-    return net
+        for alias_key in _lead_alias_keys(lead):
+            net_id = alias_map.get(alias_key)
+            if net_id and net_id not in candidates:
+                candidates.append(net_id)
+    if len(candidates) <= 1:
+        return candidates[0] if candidates else None
+    votes = Counter(lead.network_id for lead in leads if lead.network_id in candidates)
+    return max(candidates, key=lambda net_id: (votes[net_id], -candidates.index(net_id)))
+
+
+def _lead_alias_keys(lead: ManagementLead) -> list[tuple[str, str]]:
+    keys = [(NetworkAlias.KeyType.NAME, network_match_key(lead.shop_name))]
+    website_key = normalize_website_for_match(lead.website_url)
+    handle = instagram_handle(lead.website_url)
+    if handle:
+        keys.append((NetworkAlias.KeyType.INSTAGRAM, handle))
+    elif website_key:
+        keys.append((NetworkAlias.KeyType.WEBSITE, website_key))
+    return [(kind, value) for kind, value in keys if value]
+
+
+def _create_network(leads: list) -> LeadNetwork:
+    names = Counter(lead.shop_name for lead in leads)
+    canonical = max(leads, key=lambda lead: (names[lead.shop_name], -lead.id)).shop_name
+    return LeadNetwork.objects.create(
+        canonical_name=canonical,
+        slug=_unique_slug(canonical),
+        policy=LeadNetwork.Policy.NEEDS_REVIEW,
+    )
+
+
+def _assign(lead: ManagementLead, *, network_id, needs_disambiguation: bool, source: str) -> bool:
+    if (lead.network_id, lead.needs_disambiguation, lead.network_membership_source) == (network_id, needs_disambiguation, source):
+        return False
+    lead.network_id = network_id
+    lead.needs_disambiguation = needs_disambiguation
+    lead.network_membership_source = source
+    return True
 
 
 def resolve_all() -> dict:
     """Idempotent: класифікує всі parser-ліди й привʼязує до мереж.
-    Повертає підсумок {standalone, generic, network, networks_total}."""
+
+    Кластери рахуються в памʼяті (union-find за назвою, телефоном, доменом,
+    Instagram), у БД пишуться лише ліди/мережі, чия привʼязка змінилась —
+    bulk_update пачками по BULK_CHUNK_SIZE. Прогін без змін робить лише читання.
+    Повертає підсумок {standalone, generic, network, networks_total}.
+    """
     stats = {"standalone": 0, "generic": 0, "network": 0}
-    clusters: dict[str, list] = defaultdict(list)
-    for lead in ManagementLead.objects.filter(lead_source=ManagementLead.LeadSource.PARSER):
-        clusters[network_match_key(lead.shop_name)].append(lead)
+    leads = list(
+        ManagementLead.objects.filter(lead_source=ManagementLead.LeadSource.PARSER)
+        .only(
+            "id", "shop_name", "phone_normalized", "is_shared_phone", "website_url",
+            "network_id", "needs_disambiguation", "network_membership_source",
+        )
+        .order_by("id")
+    )
+    clusters, generic = build_clusters(leads)
+    alias_map = {
+        (key_type, key_value): network_id
+        for key_type, key_value, network_id in NetworkAlias.objects.values_list("key_type", "key_value", "network_id")
+    }
 
+    changed: list[ManagementLead] = []
+    touched_networks: set[int] = set()
     with transaction.atomic():
-        for name_key, leads in clusters.items():
-            kind = classify_cluster(leads)
+        for lead in generic:
+            stats["generic"] += 1
+            if lead.network_membership_source in _AUTO_SOURCES and _assign(
+                lead, network_id=None, needs_disambiguation=True, source=""
+            ):
+                changed.append(lead)
+
+        new_aliases: list[NetworkAlias] = []
+        for cluster in clusters:
+            kind = classify_cluster(cluster)
             if kind == "standalone":
                 stats["standalone"] += 1
-                _detach(leads[0])
-            elif kind == "generic":
-                stats["generic"] += len(leads)
-                for lead in leads:
-                    _mark_generic(lead)
-            else:
-                stats["network"] += 1
-                net = _get_or_create_network(name_key, leads)
-                for lead in leads:
-                    if lead.network_membership_source in _AUTO_SOURCES and (lead.network_id != net.id or lead.needs_disambiguation):
-                        lead.network = net
-                        lead.needs_disambiguation = False
-                        lead.network_membership_source = "auto"
-                        lead.save(update_fields=["network", "needs_disambiguation", "network_membership_source", "updated_at"])
-                net.members_count = net.leads.count()
-                net.save(update_fields=["members_count", "updated_at"])
+                lead = cluster[0]
+                if lead.network_membership_source in _AUTO_SOURCES and _assign(
+                    lead, network_id=None, needs_disambiguation=False, source=""
+                ):
+                    changed.append(lead)
+                continue
+
+            stats["network"] += 1
+            net_id = _pick_network(cluster, alias_map)
+            if net_id is None:
+                net_id = _create_network(cluster).id
+            touched_networks.add(net_id)
+            # алиаси назв/сайтів/Instagram (для матчингу нових лідів у Блоці B)
+            for lead in cluster:
+                for alias_key in _lead_alias_keys(lead):
+                    if alias_key not in alias_map:
+                        alias_map[alias_key] = net_id
+                        new_aliases.append(
+                            NetworkAlias(network_id=net_id, key_type=alias_key[0], key_value=alias_key[1], source="auto")
+                        )
+            for lead in cluster:
+                if lead.network_membership_source in _AUTO_SOURCES and _assign(
+                    lead, network_id=net_id, needs_disambiguation=False, source="auto"
+                ):
+                    changed.append(lead)
+
+        touched_networks.update(lead.network_id for lead in changed if lead.network_id)
+        if new_aliases:
+            NetworkAlias.objects.bulk_create(new_aliases, batch_size=BULK_CHUNK_SIZE, ignore_conflicts=True)
+        if changed:
+            now = timezone.now()
+            for lead in changed:
+                lead.updated_at = now
+            ManagementLead.objects.bulk_update(
+                changed,
+                ["network", "needs_disambiguation", "network_membership_source", "updated_at"],
+                batch_size=BULK_CHUNK_SIZE,
+            )
+        _sync_members_count(touched_networks)
     stats["networks_total"] = LeadNetwork.objects.count()
     return stats
+
+
+def _sync_members_count(network_ids: set[int]) -> None:
+    if not network_ids:
+        return
+    counts = dict(
+        ManagementLead.objects.filter(network_id__in=network_ids)
+        .values("network_id")
+        .annotate(total=Count("id"))
+        .values_list("network_id", "total")
+    )
+    stale = []
+    now = timezone.now()
+    for net in LeadNetwork.objects.filter(id__in=network_ids).only("id", "members_count"):
+        total = counts.get(net.id, 0)
+        if net.members_count != total:
+            net.members_count = total
+            net.updated_at = now
+            stale.append(net)
+    if stale:
+        LeadNetwork.objects.bulk_update(stale, ["members_count", "updated_at"], batch_size=BULK_CHUNK_SIZE)
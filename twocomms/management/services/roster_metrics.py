@@ -0,0 +1,175 @@
+"""
+Пакетні метрики складу менеджерів: бали, оброблені клієнти, рівні, прогрес.
+
+Раніше вкладка «Менеджери» в admin_overview і команда
+send_management_reminders рахували все по кожному користувачу окремо
+(get_user_stats + get_current_level + get_progression_status), тобто
+кількість запитів росла лінійно зі штатом. Тут усе рахується кількома
+згрупованими запитами на весь склад:
+
+- один GROUP BY owner_id по Client: processed_today/total, конверсії і
+  бали (legacy/override — через visible_points_sum_expr у БД);
+- клієнти visible-points-v2 без points_override (рідкісні) — добираються
+  окремо й рахуються в Python, як у client_visible_points_value;
+- один запит по ManagerLevel (staff без запису → віртуальний ADMIN).
+
+Результат кешується на (локальний день, версія складу). Версія складу —
+лічильник, який бампають сигнали Client/ManagerLevel (management.signals),
+плюс відбиток самого переліку користувачів.
+"""
+from __future__ import annotations
+
+import hashlib
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from management.models import Client, ManagerLevel
+from management.services.level_progression import (
+    build_progression_status,
+    get_next_level_requirements,
+    work_duration_days,
+)
+from management.services.manager_levels import _build_virtual_admin_level
+from management.services.visible_points import (
+    CONVERSION_RESULTS,
+    VISIBLE_POINTS_POLICY_VERSION,
+    compute_visible_points,
+    visible_points_sum_expr,
+)
+
+ROSTER_VERSION_CACHE_KEY = "management:roster_metrics:version"
+ROSTER_METRICS_CACHE_PREFIX = "management:roster_metrics"
+ROSTER_METRICS_CACHE_TTL = 300  # страховка для змін через QuerySet.update()
+
+
+def get_roster_version() -> int:
+    version = cache.get(ROSTER_VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(ROSTER_VERSION_CACHE_KEY, 1, timeout=None)
+        version = cache.get(ROSTER_VERSION_CACHE_KEY)
+    try:
+        return max(int(version), 1)
+    except (TypeError, ValueError):
+        cache.set(ROSTER_VERSION_CACHE_KEY, 1, timeout=None)
+        return 1
+
+
+def bump_roster_version() -> int:
+    current = get_roster_version()
+    try:
+        return int(cache.incr(ROSTER_VERSION_CACHE_KEY))
+    except Exception:
+        cache.set(ROSTER_VERSION_CACHE_KEY, current + 1, timeout=None)
+        return current + 1
+
+
+def _day_range(now=None):
+    local_now = timezone.localtime(now or timezone.now())
+    start = local_now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return start, start + timedelta(days=1)
+
+
+def _cache_key(users: list, day) -> str:
+    fingerprint = ",".join(
+        f"{u.pk}:{int(bool(u.is_staff))}{int(bool(getattr(u, 'is_superuser', False)))}"
+        for u in sorted(users, key=lambda item: item.pk)
+    )
+    digest = hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()[:16]
+    return f"{ROSTER_METRICS_CACHE_PREFIX}:{day.isoformat()}:{get_roster_version()}:{digest}"
+
+
+def _empty_metrics() -> dict:
+    return {
+        'points_today': 0,
+        'points_total': 0,
+        'lead_bonus_today': 0,
+        'lead_bonus_total': 0,
+        'processed_today': 0,
+        'processed_total': 0,
+        'conversions_total': 0,
+    }
+
+
+def compute_roster_metrics(users, *, now=None) -> dict[int, dict]:
+    """
+    Метрики для всіх ``users`` без кешу.
+
+    Returns:
+        {user_id: dict} з ключами get_user_stats (points_today, points_total,
+        lead_bonus_today, lead_bonus_total, processed_today, processed_total)
+        плюс conversions_total, level (ManagerLevel | None) і progression
+        (як get_progression_status).
+    """
+    users = list(users)
+    if not users:
+        return {}
+    user_ids = [u.pk for u in users]
+    today_start, today_end = _day_range(now)
+    today_q = Q(created_at__gte=today_start, created_at__lt=today_end)
+
+    metrics = {uid: _empty_metrics() for uid in user_ids}
+    rows = (
+        Client.objects.filter(owner_id__in=user_ids)
+        .order_by()
+        .values('owner_id')
+        .annotate(
+            processed_total=Count('id'),
+            processed_today=Count('id', filter=today_q),
+            conversions_total=Count('id', filter=Q(call_result__in=CONVERSION_RESULTS)),
+            points_total=Coalesce(visible_points_sum_expr(), 0),
+            points_today=Coalesce(visible_points_sum_expr(filter=today_q), 0),
+        )
+    )
+    for row in rows:
+        slot = metrics[row['owner_id']]
+        for key in ('processed_total', 'processed_today', 'conversions_total', 'points_total', 'points_today'):
+            slot[key] = int(row[key] or 0)
+
+    # visible-points-v2 без override: у БД дають 0, добираємо в Python.
+    pending = Client.objects.filter(
+        owner_id__in=user_ids,
+        points_override__isnull=True,
+        call_result_context__points_policy_version=VISIBLE_POINTS_POLICY_VERSION,
+    )
+    for client in pending:
+        points = compute_visible_points(client)
+        slot = metrics[client.owner_id]
+        slot['points_total'] += points
+        if today_start <= client.created_at < today_end:
+            slot['points_today'] += points
+
+    levels = {level.user_id: level for level in ManagerLevel.objects.filter(user_id__in=user_ids)}
+    for user in users:
+        slot = metrics[user.pk]
+        level = levels.get(user.pk)
+        if level is None and (getattr(user, 'is_superuser', False) or user.is_staff):
+            level = _build_virtual_admin_level(user)
+        slot['level'] = level
+        progression_metrics = None
+        if level and get_next_level_requirements(level.level):
+            progression_metrics = {
+                'total_conversions': slot['conversions_total'],
+                'total_processed_clients': slot['processed_total'],
+                'work_duration_days': work_duration_days(level),
+            }
+        slot['progression'] = build_progression_status(level, progression_metrics)
+    return metrics
+
+
+def get_roster_metrics(users, *, now=None) -> dict[int, dict]:
+    """Метрики складу з кешу на (день, версія складу); див. compute_roster_metrics."""
+    users = list(users)
+    if not users:
+        return {}
+    day = _day_range(now)[0].date()
+    key = _cache_key(users, day)
+    cached = cache.get(key)
+    if isinstance(cached, dict):
+        return cached
+    metrics = compute_roster_metrics(users, now=now)
+    cache.set(key, metrics, ROSTER_METRICS_CACHE_TTL)
+    return metrics
@@ -0,0 +1,88 @@
+"""
+Кеш метрик shell менеджменту (сайдбар/шапка на кожній сторінці).
+
+build_management_shell_metrics робить з десяток запитів (обробки, MOSAIC,
+передзвони, дублі, виплати) і викликається на кожен рендер, включно з
+HTMX-партіалами й полінгом. Тут — знімок метрик користувача в кеші
+``fragments``:
+
+- ключ на користувача (і на обсяг дублів: власні / всі для адміна);
+- у знімку лежить локальний день і глобальна версія; читання — один
+  get_many (знімок + глобальна версія);
+- сигнали (management.signals) видаляють знімок власника при зміні
+  Client/ClientFollowUp/NightlyScoreSnapshot/нарахувань/виплат, а зміни
+  DuplicateReview бампають глобальну версію (адмін бачить чергу всіх);
+- короткий TTL покриває перехід передзвонів «заплановано → час дзвонити →
+  пропущено» і розморожування нарахувань, які не є подіями в БД.
+"""
+from __future__ import annotations
+
+from django.core.cache import caches
+from django.utils import timezone
+
+SHELL_METRICS_CACHE_ALIAS = "fragments"
+SHELL_METRICS_CACHE_PREFIX = "management:shell_metrics"
+SHELL_METRICS_GLOBAL_VERSION_KEY = "management:shell_metrics:global_version"
+SHELL_METRICS_CACHE_TTL = 60
+SHELL_METRICS_SCOPES = ("own", "all")
+
+
+def _cache():
+    return caches[SHELL_METRICS_CACHE_ALIAS]
+
+
+def shell_metrics_key(user_id: int, scope: str) -> str:
+    return f"{SHELL_METRICS_CACHE_PREFIX}:{user_id}:{scope}"
+
+
+def _global_version(raw) -> int:
+    try:
+        return max(int(raw), 1)
+    except (TypeError, ValueError):
+        return 1
+
+
+def read_shell_metrics(user_id: int, scope: str) -> dict | None:
+    key = shell_metrics_key(user_id, scope)
+    found = _cache().get_many([key, SHELL_METRICS_GLOBAL_VERSION_KEY])
+    snapshot = found.get(key)
+    if not isinstance(snapshot, dict):
+        return None
+    if snapshot.get("day") != timezone.localdate().isoformat():
+        return None
+    if snapshot.get("global") != _global_version(found.get(SHELL_METRICS_GLOBAL_VERSION_KEY)):
+        return None
+    return snapshot.get("metrics")
+
+
+def store_shell_metrics(user_id: int, scope: str, metrics: dict) -> None:
+    cache = _cache()
+    snapshot = {
+        "day": timezone.localdate().isoformat(),
+        "global": _global_version(cache.get(SHELL_METRICS_GLOBAL_VERSION_KEY)),
+        "metrics": metrics,
+    }
+    cache.set(shell_metrics_key(user_id, scope), snapshot, SHELL_METRICS_CACHE_TTL)
+
+
+def invalidate_shell_metrics(*user_ids) -> None:
+    keys = [
+        shell_metrics_key(user_id, scope)
+        for user_id in {uid for uid in user_ids if uid}
+        for scope in SHELL_METRICS_SCOPES
+    ]
+    if keys:
+        _cache().delete_many(keys)
+
+
+def bump_shell_metrics_global_version() -> None:
+    cache = _cache()
+    cache.add(SHELL_METRICS_GLOBAL_VERSION_KEY, 1, timeout=None)
+    try:
+        cache.incr(SHELL_METRICS_GLOBAL_VERSION_KEY)
+    except Exception:
+        cache.set(
+            SHELL_METRICS_GLOBAL_VERSION_KEY,
+            _global_version(cache.get(SHELL_METRICS_GLOBAL_VERSION_KEY)) + 1,
+            timeout=None,
+        )
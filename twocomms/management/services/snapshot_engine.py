@@ -0,0 +1,309 @@
+"""
+Рушій нічних снапшотів MOSAIC: спільні денні агрегати, пропуск незмінених
+днів і паралельний backfill діапазону дат.
+
+``persist_nightly_snapshot`` рахує один снапшот (owner, day). Тут навколо
+нього три речі:
+
+1. Спільні агрегати дня. Конфіг, readiness, ManagerDayStatus, backlog
+   дублікатів, сигнали дзвінків і здоров'я телефонії читаються один раз на
+   день для всіх менеджерів (``SnapshotDayContext``), а вхідні дані кожного
+   менеджера за день — клієнти, передзвони, дзвінки, відвантаження, звіти
+   тощо — зводяться кількома GROUP BY-запитами (``collect_day_inputs``). Ті
+   самі рядки дають відбиток (``day_input_fingerprints``) і йдуть у
+   ``get_stats_payload`` замість його запитів по кожному менеджеру.
+2. Пропуск незмінених owner-day: якщо відбиток входів збігається з тим,
+   що збережений у снапшоті (payload["input_fingerprint"]), снапшот не
+   перераховується. Поточний і майбутні дні рахуються завжди (freshness).
+3. Backfill діапазону в пулі процесів: менеджери діляться на чанки, кожен
+   воркер проходить свої дні по порядку (stability залежить від снапшоту
+   попереднього дня того ж менеджера, тож дні одного менеджера не
+   паралелізуються).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.models import Count, Max, Min, Q, Sum
+from django.utils import timezone
+
+from management.models import (
+    Client,
+    ClientFollowUp,
+    ClientInteractionAttempt,
+    CallRecord,
+    CommandRunLog,
+    CommercialOfferEmailLog,
+    FollowUpEvent,
+    ManagementDailyActivity,
+    NightlyScoreSnapshot,
+    ReasonSignal,
+    Report,
+    Shop,
+    ShopCommunication,
+    ShopShipment,
+    VerifiedWorkEvent,
+)
+from management.services.snapshots import (
+    SnapshotDayContext,
+    build_daily_stats_range,
+    build_snapshot_day_context,
+    persist_nightly_snapshot,
+)
+
+
+# Бампати, коли змінюється формула/набір входів — усі снапшоти перерахуються.
+ENGINE_VERSION = 1
+
+
+@dataclass
+class SnapshotRunStats:
+    computed: int = 0
+    skipped: int = 0
+    owner_days: int = 0
+    computed_keys: list[tuple[int, str]] = field(default_factory=list)
+
+    def merge(self, other: "SnapshotRunStats") -> "SnapshotRunStats":
+        self.computed += other.computed
+        self.skipped += other.skipped
+        self.owner_days += other.owner_days
+        self.computed_keys.extend(other.computed_keys)
+        return self
+
+
+def iter_dates(date_from: date, date_to: date) -> list[date]:
+    return [date_from + timedelta(days=offset) for offset in range((date_to - date_from).days + 1)]
+
+
+def _input_specs(day: date):
+    """(назва, queryset, поле власника, агрегати) — усе, що читають снапшоти за день."""
+    stats_range = build_daily_stats_range(day)
+    start, end = stats_range.start, stats_range.end
+    now = timezone.now()
+    return (
+        ("clients", Client.objects.filter(created_at__gte=start, created_at__lt=end), "owner_id",
+         {"n": Count("id"), "id": Max("id"), "upd": Max("updated_at")}),
+        ("followups", ClientFollowUp.objects.filter(due_date=day), "owner_id",
+         {"n": Count("id"), "id": Max("id"), "closed": Max("closed_at"), "due": Max("due_at"),
+          **{status: Count("pk", filter=Q(status=status)) for status in ClientFollowUp.Status.values},
+          "overdue": Count("pk", filter=Q(status=ClientFollowUp.Status.OPEN) & (
+              Q(grace_until__lt=now) | Q(grace_until__isnull=True, due_at__lt=now)
+          ))}),
+        ("followup_events", FollowUpEvent.objects.filter(occurred_at__gte=start, occurred_at__lt=end), "owner_id",
+         {"n": Count("id"), "id": Max("id")}),
+        ("activity", ManagementDailyActivity.objects.filter(date=day), "user_id",
+         {"sec": Sum("active_seconds"), "upd": Max("updated_at")}),
+        ("reports", Report.objects.filter(created_at__gte=start, created_at__lt=end), "owner_id",
+         {"n": Count("id"), "id": Max("id"), "first": Min("created_at")}),
+        ("cp", CommercialOfferEmailLog.objects.filter(created_at__gte=start, created_at__lt=end), "owner_id",
+         {"n": Count("id"), "id": Max("id")}),
+        ("shops", Shop.objects.all(), "created_by_id",
+         {"n": Count("id"), "upd": Max("updated_at")}),
+        ("shipments", ShopShipment.objects.filter(created_at__gte=start, created_at__lt=end), "created_by_id",
+         {"n": Count("id"), "upd": Max("updated_at"), "amount": Sum("invoice_total_amount")}),
+        ("communications", ShopCommunication.objects.filter(created_at__gte=start, created_at__lt=end), "created_by_id",
+         {"n": Count("id"), "id": Max("id")}),
+        ("calls", CallRecord.objects.filter(started_at__gte=start, started_at__lt=end), "manager_id",
+         {"n": Count("id"), "upd": Max("updated_at")}),
+        ("interactions", ClientInteractionAttempt.objects.filter(created_at__gte=start, created_at__lt=end), "manager_id",
+         {"n": Count("id"), "id": Max("id")}),
+        ("reasons", ReasonSignal.objects.filter(captured_at__gte=start, captured_at__lt=end), "owner_id",
+         {"n": Count("id"), "id": Max("id")}),
+        ("verified", VerifiedWorkEvent.objects.filter(verified_at__gte=start, verified_at__lt=end), "owner_id",
+         {"n": Count("id"), "id": Max("id")}),
+    )
+
+
+def _invoice_inputs(day: date, owner_ids: list[int]) -> dict[int, dict]:
+    try:
+        from orders.models import WholesaleInvoice
+    except Exception:
+        return {}
+    stats_range = build_daily_stats_range(day)
+    rows = (
+        WholesaleInvoice.objects.filter(
+            created_by_id__in=owner_ids,
+            created_at__gte=stats_range.start,
+            created_at__lt=stats_range.end,
+        )
+        .order_by()
+        .values("created_by_id")
+        .annotate(n=Count("id"), upd=Max("updated_at"))
+    )
+    return {row.pop("created_by_id"): row for row in rows}
+
+
+def _context_fingerprint(context: SnapshotDayContext) -> dict:
+    cfg = context.cfg
+    return {
+        "engine": ENGINE_VERSION,
+        "cfg_updated": cfg.updated_at.isoformat() if cfg and getattr(cfg, "updated_at", None) else "",
+        "readiness": context.readiness,
+    }
+
+
+def collect_day_inputs(day: date, owner_ids) -> dict[int, dict]:
+    """Входи снапшоту кожного менеджера за день (кілька GROUP BY на всіх)."""
+    owner_ids = list(owner_ids)
+    inputs: dict[int, dict] = {owner_id: {} for owner_id in owner_ids}
+    for name, queryset, owner_field, aggregates in _input_specs(day):
+        rows = (
+            queryset.filter(**{f"{owner_field}__in": owner_ids})
+            .order_by()
+            .values(owner_field)
+            .annotate(**aggregates)
+        )
+        for row in rows:
+            owner_id = row.pop(owner_field)
+            inputs[owner_id][name] = row
+    for owner_id, row in _invoice_inputs(day, owner_ids).items():
+        inputs[owner_id]["invoices"] = row
+    return inputs
+
+
+def day_input_fingerprints(day: date, owner_ids, context: SnapshotDayContext) -> dict[int, str]:
+    """Відбиток входів снапшоту кожного менеджера за день (``context.owner_inputs``)."""
+    owner_ids = list(owner_ids)
+    if not context.owner_inputs:
+        context.owner_inputs = collect_day_inputs(day, owner_ids)
+    inputs = context.owner_inputs
+
+    shared = _context_fingerprint(context)
+    fingerprints = {}
+    for owner_id in owner_ids:
+        status = context.day_statuses.get(owner_id)
+        payload = {
+            "shared": shared,
+            "inputs": inputs[owner_id],
+            "day_status": status.updated_at if status else None,
+            "duplicates": context.duplicate_backlog.get(owner_id, 0),
+        }
+        raw = json.dumps(payload, sort_keys=True, default=str)
+        fingerprints[owner_id] = hashlib.sha1(raw.encode("utf-8")).hexdigest()
+    return fingerprints
+
+
+def _previous_mosaic(owner_ids: list[int], before: date) -> dict[int, str]:
+    rows = (
+        NightlyScoreSnapshot.objects.filter(owner_id__in=owner_ids, snapshot_date__lt=before)
+        .order_by("owner_id", "-snapshot_date")
+        .values_list("owner_id", "mosaic_score")
+    )
+    latest: dict[int, str] = {}
+    for owner_id, mosaic in rows:
+        latest.setdefault(owner_id, str(mosaic))
+    return latest
+
+
+def run_snapshot_chunk(
+    *,
+    owner_ids,
+    dates: list[date],
+    job_run: CommandRunLog | None = None,
+    force: bool = False,
+) -> SnapshotRunStats:
+    """Снапшоти для ``owner_ids`` за ``dates`` (по порядку дат) в поточному процесі."""
+    stats = SnapshotRunStats()
+    owners = list(get_user_model().objects.filter(id__in=list(owner_ids)).select_related("userprofile").order_by("id"))
+    if not owners or not dates:
+        return stats
+    ids = [owner.id for owner in owners]
+    dates = sorted(dates)
+    today = timezone.localdate()
+    # stability снапшоту залежить від mosaic попереднього — входить у відбиток.
+    prev_mosaic = _previous_mosaic(ids, dates[0])
+
+    day_inputs: dict[date, dict[int, dict]] = {}
+    for day in dates:
+        context = build_snapshot_day_context(day, ids)
+        previous_day = day - timedelta(days=1)
+        context.prev_owner_inputs = day_inputs.pop(previous_day, None) or collect_day_inputs(previous_day, ids)
+        context.owner_inputs = day_inputs[day] = collect_day_inputs(day, ids)
+        fingerprints = day_input_fingerprints(day, ids, context)
+        existing = {
+            snapshot.owner_id: snapshot
+            for snapshot in NightlyScoreSnapshot.objects.filter(owner_id__in=ids, snapshot_date=day).only(
+                "id", "owner_id", "mosaic_score", "payload"
+            )
+        }
+        for owner in owners:
+            stats.owner_days += 1
+            fingerprint = hashlib.sha1(
+                f"{fingerprints[owner.id]}:{prev_mosaic.get(owner.id, '')}".encode("utf-8")
+            ).hexdigest()
+            current = existing.get(owner.id)
+            if (
+                not force
+                and day < today
+                and current is not None
+                and (current.payload or {}).get("input_fingerprint") == fingerprint
+            ):
+                stats.skipped += 1
+                prev_mosaic[owner.id] = str(current.mosaic_score)
+                continue
+            snapshot = persist_nightly_snapshot(
+                owner=owner,
+                snapshot_date=day,
+                job_run=job_run,
+                context=context,
+                input_fingerprint=fingerprint,
+            )
+            stats.computed += 1
+            stats.computed_keys.append((owner.id, day.isoformat()))
+            prev_mosaic[owner.id] = str(snapshot.mosaic_score)
+    return stats
+
+
+def _init_worker():
+    import django
+
+    django.setup()
+
+
+def _run_chunk_in_worker(owner_ids: list[int], date_isos: list[str], job_run_id: int | None, force: bool) -> SnapshotRunStats:
+    job_run = CommandRunLog.objects.filter(pk=job_run_id).first() if job_run_id else None
+    try:
+        return run_snapshot_chunk(
+            owner_ids=owner_ids,
+            dates=[date.fromisoformat(value) for value in date_isos],
+            job_run=job_run,
+            force=force,
+        )
+    finally:
+        connections.close_all()
+
+
+def run_nightly_snapshots(
+    *,
+    owner_ids,
+    dates: list[date],
+    job_run: CommandRunLog | None = None,
+    workers: int = 1,
+    force: bool = False,
+) -> SnapshotRunStats:
+    """Снапшоти для всіх owner × dates; ``workers > 1`` — пул процесів по чанках менеджерів."""
+    owner_ids = sorted(set(owner_ids))
+    workers = max(1, min(int(workers or 1), len(owner_ids) or 1))
+    if workers == 1:
+        return run_snapshot_chunk(owner_ids=owner_ids, dates=dates, job_run=job_run, force=force)
+
+    chunks = [owner_ids[index::workers] for index in range(workers)]
+    date_isos = [day.isoformat() for day in sorted(dates)]
+    # Дочірні процеси відкривають власні з'єднання; успадкований сокет ділити не можна.
+    connections.close_all()
+    stats = SnapshotRunStats()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = [
+            pool.submit(_run_chunk_in_worker, chunk, date_isos, job_run.pk if job_run else None, force)
+            for chunk in chunks
+            if chunk
+        ]
+        for future in futures:
+            stats.merge(future.result())
+    return stats
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+from dataclasses import dataclass, field
 from datetime import date, datetime, time, timedelta
 from decimal import Decimal, ROUND_HALF_UP
 from typing import Any
 
+from django.db.models import Count
 from django.utils import timezone
 
 from management.models import (
@@ -26,7 +28,12 @@ from management.services.score import (
     compute_mosaic,
     compute_score_confidence,
 )
-from management.services.telephony import build_call_quality_signal, build_telephony_health_summary
+from management.services.telephony import (
+    build_call_quality_signal,
+    build_call_quality_signals,
+    build_telephony_health_summaries,
+    build_telephony_health_summary,
+)
 from management.services.trust import (
     classify_confidence_band,
     compute_dampener,
@@ -70,6 +77,29 @@ def _clamp01(value) -> Decimal:
     return _quantize(max(Decimal("0"), min(Decimal("1"), _to_decimal(value))))
 
 
+@dataclass
+class SnapshotDayContext:
+    """Спільні для всіх менеджерів входи одного дня (див. services.snapshot_engine).
+
+    Рахуються один раз на день замість окремих запитів на кожного менеджера.
+    ``owner_inputs`` — рядки GROUP BY за день по менеджерах (передзвони, звіти,
+    відвантаження, …), з яких snapshot_engine будує відбиток; ті самі рядки
+    (і ``prev_owner_inputs`` за попередній день) йдуть у ``get_stats_payload``
+    замість повторних запитів.
+    """
+
+    snapshot_date: date
+    cfg: ManagementStatsConfig | None
+    versioned: dict[str, Any]
+    readiness: dict[str, str]
+    day_statuses: dict[int, ManagerDayStatus] = field(default_factory=dict)
+    duplicate_backlog: dict[int, int] = field(default_factory=dict)
+    call_quality: dict[int, dict] = field(default_factory=dict)
+    telephony_health: dict[int, dict] = field(default_factory=dict)
+    owner_inputs: dict[int, dict] = field(default_factory=dict)
+    prev_owner_inputs: dict[int, dict] = field(default_factory=dict)
+
+
 def build_daily_stats_range(snapshot_date: date) -> StatsRange:
     tz = timezone.get_current_timezone()
     start = timezone.make_aware(datetime.combine(snapshot_date, time.min), tz)
@@ -195,8 +225,9 @@ def _compute_confidence_inputs(
     }
 
 
-def _working_day_factor(owner, snapshot_date: date) -> Decimal:
-    status = ManagerDayStatus.objects.filter(owner=owner, day=snapshot_date).first()
+def _working_day_factor(owner, snapshot_date: date, *, status: ManagerDayStatus | None = None) -> Decimal:
+    if status is None:
+        status = ManagerDayStatus.objects.filter(owner=owner, day=snapshot_date).first()
     if not status:
         return Decimal("1.00")
     return _to_decimal(status.capacity_factor, default="1.00").quantize(TWO_PLACES, rounding=ROUND_HALF_UP)
@@ -297,26 +328,74 @@ def _incident_keys(*, summary: dict[str, Any], freshness_seconds: int, duplicate
     return incidents
 
 
-def build_shadow_score_payload(*, owner, snapshot_date: date) -> dict[str, Any]:
+def build_snapshot_day_context(snapshot_date: date, owner_ids=None) -> SnapshotDayContext:
     cfg = ManagementStatsConfig.objects.filter(pk=1).first()
-    versioned = get_management_config(cfg)
+    context = SnapshotDayContext(
+        snapshot_date=snapshot_date,
+        cfg=cfg,
+        versioned=get_management_config(cfg),
+        readiness=get_component_readiness_map(),
+    )
+    if owner_ids is not None:
+        owner_ids = list(owner_ids)
+        context.day_statuses = {
+            status.owner_id: status
+            for status in ManagerDayStatus.objects.filter(owner_id__in=owner_ids, day=snapshot_date)
+        }
+        context.duplicate_backlog = dict(
+            DuplicateReview.objects.filter(owner_id__in=owner_ids, status=DuplicateReview.Status.OPEN)
+            .order_by()
+            .values("owner_id")
+            .annotate(total=Count("id"))
+            .values_list("owner_id", "total")
+        )
+        vc_window, vc_target = _call_quality_targets(context.versioned)
+        context.call_quality = build_call_quality_signals(
+            owner_ids, snapshot_date, window_days=vc_window, target_meaningful=vc_target
+        )
+        context.telephony_health = build_telephony_health_summaries(owner_ids)
+    return context
+
+
+def _call_quality_targets(versioned) -> tuple[int, int]:
+    telephony_cfg = (versioned.get("telephony_config") or {}) if isinstance(versioned, dict) else {}
+    vc_window = int(telephony_cfg.get("vc_window_days", 30) or 30)
+    vc_target = int(telephony_cfg.get("vc_target_meaningful_calls", 10) or 10)
+    return vc_window, vc_target
+
+
+def build_shadow_score_payload(*, owner, snapshot_date: date, context: SnapshotDayContext | None = None) -> dict[str, Any]:
+    if context is None:
+        context = build_snapshot_day_context(snapshot_date)
+        day_status = _manager_day_status(owner, snapshot_date)
+        duplicate_backlog = DuplicateReview.objects.filter(owner=owner, status=DuplicateReview.Status.OPEN).count()
+    else:
+        day_status = context.day_statuses.get(owner.id)
+        duplicate_backlog = context.duplicate_backlog.get(owner.id, 0)
+    cfg = context.cfg
+    versioned = context.versioned
     stats_range = build_daily_stats_range(snapshot_date)
-    stats_payload = get_stats_payload(user=owner, range_current=stats_range, include_shadow=False)
+    stats_payload = get_stats_payload(
+        user=owner,
+        range_current=stats_range,
+        include_shadow=False,
+        day_inputs=context.owner_inputs.get(owner.id) if context.owner_inputs else None,
+        prev_day_inputs=context.prev_owner_inputs.get(owner.id) if context.prev_owner_inputs else None,
+    )
     summary = stats_payload.get("summary") or {}
     sources = stats_payload.get("sources") or []
-    readiness = get_component_readiness_map()
+    readiness = context.readiness
 
     processed = max(0, int(summary.get("processed") or 0))
     orders = max(0, int((summary.get("shops") or {}).get("full") or 0))
     revenue = _to_decimal((summary.get("invoices") or {}).get("amount") or "0")
-    day_status = _manager_day_status(owner, snapshot_date)
 
-    telephony_cfg = (versioned.get("telephony_config") or {}) if isinstance(versioned, dict) else {}
-    vc_window = int(telephony_cfg.get("vc_window_days", 30) or 30)
-    vc_target = int(telephony_cfg.get("vc_target_meaningful_calls", 10) or 10)
-    call_quality = build_call_quality_signal(
-        owner, snapshot_date, window_days=vc_window, target_meaningful=vc_target
-    )
+    call_quality = context.call_quality.get(owner.id)
+    if call_quality is None:
+        vc_window, vc_target = _call_quality_targets(versioned)
+        call_quality = build_call_quality_signal(
+            owner, snapshot_date, window_days=vc_window, target_meaningful=vc_target
+        )
 
     axes = {
         "result": compute_ewr(orders=orders, contacts_processed=processed, revenue=revenue),
@@ -342,9 +421,8 @@ def build_shadow_score_payload(*, owner, snapshot_date: date) -> dict[str, Any]:
         provisional_mosaic=base_mosaic,
     )
     score_confidence = compute_score_confidence(**confidence_inputs)
-    working_day_factor = _working_day_factor(owner, snapshot_date)
-    duplicate_backlog = DuplicateReview.objects.filter(owner=owner, status=DuplicateReview.Status.OPEN).count()
-    telephony_health = build_telephony_health_summary(owner=owner)
+    working_day_factor = _working_day_factor(owner, snapshot_date, status=day_status) if day_status else Decimal("1.00")
+    telephony_health = context.telephony_health.get(owner.id) or build_telephony_health_summary(owner=owner)
     gate_level, gate_score = compute_gate_level(
         paid_orders=int((summary.get("invoices") or {}).get("paid") or 0),
         approved_orders=int((summary.get("invoices") or {}).get("approved") or 0),
@@ -537,12 +615,21 @@ def build_shadow_score_payload(*, owner, snapshot_date: date) -> dict[str, Any]:
     }
 
 
-def persist_nightly_snapshot(*, owner, snapshot_date: date, job_run: CommandRunLog | None = None) -> NightlyScoreSnapshot:
-    shadow_payload = build_shadow_score_payload(owner=owner, snapshot_date=snapshot_date)
+def persist_nightly_snapshot(
+    *,
+    owner,
+    snapshot_date: date,
+    job_run: CommandRunLog | None = None,
+    context: SnapshotDayContext | None = None,
+    input_fingerprint: str = "",
+) -> NightlyScoreSnapshot:
+    shadow_payload = build_shadow_score_payload(owner=owner, snapshot_date=snapshot_date, context=context)
     from management.services.analytics_v7 import build_shadow_score_payload_v7
 
     shadow_payload["payload"] = dict(shadow_payload["payload"] or {})
     shadow_payload["payload"]["v7"] = build_shadow_score_payload_v7(owner=owner, snapshot_date=snapshot_date)
+    if input_fingerprint:
+        shadow_payload["payload"]["input_fingerprint"] = input_fingerprint
     snapshot, _ = NightlyScoreSnapshot.objects.update_or_create(
         owner=owner,
         snapshot_date=snapshot_date,
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from datetime import timedelta
+from datetime import datetime, timedelta
 
 from django.db.models import Avg, Count, Q
 from django.utils import timezone
@@ -33,21 +33,14 @@ def build_call_quality_signal(
     Якщо аналізів ще немає — vc_real = call_presence (мʼяко, поки черга догоняє).
     """
     if not owner or not as_of_date:
-        return {"has_calls": False, "meaningful_calls": 0, "analyzed_count": 0,
-                "qa_quality": None, "call_presence": 0.0, "vc_real": None}
-    start = as_of_date - timedelta(days=max(0, window_days - 1))
-    # Діапазон aware datetime замість __date (на проді MySQL CONVERT_TZ→NULL).
-    from datetime import datetime as _dt
-    tz = timezone.get_current_timezone()
-    start_dt = timezone.make_aware(_dt.combine(start, _dt.min.time()), tz)
-    end_dt = timezone.make_aware(_dt.combine(as_of_date + timedelta(days=1), _dt.min.time()), tz)
+        return _call_quality_signal(0, None, 0, target_meaningful)
+    start_dt, end_dt = _call_quality_window(as_of_date, window_days)
     base_qs = CallRecord.objects.filter(
         manager=owner, created_at__gte=start_dt, created_at__lt=end_dt
     )
     meaningful = base_qs.filter(duration_seconds__gte=MEANINGFUL_CALL_SECONDS).count()
     if meaningful <= 0:
-        return {"has_calls": False, "meaningful_calls": 0, "analyzed_count": 0,
-                "qa_quality": None, "call_presence": 0.0, "vc_real": None}
+        return _call_quality_signal(0, None, 0, target_meaningful)
 
     agg = CallAIAnalysis.objects.filter(
         status=CallAIAnalysis.Status.DONE,
@@ -55,8 +48,67 @@ def build_call_quality_signal(
         call_record__created_at__gte=start_dt,
         call_record__created_at__lt=end_dt,
     ).aggregate(avg=Avg("overall_score"), n=Count("id"))
-    analyzed_count = int(agg["n"] or 0)
-    qa_quality = (float(agg["avg"]) / 100.0) if agg["avg"] is not None else None
+    return _call_quality_signal(meaningful, agg["avg"], agg["n"], target_meaningful)
+
+
+def build_call_quality_signals(
+    owner_ids,
+    as_of_date,
+    *,
+    window_days: int = 30,
+    target_meaningful: int = 10,
+) -> dict[int, dict]:
+    """``build_call_quality_signal`` для багатьох менеджерів двома GROUP BY-запитами."""
+    owner_ids = list(owner_ids)
+    start_dt, end_dt = _call_quality_window(as_of_date, window_days)
+    meaningful = dict(
+        CallRecord.objects.filter(
+            manager_id__in=owner_ids,
+            created_at__gte=start_dt,
+            created_at__lt=end_dt,
+            duration_seconds__gte=MEANINGFUL_CALL_SECONDS,
+        )
+        .order_by()
+        .values("manager_id")
+        .annotate(n=Count("id"))
+        .values_list("manager_id", "n")
+    )
+    analyses = {
+        row["call_record__manager_id"]: row
+        for row in CallAIAnalysis.objects.filter(
+            status=CallAIAnalysis.Status.DONE,
+            call_record__manager_id__in=[owner_id for owner_id in owner_ids if meaningful.get(owner_id)],
+            call_record__created_at__gte=start_dt,
+            call_record__created_at__lt=end_dt,
+        )
+        .order_by()
+        .values("call_record__manager_id")
+        .annotate(avg=Avg("overall_score"), n=Count("id"))
+    }
+    signals = {}
+    for owner_id in owner_ids:
+        agg = analyses.get(owner_id) or {}
+        signals[owner_id] = _call_quality_signal(
+            meaningful.get(owner_id, 0), agg.get("avg"), agg.get("n"), target_meaningful
+        )
+    return signals
+
+
+def _call_quality_window(as_of_date, window_days: int):
+    start = as_of_date - timedelta(days=max(0, window_days - 1))
+    # Діапазон aware datetime замість __date (на проді MySQL CONVERT_TZ→NULL).
+    tz = timezone.get_current_timezone()
+    start_dt = timezone.make_aware(datetime.combine(start, datetime.min.time()), tz)
+    end_dt = timezone.make_aware(datetime.combine(as_of_date + timedelta(days=1), datetime.min.time()), tz)
+    return start_dt, end_dt
+
+
+def _call_quality_signal(meaningful: int, avg_score, analyzed, target_meaningful: int) -> dict:
+    if meaningful <= 0:
+        return {"has_calls": False, "meaningful_calls": 0, "analyzed_count": 0,
+                "qa_quality": None, "call_presence": 0.0, "vc_real": None}
+    analyzed_count = int(analyzed or 0)
+    qa_quality = (float(avg_score) / 100.0) if avg_score is not None else None
 
     target = max(1, int(target_meaningful or 10))
     call_presence = min(1.0, meaningful / float(target))
@@ -91,19 +143,55 @@ def _resolve_freshness_seconds(latest: TelephonyHealthSnapshot | None) -> int:
 
 
 def build_telephony_health_summary(*, owner=None) -> dict:
-    qs = TelephonyHealthSnapshot.objects.order_by("-snapshot_at")
-    latest = qs.first()
+    latest = TelephonyHealthSnapshot.objects.order_by("-snapshot_at").first()
     config = get_management_config().get("telephony_config") or {}
-    thresholds = config.get("health_thresholds") or {}
     meaningful_seconds = int(config.get("meaningful_call_seconds") or 30)
     owner_calls = CallRecord.objects.filter(manager=owner) if owner else CallRecord.objects.all()
     matched_calls = owner_calls.exclude(manager__isnull=True).count()
     total_calls = owner_calls.count()
-    meaningful_calls = owner_calls.filter(duration_seconds__gte=meaningful_seconds).count()
+    counts = {
+        "matched": matched_calls,
+        "total": total_calls,
+        "meaningful": owner_calls.filter(duration_seconds__gte=meaningful_seconds).count(),
+        "missing_recording": owner_calls.filter(recording_url="").count() if total_calls > 0 else 0,
+    }
+    return _telephony_health(latest, config, counts)
+
+
+def build_telephony_health_summaries(owner_ids) -> dict[int, dict]:
+    """``build_telephony_health_summary`` для багатьох менеджерів одним GROUP BY."""
+    owner_ids = list(owner_ids)
+    latest = TelephonyHealthSnapshot.objects.order_by("-snapshot_at").first()
+    config = get_management_config().get("telephony_config") or {}
+    meaningful_seconds = int(config.get("meaningful_call_seconds") or 30)
+    rows = {
+        row.pop("manager_id"): row
+        for row in CallRecord.objects.filter(manager_id__in=owner_ids)
+        .order_by()
+        .values("manager_id")
+        .annotate(
+            total=Count("id"),
+            meaningful=Count("id", filter=Q(duration_seconds__gte=meaningful_seconds)),
+            missing_recording=Count("id", filter=Q(recording_url="")),
+        )
+    }
+    summaries = {}
+    for owner_id in owner_ids:
+        row = rows.get(owner_id) or {"total": 0, "meaningful": 0, "missing_recording": 0}
+        summaries[owner_id] = _telephony_health(latest, config, {**row, "matched": row["total"]})
+    return summaries
+
+
+def _telephony_health(latest: TelephonyHealthSnapshot | None, config: dict, counts: dict) -> dict:
+    thresholds = config.get("health_thresholds") or {}
+    meaningful_seconds = int(config.get("meaningful_call_seconds") or 30)
+    total_calls = int(counts["total"])
+    matched_calls = int(counts["matched"])
+    meaningful_calls = int(counts["meaningful"])
     missing_recording_ratio = (
         0.0
         if total_calls <= 0
-        else round(owner_calls.filter(recording_url="").count() / total_calls, 4)
+        else round(int(counts["missing_recording"]) / total_calls, 4)
     )
     unmatched_ratio = 0.0 if total_calls <= 0 else round((total_calls - matched_calls) / total_calls, 4)
     provider_status = latest.status if latest else TelephonyHealthSnapshot.Status.DEGRADED
@@ -93,7 +93,12 @@ def client_visible_points_value(client: Client) -> int:
     return legacy_points_value_for_result(client.call_result)
 
 
-def visible_points_sum_expr() -> Sum:
+def visible_points_sum_expr(filter: Q | None = None) -> Sum:
+    """Сума видимих балів у БД.
+
+    Рядки visible-points-v2 без points_override дають тут 0 — їх бали
+    рахуються в Python через ``compute_visible_points``.
+    """
     legacy_case = Case(
         *[When(call_result=key, then=Value(int(value))) for key, value in LEGACY_POINTS.items()],
         default=Value(0),
@@ -105,7 +110,8 @@ def visible_points_sum_expr() -> Sum:
             When(call_result_context__points_policy_version=VISIBLE_POINTS_POLICY_VERSION, then=Value(0)),
             default=legacy_case,
             output_field=IntegerField(),
-        )
+        ),
+        filter=filter,
     )
 
 
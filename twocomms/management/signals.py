@@ -0,0 +1,80 @@
+"""
+Сигнали management: інвалідація кешів і підтримка індексу дублів.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import (
+    Client,
+    ClientFollowUp,
+    DedupeIndexEntry,
+    DuplicateReview,
+    ManagementLead,
+    ManagerCommissionAccrual,
+    ManagerLevel,
+    ManagerPayoutRequest,
+    NightlyScoreSnapshot,
+)
+from .services.dedupe_index import INDEXED_FIELDS, index_client, index_lead, unindex
+from .services.roster_metrics import bump_roster_version
+from .services.shell_metrics import bump_shell_metrics_global_version, invalidate_shell_metrics
+
+
+@receiver([post_save, post_delete], sender=Client)
+@receiver([post_save, post_delete], sender=ManagerLevel)
+def invalidate_roster_metrics(sender, **kwargs):
+    """
+    Бали/кількість клієнтів/рівні змінились — метрики складу застаріли.
+
+    Бампаємо одразу (щоб наступне читання в цьому ж запиті не взяло кеш)
+    і ще раз після коміту (щоб паралельне читання до коміту не закешувало
+    старі дані під новою версією).
+    """
+    bump_roster_version()
+    transaction.on_commit(bump_roster_version)
+
+
+@receiver([post_save, post_delete], sender=Client)
+@receiver([post_save, post_delete], sender=ClientFollowUp)
+@receiver([post_save, post_delete], sender=NightlyScoreSnapshot)
+@receiver([post_save, post_delete], sender=ManagerCommissionAccrual)
+@receiver([post_save, post_delete], sender=ManagerPayoutRequest)
+def invalidate_owner_shell_metrics(sender, instance, **kwargs):
+    owner_id = instance.owner_id
+    invalidate_shell_metrics(owner_id)
+    transaction.on_commit(lambda: invalidate_shell_metrics(owner_id))
+
+
+@receiver([post_save, post_delete], sender=DuplicateReview)
+def invalidate_duplicate_shell_metrics(sender, **kwargs):
+    bump_shell_metrics_global_version()
+    transaction.on_commit(bump_shell_metrics_global_version)
+
+
+def _touches_index(update_fields) -> bool:
+    return update_fields is None or bool(INDEXED_FIELDS.intersection(update_fields))
+
+
+@receiver(post_save, sender=Client)
+def reindex_client(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw or not _touches_index(update_fields):
+        return
+    index_client(instance)
+
+
+@receiver(post_save, sender=ManagementLead)
+def reindex_lead(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw or not _touches_index(update_fields):
+        return
+    index_lead(instance)
+
+
+@receiver(post_delete, sender=Client)
+def unindex_client(sender, instance, **kwargs):
+    unindex(DedupeIndexEntry.Kind.CLIENT, instance.pk)
+
+
+@receiver(post_delete, sender=ManagementLead)
+def unindex_lead(sender, instance, **kwargs):
+    unindex(DedupeIndexEntry.Kind.LEAD, instance.pk)
@@ -1042,7 +1042,23 @@ def _ensure_shadow_snapshots_for_range(*, user, range_current: StatsRange) -> No
         persist_nightly_snapshot(owner=user, snapshot_date=snapshot_date)
 
 
-def get_stats_payload(*, user, range_current: StatsRange, include_shadow: bool = True) -> dict[str, Any]:
+def get_stats_payload(
+    *,
+    user,
+    range_current: StatsRange,
+    include_shadow: bool = True,
+    day_inputs: dict[str, dict] | None = None,
+    prev_day_inputs: dict[str, dict] | None = None,
+) -> dict[str, Any]:
+    """Статистика менеджера за період.
+
+    ``day_inputs`` / ``prev_day_inputs`` — агрегати дня і попереднього дня, вже
+    пораховані для всіх менеджерів (``snapshot_engine.collect_day_inputs``):
+    передзвони, перший звіт і відвантаження тоді беруться з них, без окремих
+    запитів на менеджера. Враховуються лише для періоду в один день.
+    """
+    if range_current.start_date != range_current.end_date:
+        day_inputs = prev_day_inputs = None
     cfg = _get_or_build_config()
     tz = timezone.get_current_timezone()
     prev_r = previous_range(range_current)
@@ -1214,15 +1230,25 @@ def get_stats_payload(*, user, range_current: StatsRange, include_shadow: bool =
     # Follow-ups
     today_local = timezone.localdate()
     fu_qs = ClientFollowUp.objects.filter(owner=user, due_date__gte=range_current.start_date, due_date__lte=range_current.end_date)
-    fu_total = fu_qs.count()
-    fu_missed = fu_qs.filter(status=ClientFollowUp.Status.MISSED).count()
-    fu_done = fu_qs.filter(status=ClientFollowUp.Status.DONE).count()
-    fu_rescheduled = fu_qs.filter(status=ClientFollowUp.Status.RESCHEDULED).count()
-    fu_cancelled = fu_qs.filter(status=ClientFollowUp.Status.CANCELLED).count()
-    fu_open = fu_qs.filter(status=ClientFollowUp.Status.OPEN).count()
-    fu_overdue_open = fu_qs.filter(status=ClientFollowUp.Status.OPEN).filter(
-        Q(grace_until__lt=timezone.now()) | Q(grace_until__isnull=True, due_at__lt=timezone.now())
-    ).count()
+    if day_inputs is not None:
+        fu_row = day_inputs.get("followups") or {}
+        fu_total = int(fu_row.get("n") or 0)
+        fu_missed = int(fu_row.get("missed") or 0)
+        fu_done = int(fu_row.get("done") or 0)
+        fu_rescheduled = int(fu_row.get("rescheduled") or 0)
+        fu_cancelled = int(fu_row.get("cancelled") or 0)
+        fu_open = int(fu_row.get("open") or 0)
+        fu_overdue_open = int(fu_row.get("overdue") or 0)
+    else:
+        fu_total = fu_qs.count()
+        fu_missed = fu_qs.filter(status=ClientFollowUp.Status.MISSED).count()
+        fu_done = fu_qs.filter(status=ClientFollowUp.Status.DONE).count()
+        fu_rescheduled = fu_qs.filter(status=ClientFollowUp.Status.RESCHEDULED).count()
+        fu_cancelled = fu_qs.filter(status=ClientFollowUp.Status.CANCELLED).count()
+        fu_open = fu_qs.filter(status=ClientFollowUp.Status.OPEN).count()
+        fu_overdue_open = fu_qs.filter(status=ClientFollowUp.Status.OPEN).filter(
+            Q(grace_until__lt=timezone.now()) | Q(grace_until__isnull=True, due_at__lt=timezone.now())
+        ).count()
 
     missed_effective = fu_missed + fu_overdue_open
     missed_rate = _safe_pct(missed_effective, fu_total)
@@ -1238,7 +1264,8 @@ def get_stats_payload(*, user, range_current: StatsRange, include_shadow: bool =
         .select_related("client")
         .order_by("due_at")
     )
-    for fu in fu_problem_qs[:10]:
+    # Список — це саме missed + overdue open; при нулі запит не потрібен.
+    for fu in (fu_problem_qs[:10] if missed_effective > 0 else ()):
         due_local = timezone.localtime(fu.due_at) if fu.due_at else None
         fu_problem_list.append(
             {
@@ -1267,7 +1294,11 @@ def get_stats_payload(*, user, range_current: StatsRange, include_shadow: bool =
     grace = int(acfg.get("report_late_grace_minutes", 60) or 60)
 
     # Earliest report per day (portable): fetch ordered list and pick first per day.
-    reports_list = list(Report.objects.filter(owner=user, created_at__gte=range_current.start, created_at__lt=range_current.end).order_by("created_at").values("created_at"))
+    if day_inputs is not None:
+        first_report = (day_inputs.get("reports") or {}).get("first")
+        reports_list = [{"created_at": first_report}] if first_report else []
+    else:
+        reports_list = list(Report.objects.filter(owner=user, created_at__gte=range_current.start, created_at__lt=range_current.end).order_by("created_at").values("created_at"))
     report_by_day: dict[date, datetime] = {}
     for r in reports_list:
         ts = r.get("created_at")
@@ -1348,22 +1379,32 @@ def get_stats_payload(*, user, range_current: StatsRange, include_shadow: bool =
 
     # Follow-ups by day
     fu_by_day: dict[date, dict[str, int]] = {}
-    for row in fu_qs.values("due_date", "status").annotate(count=Count("id")):
-        d = row.get("due_date")
-        st = str(row.get("status") or "")
-        cnt = int(row.get("count") or 0)
-        if not d:
-            continue
-        bucket = fu_by_day.setdefault(d, {})
-        bucket[st] = bucket.get(st, 0) + cnt
-    expired_open_by_day = {
-        row["due_date"]: int(row.get("count") or 0)
-        for row in fu_qs.filter(status=ClientFollowUp.Status.OPEN)
-        .filter(Q(grace_until__lt=timezone.now()) | Q(grace_until__isnull=True, due_at__lt=timezone.now()))
-        .values("due_date")
-        .annotate(count=Count("id"))
-        if row.get("due_date")
-    }
+    if day_inputs is not None:
+        fu_by_day[range_current.start_date] = {
+            ClientFollowUp.Status.OPEN: fu_open,
+            ClientFollowUp.Status.DONE: fu_done,
+            ClientFollowUp.Status.RESCHEDULED: fu_rescheduled,
+            ClientFollowUp.Status.CANCELLED: fu_cancelled,
+            ClientFollowUp.Status.MISSED: fu_missed,
+        }
+        expired_open_by_day = {range_current.start_date: fu_overdue_open}
+    else:
+        for row in fu_qs.values("due_date", "status").annotate(count=Count("id")):
+            d = row.get("due_date")
+            st = str(row.get("status") or "")
+            cnt = int(row.get("count") or 0)
+            if not d:
+                continue
+            bucket = fu_by_day.setdefault(d, {})
+            bucket[st] = bucket.get(st, 0) + cnt
+        expired_open_by_day = {
+            row["due_date"]: int(row.get("count") or 0)
+            for row in fu_qs.filter(status=ClientFollowUp.Status.OPEN)
+            .filter(Q(grace_until__lt=timezone.now()) | Q(grace_until__isnull=True, due_at__lt=timezone.now()))
+            .values("due_date")
+            .annotate(count=Count("id"))
+            if row.get("due_date")
+        }
 
     # CP sent by day
     cp_by_day = {row["day"]: int(row["count"] or 0) for row in cp_qs.filter(status=CommercialOfferEmailLog.Status.SENT).annotate(day=TruncDate("created_at", tzinfo=tz)).values("day").annotate(count=Count("id"))}
@@ -1514,9 +1555,14 @@ def get_stats_payload(*, user, range_current: StatsRange, include_shadow: bool =
     overdue_tests_list = overdue_tests_list[:10]
 
     # Shipments + inventory movements inside period (only for manager's shops)
-    shipments_qs = ShopShipment.objects.filter(created_by=user, created_at__gte=range_current.start, created_at__lt=range_current.end)
-    shipments_count = shipments_qs.count()
-    shipments_amount = shipments_qs.aggregate(s=Sum("invoice_total_amount")).get("s") or 0
+    if day_inputs is not None:
+        shipments_row = day_inputs.get("shipments") or {}
+        shipments_count = int(shipments_row.get("n") or 0)
+        shipments_amount = shipments_row.get("amount") or 0
+    else:
+        shipments_qs = ShopShipment.objects.filter(created_by=user, created_at__gte=range_current.start, created_at__lt=range_current.end)
+        shipments_count = shipments_qs.count()
+        shipments_amount = shipments_qs.aggregate(s=Sum("invoice_total_amount")).get("s") or 0
 
     inv_qs = ShopInventoryMovement.objects.filter(created_by=user, created_at__gte=range_current.start, created_at__lt=range_current.end)
     inv_sales_qty = inv_qs.filter(kind=ShopInventoryMovement.Kind.SALE).aggregate(s=Sum(Abs("delta_qty"))).get("s") or 0
@@ -1553,7 +1599,7 @@ def get_stats_payload(*, user, range_current: StatsRange, include_shadow: bool =
     kpd = compute_kpd(metrics_now, cfg)
 
     # Prev period for advice & kpd mini insight
-    metrics_prev = _build_metrics_for_prev(user=user, r=prev_r, cfg=cfg)
+    metrics_prev = _build_metrics_for_prev(user=user, r=prev_r, cfg=cfg, day_inputs=prev_day_inputs)
     kpd_prev = compute_kpd(metrics_prev, cfg)
     kpd_delta = round(float(kpd.get("value") or 0) - float(kpd_prev.get("value") or 0), 2)
 
@@ -1744,7 +1790,9 @@ def get_stats_payload(*, user, range_current: StatsRange, include_shadow: bool =
     return payload
 
 
-def _build_metrics_for_prev(*, user, r: StatsRange, cfg: dict[str, Any]) -> dict[str, Any]:
+def _build_metrics_for_prev(
+    *, user, r: StatsRange, cfg: dict[str, Any], day_inputs: dict[str, dict] | None = None
+) -> dict[str, Any]:
     clients_qs = Client.objects.filter(owner=user, created_at__gte=r.start, created_at__lt=r.end)
     processed = clients_qs.count()
     points = clients_qs.aggregate(points=_points_sum_expr()).get("points") or 0
@@ -1752,11 +1800,17 @@ def _build_metrics_for_prev(*, user, r: StatsRange, cfg: dict[str, Any]) -> dict
 
     fu_qs = ClientFollowUp.objects.filter(owner=user, due_date__gte=r.start_date, due_date__lte=r.end_date)
     today_local = timezone.localdate()
-    fu_total = fu_qs.count()
-    fu_missed = fu_qs.filter(status=ClientFollowUp.Status.MISSED).count()
-    fu_overdue_open = fu_qs.filter(status=ClientFollowUp.Status.OPEN).filter(
-        Q(grace_until__lt=timezone.now()) | Q(grace_until__isnull=True, due_at__lt=timezone.now())
-    ).count()
+    if day_inputs is not None:
+        fu_row = day_inputs.get("followups") or {}
+        fu_total = int(fu_row.get("n") or 0)
+        fu_missed = int(fu_row.get("missed") or 0)
+        fu_overdue_open = int(fu_row.get("overdue") or 0)
+    else:
+        fu_total = fu_qs.count()
+        fu_missed = fu_qs.filter(status=ClientFollowUp.Status.MISSED).count()
+        fu_overdue_open = fu_qs.filter(status=ClientFollowUp.Status.OPEN).filter(
+            Q(grace_until__lt=timezone.now()) | Q(grace_until__isnull=True, due_at__lt=timezone.now())
+        ).count()
 
     # Reports required/late
     acfg = cfg.get("advice") or {}
@@ -1766,7 +1820,11 @@ def _build_metrics_for_prev(*, user, r: StatsRange, cfg: dict[str, Any]) -> dict
     report_days_late = 0
     report_days_missing = 0
 
-    reports_list = list(Report.objects.filter(owner=user, created_at__gte=r.start, created_at__lt=r.end).order_by("created_at").values("created_at"))
+    if day_inputs is not None:
+        first_report = (day_inputs.get("reports") or {}).get("first")
+        reports_list = [{"created_at": first_report}] if first_report else []
+    else:
+        reports_list = list(Report.objects.filter(owner=user, created_at__gte=r.start, created_at__lt=r.end).order_by("created_at").values("created_at"))
     report_by_day: dict[date, datetime] = {}
     for row in reports_list:
         ts = row.get("created_at")
@@ -37,3 +37,66 @@ class CatalogProductIdTests(TestCase):
         ProductColorVariant.objects.create(product=p, color=color, stock=1)
         text = get_catalog_context(force=True)
         self.assertIn(f"id={p.id}", text)
+
+
+class CatalogRetrievalTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from productcolors.models import Color, ProductColorVariant
+        from storefront.models import Category, Product, ProductStatus
+
+        cache.clear()
+        tees = Category.objects.create(name="Футболки", slug="tees-retrieval")
+        hoodies = Category.objects.create(name="Худі", slug="hoodies-retrieval")
+        black = Color.objects.create(name="чорний", primary_hex="#000000")
+        for idx in range(30):
+            p = Product.objects.create(
+                title=f"Футболка базова {idx}", slug=f"tee-r-{idx}", category=tees, price=500,
+                status=ProductStatus.PUBLISHED,
+            )
+            ProductColorVariant.objects.create(product=p, color=black, stock=1)
+        self.hoodie = Product.objects.create(
+            title="Худі Kharkiv", slug="hoodie-r", category=hoodies, price=1450,
+            status=ProductStatus.PUBLISHED,
+        )
+        ProductColorVariant.objects.create(
+            product=self.hoodie, color=black, stock=2,
+            metadata={"bot_vision": {"summary": "єнот у шоломі на спині"}},
+        )
+
+    def test_context_contains_only_top_k_relevant_products(self):
+        text = get_catalog_context(force=True, query="а є худі харків?", top_k=3)
+
+        self.assertIn(f"id={self.hoodie.id}", text)
+        self.assertLessEqual(text.count("• id="), 3)
+        self.assertLess(len(text), 1500)
+
+    def test_transliterated_and_print_queries_hit_same_product(self):
+        from management.services.bot_catalog import search_catalog
+
+        for query in ("hudi kharkiv", "hoodie harkiv", "худі з єнотом"):
+            with self.subTest(query=query):
+                self.assertEqual(search_catalog(query, k=1, force=True), [self.hoodie.id])
+
+    def test_generic_question_falls_back_to_default_top(self):
+        from management.services.bot_catalog import MIN_RESULTS
+
+        text = get_catalog_context(force=True, query="привіт", top_k=8)
+
+        self.assertEqual(text.count("• id="), MIN_RESULTS)
+
+    def test_index_is_rebuilt_when_catalog_version_changes(self):
+        from storefront.models import Category, Product, ProductStatus
+        from storefront.services.catalog_helpers import bump_public_product_order_version
+        from management.services.bot_catalog import search_catalog
+
+        self.assertEqual(search_catalog("світшот"), [])
+        Product.objects.create(
+            title="Світшот Одеса", slug="sweat-r", category=Category.objects.get(slug="hoodies-retrieval"),
+            price=1200, status=ProductStatus.PUBLISHED,
+        )
+        self.assertEqual(search_catalog("світшот"), [])  # той самий кеш до бампу версії
+
+        bump_public_product_order_version()
+
+        self.assertEqual(len(search_catalog("світшот")), 1)
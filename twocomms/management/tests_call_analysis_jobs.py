@@ -0,0 +1,194 @@
+"""Черга ШІ-аналізу дзвінків: оренда одним UPDATE, повтори за графіком,
+паралельний воркер і стрімінг запису в тимчасовий файл.
+"""
+import threading
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from management.models import CallAIAnalysis, CallRecord
+from management.services import call_ai_analysis as caa
+from management.services import call_analysis_jobs as jobs
+
+
+def _record(gcid, *, age=600, duration=120, **fields):
+    rec = CallRecord.objects.create(
+        provider="binotel", external_call_id=gcid, duration_seconds=duration,
+        ai_status=fields.pop("ai_status", CallRecord.AiStatus.PENDING), **fields,
+    )
+    CallRecord.objects.filter(id=rec.id).update(created_at=timezone.now() - timedelta(seconds=age))
+    rec.refresh_from_db()
+    return rec
+
+
+class ClaimCallJobsTests(TestCase):
+    def test_claims_due_rows_in_one_update_and_only_once(self):
+        due = _record("100")
+        _record("101", duration=5)                      # короткий дзвінок
+        _record("102", age=10)                          # запис ще не встиг зʼявитись
+        _record("103", ai_next_attempt_at=timezone.now() + timedelta(minutes=5))
+        queued = _record("104", age=5, duration=0, ai_next_attempt_at=timezone.now())
+
+        with CaptureQueriesContext(connection) as ctx:
+            rows = jobs.claim_call_jobs(10, worker="w1")
+        self.assertEqual(len([q for q in ctx.captured_queries if q["sql"].startswith("UPDATE")]), 1)
+        self.assertEqual({r.id for r in rows}, {due.id, queued.id})
+        for row in rows:
+            self.assertEqual(row.ai_status, CallRecord.AiStatus.RUNNING)
+            self.assertTrue(row.ai_claimed_by.startswith("w1:"))
+            self.assertEqual(row.ai_attempts, 1)
+            self.assertGreater(row.ai_lease_until, timezone.now())
+        self.assertEqual(jobs.claim_call_jobs(10, worker="w2"), [])
+
+    def test_expired_lease_is_reclaimed_and_exhausted_rows_fail(self):
+        stale = _record("200", ai_status=CallRecord.AiStatus.RUNNING, ai_attempts=1,
+                        ai_claimed_by="dead:1", ai_lease_until=timezone.now() - timedelta(seconds=1))
+        _record("201", ai_status=CallRecord.AiStatus.RUNNING, ai_attempts=1,
+                ai_claimed_by="alive:1", ai_lease_until=timezone.now() + timedelta(minutes=5))
+        spent = _record("202", ai_attempts=jobs.MAX_ATTEMPTS)
+
+        self.assertEqual([r.id for r in jobs.claim_call_jobs(10, worker="w1")], [stale.id])
+        self.assertEqual(jobs.fail_exhausted(), 1)
+        spent.refresh_from_db()
+        self.assertEqual(spent.ai_status, CallRecord.AiStatus.ERROR)
+
+    def test_enqueue_sets_due_time_and_skips_finished(self):
+        rec = jobs.enqueue_call_analysis("300", delay_seconds=0)
+        self.assertEqual(rec.ai_status, CallRecord.AiStatus.PENDING)
+        self.assertLessEqual(rec.ai_next_attempt_at, timezone.now())
+        CallRecord.objects.filter(id=rec.id).update(ai_status=CallRecord.AiStatus.DONE)
+        self.assertEqual(jobs.enqueue_call_analysis("300").ai_status, CallRecord.AiStatus.DONE)
+
+
+class ProcessCallJobTests(TestCase):
+    def _claimed(self, **fields):
+        _record("400", **fields)
+        return jobs.claim_call_jobs(1, worker="w")[0]
+
+    def _analysis(self, rec, status):
+        return CallAIAnalysis.objects.create(call_record=rec, status=status, error="boom")
+
+    def test_success_marks_done_and_releases_lease(self):
+        rec = self._claimed()
+        with patch.object(caa, "analyze_call", return_value=self._analysis(rec, CallAIAnalysis.Status.DONE)):
+            self.assertEqual(jobs.process_call_job(rec), "done")
+        rec.refresh_from_db()
+        self.assertEqual(rec.ai_status, CallRecord.AiStatus.DONE)
+        self.assertEqual((rec.ai_claimed_by, rec.ai_lease_until), ("", None))
+
+    def test_failure_is_rescheduled_then_gives_up(self):
+        rec = self._claimed()
+        failed = self._analysis(rec, CallAIAnalysis.Status.ERROR)
+        with patch.object(caa, "analyze_call", return_value=failed):
+            self.assertEqual(jobs.process_call_job(rec), "retry")
+            rec.refresh_from_db()
+            self.assertEqual(rec.ai_status, CallRecord.AiStatus.PENDING)
+            self.assertEqual(rec.ai_last_error, "boom")
+            self.assertGreater(rec.ai_next_attempt_at, timezone.now() + timedelta(seconds=60))
+
+            CallRecord.objects.filter(id=rec.id).update(
+                ai_attempts=jobs.MAX_ATTEMPTS - 1, ai_next_attempt_at=timezone.now())
+            rec = jobs.claim_call_jobs(1, worker="w")[0]
+            self.assertEqual(jobs.process_call_job(rec), "error")
+        rec.refresh_from_db()
+        self.assertEqual(rec.ai_status, CallRecord.AiStatus.ERROR)
+
+    def test_missing_recording_waits_without_spending_an_attempt(self):
+        rec = self._claimed(age=5, ai_next_attempt_at=timezone.now())
+        with patch.object(caa, "_recording_ready", return_value=False), \
+             patch.object(caa, "analyze_call", side_effect=AssertionError("not yet")):
+            self.assertEqual(jobs.process_call_job(rec), "waiting")
+        rec.refresh_from_db()
+        self.assertEqual((rec.ai_status, rec.ai_attempts), (CallRecord.AiStatus.PENDING, 0))
+        self.assertGreater(rec.ai_next_attempt_at, timezone.now())
+
+    def test_stolen_lease_is_not_overwritten(self):
+        rec = self._claimed()
+        CallRecord.objects.filter(id=rec.id).update(ai_claimed_by="other:1")
+        with patch.object(caa, "analyze_call", return_value=self._analysis(rec, CallAIAnalysis.Status.DONE)):
+            jobs.process_call_job(rec)
+        rec.refresh_from_db()
+        self.assertEqual((rec.ai_status, rec.ai_claimed_by), (CallRecord.AiStatus.RUNNING, "other:1"))
+
+
+class RunCallJobsPoolTests(SimpleTestCase):
+    DELAY = 0.05
+
+    def _run(self, workers, total=6):
+        queue = list(range(total))
+        guard = threading.Lock()
+        active = {"now": 0, "peak": 0}
+
+        def claim(limit, *, worker=""):
+            with guard:
+                taken, queue[:] = queue[:limit], queue[limit:]
+            return [SimpleNamespace(id=i) for i in taken]
+
+        def process(record):
+            with guard:
+                active["now"] += 1
+                active["peak"] = max(active["peak"], active["now"])
+            time.sleep(self.DELAY)  # «повільний Gemini»
+            with guard:
+                active["now"] -= 1
+            return "done"
+
+        with patch.object(jobs, "claim_call_jobs", side_effect=claim), \
+             patch.object(jobs, "process_call_job", side_effect=process), \
+             patch.object(jobs, "fail_exhausted", return_value=0):
+            started = time.monotonic()
+            stats = jobs.run_call_jobs(100, workers=workers)
+        return stats, time.monotonic() - started, active["peak"]
+
+    def test_workers_process_calls_concurrently(self):
+        seq_stats, seq_elapsed, seq_peak = self._run(workers=1)
+        stats, elapsed, peak = self._run(workers=3)
+        self.assertEqual(seq_stats["done"], 6)
+        self.assertEqual(stats["done"], 6)
+        self.assertEqual(seq_peak, 1)
+        self.assertEqual(peak, 3)
+        self.assertLess(elapsed, seq_elapsed / 2)
+
+
+class _Upstream:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.served = 0
+        self.closed = False
+
+    def iter_content(self, chunk_size=65536):
+        for chunk in self.chunks:
+            self.served += 1
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+class DownloadRecordingTests(SimpleTestCase):
+    def test_streams_to_temp_file(self):
+        upstream = _Upstream([b"ID3", b"", b"-audio"])
+        client = SimpleNamespace(fetch_record_stream=lambda gcid: (upstream, "u"))
+        with caa._download_recording(client, "1") as (audio, size):
+            self.assertEqual(size, 9)
+            self.assertEqual(audio.read(), b"ID3-audio")
+            self.assertEqual(caa._b64_audio(audio), "SUQzLWF1ZGlv")
+        self.assertTrue(audio.closed)
+        self.assertTrue(upstream.closed)
+
+    def test_oversized_recording_is_cut_off_early(self):
+        big = b"x" * (1024 * 1024)
+        upstream = _Upstream([big] * 40)
+        client = SimpleNamespace(fetch_record_stream=lambda gcid: (upstream, "u"))
+        with patch.object(caa, "MAX_AUDIO_BYTES", 3 * len(big)):
+            with self.assertRaises(caa.CallAIAnalysisError):
+                with caa._download_recording(client, "1"):
+                    pass
+        self.assertEqual(upstream.served, 4)
+        self.assertTrue(upstream.closed)
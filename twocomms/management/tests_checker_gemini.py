@@ -10,7 +10,7 @@ ENV6 = {f"GEMINI_API{n}": f"key-val-{n or '1'}" for n in ("", "2", "3", "4", "5"
 
 class GeminiGroundedPoolTests(TestCase):
     def setUp(self):
-        gk.clear_model_overload()
+        gk.reset_quota_state()
 
     def test_grounded_skips_gen3_and_uses_25_flash(self):
         """grounded на gen-3 → 429 (не free) → model_skip, успіх на 2.5-flash, ключ НЕ в кулдауні."""
@@ -68,7 +68,7 @@ class GeminiGroundedPoolTests(TestCase):
 
 class GeminiJsonPoolTests(TestCase):
     def setUp(self):
-        gk.clear_model_overload()
+        gk.reset_quota_state()
 
     def test_free_model_429_cools_key_and_moves_to_next(self):
         """429 на free-моделі (3.5-flash, non-grounded) = вичерпана квота ПРОЕКТУ →
@@ -115,7 +115,7 @@ class GeminiJsonPoolTests(TestCase):
 
 class GeminiTextPoolTests(TestCase):
     def setUp(self):
-        gk.clear_model_overload()
+        gk.reset_quota_state()
 
     def test_text_mode_returns_raw_text(self):
         def fake(model, payload, key, *, parse=True, timeout=None):
@@ -180,7 +180,7 @@ class GeminiTextPoolTests(TestCase):
 
 class GeminiEmptyResponseTests(TestCase):
     def setUp(self):
-        gk.clear_model_overload()
+        gk.reset_quota_state()
 
     def test_empty_retries_and_does_not_mark_overloaded(self):
         """Порожня відповідь ретраїться, але НЕ метить модель глобально overloaded."""
@@ -238,7 +238,7 @@ class ParseModelJsonTests(TestCase):
 
 class ChatTimeoutTests(TestCase):
     def setUp(self):
-        gk.clear_model_overload()
+        gk.reset_quota_state()
 
     def test_chat_uses_short_timeout(self):
         """Чат не повинен висіти на завислій моделі — короткий read-таймаут."""
@@ -286,24 +286,31 @@ class ChatTimeoutTests(TestCase):
 
 class ChatRoundsRetryTests(TestCase):
     def setUp(self):
-        gk.clear_model_overload()
+        gk.reset_quota_state()
 
     def test_chat_cycles_three_rounds_before_error(self):
         """503 на всіх моделях → чат робить 3 круги (з backoff між ними), тільки потім помилка.
 
         Model-major: кожен круг — повний свип пулу (усі моделі цепочки × 4 ключі),
         бо пріоритетну модель пробуємо на ВСІХ ключах. Кількість викликів =
-        len(chain) × 4 ключі × max_rounds. Між кругами clear_model_overload() + backoff 2с, 4с."""
+        len(chain) × 4 ключі × max_rounds. Між кругами — очікування до retry_at
+        перевантажених моделей: 2с, потім 4с."""
         calls = {"n": 0}
+        clock = {"t": 1_000_000.0}
 
         def fake(model, payload, key, *, parse=True, timeout=None):
             calls["n"] += 1
             raise caa._GeminiTransient("HTTP 503")
 
+        def fake_wait(seconds):
+            sleeps.append(seconds)
+            clock["t"] += seconds
+
         sleeps = []
         with patch.dict("os.environ", ENV6, clear=False), \
              patch.object(caa, "_gemini_call_once", side_effect=fake), \
-             patch("management.services.call_ai_analysis.time.sleep", side_effect=lambda s: sleeps.append(s)):
+             patch.object(gk, "_clock", lambda: clock["t"]), \
+             patch.object(gk, "wait_for_refill", side_effect=fake_wait):
             with self.assertRaises(caa.CallAIAnalysisError):
                 caa.gemini_generate_text({"contents": []}, role="chat")
         # усі моделі цепочки × 4 ключі (own API/API2 + borrow API5/API6) × 3 круги
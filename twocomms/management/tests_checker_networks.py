@@ -88,3 +88,66 @@ class ClassifyClusterTests(TestCase):
         nr.resolve_all()
         self.assertEqual(LeadNetwork.objects.count(), 1)
         self.assertEqual(LeadNetwork.objects.first().leads.count(), 3)
+
+
+class BulkResolverTests(TestCase):
+    def _lead(self, name, phone, website="", **fields):
+        return ManagementLead.objects.create(
+            shop_name=name, phone=phone, website_url=website,
+            lead_source=ManagementLead.LeadSource.PARSER, **fields,
+        )
+
+    def test_phone_domain_and_instagram_link_different_names(self):
+        a = self._lead("Tactical Lab", "0501110001", "https://tlab.ua")
+        b = self._lead("TL Kyiv", "0501110002", "https://tlab.ua/kyiv")
+        c = self._lead("T-Lab Odesa", "0501110002")
+        d = self._lead("Lab Shop", "0501110003", "https://instagram.com/tlab_shop")
+        e = self._lead("Tlab Lviv", "0501110001", "https://www.instagram.com/tlab_shop/")
+        nr.resolve_all()
+
+        self.assertEqual(LeadNetwork.objects.count(), 1)
+        net = LeadNetwork.objects.get()
+        self.assertEqual(set(net.leads.values_list("id", flat=True)), {a.id, b.id, c.id, d.id, e.id})
+        self.assertEqual(net.members_count, 5)
+        self.assertTrue(NetworkAlias.objects.filter(network=net, key_type="instagram", key_value="tlab_shop").exists())
+
+    def test_shared_hosts_and_shared_phones_do_not_merge(self):
+        self._lead("Alpha", "0501110011", "https://facebook.com/alpha")
+        self._lead("Beta", "0501110012", "https://facebook.com/beta")
+        self._lead("Gamma", "0501110013", is_shared_phone=True)
+        self._lead("Delta", "0501110013", is_shared_phone=True)
+        res = nr.resolve_all()
+        self.assertEqual(res["standalone"], 4)
+        self.assertEqual(LeadNetwork.objects.count(), 0)
+
+    def test_manual_membership_is_kept(self):
+        other = LeadNetwork.objects.create(canonical_name="Manual", slug="manual")
+        pinned = self._lead("Sinsay", "0502223301", network=other, network_membership_source="manual")
+        self._lead("Sinsay", "0502223302")
+        nr.resolve_all()
+        pinned.refresh_from_db()
+        self.assertEqual(pinned.network_id, other.id)
+
+    def test_rerun_without_changes_only_reads(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        for i in range(30):
+            self._lead("Sinsay", f"05022233{i:02d}", "https://sinsay.com")
+            self._lead(f"Shop {i}", f"05033344{i:02d}")
+            self._lead("Військторг", f"05044455{i:02d}")
+        nr.resolve_all()
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = nr.resolve_all()
+        writes = [q["sql"] for q in ctx.captured_queries if q["sql"].split(" ", 1)[0] in ("INSERT", "UPDATE", "DELETE")]
+        self.assertEqual(writes, [])
+        self.assertLessEqual(len([q for q in ctx.captured_queries if q["sql"].startswith("SELECT")]), 5)
+        self.assertEqual((res["network"], res["standalone"], res["generic"]), (1, 30, 30))
+
+    def test_changed_rows_are_written_in_bulk(self):
+        for i in range(20):
+            self._lead("Sinsay", f"05022233{i:02d}")
+        with self.assertNumQueries(12):  # кількість не залежить від числа лідів
+            nr.resolve_all()
+        self.assertEqual(LeadNetwork.objects.get().members_count, 20)
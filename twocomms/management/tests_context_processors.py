@@ -1,9 +1,14 @@
 from types import SimpleNamespace
 from unittest.mock import patch
 
-from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
 from management import context_processors
+from management.models import Client, DuplicateReview
 
 
 class ManagementShellContextTests(SimpleTestCase):
@@ -48,3 +53,42 @@ class ManagementShellContextTests(SimpleTestCase):
         self.assertEqual(context["management_shell_role_label"], "Адміністратор")
         self.assertEqual(context["management_shell_stats_url"], "/stats/")
         self.assertEqual(context["management_shell_payout_url"], "/payouts/")
+
+
+@override_settings(ROOT_URLCONF="twocomms.urls_management")
+class ManagementShellMetricsCacheTests(TestCase):
+    def setUp(self):
+        caches["fragments"].clear()
+        self.factory = RequestFactory()
+        self.user = get_user_model().objects.create_user(username="shell_cache_mgr", password="x", is_staff=True)
+
+    def _request(self):
+        request = self.factory.get("/", HTTP_HOST="management.twocomms.shop")
+        request.user = self.user
+        return request
+
+    def test_second_render_query_count_stays_constant(self):
+        context_processors.management_shell_context(self._request())
+        with CaptureQueriesContext(connection) as second:
+            context_processors.management_shell_context(self._request())
+        with CaptureQueriesContext(connection) as third:
+            context_processors.management_shell_context(self._request())
+        self.assertEqual(len(second.captured_queries), len(third.captured_queries))
+
+        with CaptureQueriesContext(connection) as metrics_ctx:
+            metrics = context_processors.build_management_shell_metrics(self.user, None)
+        self.assertEqual(len(metrics_ctx.captured_queries), 0)
+        self.assertEqual(metrics["management_shell_payout_url"], "/payouts/")
+
+    def test_client_and_duplicate_review_changes_invalidate_snapshot(self):
+        metrics = context_processors.build_management_shell_metrics(self.user, None)
+        self.assertEqual(metrics["management_shell_processed_total"], 0)
+        self.assertEqual(metrics["management_shell_duplicate_reviews"], 0)
+
+        Client.objects.create(shop_name="Shell Shop", phone="+380671110000", full_name="Owner", owner=self.user)
+        other = get_user_model().objects.create_user(username="shell_cache_other", password="x")
+        DuplicateReview.objects.create(owner=other, zone="review", incoming_shop_name="X", incoming_phone="+380671110001")
+
+        metrics = context_processors.build_management_shell_metrics(self.user, None)
+        self.assertEqual(metrics["management_shell_processed_total"], 1)
+        self.assertEqual(metrics["management_shell_duplicate_reviews"], 1)
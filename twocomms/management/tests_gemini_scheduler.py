@@ -0,0 +1,175 @@
+"""Планувальник пулу Gemini: спільний стан квот у кеші, вибір комбінації без
+походів у БД, очікування до найближчого звільнення замість фіксованих пауз.
+
+Фейковий Gemini нижче віддає заскриптовані 429/503 за фейковим годинником — так
+видно, скільки HTTP-спроб іде «в молоко» і скільки (симульованого) часу чекає запит.
+"""
+import time
+from collections import Counter
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+
+from management.services import call_ai_analysis as caa
+from management.services import gemini_keys as gk
+
+ENV6 = {f"GEMINI_API{n}": f"key-val-{n or '1'}" for n in ("", "2", "3", "4", "5", "6")}
+KEY_NAMES = {f"key-val-{n or '1'}": f"GEMINI_API{n}" for n in ("", "2", "3", "4", "5", "6")}
+CALL_LATENCY = 0.5
+
+
+class _FakeGemini:
+    """generateContent зі сценарієм: перевантажені моделі, ключі з вичерпаною
+    квотою (429 з retryDelay), хвилинний RPM на (ключ, модель)."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.overloaded_until = {}
+        self.exhausted_until = {}
+        self.rpm = {}
+        self.sent = Counter()
+        self.calls = []
+
+    def __call__(self, model, payload, key, *, parse=True, timeout=None):
+        now = self.clock["t"]
+        self.clock["t"] += CALL_LATENCY
+        name = KEY_NAMES[key]
+        if self.overloaded_until.get(model, 0) > now:
+            self.calls.append((name, model, 503))
+            raise caa._GeminiTransient("HTTP 503")
+        until = self.exhausted_until.get(name, 0)
+        if until > now:
+            self.calls.append((name, model, 429))
+            raise caa._Gemini429(
+                '{"error":{"details":[{"@type":"RetryInfo","retryDelay":"%ds"}]}}' % int(until - now)
+            )
+        window = (name, model, int(now // 60))
+        limit = self.rpm.get(model)
+        if limit and self.sent[window] >= limit:
+            self.calls.append((name, model, 429))
+            raise caa._Gemini429('{"error":{"details":[{"@type":"RetryInfo","retryDelay":"30s"}]}}')
+        self.sent[window] += 1
+        self.calls.append((name, model, 200))
+        return ("ok", {})
+
+    @property
+    def wasted(self):
+        return [c for c in self.calls if c[2] != 200]
+
+
+class SchedulerTestMixin:
+    def setUp(self):
+        gk.reset_quota_state()
+        # Близько до реального часу (кулдауни з БД), на початку хвилинного вікна.
+        self.clock = {"t": time.time() // 60 * 60 + 1.0}
+        self.waits = []
+        self.sleeps = []
+        self.gemini = _FakeGemini(self.clock)
+
+        def fake_wait(seconds):
+            self.waits.append(seconds)
+            self.clock["t"] += seconds
+
+        for patcher in (
+            patch.dict("os.environ", ENV6, clear=False),
+            patch.object(gk, "_clock", lambda: self.clock["t"]),
+            patch.object(gk, "wait_for_refill", side_effect=fake_wait),
+            patch.object(caa, "_gemini_call_once", side_effect=self.gemini),
+            patch("management.services.call_ai_analysis.time.sleep", side_effect=self.sleeps.append),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(gk.reset_quota_state)
+
+    def chat(self):
+        return caa.gemini_generate_text({"contents": []}, role="chat")
+
+
+class PickSlotTests(SchedulerTestMixin, TestCase):
+    def test_pick_follows_model_major_order_without_db_queries(self):
+        self.assertEqual(gk.pick_slot("chat"), ("GEMINI_API", "key-val-1", "gemini-3.5-flash"))
+        with self.assertNumQueries(0):
+            slot = gk.pick_slot("chat", exclude={("GEMINI_API", "gemini-3.5-flash")})
+        self.assertEqual(slot[0], "GEMINI_API2")
+
+    def test_cooled_key_and_paid_model_are_skipped(self):
+        gk.mark_429("GEMINI_API", "minute", 40)
+        gk.mark_model_unavailable("gemini-3.5-flash")
+        self.assertEqual(gk.pick_slot("chat")[::2], ("GEMINI_API2", "gemini-3.1-flash-lite"))
+
+    def test_key_state_is_seeded_from_db_when_cache_is_empty(self):
+        gk.mark_429("GEMINI_API", "day", 0)
+        gk.reset_quota_state()
+        self.assertEqual(gk.pick_slot("chat")[0], "GEMINI_API2")
+
+    def test_next_refill_at_is_soonest_usable_combo(self):
+        for name in ("GEMINI_API", "GEMINI_API2", "GEMINI_API5"):
+            gk.mark_429(name, "minute", 50)
+        gk.mark_429("GEMINI_API6", "minute", 20)
+        self.assertIsNone(gk.pick_slot("chat"))
+        self.assertAlmostEqual(gk.next_refill_at("chat") - self.clock["t"], 20, places=3)
+
+
+class SharedQuotaStateTests(SchedulerTestMixin, TestCase):
+    def test_429_is_paid_once_for_all_following_requests(self):
+        self.gemini.exhausted_until["GEMINI_API"] = self.clock["t"] + 600
+        for _ in range(5):
+            self.assertEqual(self.chat()["meta"]["key"], "GEMINI_API2")
+        self.assertEqual(self.gemini.wasted, [("GEMINI_API", "gemini-3.5-flash", 429)])
+
+    def test_503_moves_on_without_retrying_the_same_combo(self):
+        """management: раніше кожна комбінація з 503 ретраїлась на місці після
+        паузи 2с (4 ключі × 2 спроби + 8с сну). Тепер — одна спроба на ключ і
+        одразу нижча модель."""
+        self.gemini.overloaded_until["gemini-3.5-flash"] = self.clock["t"] + 600
+        started = self.clock["t"]
+        out = caa.gemini_generate_json("S", "U", role="management")
+
+        self.assertEqual(out["model"], "gemini-3.1-flash-lite")
+        self.assertEqual(len(self.gemini.wasted), 4)
+        self.assertEqual(self.sleeps, [])
+        self.assertEqual(self.waits, [])
+        self.assertEqual(self.clock["t"] - started, 5 * CALL_LATENCY)
+
+        # Наступний запит уже не торкається перевантаженої моделі.
+        caa.gemini_generate_json("S", "U", role="management")
+        self.assertEqual(len(self.gemini.wasted), 4)
+
+    def test_waits_for_soonest_refill_instead_of_failing(self):
+        for name in ("GEMINI_API", "GEMINI_API2", "GEMINI_API5", "GEMINI_API6"):
+            self.gemini.exhausted_until[name] = self.clock["t"] + 20
+        out = self.chat()
+
+        self.assertEqual(out["parsed"], "ok")
+        self.assertEqual(len(self.gemini.wasted), 4)  # по одній 429 на ключ, далі — тиша
+        self.assertEqual(len(self.waits), 1)
+        self.assertLess(self.waits[0], 25)
+
+    def test_fails_fast_when_nothing_refills_within_budget(self):
+        for name in ("GEMINI_API3", "GEMINI_API4", "GEMINI_API5", "GEMINI_API6"):
+            gk.mark_429(name, "day", 0)
+        with self.assertRaises(caa.CallAIAnalysisError):
+            caa.gemini_generate_json("S", "U", role="management")
+        self.assertEqual(self.gemini.calls, [])
+        self.assertEqual(self.waits, [])
+
+
+@override_settings(GEMINI_MODEL_RPM={"gemini-3.5-flash": 2})
+class RpmBucketTests(SchedulerTestMixin, TestCase):
+    def test_bucket_spreads_load_before_google_says_429(self):
+        self.gemini.rpm["gemini-3.5-flash"] = 2
+        keys = [self.chat()["meta"]["key"] for _ in range(9)]
+
+        self.assertEqual(self.gemini.wasted, [])
+        self.assertEqual(Counter(keys[:8]), Counter({
+            "GEMINI_API": 2, "GEMINI_API2": 2, "GEMINI_API5": 2, "GEMINI_API6": 2,
+        }))
+        self.assertEqual(self.gemini.calls[-1][1], "gemini-3.1-flash-lite")
+
+    def test_reserve_counts_tokens_per_minute_window(self):
+        self.assertTrue(gk.reserve("GEMINI_API", "gemini-3.5-flash"))
+        self.assertTrue(gk.reserve("GEMINI_API", "gemini-3.5-flash"))
+        self.assertFalse(gk.reserve("GEMINI_API", "gemini-3.5-flash"))
+        self.assertTrue(gk.reserve("GEMINI_API", "gemini-2.5-flash"))  # без ліміту
+        self.clock["t"] += 60
+        self.assertTrue(gk.reserve("GEMINI_API", "gemini-3.5-flash"))
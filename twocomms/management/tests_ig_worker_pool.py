@@ -0,0 +1,157 @@
+"""Пул воркерів черги IG-бота: пакетний claim одним UPDATE, паралельність між
+відправниками, строгий порядок у межах одного sender_id, виграш під повільним
+(фейковим) LLM.
+"""
+import threading
+import time
+from collections import defaultdict
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from management.models import InstagramBotMessage
+from management.services import instagram_bot as bot
+
+
+def _pending(sender_id, text="привіт"):
+    return InstagramBotMessage.objects.create(
+        sender_id=sender_id, role=InstagramBotMessage.Role.USER, text=text,
+        status=InstagramBotMessage.Status.PENDING,
+    )
+
+
+class ClaimBatchTests(TestCase):
+    def test_claims_oldest_message_per_free_sender_in_one_update(self):
+        a1 = _pending("a")
+        _pending("a")
+        b1 = _pending("b")
+        InstagramBotMessage.objects.create(
+            sender_id="c", role=InstagramBotMessage.Role.USER, text="x",
+            status=InstagramBotMessage.Status.PROCESSING,
+        )
+        _pending("c")
+
+        with CaptureQueriesContext(connection) as ctx:
+            rows = bot._claim_batch(10)
+        updates = [q for q in ctx.captured_queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual([row.id for row in rows], [a1.id, b1.id])
+        self.assertTrue(all(row.status == InstagramBotMessage.Status.PROCESSING for row in rows))
+        self.assertEqual(rows[0].attempts, 1)
+
+        # Обидва відправники зайняті — друге повідомлення «a» чекає.
+        self.assertEqual(bot._claim_batch(10), [])
+        InstagramBotMessage.objects.filter(id=a1.id).update(status=InstagramBotMessage.Status.DONE)
+        self.assertEqual([row.sender_id for row in bot._claim_batch(10)], ["a"])
+
+    def test_busy_senders_and_limit_are_respected(self):
+        _pending("a")
+        _pending("b")
+        _pending("d")
+        rows = bot._claim_batch(1, busy_senders={"a"})
+        self.assertEqual([row.sender_id for row in rows], ["b"])
+
+    def test_busy_check_is_part_of_the_head_query(self):
+        # Окремий SELECT «хто зайнятий» до UPDATE відкривав вікно для гонки:
+        # перевірка має бути в тому ж запиті, що й вибір голів черги.
+        _pending("a")
+        with CaptureQueriesContext(connection) as ctx:
+            bot._claim_batch(10)
+        selects = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith("SELECT")]
+        self.assertIn("EXISTS", selects[0])
+        self.assertIn("MIN(", selects[0])
+        self.assertFalse(any("DISTINCT" in sql for sql in selects))
+
+
+class _FakeQueue:
+    """Потокобезпечна черга в пам'яті з тією ж семантикою claim, що й _claim_batch."""
+
+    def __init__(self, senders, per_sender):
+        self.lock = threading.Lock()
+        self.pending = [(sender, seq) for seq in range(per_sender) for sender in senders]
+        self.processing = set()
+        self.enqueued_at = time.monotonic()
+
+    def claim(self, limit, busy):
+        with self.lock:
+            taken, heads = [], set()
+            for item in list(self.pending):
+                sender = item[0]
+                if len(taken) >= limit:
+                    break
+                if sender in heads or sender in busy or sender in self.processing:
+                    heads.add(sender)
+                    continue
+                heads.add(sender)
+                self.pending.remove(item)
+                self.processing.add(sender)
+                taken.append(_Row(*item))
+            return taken
+
+    def done(self, sender):
+        with self.lock:
+            self.processing.discard(sender)
+
+
+class _Row:
+    def __init__(self, sender_id, seq):
+        self.sender_id = sender_id
+        self.seq = seq
+
+
+class SenderPoolSchedulingTests(SimpleTestCase):
+    LLM_DELAY = 0.05
+    SENDERS = ["s1", "s2", "s3", "s4"]
+    PER_SENDER = 3
+
+    def _run(self, workers):
+        queue = _FakeQueue(self.SENDERS, self.PER_SENDER)
+        order = defaultdict(list)
+        active = defaultdict(int)
+        overlap = []
+        latencies = []
+        guard = threading.Lock()
+
+        def handle(row):
+            with guard:
+                active[row.sender_id] += 1
+                if active[row.sender_id] > 1:
+                    overlap.append(row.sender_id)
+            time.sleep(self.LLM_DELAY)  # «повільний Gemini»
+            with guard:
+                active[row.sender_id] -= 1
+                order[row.sender_id].append(row.seq)
+                latencies.append(time.monotonic() - queue.enqueued_at)
+            queue.done(row.sender_id)
+            return True
+
+        started = time.monotonic()
+        handled = bot.run_sender_pool(queue.claim, handle, workers=workers, max_items=100)
+        elapsed = time.monotonic() - started
+        return handled, elapsed, sum(latencies) / len(latencies), order, overlap
+
+    def test_pool_beats_sequential_loop_and_keeps_per_sender_order(self):
+        total = len(self.SENDERS) * self.PER_SENDER
+        seq_handled, seq_elapsed, seq_latency, _, _ = self._run(workers=1)
+        handled, elapsed, latency, order, overlap = self._run(workers=4)
+
+        self.assertEqual(seq_handled, total)
+        self.assertEqual(handled, total)
+        self.assertEqual(overlap, [])
+        for sender in self.SENDERS:
+            self.assertEqual(order[sender], list(range(self.PER_SENDER)))
+        self.assertLess(elapsed, seq_elapsed / 2)
+        self.assertLess(latency, seq_latency / 2)
+
+    def test_handler_error_stops_claiming_new_rows(self):
+        queue = _FakeQueue(["s1", "s2"], 3)
+        calls = []
+
+        def handle(row):
+            calls.append(row.sender_id)
+            queue.done(row.sender_id)
+            raise RuntimeError("boom")
+
+        self.assertEqual(bot.run_sender_pool(queue.claim, handle, workers=2, max_items=100), 0)
+        self.assertLessEqual(len(calls), 2)
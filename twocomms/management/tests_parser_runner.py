@@ -0,0 +1,166 @@
+"""Конвеєрний раннер парсера: prefetch сторінок і наступних запитів у пулі,
+спільний бюджет запитів, стан дедуплікації раз на прогін.
+
+Фейковий searchText нижче віддає записаний набір сторінок із затримкою
+«мережі» — так порівнюємо час прогону з циклом parser_run_step.
+"""
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from management import parser_runner as runner
+from management import parser_service as ps
+from management.models import Client, LeadParsingJob, LeadParsingResult, ManagementLead
+
+KEYWORDS = ("військторг", "тактичний", "спорядження")
+CITY = "Харків"
+PAGES_PER_QUERY = 3
+PLACES_PER_PAGE = 6
+LATENCY = 0.15
+CLIENT_PHONE = "+380672100003"
+
+
+def _place(kw_index, page, item, phone=None):
+    return {
+        "id": f"place-{kw_index}-{page}-{item}",
+        "displayName": {"text": f"Магазин {kw_index}/{page}/{item}"},
+        "internationalPhoneNumber": phone or f"+38067{kw_index}{page}{item:05d}",
+    }
+
+
+def _recorded_pages():
+    pages = {}
+    for kw_index, keyword in enumerate(KEYWORDS):
+        query = f"{keyword} {CITY}"
+        for page in range(PAGES_PER_QUERY):
+            places = [_place(kw_index, page, item) for item in range(PLACES_PER_PAGE)]
+            if kw_index == 1 and page == 0:
+                places.append(_place(1, 0, 99, phone=places[0]["internationalPhoneNumber"]))
+                places.append(_place(1, 0, 98, phone=_place(0, 1, 2)["internationalPhoneNumber"]))
+            token = f"{kw_index}-p{page + 1}" if page + 1 < PAGES_PER_QUERY else ""
+            pages[(query, f"{kw_index}-p{page}" if page else "")] = (places, token)
+    return pages
+
+
+class _FakePlaces:
+    def __init__(self):
+        self.pages = _recorded_pages()
+        self.lock = threading.Lock()
+        self.calls = []
+
+    def __call__(self, api_key, text_query, city, page_token="", request_spec=None):
+        time.sleep(LATENCY)
+        with self.lock:
+            self.calls.append((text_query, page_token))
+        return self.pages[(text_query, page_token)]
+
+
+class ParserRunnerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(username="parser_admin", password="x", is_staff=True)
+        Client.objects.create(shop_name="Existing", phone=CLIENT_PHONE, full_name="Owner", owner=self.user)
+        self.places = _FakePlaces()
+        for patcher in (
+            patch.object(ps, "get_maps_api_key", return_value="x"),
+            patch.object(ps, "geocode_city_center", return_value=None),
+            patch.object(ps, "_places_search_text", side_effect=self.places),
+            patch.object(ps, "_rate_interval", return_value=timedelta(seconds=0.01)),
+            patch.object(ps, "PAGE_TOKEN_DELAY_SECONDS", 0),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _job(self, request_limit=20):
+        return ps.create_parsing_job(
+            user=self.user,
+            keywords_raw=", ".join(KEYWORDS),
+            cities_raw=CITY,
+            request_limit=request_limit,
+        )
+
+    def _result_counts(self, job):
+        return Counter(LeadParsingResult.objects.filter(job=job).values_list("status", "reason_code"))
+
+    def _run_step_loop(self, job):
+        while job.status == LeadParsingJob.Status.RUNNING:
+            if job.next_step_not_before:
+                delay = (job.next_step_not_before - timezone.now()).total_seconds()
+                if delay > 0:
+                    time.sleep(delay)
+            job = ps.parser_run_step(job)
+        return job
+
+    def test_runner_matches_step_loop_in_a_fraction_of_the_time(self):
+        started = time.monotonic()
+        baseline = self._run_step_loop(self._job())
+        baseline_elapsed = time.monotonic() - started
+        baseline_outcome = self._result_counts(baseline)
+        # Той самий стан історії для другого прогону.
+        ManagementLead.objects.all().delete()
+
+        started = time.monotonic()
+        job = runner.run_parser_job(self._job(), workers=3, lookahead=2)
+        elapsed = time.monotonic() - started
+
+        self.assertEqual(job.status, LeadParsingJob.Status.COMPLETED)
+        self.assertEqual(baseline.status, LeadParsingJob.Status.COMPLETED)
+        self.assertEqual(job.request_count, baseline.request_count)
+        self.assertEqual(self._result_counts(job), baseline_outcome)
+        self.assertEqual(baseline_outcome[("duplicate", "duplicate_job_phone")], 2)
+        self.assertEqual(baseline_outcome[("duplicate", "recent_history_phone")], 1)
+        self.assertLess(elapsed, baseline_elapsed / 2)
+
+    def test_speculative_requests_stay_within_request_limit(self):
+        job = runner.run_parser_job(self._job(request_limit=4), workers=3, lookahead=2)
+
+        self.assertEqual(job.status, LeadParsingJob.Status.COMPLETED)
+        self.assertEqual(job.request_count, 4)
+        self.assertEqual(len(self.places.calls), 4)
+
+    def test_unconsumed_prefetched_requests_are_charged_to_the_job(self):
+        job = runner.run_parser_job(self._job(), max_steps=1, workers=3, lookahead=2)
+
+        self.assertGreater(len(self.places.calls), 1)
+        self.assertEqual(job.request_count, len(self.places.calls))
+        job.refresh_from_db()
+        self.assertEqual(job.request_count, len(self.places.calls))
+
+    def test_run_state_loads_job_rows_and_history_once(self):
+        job = self._job()
+        prepared = ps._prepare_places(self.places.pages[(f"{KEYWORDS[0]} {CITY}", "")][0])
+        state = ps.ParserRunState(job)
+        with patch.object(ps, "lookup_candidates", wraps=ps.lookup_candidates) as lookup:
+            state.batch_for(job, prepared)
+            with self.assertNumQueries(0):
+                batch = state.batch_for(job, prepared)
+        self.assertEqual(lookup.call_count, 1)
+        self.assertEqual(batch.recent_client_phones, set())
+
+        ps._mark_seen(prepared[0], state.job_phones, state.job_place_ids)
+        decision = ps._parser_duplicate_state(job, prepared[0], batch, state.job_phones, state.job_place_ids)
+        self.assertEqual(decision.reason_code, "duplicate_job_place")
+
+
+class RateBudgetTests(SimpleTestCase):
+    def test_starts_are_spaced_by_interval(self):
+        clock = {"t": 100.0}
+        sleeps = []
+
+        def fake_sleep(seconds):
+            sleeps.append(seconds)
+
+        budget = runner._RateBudget(3.0, clock=lambda: clock["t"], sleep=fake_sleep)
+        budget.acquire()
+        budget.acquire()
+        budget.acquire(not_before=110.0)
+        clock["t"] = 200.0
+        budget.acquire()
+        self.assertEqual(sleeps, [3.0, 10.0])
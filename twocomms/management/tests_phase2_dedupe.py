@@ -1,7 +1,16 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase, override_settings
-from management.models import Client, DuplicateReview, ManagementLead
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from management.models import Client, DedupeIndexEntry, DuplicateReview, ManagementLead
 from management.services.dedupe import DedupeZone, evaluate_duplicate_zone
+from management.services.dedupe_index import DedupeQuery, lookup_candidates, reset_common_trigram_keys
 
 
 class DedupeServiceTests(TestCase):
@@ -84,6 +93,107 @@ class DedupeServiceTests(TestCase):
         self.assertEqual(decision.candidates[0]["kind"], "client")
         self.assertEqual(decision.candidates[0]["id"], existing.id)
 
+    def test_transliterated_similar_name_returns_suggestion(self):
+        existing = Client.objects.create(
+            shop_name="Арсенал Мілітарі",
+            phone="+380671112233",
+            full_name="Owner",
+            owner=self.user,
+        )
+
+        decision = evaluate_duplicate_zone(
+            shop_name="Arsenal Military shop",
+            phone="",
+            website_url="",
+            owner=None,
+        )
+
+        self.assertEqual(decision.zone, DedupeZone.SUGGESTION)
+        self.assertEqual(decision.candidates[0]["id"], existing.id)
+        self.assertEqual(decision.candidates[0]["matched_on"], ["name_similar"])
+
+    def test_unrelated_names_sharing_a_word_are_not_candidates(self):
+        Client.objects.create(shop_name="Alpha Store", phone="+380671112233", full_name="Owner", owner=self.user)
+
+        decision = evaluate_duplicate_zone(shop_name="Another Store", phone="", website_url="", owner=None)
+
+        self.assertEqual(decision.zone, DedupeZone.CLEAR)
+
+    def test_index_follows_saves_and_deletes(self):
+        client = Client.objects.create(shop_name="Beta Shop", phone="+380671112233", full_name="Owner", owner=self.user)
+        self.assertTrue(DedupeIndexEntry.objects.filter(object_id=client.id, key="p:+380671112233").exists())
+
+        client.phone = "+380509998877"
+        client.save()
+        keys = set(DedupeIndexEntry.objects.filter(kind="client", object_id=client.id).values_list("key", flat=True))
+        self.assertIn("p:+380509998877", keys)
+        self.assertNotIn("p:+380671112233", keys)
+
+        client.delete()
+        self.assertFalse(DedupeIndexEntry.objects.filter(kind="client", object_id=client.id).exists())
+
+    def test_batch_lookup_query_count_is_independent_of_batch_size(self):
+        for idx in range(6):
+            Client.objects.create(
+                shop_name=f"Batch Shop {idx}",
+                phone=f"+38067111220{idx}",
+                full_name="Owner",
+                owner=self.user,
+            )
+        small = [DedupeQuery(shop_name="Batch Shop 0", phone="+380671112200")]
+        large = [DedupeQuery(shop_name=f"Batch Shop {idx}", phone=f"+38067111220{idx}") for idx in range(6)]
+
+        lookup_candidates(small)  # прогріває кеш частих триграм
+        with CaptureQueriesContext(connection) as small_ctx:
+            lookup_candidates(small)
+        with CaptureQueriesContext(connection) as large_ctx:
+            results = lookup_candidates(large)
+
+        self.assertEqual(len(small_ctx.captured_queries), len(large_ctx.captured_queries))
+        self.assertTrue(all(any(match.exact_phone for match in matches) for matches in results))
+
+    def test_frequent_trigrams_are_not_fetched_or_used_for_blocking(self):
+        for idx in range(4):
+            Client.objects.create(shop_name=f"Magazyn {idx}{idx}{idx}", phone=f"+38067333000{idx}", full_name="Owner")
+        target = Client.objects.create(shop_name="Zubr Tactic", phone="+380673339999", full_name="Owner")
+
+        with patch("management.services.dedupe_index.MAX_TRIGRAM_POSTINGS", 3):
+            reset_common_trigram_keys()
+            with CaptureQueriesContext(connection) as ctx:
+                [matches] = lookup_candidates([DedupeQuery(shop_name="Magazyn Zubr Tactic")])
+            # Набір частих триграм кешується: повторний пошук не рахує GROUP BY знову.
+            with CaptureQueriesContext(connection) as repeat_ctx:
+                lookup_candidates([DedupeQuery(shop_name="Magazyn Zubr")])
+            reset_common_trigram_keys()
+
+        self.assertEqual([match.obj.id for match in matches], [target.id])
+        postings_sql = next(q["sql"] for q in ctx.captured_queries if '"object_id"' in q["sql"])
+        self.assertNotIn("t:gaz", postings_sql)
+        self.assertIn("t:zub", postings_sql)
+        self.assertFalse(any("GROUP BY" in q["sql"] for q in repeat_ctx.captured_queries))
+
+    def test_created_since_filters_candidate_rows_in_sql(self):
+        old = Client.objects.create(shop_name="Old Shop", phone="+380674440001", full_name="Owner")
+        Client.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=90))
+        fresh = Client.objects.create(shop_name="Fresh Shop", phone="+380674440002", full_name="Owner")
+        queries = [DedupeQuery(phone="+380674440001"), DedupeQuery(phone="+380674440002")]
+
+        with CaptureQueriesContext(connection) as ctx:
+            results = lookup_candidates(queries, created_since=timezone.now() - timedelta(days=30))
+
+        self.assertEqual(results[0], [])
+        self.assertEqual([match.obj.id for match in results[1]], [fresh.id])
+        rows_sql = next(q["sql"] for q in ctx.captured_queries if 'FROM "management_client"' in q["sql"])
+        self.assertIn('"created_at" >=', rows_sql)
+
+    def test_rebuild_command_restores_index(self):
+        client = Client.objects.create(shop_name="Gamma", phone="+380671112233", full_name="Owner", owner=self.user)
+        DedupeIndexEntry.objects.all().delete()
+
+        call_command("rebuild_dedupe_index", stdout=StringIO())
+
+        self.assertTrue(DedupeIndexEntry.objects.filter(kind="client", object_id=client.id, key="n:gamma").exists())
+
 
 @override_settings(ROOT_URLCONF="twocomms.urls_management")
 class LeadCreateDedupeApiTests(TestCase):
@@ -1,21 +1,30 @@
-from datetime import date, datetime, time
+import pickle
+from concurrent.futures import Future
+from datetime import date, datetime, time, timedelta
 from decimal import Decimal
+from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
-from django.core.management import call_command
+from django.core.management import CommandError, call_command
+from django.db import connection
 from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
 from management.models import (
+    CallRecord,
     Client,
+    ClientFollowUp,
     CommandRunLog,
     ManagementDailyActivity,
     ManagementStatsConfig,
     ManagerDayStatus,
     NightlyScoreSnapshot,
+    Report,
     ScoreAppeal,
 )
+from management.services.snapshot_engine import run_nightly_snapshots
 from management.services.snapshots import build_daily_stats_range, persist_nightly_snapshot
 from management.stats_service import get_stats_payload
 
@@ -183,6 +192,171 @@ class ComputeNightlyScoresCommandTests(TestCase):
 
         self.assertTrue(NightlyScoreSnapshot.objects.filter(owner=excluded, snapshot_date=target_date).exists())
 
+    def _seed_manager_day(self, target_date, phone, *, hour=11, activity=True):
+        created_at = timezone.make_aware(datetime.combine(target_date, time(hour=hour, minute=0)))
+        client = Client.objects.create(
+            shop_name=f"Backfill Shop {phone}",
+            phone=phone,
+            full_name="Owner",
+            owner=self.manager,
+            call_result=Client.CallResult.THINKING,
+            points_override=120,
+            source="Instagram",
+        )
+        Client.objects.filter(pk=client.pk).update(created_at=created_at)
+        if activity:
+            ManagementDailyActivity.objects.create(user=self.manager, date=target_date, active_seconds=3_600, last_seen_at=created_at)
+        return client
+
+    def test_range_backfill_skips_unchanged_owner_days(self):
+        days = [date(2026, 3, 9), date(2026, 3, 10), date(2026, 3, 11)]
+        for idx, day in enumerate(days):
+            self._seed_manager_day(day, f"+38067111330{idx}")
+
+        call_command("compute_nightly_scores", date_from="2026-03-09", date_to="2026-03-11")
+
+        self.assertEqual(NightlyScoreSnapshot.objects.filter(owner=self.manager).count(), 3)
+        first_run = CommandRunLog.objects.get(run_key="compute_nightly_scores:2026-03-09..2026-03-11:all")
+        self.assertEqual(first_run.rows_processed, 3)
+        self.assertEqual(first_run.meta["computed"], 3)
+        self.assertTrue(all(snap.payload.get("input_fingerprint") for snap in NightlyScoreSnapshot.objects.all()))
+
+        call_command("compute_nightly_scores", date_from="2026-03-09", date_to="2026-03-11")
+        second_run = CommandRunLog.objects.get(run_key="compute_nightly_scores:2026-03-09..2026-03-11:all")
+        self.assertEqual(second_run.meta["computed"], 0)
+        self.assertEqual(second_run.meta["skipped_unchanged"], 3)
+
+        cache.clear()
+        self._seed_manager_day(days[2], "+380671113399", hour=15, activity=False)
+        stats = run_nightly_snapshots(owner_ids=[self.manager.id], dates=days)
+        self.assertEqual(stats.computed_keys, [(self.manager.id, "2026-03-11")])
+
+        stats = run_nightly_snapshots(owner_ids=[self.manager.id], dates=days, force=True)
+        self.assertEqual(stats.computed, 3)
+
+    def test_engine_snapshot_matches_single_owner_snapshot(self):
+        target_date = date(2026, 3, 12)
+        self._seed_manager_day(target_date, "+380671113401")
+
+        single = persist_nightly_snapshot(owner=self.manager, snapshot_date=target_date)
+        single_payload = dict(single.payload)
+        cache.clear()
+        run_nightly_snapshots(owner_ids=[self.manager.id], dates=[target_date], force=True)
+        engine = NightlyScoreSnapshot.objects.get(owner=self.manager, snapshot_date=target_date)
+
+        self.assertEqual(engine.mosaic_score, single.mosaic_score)
+        self.assertEqual(engine.working_day_factor, single.working_day_factor)
+        self.assertEqual(engine.payload["axes"], single_payload["axes"])
+        self.assertEqual(engine.payload["trust"], single_payload["trust"])
+
+    def _seed_followups_reports_and_calls(self, owner, target_date, phone, statuses=("open", "missed")):
+        client = self._seed_manager_day(target_date, phone, activity=owner == self.manager)
+        client.owner = owner
+        client.save(update_fields=["owner"])
+        due_at = timezone.make_aware(datetime.combine(target_date, time(hour=12, minute=0)))
+        for status in statuses:
+            ClientFollowUp.objects.create(client=client, owner=owner, due_at=due_at, due_date=target_date, status=status)
+        report = Report.objects.create(owner=owner, points=10, processed=1)
+        Report.objects.filter(pk=report.pk).update(created_at=due_at + timedelta(hours=8))
+        call = CallRecord.objects.create(
+            provider="binotel", external_call_id=f"call-{phone}", manager=owner, duration_seconds=120
+        )
+        CallRecord.objects.filter(pk=call.pk).update(created_at=due_at, started_at=due_at)
+
+    def test_engine_summary_from_shared_day_inputs_matches_single_owner_snapshot(self):
+        target_date = date(2026, 3, 12)
+        self._seed_followups_reports_and_calls(self.manager, target_date, "+380671113402")
+
+        single = persist_nightly_snapshot(owner=self.manager, snapshot_date=target_date)
+        single_payload = dict(single.payload)
+        cache.clear()
+        run_nightly_snapshots(owner_ids=[self.manager.id], dates=[target_date], force=True)
+        engine = NightlyScoreSnapshot.objects.get(owner=self.manager, snapshot_date=target_date)
+
+        self.assertEqual(engine.payload["summary"]["followups"]["missed_effective"], 2)
+        self.assertEqual(engine.payload["summary"], single_payload["summary"])
+        self.assertEqual(engine.payload["telephony_health"], single_payload["telephony_health"])
+        self.assertEqual(engine.payload["meta"]["call_quality"], single_payload["meta"]["call_quality"])
+        self.assertEqual(engine.mosaic_score, single.mosaic_score)
+
+    def test_day_aggregates_are_queried_once_for_all_owners(self):
+        target_date = date(2026, 3, 12)
+        shared_tables = {f"management_{name}" for name in ("clientfollowup", "report", "callrecord", "shopshipment")}
+
+        def shared_table_queries(owner_ids):
+            cache.clear()
+            # v7-факти матеріалізуються окремо на кожного менеджера — тут не рахуємо.
+            with patch("management.services.analytics_v7.build_shadow_score_payload_v7", return_value={}), \
+                    CaptureQueriesContext(connection) as queries:
+                run_nightly_snapshots(owner_ids=owner_ids, dates=[target_date], force=True)
+            selects = [query["sql"] for query in queries.captured_queries if query["sql"].startswith("SELECT")]
+            return [sql for sql in selects if sql.split(" FROM ", 1)[1].split(" ", 1)[0].strip('"') in shared_tables]
+
+        managers = [self.manager] + [
+            get_user_model().objects.create_user(username=f"shared_mgr_{idx}", password="x", is_staff=True)
+            for idx in range(2)
+        ]
+        for idx, manager in enumerate(managers):
+            self._seed_followups_reports_and_calls(
+                manager, target_date, f"+38067111350{idx}", statuses=("done", "rescheduled")
+            )
+
+        single = shared_table_queries([self.manager.id])
+        everyone = shared_table_queries([manager.id for manager in managers])
+
+        self.assertTrue(single)
+        self.assertEqual(len(everyone), len(single))
+
+    def test_workers_option_runs_owner_chunks_in_a_process_pool(self):
+        target_date = date(2026, 3, 12)
+        second = get_user_model().objects.create_user(username="pool_mgr", password="x", is_staff=True)
+        self._seed_manager_day(target_date, "+380671113501")
+        pools = []
+
+        class InlineProcessPool:
+            """Виконує задачі в цьому процесі (тестова БД у пам'яті), але перевіряє, що вони pickle-уються."""
+
+            def __init__(self, max_workers, initializer=None):
+                self.max_workers = max_workers
+                self.submitted = []
+                pools.append(self)
+                if initializer:
+                    initializer()
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc_info):
+                return False
+
+            def submit(self, fn, *args):
+                fn, args = pickle.loads(pickle.dumps((fn, args)))
+                self.submitted.append(args)
+                future = Future()
+                future.set_result(fn(*args))
+                return future
+
+        with patch("management.services.snapshot_engine.ProcessPoolExecutor", InlineProcessPool):
+            call_command("compute_nightly_scores", date=target_date.isoformat(), workers=2)
+
+        self.assertEqual(len(pools), 1)
+        self.assertEqual(pools[0].max_workers, 2)
+        chunks = sorted(args[0] for args in pools[0].submitted)
+        self.assertEqual(chunks, sorted([[self.manager.id], [second.id]]))
+        self.assertEqual(
+            set(NightlyScoreSnapshot.objects.filter(snapshot_date=target_date).values_list("owner_id", flat=True)),
+            {self.manager.id, second.id},
+        )
+        run_log = CommandRunLog.objects.get(command_name="compute_nightly_scores")
+        self.assertEqual(run_log.meta["workers"], 2)
+        self.assertEqual(run_log.meta["computed"], 2)
+
+    def test_range_arguments_are_validated(self):
+        with self.assertRaises(CommandError):
+            call_command("compute_nightly_scores", date_from="2026-03-12", date_to="2026-03-10")
+        with self.assertRaises(CommandError):
+            call_command("compute_nightly_scores", date="2026-03-12", date_from="2026-03-10", date_to="2026-03-12")
+
 
 @override_settings(ROOT_URLCONF="twocomms.urls_management")
 class StatsShadowUiTests(TestCase):
@@ -0,0 +1,109 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from management.models import Client, ManagerLevel
+from management.services import manager_levels as ml
+from management.services.level_progression import get_progression_status
+from management.services.roster_metrics import compute_roster_metrics, get_roster_metrics
+from management.services.visible_points import VISIBLE_POINTS_POLICY_VERSION
+from management.views import get_user_stats
+
+User = get_user_model()
+
+
+class RosterMetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_user(username="roster_boss", password="x", is_staff=True)
+        self.managers = [User.objects.create_user(username=f"roster_mgr_{i}", password="x") for i in range(3)]
+        ManagerLevel.objects.create(user=self.managers[0], level=ManagerLevel.Level.CANDIDATE)
+        ManagerLevel.objects.create(
+            user=self.managers[1],
+            level=ManagerLevel.Level.LEVEL_1,
+            salary_start_date=timezone.localdate() - timedelta(days=40),
+        )
+        self._seed_clients()
+
+    def _client(self, owner, idx, call_result, **extra):
+        return Client.objects.create(
+            shop_name=f"Shop {owner.pk}-{idx}",
+            phone=f"+38067{owner.pk:03d}{idx:04d}",
+            full_name="Owner",
+            owner=owner,
+            call_result=call_result,
+            **extra,
+        )
+
+    def _seed_clients(self):
+        old = timezone.now() - timedelta(days=3)
+        for idx, result in enumerate([Client.CallResult.ORDER, Client.CallResult.NO_ANSWER, Client.CallResult.THINKING]):
+            self._client(self.managers[0], idx, result)
+        stale = self._client(self.managers[0], 10, Client.CallResult.TEST_BATCH)
+        Client.objects.filter(pk=stale.pk).update(created_at=old)
+        self._client(self.managers[1], 1, Client.CallResult.SENT_EMAIL, points_override=9)
+        self._client(
+            self.managers[1],
+            2,
+            Client.CallResult.NOT_INTERESTED,
+            call_result_context={"points_policy_version": VISIBLE_POINTS_POLICY_VERSION},
+        )
+        self._client(self.staff, 1, Client.CallResult.ORDER)
+
+    def _roster(self):
+        return [User.objects.get(pk=u.pk) for u in [self.staff, *self.managers]]
+
+    def test_metrics_match_per_user_services(self):
+        users = self._roster()
+        metrics = compute_roster_metrics(users)
+        for user in users:
+            row = metrics[user.pk]
+            expected = get_user_stats(user)
+            for key, value in expected.items():
+                self.assertEqual(row[key], value, f"{user.username}:{key}")
+            fresh = User.objects.get(pk=user.pk)
+            level = ml.get_current_level(fresh)
+            self.assertEqual(getattr(row["level"], "level", None), getattr(level, "level", None))
+            self.assertEqual(row["progression"], get_progression_status(fresh))
+        self.assertEqual(metrics[self.staff.pk]["level"].level, ManagerLevel.Level.ADMIN)
+        self.assertIsNone(metrics[self.managers[2].pk]["level"])
+
+    def test_query_count_does_not_grow_with_headcount(self):
+        small = self._roster()
+        with CaptureQueriesContext(connection) as small_ctx:
+            compute_roster_metrics(small)
+        for i in range(5):
+            extra = User.objects.create_user(username=f"roster_extra_{i}", password="x")
+            ManagerLevel.objects.create(user=extra, level=ManagerLevel.Level.CANDIDATE)
+            self._client(extra, 1, Client.CallResult.ORDER)
+        large = list(User.objects.all())
+        with CaptureQueriesContext(connection) as large_ctx:
+            compute_roster_metrics(large)
+        self.assertEqual(len(small_ctx.captured_queries), len(large_ctx.captured_queries))
+
+    def test_cached_per_roster_version(self):
+        users = self._roster()
+        first = get_roster_metrics(users)
+        with CaptureQueriesContext(connection) as ctx:
+            again = get_roster_metrics(users)
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertEqual(again[self.managers[2].pk]["processed_total"], 0)
+        self.assertEqual(first[self.managers[2].pk]["processed_total"], 0)
+
+        self._client(self.managers[2], 1, Client.CallResult.ORDER)
+        refreshed = get_roster_metrics(users)
+        self.assertEqual(refreshed[self.managers[2].pk]["processed_total"], 1)
+        self.assertEqual(refreshed[self.managers[2].pk]["processed_today"], 1)
+
+    def test_level_change_invalidates_cache(self):
+        users = self._roster()
+        self.assertIsNone(get_roster_metrics(users)[self.managers[2].pk]["level"])
+        ManagerLevel.objects.create(user=self.managers[2], level=ManagerLevel.Level.CANDIDATE)
+        row = get_roster_metrics(users)[self.managers[2].pk]
+        self.assertEqual(row["level"].level, ManagerLevel.Level.CANDIDATE)
+        self.assertEqual(row["progression"]["next_level"], ManagerLevel.Level.LEVEL_1)
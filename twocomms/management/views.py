@@ -1619,10 +1619,7 @@ def admin_overview(request):
 
     today_start, today_end = get_today_range()
     admin_user_data = []
-    users = manager_roster_queryset(include_staff=True).annotate(
-        total_clients=Count('management_clients', distinct=True),
-        today_clients=Count('management_clients', filter=Q(management_clients__created_at__gte=today_start), distinct=True),
-    ).distinct()
+    users = manager_roster_queryset(include_staff=True)
 
     stats = get_user_stats(request.user)
     user_points_today = stats['points_today']
@@ -1633,10 +1630,13 @@ def admin_overview(request):
     progress_points_pct = min(100, int(user_points_today / TARGET_POINTS_DAY * 100)) if TARGET_POINTS_DAY else 0
 
     if tab == 'managers':
-        from management.services.manager_levels import get_current_level, get_level_display_name
-        from management.services.level_progression import get_progression_status
+        from management.services.manager_levels import get_level_display_name
+        from management.services.roster_metrics import get_roster_metrics
         from management.services.activity_tracking import get_last_seen_map, compute_online_state
 
+        users = list(users)
+        # Бали/кількості/рівні/прогрес — пакетно на весь склад (кеш на день).
+        roster_metrics = get_roster_metrics(users)
         last_seen_map = get_last_seen_map(users)
 
         # MOSAIC: останній нічний снапшот по кожному менеджеру (shadow-показник).
@@ -1669,13 +1669,12 @@ def admin_overview(request):
             last_seen_at = last_seen_map.get(u.id)
             online_state = compute_online_state(last_seen_at)
             online = online_state['online']
-            user_clients = Client.objects.filter(owner=u).order_by('-created_at')
-            points_stats = get_user_stats(u)
+            points_stats = roster_metrics[u.id]
 
-            level_obj = get_current_level(u)
+            level_obj = points_stats['level']
             level_code = level_obj.level if level_obj else ''
             level_label = get_level_display_name(level_obj.level) if level_obj else 'Без рівня'
-            progression = get_progression_status(u)
+            progression = points_stats['progression']
 
             mosaic = mosaic_map.get(u.id)
             mosaic_score = float(mosaic['mosaic_score']) if mosaic else None
@@ -1702,8 +1701,8 @@ def admin_overview(request):
                 'id': u.id,
                 'name': u.get_full_name() or u.username,
                 'role': role_label,
-                'today': u.today_clients,
-                'total': u.total_clients,
+                'today': points_stats['processed_today'],
+                'total': points_stats['processed_total'],
                 'points_today': points_stats['points_today'],
                 'points_total': points_stats['points_total'],
                 'online': online,
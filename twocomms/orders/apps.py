@@ -13,3 +13,14 @@ class OrdersConfig(AppConfig):
             from . import wholesale_signals  # noqa: F401
         except Exception:
             pass
+        # Інкрементальна статистика дропшиперів (DropshipperStats).
+        try:
+            from . import dropshipper_signals  # noqa: F401
+        except Exception:
+            pass
+        # Клієнт Telegram відстежує веб-запити (request_started/finished), щоб
+        # не блокувати їх чергою лімітів; підключаємо до першого запиту.
+        try:
+            from . import telegram_client  # noqa: F401
+        except Exception:
+            pass
@@ -0,0 +1,190 @@
+"""
+Коалесцирующая отправка серверных событий конверсий (Facebook CAPI, TikTok Events).
+
+Раньше каждое событие уходило отдельным HTTP-запросом прямо из потока запроса,
+хотя обе платформы принимают пачку событий одного пикселя за один вызов.
+``CoalescingEventDispatcher`` собирает события по ключу группы (пиксель +
+test_event_code) в течение короткого окна (``flush_window``) и отправляет их
+одним запросом:
+
+* дубликаты по ``event_id`` не ставятся в очередь повторно — возвращается тот
+  же ``DeliveryTicket``; недавно доставленные ``event_id`` тоже не шлются снова;
+* ``send_batch(key, events)`` возвращает ``BatchOutcome``: повторяется только
+  поднабор ``retry`` (исключение = повторить всю пачку), ``rejected`` сразу
+  получают отказ без повторов;
+* вызывающий код может дождаться результата (``ticket.wait()``) или не ждать
+  вовсе (checkout: AddPaymentInfo), тогда HTTP и повторы идут в фоне.
+
+``flush_window <= 0`` отключает окно: пачка отправляется сразу в потоке
+вызывающего кода.
+"""
+from __future__ import annotations
+
+import atexit
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+RECENT_EVENT_IDS_LIMIT = 2048
+
+
+@dataclass
+class BatchOutcome:
+    """``event_id`` из пачки, которые не приняты: повторить / отказ без повторов."""
+
+    retry: Set[str] = field(default_factory=set)
+    rejected: Set[str] = field(default_factory=set)
+
+
+class DeliveryTicket:
+    """Результат доставки одного события (общий для его дубликатов)."""
+
+    def __init__(self, event_id: str) -> None:
+        self.event_id = event_id
+        self.delivered = False
+        self._done = threading.Event()
+
+    def resolve(self, delivered: bool) -> None:
+        self.delivered = delivered
+        self._done.set()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """True — событие принято платформой; False — ошибка или таймаут."""
+        if not self._done.wait(timeout):
+            return False
+        return self.delivered
+
+
+class CoalescingEventDispatcher:
+    def __init__(
+        self,
+        name: str,
+        send_batch: Callable[[Hashable, List[Any]], Optional[BatchOutcome]],
+        *,
+        flush_window: float = 0.05,
+        max_batch_size: int = 100,
+        max_attempts: int = 3,
+        retry_delay: float = 1.0,
+        retry_backoff: float = 2.0,
+    ) -> None:
+        self.name = name
+        self.send_batch = send_batch
+        self.flush_window = flush_window
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_delay = retry_delay
+        self.retry_backoff = max(1.0, retry_backoff)
+
+        self._lock = threading.Lock()
+        self._pending: Dict[Hashable, "OrderedDict[str, tuple[Any, DeliveryTicket]]"] = {}
+        self._timers: Dict[Hashable, threading.Timer] = {}
+        self._in_flight: Dict[str, DeliveryTicket] = {}
+        self._recent: "OrderedDict[str, None]" = OrderedDict()
+        atexit.register(self.flush)
+
+    def submit(self, key: Hashable, event_id: str, event: Any) -> DeliveryTicket:
+        """Ставит событие в пачку группы ``key`` и возвращает его ticket."""
+        flush_now = False
+        with self._lock:
+            if event_id in self._recent:
+                ticket = DeliveryTicket(event_id)
+                ticket.resolve(True)
+                logger.info("%s: event %s already delivered, skipping duplicate", self.name, event_id)
+                return ticket
+
+            if event_id in self._in_flight:
+                return self._in_flight[event_id]
+            group = self._pending.setdefault(key, OrderedDict())
+            if event_id in group:
+                return group[event_id][1]
+
+            ticket = DeliveryTicket(event_id)
+            group[event_id] = (event, ticket)
+            if self.flush_window <= 0 or len(group) >= self.max_batch_size:
+                flush_now = True
+            elif key not in self._timers:
+                timer = threading.Timer(self.flush_window, self._flush_group, args=(key,))
+                timer.daemon = True
+                self._timers[key] = timer
+                timer.start()
+
+        if flush_now:
+            self._flush_group(key)
+        return ticket
+
+    def flush(self) -> None:
+        """Немедленно отправляет все ожидающие пачки (тесты, завершение процесса)."""
+        with self._lock:
+            keys = list(self._pending)
+        for key in keys:
+            self._flush_group(key)
+
+    def _flush_group(self, key: Hashable) -> None:
+        with self._lock:
+            timer = self._timers.pop(key, None)
+            if timer is not None and timer is not threading.current_thread():
+                timer.cancel()
+            group = self._pending.pop(key, None)
+            for event_id, (_, ticket) in (group or {}).items():
+                self._in_flight[event_id] = ticket
+        if group:
+            self._deliver(key, group)
+
+    def _deliver(self, key: Hashable, group: "OrderedDict[str, tuple[Any, DeliveryTicket]]") -> None:
+        remaining = group
+        delay = self.retry_delay
+        attempt = 1
+        while True:
+            events = [event for event, _ in remaining.values()]
+            try:
+                outcome = self.send_batch(key, events) or BatchOutcome()
+            except Exception as exc:
+                logger.warning(
+                    "%s: batch of %s events failed (attempt %s/%s): %s",
+                    self.name, len(events), attempt, self.max_attempts, exc,
+                )
+                outcome = BatchOutcome(retry=set(remaining))
+
+            retry = set(outcome.retry) & set(remaining)
+            rejected = (set(outcome.rejected) & set(remaining)) - retry
+            if attempt >= self.max_attempts and retry:
+                logger.error(
+                    "%s: %s events not delivered after %s attempts: %s",
+                    self.name, len(retry), attempt, sorted(retry),
+                )
+                rejected |= retry
+                retry = set()
+
+            with self._lock:
+                for event_id in remaining:
+                    if event_id in retry:
+                        continue
+                    self._in_flight.pop(event_id, None)
+                    if event_id not in rejected:
+                        self._recent[event_id] = None
+                while len(self._recent) > RECENT_EVENT_IDS_LIMIT:
+                    self._recent.popitem(last=False)
+            for event_id, (_, ticket) in remaining.items():
+                if event_id not in retry:
+                    ticket.resolve(event_id not in rejected)
+
+            remaining = OrderedDict((event_id, item) for event_id, item in remaining.items() if event_id in retry)
+            if not remaining:
+                return
+
+            logger.warning(
+                "%s: retrying %s of %s events in %s s",
+                self.name, len(remaining), len(group), delay,
+            )
+            time.sleep(delay)
+            delay *= self.retry_backoff
+            attempt += 1
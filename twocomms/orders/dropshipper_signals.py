@@ -0,0 +1,102 @@
+"""
+Сигнали інкрементальної статистики дропшипера (orders.DropshipperStats).
+
+Підключаються в OrdersConfig.ready() окремо від orders/signals.py, як і
+wholesale_signals. Логіка внеску заказу — orders.services.dropshipper_stats.
+Зміни через QuerySet.update() сигналів не дають — їх вирівнює
+``manage.py reconcile_dropshipper_stats``.
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import DropshipperOrder, DropshipperOrderItem
+from .services.dropshipper_stats import (
+    RECEIVED,
+    apply_stats_delta,
+    contribution_delta,
+    order_contribution,
+    received_items_count,
+    refresh_last_order_date,
+)
+
+
+@receiver(pre_save, sender=DropshipperOrder)
+def remember_dropshipper_order_state(sender, instance, raw=False, **kwargs):
+    instance._stats_previous = None
+    if raw or not instance.pk:
+        return
+    instance._stats_previous = (
+        DropshipperOrder.objects.filter(pk=instance.pk)
+        .values('status', 'total_selling_price', 'total_drop_price')
+        .first()
+    )
+
+
+@receiver(post_save, sender=DropshipperOrder)
+def apply_dropshipper_order_stats(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_stats_previous', None)
+    old = None
+    if previous is not None:
+        old = order_contribution(previous['status'], previous['total_selling_price'], previous['total_drop_price'])
+    new = order_contribution(instance.status, instance.total_selling_price, instance.total_drop_price)
+    delta = contribution_delta(old, new)
+
+    was_received = previous is not None and previous['status'] == RECEIVED
+    is_received = instance.status == RECEIVED
+    items_sold = 0
+    if was_received != is_received:
+        items_sold = received_items_count(instance.pk) * (1 if is_received else -1)
+
+    apply_stats_delta(
+        instance.dropshipper_id,
+        items_sold=items_sold,
+        order_created_at=instance.created_at if created else None,
+        **delta,
+    )
+    instance._stats_previous = None
+
+
+@receiver(post_delete, sender=DropshipperOrder)
+def drop_dropshipper_order_stats(sender, instance, **kwargs):
+    old = order_contribution(instance.status, instance.total_selling_price, instance.total_drop_price)
+    apply_stats_delta(instance.dropshipper_id, **contribution_delta(old, None))
+    if instance.created_at:
+        refresh_last_order_date(instance.dropshipper_id, instance.created_at)
+
+
+def _received_order_owner(order_id):
+    return (
+        DropshipperOrder.objects.filter(pk=order_id, status=RECEIVED)
+        .values_list('dropshipper_id', flat=True)
+        .first()
+    )
+
+
+@receiver(pre_save, sender=DropshipperOrderItem)
+def remember_dropshipper_item_quantity(sender, instance, raw=False, **kwargs):
+    instance._stats_previous_quantity = 0
+    if raw or not instance.pk:
+        return
+    instance._stats_previous_quantity = (
+        DropshipperOrderItem.objects.filter(pk=instance.pk).values_list('quantity', flat=True).first() or 0
+    )
+
+
+@receiver(post_save, sender=DropshipperOrderItem)
+def apply_dropshipper_item_stats(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    diff = instance.quantity - getattr(instance, '_stats_previous_quantity', 0)
+    if diff:
+        dropshipper_id = _received_order_owner(instance.order_id)
+        if dropshipper_id:
+            apply_stats_delta(dropshipper_id, items_sold=diff)
+
+
+@receiver(post_delete, sender=DropshipperOrderItem)
+def drop_dropshipper_item_stats(sender, instance, **kwargs):
+    dropshipper_id = _received_order_owner(instance.order_id)
+    if dropshipper_id and instance.quantity:
+        apply_stats_delta(dropshipper_id, items_sold=-instance.quantity)
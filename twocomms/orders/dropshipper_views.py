@@ -232,9 +232,9 @@ def dropshipper_dashboard(request):
             'is_locked': True  # Флаг для шаблона
         })
 
-    # Получаем или создаем статистику дропшипера
+    # Статистика ведётся инкрементально сигналами заказов; новую — досчитываем разово
     stats, created = DropshipperStats.objects.get_or_create(dropshipper=request.user)
-    if not created:
+    if created:
         stats.update_stats()
 
     # Получаем последние заказы
@@ -382,9 +382,9 @@ def dropshipper_orders(request):
 @login_required
 def dropshipper_statistics(request):
     """Страница со статистикой дропшипера"""
-    # Получаем статистику
+    # Получаем статистику (ведётся инкрементально сигналами заказов)
     stats, created = DropshipperStats.objects.get_or_create(dropshipper=request.user)
-    if not created:
+    if created:
         stats.update_stats()
 
     # Получаем статистику по месяцам
@@ -886,11 +886,7 @@ def update_order_status(request, order_id):
 
         if new_status in [choice[0] for choice in DropshipperOrder.STATUS_CHOICES]:
             order.status = new_status
-            order.save()
-
-            # Обновляем статистику
-            stats, created = DropshipperStats.objects.get_or_create(dropshipper=request.user)
-            stats.update_stats()
+            order.save()  # статистику обновляют сигналы (orders.dropshipper_signals)
 
             return JsonResponse({
                 'success': True,
@@ -29,6 +29,8 @@ from django.core.exceptions import ValidationError
 from django.core.validators import validate_email
 from storefront.utils.analytics_helpers import get_offer_id as build_offer_id
 
+from .conversion_dispatcher import BatchOutcome, CoalescingEventDispatcher
+
 logger = logging.getLogger(__name__)
 
 
@@ -41,6 +43,8 @@ class FacebookConversionsService:
     - Отправка Lead событий при предоплате
     - Advanced Matching (email, phone, user_data)
     - Дедупликация с клиентскими событиями через event_id
+    - Пакетная отправка: события одного пикселя за окно FLUSH_WINDOW_SECONDS
+      уходят одним EventRequest (orders.conversion_dispatcher)
     """
 
     MAX_EVENT_AGE_SECONDS = 7 * 24 * 60 * 60
@@ -49,6 +53,9 @@ class FacebookConversionsService:
     PHONE_MIN_LENGTH = 10
     PHONE_MAX_LENGTH = 15
     CITY_SANITIZE_RE = re.compile(r'[^a-z0-9]')
+    FLUSH_WINDOW_SECONDS = 0.05
+    MAX_BATCH_SIZE = 100  # Graph API принимает до 1000 событий за запрос
+    DELIVERY_WAIT_TIMEOUT = 60
 
     def __init__(self):
         """Инициализация сервиса с настройками из ENV"""
@@ -58,6 +65,15 @@ class FacebookConversionsService:
         self.retry_max_attempts = getattr(settings, 'FACEBOOK_CAPI_MAX_RETRIES', 3)
         self.retry_initial_delay = getattr(settings, 'FACEBOOK_CAPI_RETRY_DELAY', 1)
         self.retry_backoff = getattr(settings, 'FACEBOOK_CAPI_RETRY_BACKOFF', 2)
+        self.dispatcher = CoalescingEventDispatcher(
+            'Facebook CAPI',
+            self._send_batch,
+            flush_window=getattr(settings, 'FACEBOOK_CAPI_FLUSH_WINDOW', self.FLUSH_WINDOW_SECONDS),
+            max_batch_size=self.MAX_BATCH_SIZE,
+            max_attempts=self.retry_max_attempts,
+            retry_delay=max(0.5, self.retry_initial_delay),
+            retry_backoff=self.retry_backoff,
+        )
 
         # Проверяем наличие обязательных настроек
         if not self.access_token or not self.pixel_id:
@@ -224,35 +240,21 @@ class FacebookConversionsService:
         except Exception:
             return None
 
-    def _validate_response(self, response, order, event_name: str, event_id: str) -> bool:
-        """Проверяет, что API принял событие без ошибок."""
+    def _validate_response(self, response, events) -> bool:
+        """Проверяет, что API принял пачку событий без ошибок."""
+        label = ', '.join(f"{event.event_name}:{event.event_id}" for event in events)
         if response is None:
-            logger.error(
-                "❌ Facebook Conversions API returned empty response for %s event (%s)",
-                event_name,
-                order.order_number,
-            )
+            logger.error("❌ Facebook Conversions API returned empty response for %s", label)
             return False
 
         errors = self._get_response_attr(response, 'errors')
         if errors:
-            logger.error(
-                "❌ Facebook API errors for %s event (order %s, event_id %s): %s",
-                event_name,
-                order.order_number,
-                event_id,
-                errors,
-            )
+            logger.error("❌ Facebook API errors for %s: %s", label, errors)
             return False
 
         warnings = self._get_response_attr(response, 'warnings')
         if warnings:
-            logger.warning(
-                "⚠️ Facebook API warnings for %s event (order %s): %s",
-                event_name,
-                order.order_number,
-                warnings,
-            )
+            logger.warning("⚠️ Facebook API warnings for %s: %s", label, warnings)
 
         events_received = self._get_response_attr(response, 'events_received')
         try:
@@ -261,56 +263,80 @@ class FacebookConversionsService:
             events_received_value = 0 if events_received is None else events_received
 
         if not events_received_value:
-            logger.error(
-                "❌ Facebook API accepted 0 %s events for order %s (event_id %s)",
-                event_name,
-                order.order_number,
-                event_id,
-            )
+            logger.error("❌ Facebook API accepted 0 events for %s", label)
             return False
 
         events_dropped = self._get_response_attr(response, 'events_dropped')
         if events_dropped:
-            logger.warning(
-                "⚠️ Facebook API dropped %s %s events for order %s",
-                events_dropped,
-                event_name,
-                order.order_number,
-            )
+            logger.warning("⚠️ Facebook API dropped %s events for %s", events_dropped, label)
 
         return True
 
-    def _send_request_with_retry(self, event_request, order, event_name: str):
-        """Отправляет запрос в Facebook с повторными попытками при ошибках."""
-        attempt = 1
-        delay = self.retry_initial_delay
-        while attempt <= max(1, self.retry_max_attempts):
+    def _is_client_error(self, exc) -> bool:
+        """4xx от Graph API (кроме 429 и транзиентных) — повтор не поможет."""
+        from facebook_business.exceptions import FacebookRequestError
+
+        if not isinstance(exc, FacebookRequestError) or exc.api_transient_error():
+            return False
+        try:
+            status = int(exc.http_status())
+        except (TypeError, ValueError):
+            return False
+        return 400 <= status < 500 and status != 429
+
+    def _send_batch(self, key, events) -> BatchOutcome:
+        """Отправляет пачку событий одного пикселя одним EventRequest.
+
+        Сеть, 429 и 5xx — исключение, диспетчер повторит всю пачку. Ошибка
+        Graph API (4xx или ``errors`` в ответе) относится ко всему запросу,
+        поэтому пачка делится пополам, пока не останутся отдельные плохие
+        события — только они получают отказ без повторов.
+        """
+        pixel_id, test_event_code = key
+        event_request = self.EventRequest(pixel_id=pixel_id, events=events)
+        if test_event_code:
+            event_request.test_event_code = test_event_code
+        try:
+            response = event_request.execute()
+        except Exception as exc:
+            if not self._is_client_error(exc):
+                raise
+            logger.error(
+                "❌ Facebook API rejected %s events (HTTP %s): %s",
+                len(events), exc.http_status(), exc.api_error_message(),
+            )
+        else:
+            if self._validate_response(response, events):
+                logger.info("✅ Facebook Conversions API accepted %s events", len(events))
+                return BatchOutcome()
+        if len(events) == 1:
+            return BatchOutcome(rejected={events[0].event_id})
+        return self._bisect_batch(key, events)
+
+    def _bisect_batch(self, key, events) -> BatchOutcome:
+        """Переотправляет половины отклонённой пачки, чтобы найти плохие события."""
+        outcome = BatchOutcome()
+        middle = len(events) // 2
+        for part in (events[:middle], events[middle:]):
             try:
-                return event_request.execute()
+                part_outcome = self._send_batch(key, part)
             except Exception as exc:
-                if attempt >= max(1, self.retry_max_attempts):
-                    logger.error(
-                        "❌ Failed to send %s event for order %s after %s attempts: %s",
-                        event_name,
-                        order.order_number,
-                        attempt,
-                        exc,
-                        exc_info=True,
-                    )
-                    raise
-
-                logger.warning(
-                    "⚠️ Attempt %s/%s failed for %s event (order %s): %s. Retrying in %s s",
-                    attempt,
-                    self.retry_max_attempts,
-                    event_name,
-                    order.order_number,
-                    exc,
-                    delay,
-                )
-                time.sleep(max(0.5, delay))
-                delay *= max(1, self.retry_backoff)
-                attempt += 1
+                logger.warning("Facebook CAPI: part of rejected batch failed, will retry: %s", exc)
+                part_outcome = BatchOutcome(retry={event.event_id for event in part})
+            outcome.retry |= part_outcome.retry
+            outcome.rejected |= part_outcome.rejected
+        return outcome
+
+    def _dispatch_event(self, event, test_event_code: Optional[str], wait: bool = True) -> bool:
+        """Ставит событие в пачку пикселя; при wait=True ждёт результата доставки."""
+        ticket = self.dispatcher.submit(
+            (self.pixel_id, test_event_code or self.test_event_code or ''),
+            event.event_id,
+            event,
+        )
+        if not wait:
+            return True
+        return ticket.wait(self.DELIVERY_WAIT_TIMEOUT)
 
     def _prepare_user_data(self, order) -> "UserData":
         """
@@ -516,10 +542,12 @@ class FacebookConversionsService:
         event_id: Optional[str] = None,
         source_url: Optional[str] = None,
         test_event_code: Optional[str] = None,
+        wait: bool = True,
     ) -> bool:
         """
         Отправляет AddPaymentInfo событие (добавление платежных данных) в Facebook CAPI.
         Используется при создании инвойса Monobank, чтобы дедуплицировать с браузерным событием.
+        wait=False — только поставить в пачку (не задерживать ответ checkout).
         """
         if not self.enabled:
             logger.warning("Facebook Conversions API disabled, skipping AddPaymentInfo event")
@@ -561,21 +589,13 @@ class FacebookConversionsService:
                 event_source_url=source_url or f"https://twocomms.com/orders/{order.order_number}/"
             )
 
-            event_request = self.EventRequest(
-                pixel_id=self.pixel_id,
-                events=[event]
-            )
-            test_code = test_event_code or self.test_event_code
-            if test_code:
-                event_request.test_event_code = test_code
-
-            response = self._send_request_with_retry(event_request, order, 'AddPaymentInfo')
-            if not self._validate_response(response, order, 'AddPaymentInfo', resolved_event_id):
+            if not self._dispatch_event(event, test_event_code, wait=wait):
                 return False
 
             logger.info(
-                "✅ AddPaymentInfo event sent to Facebook Conversions API: "
+                "✅ AddPaymentInfo event %s to Facebook Conversions API: "
                 "Order %s, Value %.2f UAH, Event ID: %s",
+                'sent' if wait else 'queued',
                 order.order_number,
                 custom_data.value,
                 resolved_event_id,
@@ -590,7 +610,8 @@ class FacebookConversionsService:
                     'event_id': resolved_event_id,
                     'sent_at': int(time.time()),
                     'value': custom_data.value,
-                    'currency': 'UAH'
+                    'currency': 'UAH',
+                    'queued': not wait,
                 }
                 order.save(update_fields=['payment_payload'])
             except Exception as payload_err:
@@ -662,20 +683,8 @@ class FacebookConversionsService:
                 event_source_url=source_url or f"https://twocomms.com/orders/{order.order_number}/"
             )
 
-            # Создаем запрос
-            event_request = self.EventRequest(
-                pixel_id=self.pixel_id,
-                events=[event]
-            )
-
-            # Добавляем test_event_code если есть
-            test_code = test_event_code or self.test_event_code
-            if test_code:
-                event_request.test_event_code = test_code
-
-            # Отправляем с повторными попытками
-            response = self._send_request_with_retry(event_request, order, 'Purchase')
-            if not self._validate_response(response, order, 'Purchase', event_id):
+            # Отправляем в пачке пикселя (с повторными попытками)
+            if not self._dispatch_event(event, test_event_code):
                 return False
 
             logger.info(
@@ -779,20 +788,8 @@ class FacebookConversionsService:
                 event_source_url=source_url or f"https://twocomms.com/orders/{order.order_number}/"
             )
 
-            # Создаем запрос
-            event_request = self.EventRequest(
-                pixel_id=self.pixel_id,
-                events=[event]
-            )
-
-            # Добавляем test_event_code если есть
-            test_code = test_event_code or self.test_event_code
-            if test_code:
-                event_request.test_event_code = test_code
-
-            # Отправляем
-            response = self._send_request_with_retry(event_request, order, 'Lead')
-            if not self._validate_response(response, order, 'Lead', event_id):
+            # Отправляем в пачке пикселя
+            if not self._dispatch_event(event, test_event_code):
                 return False
 
             logger.info(
@@ -0,0 +1,40 @@
+"""
+Django management команда для сверки статистики дропшиперов с заказами.
+
+Разовое выравнивание строк, накопленных до инкрементального режима, делает
+миграция ``orders.0050`` (обычный ``migrate`` при деплое); команду стоит
+запускать после массовых ``QuerySet.update()`` по заказам в обход сигналов.
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from orders.models import DropshipperOrder, DropshipperStats
+
+_COMPARED_FIELDS = (
+    'total_orders', 'completed_orders', 'cancelled_orders', 'total_revenue',
+    'total_drop_cost', 'total_profit', 'total_items_sold', 'successful_orders', 'loyalty_discount',
+)
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает DropshipperStats агрегатами по заказам (статистика ведётся инкрементально)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user-id', type=int, help='Только для одного дропшипера')
+
+    def handle(self, *args, **options):
+        user_ids = set(DropshipperOrder.objects.values_list('dropshipper_id', flat=True).distinct())
+        user_ids.update(DropshipperStats.objects.values_list('dropshipper_id', flat=True))
+        if options.get('user_id'):
+            user_ids &= {options['user_id']}
+
+        drifted = 0
+        for user in get_user_model().objects.filter(pk__in=user_ids):
+            stats, _ = DropshipperStats.objects.get_or_create(dropshipper=user)
+            before = [getattr(stats, field) for field in _COMPARED_FIELDS]
+            stats.update_stats()
+            if before != [getattr(stats, field) for field in _COMPARED_FIELDS]:
+                drifted += 1
+                self.stdout.write(f"Исправлена статистика {user.username}")
+
+        self.stdout.write(self.style.SUCCESS(f"Проверено: {len(user_ids)}, исправлено: {drifted}"))
@@ -0,0 +1,53 @@
+"""
+Django management команда для синхронизации локального справочника Новой Почты
+(населённые пункты и отделения/почтоматы для автодополнения в checkout)
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.nova_poshta_directory import fetch_directory_dump, load_directory_dump, sync_directory
+from orders.nova_poshta_lookup import NovaPoshtaDirectoryService, NovaPoshtaLookupError
+
+
+class Command(BaseCommand):
+    help = 'Копирует справочник отделений Новой Почты в локальные таблицы (запускать по cron раз в сутки)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--from-file',
+            type=str,
+            help='Загрузить справочник из JSON-дампа вместо запроса к API',
+        )
+        parser.add_argument(
+            '--dump',
+            type=str,
+            help='Сохранить полученный из API справочник в JSON-файл',
+        )
+
+    def handle(self, *args, **options):
+        service = NovaPoshtaDirectoryService()
+
+        if options.get('from_file'):
+            dump = load_directory_dump(options['from_file'])
+        else:
+            if not service.is_available():
+                raise CommandError("NOVA_POSHTA_API_KEY не настроен в settings.")
+            try:
+                dump = fetch_directory_dump(service)
+            except NovaPoshtaLookupError as exc:
+                raise CommandError(f"Не удалось получить справочник Новой Почты: {exc}") from exc
+
+        if options.get('dump'):
+            with open(options['dump'], 'w', encoding='utf-8') as handle:
+                json.dump(dump, handle, ensure_ascii=False)
+
+        try:
+            counts = sync_directory(dump, service=service)
+        except ValueError as exc:
+            raise CommandError(str(exc)) from exc
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Отделений: {counts['warehouses']} (удалено {counts['removed_warehouses']}), "
+            f"населённых пунктов: {counts['settlements']} (удалено {counts['removed_settlements']})"
+        ))
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.11 on 2026-10-19 02:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0048_number_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NovaPoshtaSettlement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('settlement_ref', models.CharField(max_length=36, unique=True)),
+                ('city_ref', models.CharField(blank=True, db_index=True, default='', max_length=36)),
+                ('description', models.CharField(max_length=200)),
+                ('settlement_type', models.CharField(blank=True, default='', max_length=100)),
+                ('area', models.CharField(blank=True, default='', max_length=100)),
+                ('region', models.CharField(blank=True, default='', max_length=100)),
+                ('search_name', models.CharField(db_index=True, max_length=200)),
+                ('warehouses_count', models.PositiveIntegerField(default=0)),
+                ('synced_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Населений пункт НП',
+                'verbose_name_plural': 'Населені пункти НП',
+            },
+        ),
+        migrations.CreateModel(
+            name='NovaPoshtaWarehouse',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ref', models.CharField(max_length=36, unique=True)),
+                ('settlement_ref', models.CharField(blank=True, db_index=True, default='', max_length=36)),
+                ('city_ref', models.CharField(blank=True, db_index=True, default='', max_length=36)),
+                ('kind', models.CharField(choices=[('branch', 'Відділення'), ('postomat', 'Поштомат')], default='branch', max_length=16)),
+                ('number', models.CharField(blank=True, default='', max_length=16)),
+                ('number_sort', models.PositiveIntegerField(blank=True, null=True)),
+                ('description', models.CharField(blank=True, default='', max_length=255)),
+                ('short_address', models.CharField(blank=True, default='', max_length=255)),
+                ('search_text', models.CharField(blank=True, default='', max_length=600)),
+                ('synced_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Відділення НП',
+                'verbose_name_plural': 'Відділення НП',
+                'indexes': [models.Index(fields=['city_ref', 'kind', 'number_sort'], name='np_wh_city_kind_num'), models.Index(fields=['settlement_ref', 'kind', 'number_sort'], name='np_wh_settl_kind_num')],
+            },
+        ),
+    ]
@@ -0,0 +1,65 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
+
+# Заморожена копія правил на момент міграції: живий сервіс може змінитись.
+LOYALTY_DISCOUNT_PER_ORDER = Decimal('10.00')
+LOYALTY_DISCOUNT_MAX = Decimal('120.00')
+
+
+def recompute_dropshipper_stats(apps, schema_editor):
+    """Перераховує рядки статистики, що накопичились до інкрементального режиму.
+
+    Раніше кожен показ кабінету перераховував статистику; тепер її лише
+    зсувають сигнали заказів, тож застарілі рядки треба вирівняти один раз
+    тими самими агрегатами, що й ``recompute_stats_fields`` на цей момент.
+    """
+    DropshipperStats = apps.get_model('orders', 'DropshipperStats')
+    DropshipperOrder = apps.get_model('orders', 'DropshipperOrder')
+    DropshipperOrderItem = apps.get_model('orders', 'DropshipperOrderItem')
+
+    received = Q(status='received')
+    for stats_id, dropshipper_id in DropshipperStats.objects.values_list('id', 'dropshipper_id').iterator():
+        totals = DropshipperOrder.objects.filter(dropshipper_id=dropshipper_id).aggregate(
+            total=Count('id'),
+            completed=Count('id', filter=received),
+            cancelled=Count('id', filter=Q(status='cancelled')),
+            revenue=Sum('total_selling_price', filter=received),
+            drop_cost=Sum('total_drop_price', filter=received),
+            last_order_date=Max('created_at'),
+        )
+        items_sold = DropshipperOrderItem.objects.filter(
+            order__dropshipper_id=dropshipper_id, order__status='received'
+        ).aggregate(total=Sum('quantity'))['total']
+
+        revenue = totals['revenue'] or Decimal('0')
+        drop_cost = totals['drop_cost'] or Decimal('0')
+        fields = {
+            'total_orders': totals['total'],
+            'completed_orders': totals['completed'],
+            'cancelled_orders': totals['cancelled'],
+            'total_revenue': revenue,
+            'total_drop_cost': drop_cost,
+            'total_profit': revenue - drop_cost,
+            'total_items_sold': items_sold or 0,
+            'successful_orders': totals['completed'],
+            'loyalty_discount': min(
+                Decimal(totals['completed']) * LOYALTY_DISCOUNT_PER_ORDER, LOYALTY_DISCOUNT_MAX
+            ),
+        }
+        if totals['last_order_date']:
+            fields['last_order_date'] = totals['last_order_date']
+        DropshipperStats.objects.filter(pk=stats_id).update(updated_at=timezone.now(), **fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0049_nova_poshta_directory'),
+    ]
+
+    operations = [
+        migrations.RunPython(recompute_dropshipper_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.2.11 on 2026-10-19 03:19
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+TOKEN_RE = re.compile(r"[\w']+")
+
+
+def fill_warehouse_tokens(apps, schema_editor):
+    """Розбиває ``search_text`` уже синхронізованих відділень на слова.
+
+    Без цього до наступного ``sync_nova_poshta_directory`` локальний пошук з
+    запитом нічого б не знаходив. ``search_text`` уже нормалізований.
+    """
+    NovaPoshtaWarehouse = apps.get_model('orders', 'NovaPoshtaWarehouse')
+    NovaPoshtaWarehouseToken = apps.get_model('orders', 'NovaPoshtaWarehouseToken')
+
+    batch = []
+    rows = NovaPoshtaWarehouse.objects.values_list('pk', 'settlement_ref', 'city_ref', 'search_text')
+    for pk, settlement_ref, city_ref, search_text in rows.iterator():
+        for token in dict.fromkeys(token[:64] for token in TOKEN_RE.findall(search_text)):
+            batch.append(NovaPoshtaWarehouseToken(
+                warehouse_id=pk, settlement_ref=settlement_ref, city_ref=city_ref, token=token,
+            ))
+        if len(batch) >= 500:
+            NovaPoshtaWarehouseToken.objects.bulk_create(batch)
+            batch = []
+    NovaPoshtaWarehouseToken.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0050_recompute_dropshipper_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NovaPoshtaWarehouseToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('settlement_ref', models.CharField(blank=True, default='', max_length=36)),
+                ('city_ref', models.CharField(blank=True, default='', max_length=36)),
+                ('token', models.CharField(max_length=64)),
+            ],
+            options={
+                'verbose_name': 'Слово адреси відділення НП',
+                'verbose_name_plural': 'Слова адрес відділень НП',
+            },
+        ),
+        migrations.AlterField(
+            model_name='novaposhtasettlement',
+            name='search_name',
+            field=models.CharField(max_length=200),
+        ),
+        migrations.AddIndex(
+            model_name='novaposhtasettlement',
+            index=models.Index(fields=['search_name'], name='np_settl_search_prefix', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddField(
+            model_name='novaposhtawarehousetoken',
+            name='warehouse',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tokens', to='orders.novaposhtawarehouse'),
+        ),
+        migrations.AddIndex(
+            model_name='novaposhtawarehousetoken',
+            index=models.Index(fields=['settlement_ref', 'token'], name='np_wh_token_settl', opclasses=['varchar_pattern_ops', 'varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='novaposhtawarehousetoken',
+            index=models.Index(fields=['city_ref', 'token'], name='np_wh_token_city', opclasses=['varchar_pattern_ops', 'varchar_pattern_ops']),
+        ),
+        migrations.RunPython(fill_warehouse_tokens, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,101 @@
+import time
+from decimal import Decimal
+
 from django.conf import settings
-from django.db import models, IntegrityError, transaction
-from django.db.models import Max
+from django.db import models, OperationalError, transaction
+from django.db.models.functions import Length
 from django.utils.translation import gettext_lazy as _
 from storefront.models import Product, PromoCode
 from productcolors.models import ProductColorVariant
 from django.utils import timezone
 
+from orders.services.dropshipper_stats import (
+    LOYALTY_DISCOUNT_MAX,
+    LOYALTY_DISCOUNT_PER_ORDER,
+    recompute_stats_fields,
+)
+
+
+class NumberSequence(models.Model):
+    """Лічильник номерів документів: один рядок на префікс (префікс містить дату).
+
+    Номер видається атомарним ``UPDATE value = value + 1`` по одному рядку,
+    а не ``Max()`` + повтор на ``IntegrityError``: паралельні оформлення
+    чекають на блокування рядка і отримують різні номери без повторів.
+    """
+
+    prefix = models.CharField(max_length=32, unique=True)
+    value = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Лічильник номерів'
+        verbose_name_plural = 'Лічильники номерів'
+
+    def __str__(self):
+        return f'{self.prefix}: {self.value}'
+
+    @classmethod
+    def next_value(cls, prefix, seed=None):
+        """
+        Повертає наступне значення лічильника ``prefix``.
+
+        ``seed`` — callable, що повертає вже використане значення; викликається
+        лише коли рядка ще немає (перший номер дня або номери, видані до
+        появи лічильника).
+
+        Рядок створюється через ``get_or_create`` (паралельний INSERT того ж
+        префікса ловиться всередині нього), а номер завжди видає один
+        ``UPDATE``. Дедлок MySQL на першому номері дня (два INSERT в один
+        унікальний ключ) повторюємо, якщо поза нами немає відкритої
+        транзакції — інакше MySQL вже відкотив її цілком і повтор неможливий.
+        """
+        retries = 1 if transaction.get_connection().in_atomic_block else SEQUENCE_DEADLOCK_RETRIES
+        for attempt in range(1, retries + 1):
+            try:
+                with transaction.atomic():
+                    if not cls._increment(prefix):
+                        cls.objects.get_or_create(prefix=prefix, defaults={'value': seed() if seed else 0})
+                        cls._increment(prefix)
+                    return cls.objects.filter(prefix=prefix).values_list('value', flat=True).get()
+            except OperationalError as exc:
+                if attempt >= retries or not _is_deadlock(exc):
+                    raise
+                time.sleep(0.05 * attempt)
+
+    @classmethod
+    def _increment(cls, prefix):
+        return cls.objects.filter(prefix=prefix).update(value=models.F('value') + 1, updated_at=timezone.now())
+
+
+SEQUENCE_DEADLOCK_RETRIES = 3
+# MySQL: 1213 — deadlock, 1205 — lock wait timeout.
+_DEADLOCK_ERROR_CODES = {1213, 1205}
+
+
+def _is_deadlock(exc):
+    code = exc.args[0] if exc.args else None
+    return code in _DEADLOCK_ERROR_CODES or 'deadlock' in str(exc).lower()
+
+
+def _last_counter(queryset, field, prefix):
+    """Найбільший числовий суфікс серед ``field`` з цим префіксом (0, якщо немає).
+
+    Порівнюємо як числа, а не рядки: за ``Max()`` «N99» більший за «N100».
+    Довший номер з тим самим префіксом завжди більший, тому сортуємо спершу
+    за довжиною — у БД, без вибірки всіх номерів дня.
+    """
+    last = (
+        queryset.filter(**{f'{field}__startswith': prefix})
+        .order_by(Length(field).desc(), f'-{field}')
+        .values_list(field, flat=True)
+        .first()
+    )
+    try:
+        return int(last[len(prefix):]) if last else 0
+    except ValueError:
+        return 0
+
 
 class Order(models.Model):
     STATUS_CHOICES = [
@@ -164,48 +254,23 @@ class Order(models.Model):
         return f'Order {self.order_number} by {self.get_user_display()} — {self.get_status_display()}'
 
     def save(self, *args, **kwargs):
-        attempts = 0
-        while True:
-            if not self.order_number:
-                self.order_number = self.generate_order_number()
-            try:
-                with transaction.atomic():
-                    super().save(*args, **kwargs)
-                break
-            except IntegrityError:
-                attempts += 1
-                if attempts >= 5:
-                    raise
-                # сбросим номер и попробуем ещё раз
-                self.order_number = None
+        if not self.order_number:
+            self.order_number = self.generate_order_number()
+        super().save(*args, **kwargs)
 
     def generate_order_number(self):
         """
         Генерирует уникальный номер заказа в формате TWC+дата+N+номер.
-        Оптимизировано: использует Max() вместо перебора в цикле.
+        Номер берётся из NumberSequence — без Max() и повторов на IntegrityError.
         """
         today = timezone.localdate()
         date_str = today.strftime('%d%m%Y')
         prefix = f"TWC{date_str}N"
 
-        # Ищем максимальный номер за сегодня с этим префиксом
-        # Используем startswith для надежности, хотя можно и по дате фильтровать
-        last_order = Order.objects.filter(order_number__startswith=prefix).aggregate(Max('order_number'))
-        max_number = last_order.get('order_number__max')
-
-        if max_number:
-            # Извлекаем последние цифры и инкрементируем
-            try:
-                # TWC30102025N01 -> 01
-                suffix = max_number.replace(prefix, '')
-                counter = int(suffix) + 1
-            except ValueError:
-                # Если формат нарушен, начинаем с 1 (или fallback на безопасный вариант)
-                counter = 1
-        else:
-            counter = 1
-
-        # Формируем новый номер
+        # TWC30102025N01 -> 01
+        counter = NumberSequence.next_value(
+            prefix, seed=lambda: _last_counter(Order.objects.all(), 'order_number', prefix)
+        )
         return f"{prefix}{counter:02d}"
 
     def get_user_display(self):
@@ -643,29 +708,16 @@ class DropshipperOrder(models.Model):
 
     def generate_order_number(self):
         """
-        Генерирует уникальный номер заказа дропшипера.
-        Оптимизировано: использует Max() вместо перебора.
+        Генерирует уникальный номер заказа дропшипера (счётчик NumberSequence).
         """
-        from django.utils import timezone
-        from django.db.models import Max
-
         today = timezone.localdate()
         date_str = today.strftime('%d%m%Y')
         prefix = f"DS{date_str}"
 
-        last_order = DropshipperOrder.objects.filter(order_number__startswith=prefix).aggregate(Max('order_number'))
-        max_number = last_order.get('order_number__max')
-
-        if max_number:
-            try:
-                # DS30102025001 -> 001
-                suffix = max_number.replace(prefix, '')
-                counter = int(suffix) + 1
-            except ValueError:
-                counter = 1
-        else:
-            counter = 1
-
+        # DS30102025001 -> 001
+        counter = NumberSequence.next_value(
+            prefix, seed=lambda: _last_counter(DropshipperOrder.objects.all(), 'order_number', prefix)
+        )
         return f"{prefix}{counter:03d}"
 
     def calculate_profit(self):
@@ -715,10 +767,11 @@ class DropshipperOrder(models.Model):
             self.save(update_fields=['payout_processed'])
             return False, f"Сума виплати <= 0 (прибуток: {payout_amount} грн)"
 
-        # Обновляем available_for_payout в статистике дропшипера
+        # Обновляем available_for_payout в статистике дропшипера (атомарно, без гонки read-modify-write)
         stats, created = DropshipperStats.objects.get_or_create(dropshipper=self.dropshipper)
-        stats.available_for_payout += payout_amount
-        stats.save(update_fields=['available_for_payout'])
+        DropshipperStats.objects.filter(pk=stats.pk).update(
+            available_for_payout=models.F('available_for_payout') + payout_amount
+        )
 
         # Отмечаем что выплата обработана
         self.payout_processed = True
@@ -859,56 +912,33 @@ class DropshipperStats(models.Model):
 
     def update_loyalty_discount(self):
         """Обновляет скидку лояльности: -10 грн за каждый успешный заказ, максимум -120 грн"""
-        from decimal import Decimal
-
         # Считаем успешные заказы (статус received)
         self.successful_orders = DropshipperOrder.objects.filter(
             dropshipper=self.dropshipper,
             status='received'
         ).count()
 
-        # Рассчитываем скидку: -10 грн за заказ, но не больше -120 грн
-        discount_per_order = Decimal('10.00')
-        max_discount = Decimal('120.00')
-
         self.loyalty_discount = min(
-            Decimal(self.successful_orders) * discount_per_order,
-            max_discount
+            Decimal(self.successful_orders) * LOYALTY_DISCOUNT_PER_ORDER,
+            LOYALTY_DISCOUNT_MAX
         )
 
         self.save(update_fields=['successful_orders', 'loyalty_discount'])
         return self.loyalty_discount
 
     def update_stats(self):
-        """Обновляет статистику на основе заказов"""
-        orders = DropshipperOrder.objects.filter(dropshipper=self.dropshipper)
-
-        self.total_orders = orders.count()
-        # Считаем заказы со статусом 'received' (клиент забрал товар)
-        self.completed_orders = orders.filter(status='received').count()
-        self.cancelled_orders = orders.filter(status='cancelled').count()
-
-        # Финансовая статистика - считаем только полученные заказы (received)
-        received_orders = orders.filter(status='received')
-        self.total_revenue = sum(order.total_selling_price for order in received_orders)
-        self.total_drop_cost = sum(order.total_drop_price for order in received_orders)
-        self.total_profit = self.total_revenue - self.total_drop_cost
-
-        # Статистика по товарам
-        self.total_items_sold = sum(
-            sum(item.quantity for item in order.items.all())
-            for order in received_orders
-        )
-
-        # Дата последнего заказа
-        last_order = orders.order_by('-created_at').first()
-        if last_order:
-            self.last_order_date = last_order.created_at
-
-        # Обновляем скидку лояльности
-        self.update_loyalty_discount()
+        """
+        Полный пересчёт статистики агрегатами в БД (сверка).
 
-        self.save()
+        В обычной работе статистика ведётся инкрементально из переходов
+        статусов заказов (orders.services.dropshipper_stats); этот метод —
+        для сверки и первичного заполнения. Сохраняет только пересчитанные
+        поля: ``available_for_payout`` меняется отдельно и не затирается.
+        """
+        fields = recompute_stats_fields(self.dropshipper_id, DropshipperOrder, DropshipperOrderItem)
+        for name, value in fields.items():
+            setattr(self, name, value)
+        self.save(update_fields=[*fields, 'updated_at'])
 
 
 class DropshipperPayout(models.Model):
@@ -961,17 +991,15 @@ class DropshipperPayout(models.Model):
         super().save(*args, **kwargs)
 
     def generate_payout_number(self):
-        """Генерирует уникальный номер выплаты"""
-        from django.utils import timezone
+        """Генерирует уникальный номер выплаты (счётчик NumberSequence)"""
         today = timezone.localdate()
         date_str = today.strftime('%d%m%Y')
-        counter = 1
+        prefix = f"PY{date_str}"
 
-        while True:
-            number = f"PY{date_str}{counter:03d}"
-            if not DropshipperPayout.objects.filter(payout_number=number).exists():
-                return number
-            counter += 1
+        counter = NumberSequence.next_value(
+            prefix, seed=lambda: _last_counter(DropshipperPayout.objects.all(), 'payout_number', prefix)
+        )
+        return f"{prefix}{counter:03d}"
 
 
 class CheckoutCapture(models.Model):
@@ -1004,3 +1032,95 @@ class CheckoutCapture(models.Model):
 
     def __str__(self):
         return f"capture {self.session_key[:8]}… {self.phone or self.email or 'anon'}"
+
+
+class NovaPoshtaSettlement(models.Model):
+    """Локальна копія довідника населених пунктів Нової пошти (з відділеннями).
+
+    Заповнюється командою ``sync_nova_poshta_directory``; ``search_name`` —
+    нормалізована назва для пошуку за префіксом (індекс; на Postgres — з
+    ``varchar_pattern_ops``, інакше ``LIKE 'q%'`` його не використовує).
+    """
+
+    settlement_ref = models.CharField(max_length=36, unique=True)
+    city_ref = models.CharField(max_length=36, blank=True, default='', db_index=True)
+    description = models.CharField(max_length=200)
+    settlement_type = models.CharField(max_length=100, blank=True, default='')
+    area = models.CharField(max_length=100, blank=True, default='')
+    region = models.CharField(max_length=100, blank=True, default='')
+    search_name = models.CharField(max_length=200)
+    warehouses_count = models.PositiveIntegerField(default=0)
+    synced_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = 'Населений пункт НП'
+        verbose_name_plural = 'Населені пункти НП'
+        indexes = [
+            models.Index(fields=['search_name'], name='np_settl_search_prefix', opclasses=['varchar_pattern_ops']),
+        ]
+
+    def __str__(self):
+        return self.description
+
+
+class NovaPoshtaWarehouse(models.Model):
+    """Локальна копія довідника відділень і поштоматів Нової пошти."""
+
+    KIND_CHOICES = [
+        ('branch', 'Відділення'),
+        ('postomat', 'Поштомат'),
+    ]
+
+    ref = models.CharField(max_length=36, unique=True)
+    settlement_ref = models.CharField(max_length=36, blank=True, default='', db_index=True)
+    city_ref = models.CharField(max_length=36, blank=True, default='', db_index=True)
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES, default='branch')
+    number = models.CharField(max_length=16, blank=True, default='')
+    number_sort = models.PositiveIntegerField(null=True, blank=True)
+    description = models.CharField(max_length=255, blank=True, default='')
+    short_address = models.CharField(max_length=255, blank=True, default='')
+    search_text = models.CharField(max_length=600, blank=True, default='')
+    synced_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'Відділення НП'
+        verbose_name_plural = 'Відділення НП'
+        indexes = [
+            models.Index(fields=['city_ref', 'kind', 'number_sort'], name='np_wh_city_kind_num'),
+            models.Index(fields=['settlement_ref', 'kind', 'number_sort'], name='np_wh_settl_kind_num'),
+        ]
+
+    def __str__(self):
+        return self.short_address or self.description
+
+
+class NovaPoshtaWarehouseToken(models.Model):
+    """Слово адреси відділення (вулиця, номер) для пошуку за префіксом.
+
+    ``settlement_ref`` / ``city_ref`` продубльовані з відділення, щоб пошук у
+    межах міста був діапазоном по індексу ``(ref, token)``.
+    """
+
+    warehouse = models.ForeignKey(NovaPoshtaWarehouse, on_delete=models.CASCADE, related_name='tokens')
+    settlement_ref = models.CharField(max_length=36, blank=True, default='')
+    city_ref = models.CharField(max_length=36, blank=True, default='')
+    token = models.CharField(max_length=64)
+
+    class Meta:
+        verbose_name = 'Слово адреси відділення НП'
+        verbose_name_plural = 'Слова адрес відділень НП'
+        indexes = [
+            models.Index(
+                fields=['settlement_ref', 'token'],
+                name='np_wh_token_settl',
+                opclasses=['varchar_pattern_ops', 'varchar_pattern_ops'],
+            ),
+            models.Index(
+                fields=['city_ref', 'token'],
+                name='np_wh_token_city',
+                opclasses=['varchar_pattern_ops', 'varchar_pattern_ops'],
+            ),
+        ]
+
+    def __str__(self):
+        return self.token
@@ -0,0 +1,277 @@
+"""
+Local replica of the Nova Poshta settlement / warehouse directory.
+
+Checkout autocomplete used to hit ``Address.searchSettlements`` /
+``getWarehouses`` for every distinct keystroke query. The directory changes
+slowly, so ``manage.py sync_nova_poshta_directory`` now copies it into
+``NovaPoshtaSettlement`` / ``NovaPoshtaWarehouse`` and
+``NovaPoshtaDirectoryService`` answers from those tables:
+
+* settlements are derived from the warehouse dump (``getWarehouses`` carries
+  both ``SettlementRef`` and ``CityRef``), so every local settlement is one a
+  parcel can actually be sent to;
+* ``search_name`` and the words of ``search_text`` (``NovaPoshtaWarehouseToken``)
+  hold the same normalisation the lookup applies to the query, so matching is
+  an indexed prefix lookup instead of a remote round trip;
+* a dump written with ``--dump`` can be loaded back with ``--from-file``
+  (fixtures for tests, or seeding a server without API access).
+"""
+from __future__ import annotations
+
+import json
+import logging
+import re
+from collections import Counter
+from datetime import timedelta
+from typing import Any, Iterable
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+SYNC_PAGE_SIZE = 500
+BULK_CHUNK_SIZE = 500
+REPLICA_MAX_AGE = timedelta(days=7)
+REPLICA_STATE_CACHE_KEY = "nova_poshta_directory:synced_at"
+REPLICA_STATE_CACHE_TTL = 10 * 60
+
+TOKEN_MAX_LENGTH = 64
+_TOKEN_RE = re.compile(r"[\w']+")
+_APOSTROPHES = str.maketrans({"’": "'", "ʼ": "'", "`": "'", "‘": "'", "´": "'"})
+
+_SETTLEMENT_TYPE_SHORT = {
+    "місто": "м.",
+    "село": "с.",
+    "селище": "с-ще",
+    "селище міського типу": "смт",
+}
+
+WAREHOUSE_FIELDS = (
+    "settlement_ref",
+    "city_ref",
+    "kind",
+    "number",
+    "number_sort",
+    "description",
+    "short_address",
+    "search_text",
+    "synced_at",
+)
+SETTLEMENT_FIELDS = (
+    "city_ref",
+    "description",
+    "settlement_type",
+    "area",
+    "region",
+    "search_name",
+    "warehouses_count",
+    "synced_at",
+)
+
+
+def normalize_search_text(value: Any) -> str:
+    """Lower-case, single-spaced, with the apostrophe variants unified."""
+    return " ".join(str(value or "").translate(_APOSTROPHES).strip().lower().split())
+
+
+def search_tokens(value: Any) -> list[str]:
+    """Distinct words of the normalised text: ``вул. Пʼятницька, 12`` → вул, п'ятницька, 12."""
+    return list(dict.fromkeys(token[:TOKEN_MAX_LENGTH] for token in _TOKEN_RE.findall(normalize_search_text(value))))
+
+
+def settlement_label(item: dict[str, Any]) -> str:
+    """``м. Київ, Київська обл.`` — close to the ``Present`` of searchSettlements."""
+    kind = _SETTLEMENT_TYPE_SHORT.get(normalize_search_text(item.get("settlement_type")), "")
+    name = f"{kind} {item.get('description') or ''}".strip()
+    parts = [name]
+    if item.get("region"):
+        parts.append(item["region"])
+    if item.get("area") and normalize_search_text(item["area"]) != normalize_search_text(item.get("description")):
+        parts.append(f"{item['area']} обл.")
+    return ", ".join(parts)
+
+
+def _clean(value: Any) -> str:
+    return str(value or "").strip()
+
+
+def _number_sort(number: str) -> int | None:
+    digits = "".join(char for char in number if char.isdigit())
+    return int(digits) if digits else None
+
+
+def build_directory_rows(
+    warehouses: Iterable[dict[str, Any]],
+    *,
+    detect_kind,
+) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    """Raw ``getWarehouses`` items → (warehouse rows, settlement rows)."""
+    warehouse_rows: dict[str, dict[str, Any]] = {}
+    settlements: dict[str, dict[str, Any]] = {}
+    counts: Counter = Counter()
+
+    for item in warehouses:
+        if not isinstance(item, dict):
+            continue
+        ref = _clean(item.get("Ref"))
+        short_address = _clean(item.get("ShortAddress"))
+        description = _clean(item.get("Description") or item.get("DescriptionRu"))
+        if not ref or not (short_address or description):
+            continue
+        settlement_ref = _clean(item.get("SettlementRef"))
+        city_ref = _clean(item.get("CityRef"))
+        number = _clean(item.get("Number"))
+        warehouse_rows[ref] = {
+            "ref": ref,
+            "settlement_ref": settlement_ref,
+            "city_ref": city_ref,
+            "kind": detect_kind(item),
+            "number": number[:16],
+            "number_sort": _number_sort(number),
+            "description": description[:255],
+            "short_address": short_address[:255],
+            "search_text": normalize_search_text(" | ".join(filter(None, (short_address, description, number))))[:600],
+        }
+
+        if not settlement_ref:
+            continue
+        counts[settlement_ref] += 1
+        if settlement_ref not in settlements:
+            name = _clean(item.get("SettlementDescription") or item.get("CityDescription"))
+            if not name:
+                continue
+            settlements[settlement_ref] = {
+                "settlement_ref": settlement_ref,
+                "city_ref": city_ref,
+                "description": name[:200],
+                "settlement_type": _clean(item.get("SettlementTypeDescription"))[:100],
+                "area": _clean(item.get("SettlementAreaDescription"))[:100],
+                "region": _clean(item.get("SettlementRegionsDescription"))[:100],
+                "search_name": normalize_search_text(name)[:200],
+            }
+
+    for settlement_ref, row in settlements.items():
+        row["warehouses_count"] = counts[settlement_ref]
+    return list(warehouse_rows.values()), list(settlements.values())
+
+
+def fetch_directory_dump(service) -> dict[str, Any]:
+    """Download warehouse types and all warehouses page by page."""
+    warehouse_types = service._request("Address", "getWarehouseTypes", {})
+    warehouses: list[dict[str, Any]] = []
+    page = 1
+    while True:
+        chunk = service._request(
+            "Address",
+            "getWarehouses",
+            {"Page": str(page), "Limit": str(SYNC_PAGE_SIZE)},
+        )
+        warehouses.extend(chunk)
+        if len(chunk) < SYNC_PAGE_SIZE:
+            break
+        page += 1
+    return {"warehouse_types": warehouse_types, "warehouses": warehouses}
+
+
+def load_directory_dump(path: str) -> dict[str, Any]:
+    with open(path, encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def _upsert(model, key: str, rows: list[dict[str, Any]], fields: tuple[str, ...]) -> tuple[int, int]:
+    existing = dict(model.objects.values_list(key, "pk"))
+    to_create, to_update = [], []
+    for row in rows:
+        pk = existing.pop(row[key], None)
+        if pk is None:
+            to_create.append(model(**row))
+        else:
+            to_update.append(model(pk=pk, **row))
+    model.objects.bulk_create(to_create, batch_size=BULK_CHUNK_SIZE)
+    model.objects.bulk_update(to_update, fields, batch_size=BULK_CHUNK_SIZE)
+    stale = list(existing.values())
+    for start in range(0, len(stale), BULK_CHUNK_SIZE):
+        model.objects.filter(pk__in=stale[start:start + BULK_CHUNK_SIZE]).delete()
+    return len(to_create) + len(to_update), len(stale)
+
+
+def _rebuild_tokens(warehouse_rows: list[dict[str, Any]]) -> None:
+    from orders.models import NovaPoshtaWarehouse, NovaPoshtaWarehouseToken
+
+    pks = dict(NovaPoshtaWarehouse.objects.values_list("ref", "pk"))
+    NovaPoshtaWarehouseToken.objects.all().delete()
+    NovaPoshtaWarehouseToken.objects.bulk_create(
+        (
+            NovaPoshtaWarehouseToken(
+                warehouse_id=pks[row["ref"]],
+                settlement_ref=row["settlement_ref"],
+                city_ref=row["city_ref"],
+                token=token,
+            )
+            for row in warehouse_rows
+            for token in search_tokens(row["search_text"])
+        ),
+        batch_size=BULK_CHUNK_SIZE,
+    )
+
+
+def sync_directory(dump: dict[str, Any], *, service=None) -> dict[str, int]:
+    """Replace the local replica with ``dump`` (see ``fetch_directory_dump``)."""
+    from orders.models import NovaPoshtaSettlement, NovaPoshtaWarehouse
+    from orders.nova_poshta_lookup import NovaPoshtaDirectoryService
+
+    service = service or NovaPoshtaDirectoryService()
+    type_map = service.parse_warehouse_types(dump.get("warehouse_types") or [])
+    warehouse_rows, settlement_rows = build_directory_rows(
+        dump.get("warehouses") or [],
+        detect_kind=lambda item: service._detect_warehouse_kind(item, type_map),
+    )
+    if not warehouse_rows:
+        # An empty directory answer must not wipe a working replica.
+        raise ValueError("Nova Poshta directory dump contains no warehouses.")
+
+    now = timezone.now()
+    for row in warehouse_rows:
+        row["synced_at"] = now
+    for row in settlement_rows:
+        row["synced_at"] = now
+
+    with transaction.atomic():
+        warehouses, removed_warehouses = _upsert(NovaPoshtaWarehouse, "ref", warehouse_rows, WAREHOUSE_FIELDS)
+        _rebuild_tokens(warehouse_rows)
+        settlements, removed_settlements = _upsert(
+            NovaPoshtaSettlement, "settlement_ref", settlement_rows, SETTLEMENT_FIELDS
+        )
+    cache.set(REPLICA_STATE_CACHE_KEY, now, REPLICA_STATE_CACHE_TTL)
+    if type_map:
+        cache.set(service.WAREHOUSE_TYPES_CACHE_KEY, type_map, service.WAREHOUSE_TYPES_CACHE_TTL)
+    return {
+        "warehouses": warehouses,
+        "settlements": settlements,
+        "removed_warehouses": removed_warehouses,
+        "removed_settlements": removed_settlements,
+    }
+
+
+def replica_synced_at():
+    """Time of the last sync, or ``None`` when the replica is empty/unavailable."""
+    cached = cache.get(REPLICA_STATE_CACHE_KEY)
+    if cached is not None:
+        return cached or None
+    from orders.models import NovaPoshtaSettlement
+
+    try:
+        synced_at = (
+            NovaPoshtaSettlement.objects.order_by("-synced_at").values_list("synced_at", flat=True).first()
+        )
+    except Exception as exc:  # not migrated yet / DB unavailable — keep using the API
+        logger.debug("Nova Poshta directory replica unavailable: %s", exc)
+        return None
+    cache.set(REPLICA_STATE_CACHE_KEY, synced_at or False, REPLICA_STATE_CACHE_TTL)
+    return synced_at
+
+
+def replica_is_fresh(synced_at) -> bool:
+    return bool(synced_at) and timezone.now() - synced_at <= REPLICA_MAX_AGE
@@ -7,6 +7,15 @@ from typing import Any
 import requests
 from django.conf import settings
 from django.core.cache import cache
+from django.db.models import Case, Q, Value, When
+
+from .nova_poshta_directory import (
+    normalize_search_text,
+    replica_is_fresh,
+    replica_synced_at,
+    search_tokens,
+    settlement_label,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +36,12 @@ class NovaPoshtaDirectoryService:
     project (`https://api.novaposhta.ua/v2.0/json/`) instead of switching checkout flows
     to the newer REST API family, because production is already configured around the
     legacy endpoint and we need a minimal-risk integration for cart/checkout UX.
+
+    When the local directory replica (``manage.py sync_nova_poshta_directory``) is
+    populated, lookups are answered from ``NovaPoshtaSettlement`` /
+    ``NovaPoshtaWarehouse`` first. The API is only consulted when the replica has
+    no match or is older than ``REPLICA_MAX_AGE``, and a stale replica still
+    answers while the API is down.
     """
 
     API_URL = "https://api.novaposhta.ua/v2.0/json/"
@@ -36,6 +51,7 @@ class NovaPoshtaDirectoryService:
     WAREHOUSE_DIRECTORY_CACHE_TTL = 15 * 60
     WAREHOUSE_TYPES_CACHE_TTL = 24 * 60 * 60
     FAST_WAREHOUSE_PAGE_SIZE = 50
+    WAREHOUSE_TYPES_CACHE_KEY = "nova_poshta_lookup:warehouse_types"
 
     def __init__(self) -> None:
         self.api_key = getattr(settings, "NOVA_POSHTA_API_KEY", "") or ""
@@ -51,6 +67,11 @@ class NovaPoshtaDirectoryService:
         if len(normalized_query) < 2:
             return []
 
+        synced_at = replica_synced_at()
+        local = self._search_settlements_local(normalized_query, normalized_limit) if synced_at else []
+        if local and replica_is_fresh(synced_at):
+            return local
+
         cache_key = self._cache_key(
             "settlements",
             {
@@ -58,11 +79,17 @@ class NovaPoshtaDirectoryService:
                 "limit": normalized_limit,
             },
         )
-        return self._cached_lookup(
-            cache_key,
-            lambda: self._search_settlements_uncached(normalized_query, normalized_limit),
-            self.SETTLEMENT_CACHE_TTL,
-        )
+        try:
+            remote = self._cached_lookup(
+                cache_key,
+                lambda: self._search_settlements_uncached(normalized_query, normalized_limit),
+                self.SETTLEMENT_CACHE_TTL,
+            )
+        except NovaPoshtaLookupError:
+            if local:
+                return local
+            raise
+        return remote or local
 
     def search_warehouses(
         self,
@@ -82,6 +109,22 @@ class NovaPoshtaDirectoryService:
         if not normalized_settlement_ref and not normalized_city_ref:
             return []
 
+        synced_at = replica_synced_at()
+        local: list[dict[str, Any]] = []
+        known_scope = False
+        if synced_at:
+            local, known_scope = self._search_warehouses_local(
+                settlement_ref=normalized_settlement_ref,
+                city_ref=normalized_city_ref,
+                query=normalized_query,
+                kind=normalized_kind,
+                limit=normalized_limit,
+            )
+            if known_scope and replica_is_fresh(synced_at):
+                # The settlement is in the replica, so an empty answer is a real
+                # "no such warehouse" rather than a reason to call the API.
+                return local
+
         cache_key = self._cache_key(
             "warehouses",
             {
@@ -92,17 +135,117 @@ class NovaPoshtaDirectoryService:
                 "limit": normalized_limit,
             },
         )
-        return self._cached_lookup(
-            cache_key,
-            lambda: self._search_warehouses_uncached(
-                settlement_ref=normalized_settlement_ref,
-                city_ref=normalized_city_ref,
-                query=normalized_query,
-                kind=normalized_kind,
-                limit=normalized_limit,
-            ),
-            self.WAREHOUSE_CACHE_TTL,
+        try:
+            remote = self._cached_lookup(
+                cache_key,
+                lambda: self._search_warehouses_uncached(
+                    settlement_ref=normalized_settlement_ref,
+                    city_ref=normalized_city_ref,
+                    query=normalized_query,
+                    kind=normalized_kind,
+                    limit=normalized_limit,
+                ),
+                self.WAREHOUSE_CACHE_TTL,
+            )
+        except NovaPoshtaLookupError:
+            if known_scope:
+                return local
+            raise
+        return remote or local
+
+    def _search_settlements_local(self, query: str, limit: int) -> list[dict[str, Any]]:
+        from .models import NovaPoshtaSettlement
+
+        rows = (
+            NovaPoshtaSettlement.objects.filter(search_name__startswith=normalize_search_text(query))
+            .order_by("-warehouses_count", "search_name")
+            .values(
+                "settlement_ref",
+                "city_ref",
+                "description",
+                "settlement_type",
+                "area",
+                "region",
+                "warehouses_count",
+            )[:limit]
         )
+        return [
+            {
+                "label": settlement_label(row),
+                "main_description": row["description"],
+                "area": row["area"],
+                "region": row["region"],
+                "settlement_type": row["settlement_type"],
+                "settlement_ref": row["settlement_ref"],
+                "city_ref": row["city_ref"],
+                "legacy_ref": row["settlement_ref"],
+                "warehouses": row["warehouses_count"],
+            }
+            for row in rows
+        ]
+
+    def _search_warehouses_local(
+        self,
+        *,
+        settlement_ref: str,
+        city_ref: str,
+        query: str,
+        kind: str,
+        limit: int,
+    ) -> tuple[list[dict[str, Any]], bool]:
+        """Replica lookup → (items, whether the settlement/city is in the replica).
+
+        Every word of the query must be a prefix of some address word
+        (``NovaPoshtaWarehouseToken``, index ``(ref, token)``) or the query is the
+        warehouse number; ranking and ``LIMIT`` are done by the database.
+        """
+        from .models import NovaPoshtaWarehouse, NovaPoshtaWarehouseToken
+
+        scope = Q()
+        if city_ref:
+            scope |= Q(city_ref=city_ref)
+        if settlement_ref:
+            scope |= Q(settlement_ref=settlement_ref)
+        queryset = NovaPoshtaWarehouse.objects.filter(scope)
+        if kind != "all":
+            queryset = queryset.filter(kind=kind)
+
+        words = search_tokens(query)
+        query_number = self._normalize_lookup_number(query)
+        if words:
+            match = Q()
+            for word in words:
+                match &= Q(
+                    pk__in=NovaPoshtaWarehouseToken.objects.filter(scope, token__startswith=word).values("warehouse_id")
+                )
+            if query_number:
+                match |= Q(number=query_number)
+            queryset = queryset.filter(match).annotate(
+                number_rank=Case(When(number=query_number, then=Value(0)), default=Value(1))
+                if query_number
+                else Value(1)
+            )
+            queryset = queryset.order_by("number_rank", "number_sort", "ref")
+        else:
+            queryset = queryset.order_by("number_sort", "ref")
+
+        items = [
+            {
+                "ref": row["ref"],
+                "label": row["short_address"] or row["description"],
+                "kind": row["kind"],
+                "number": row["number"],
+                "short_address": row["short_address"],
+                "description": row["description"],
+                "city_ref": row["city_ref"] or row["settlement_ref"],
+            }
+            for row in queryset.values(
+                "ref", "kind", "number", "short_address", "description", "city_ref", "settlement_ref"
+            )[:limit]
+        ]
+        if items:
+            return items, True
+        return items, NovaPoshtaWarehouse.objects.filter(scope).exists()
 
     def _search_settlements_uncached(self, query: str, limit: int) -> list[dict[str, Any]]:
         payload = self._request(
@@ -442,26 +585,27 @@ class NovaPoshtaDirectoryService:
     def _normalize_lookup_number(value: Any) -> str:
         return "".join(char for char in str(value or "") if char.isdigit())
 
-    def _get_warehouse_type_map(self) -> dict[str, str]:
-        cache_key = "nova_poshta_lookup:warehouse_types"
+    @staticmethod
+    def parse_warehouse_types(payload: list[dict[str, Any]]) -> dict[str, str]:
+        mapping: dict[str, str] = {}
+        for item in payload:
+            if not isinstance(item, dict):
+                continue
+            ref = str(item.get("Ref") or "").strip()
+            label = str(item.get("Description") or item.get("DescriptionRu") or "").strip()
+            if ref and label:
+                mapping[ref] = label
+        return mapping
 
+    def _get_warehouse_type_map(self) -> dict[str, str]:
         def load_mapping() -> dict[str, str]:
             try:
                 payload = self._request("Address", "getWarehouseTypes", {})
             except NovaPoshtaLookupError:
                 return {}
+            return self.parse_warehouse_types(payload)
 
-            mapping: dict[str, str] = {}
-            for item in payload:
-                if not isinstance(item, dict):
-                    continue
-                ref = str(item.get("Ref") or "").strip()
-                label = str(item.get("Description") or item.get("DescriptionRu") or "").strip()
-                if ref and label:
-                    mapping[ref] = label
-            return mapping
-
-        return cache.get_or_set(cache_key, load_mapping, self.WAREHOUSE_TYPES_CACHE_TTL) or {}
+        return cache.get_or_set(self.WAREHOUSE_TYPES_CACHE_KEY, load_mapping, self.WAREHOUSE_TYPES_CACHE_TTL) or {}
 
     def _request(
         self,
@@ -0,0 +1,150 @@
+"""
+Інкрементальна статистика дропшипера (orders.DropshipperStats).
+
+Раніше кожен показ кабінету викликав ``update_stats()``: кілька count() і
+підсумовування кожного отриманого заказу та його товарів у Python — вартість
+росла з кількістю заказів. Тепер лічильники зсуваються на різницю «внеску»
+заказу при кожній зміні його статусу/сум (сигнали в
+``orders.dropshipper_signals``) одним ``UPDATE ... SET f = f + delta``.
+``recompute_stats_fields`` — агрегатний перерахунок для сверки
+(``DropshipperStats.update_stats()``, ``manage.py reconcile_dropshipper_stats``
+і дата-міграція ``orders.0050``, що перераховує рядки, накопичені до
+інкрементального режиму). ``available_for_payout`` він не чіпає: це баланс
+виплат, який веде ``DropshipperOrder.process_payout``.
+
+Внесок заказу: +1 до total_orders; для ``received`` — +1 completed/successful,
+сума продажу, собівартість і кількість товарів; для ``cancelled`` — +1
+cancelled. Кількість товарів отриманого заказу окремо зсувають сигнали
+DropshipperOrderItem, тож при видаленні заказу товари не віднімаються двічі.
+"""
+from __future__ import annotations
+
+from decimal import Decimal
+
+from django.db.models import Case, Count, F, Max, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Least
+from django.utils import timezone
+
+RECEIVED = 'received'
+CANCELLED = 'cancelled'
+
+_ZERO = Decimal('0')
+
+# Знижка лояльності: -10 грн за кожен отриманий заказ, максимум -120 грн
+LOYALTY_DISCOUNT_PER_ORDER = Decimal('10.00')
+LOYALTY_DISCOUNT_MAX = Decimal('120.00')
+
+
+def recompute_stats_fields(dropshipper_id, order_model, item_model) -> dict:
+    """Повний перерахунок лічильників агрегатами в БД (два запити).
+
+    ``last_order_date`` повертається лише якщо заказ є — інакше зберігаємо
+    наявне значення.
+    """
+    received = Q(status=RECEIVED)
+    totals = order_model.objects.filter(dropshipper_id=dropshipper_id).aggregate(
+        total=Count('id'),
+        completed=Count('id', filter=received),
+        cancelled=Count('id', filter=Q(status=CANCELLED)),
+        revenue=Sum('total_selling_price', filter=received),
+        drop_cost=Sum('total_drop_price', filter=received),
+        last_order_date=Max('created_at'),
+    )
+    items_sold = item_model.objects.filter(
+        order__dropshipper_id=dropshipper_id, order__status=RECEIVED
+    ).aggregate(total=Sum('quantity'))['total']
+
+    revenue = totals['revenue'] or _ZERO
+    drop_cost = totals['drop_cost'] or _ZERO
+    fields = {
+        'total_orders': totals['total'],
+        'completed_orders': totals['completed'],
+        'cancelled_orders': totals['cancelled'],
+        'total_revenue': revenue,
+        'total_drop_cost': drop_cost,
+        'total_profit': revenue - drop_cost,
+        'total_items_sold': items_sold or 0,
+        'successful_orders': totals['completed'],
+        'loyalty_discount': min(Decimal(totals['completed']) * LOYALTY_DISCOUNT_PER_ORDER, LOYALTY_DISCOUNT_MAX),
+    }
+    if totals['last_order_date']:
+        fields['last_order_date'] = totals['last_order_date']
+    return fields
+
+
+def order_contribution(status, selling=_ZERO, drop=_ZERO) -> dict:
+    """Внесок одного заказу в лічильники (без кількості товарів)."""
+    received = status == RECEIVED
+    return {
+        'total_orders': 1,
+        'completed_orders': int(received),
+        'cancelled_orders': int(status == CANCELLED),
+        'total_revenue': Decimal(selling or 0) if received else _ZERO,
+        'total_drop_cost': Decimal(drop or 0) if received else _ZERO,
+    }
+
+
+def contribution_delta(old: dict | None, new: dict | None) -> dict:
+    keys = (old or new or {}).keys()
+    return {key: (new or {}).get(key, 0) - (old or {}).get(key, 0) for key in keys}
+
+
+def received_items_count(order_id) -> int:
+    from orders.models import DropshipperOrderItem
+
+    return DropshipperOrderItem.objects.filter(order_id=order_id).aggregate(total=Sum('quantity'))['total'] or 0
+
+
+def apply_stats_delta(dropshipper_id, *, items_sold=0, order_created_at=None, **delta) -> None:
+    """Зсуває лічильники статистики дропшипера на ``delta`` одним UPDATE.
+
+    Якщо рядка статистики ще немає — створює його повним перерахунком
+    (він уже врахує поточну зміну).
+    """
+    from orders.models import DropshipperStats
+
+    fields = {}
+    for name, value in delta.items():
+        if value:
+            fields[name] = F(name) + value
+    if delta.get('completed_orders'):
+        fields['successful_orders'] = F('successful_orders') + delta['completed_orders']
+    profit = delta.get('total_revenue', 0) - delta.get('total_drop_cost', 0)
+    if profit:
+        fields['total_profit'] = F('total_profit') + profit
+    if items_sold:
+        fields['total_items_sold'] = F('total_items_sold') + items_sold
+    if order_created_at is not None:
+        fields['last_order_date'] = Case(
+            When(last_order_date__gte=order_created_at, then=F('last_order_date')),
+            default=Value(order_created_at),
+        )
+    if not fields:
+        return
+
+    stats = DropshipperStats.objects.filter(dropshipper_id=dropshipper_id)
+    if not stats.update(updated_at=timezone.now(), **fields):
+        DropshipperStats.objects.get_or_create(dropshipper_id=dropshipper_id)[0].update_stats()
+        return
+    if delta.get('completed_orders'):
+        # Окремим UPDATE: MySQL бачить у SET уже нове successful_orders.
+        stats.update(
+            loyalty_discount=Least(
+                F('successful_orders') * LOYALTY_DISCOUNT_PER_ORDER,
+                Value(LOYALTY_DISCOUNT_MAX),
+            )
+        )
+
+
+def refresh_last_order_date(dropshipper_id, deleted_created_at) -> None:
+    """Після видалення останнього заказу — дата попереднього (один UPDATE)."""
+    from orders.models import DropshipperOrder, DropshipperStats
+
+    latest = (
+        DropshipperOrder.objects.filter(dropshipper_id=OuterRef('dropshipper_id'))
+        .order_by('-created_at')
+        .values('created_at')[:1]
+    )
+    DropshipperStats.objects.filter(
+        dropshipper_id=dropshipper_id, last_order_date__lte=deleted_created_at
+    ).update(last_order_date=Coalesce(Subquery(latest), F('last_order_date')))
@@ -0,0 +1,276 @@
+"""
+Общий клиент Telegram Bot API для уведомлений.
+
+Раньше ``TelegramNotifier`` вызывал ``requests.post`` на каждое сообщение,
+документ и альбом: новое TCP/TLS-соединение на запрос и никакого учёта
+лимитов Telegram, поэтому пачки уведомлений (массовая смена статусов,
+обновления ТТН) упирались в 429 и затем блокировались на повторах.
+
+``TelegramBotClient`` — один на токен бота в процессе (``get_telegram_client``):
+
+* ``requests.Session`` с пулом keep-alive соединений к api.telegram.org;
+* token bucket на весь бот (``TELEGRAM_GLOBAL_RATE_LIMIT``, по умолчанию
+  30 запросов/с) и на каждый чат (``TELEGRAM_CHAT_RATE_LIMIT`` — 1/с для
+  личных чатов; группы — ``TELEGRAM_GROUP_BURST`` = 20 сообщений с
+  пополнением ``TELEGRAM_GROUP_RATE_LIMIT`` = 20/мин).
+  Запрос сначала резервирует слот в своём чате (с учётом блокировки чата)
+  и ждёт его, и только потом берёт глобальный токен — на момент реальной
+  отправки, чтобы ожидание одного чата не занимало общую ёмкость бота.
+  Пачка уходит с максимально допустимой скоростью, а не ловит 429;
+* сколько ждать очереди, зависит от вызывающего. Поток, обрабатывающий
+  веб-запрос (между сигналами ``request_started``/``request_finished``),
+  ждёт не дольше ``TELEGRAM_MAX_WAIT`` секунд: иначе (в т.ч. при
+  ``retry_after`` длиннее этого) сразу возвращается ответ с ошибкой 429,
+  токены не списываются. Фоновые отправители (потоки уведомлений, Celery,
+  management-команды) ждут своего слота — до
+  ``TELEGRAM_BACKGROUND_MAX_WAIT`` секунд, так что пачка уходит целиком.
+  ``call(..., max_wait=...)`` переопределяет лимит для одного вызова;
+* на 429 соблюдается ``parameters.retry_after``: чат (или весь бот, если
+  чата нет) блокируется до этого момента, запрос повторяется до
+  ``TELEGRAM_MAX_RETRIES`` раз.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import requests
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+API_URL = "https://api.telegram.org/bot{token}/{method}"
+
+DEFAULT_GLOBAL_RATE = 30.0
+DEFAULT_CHAT_RATE = 1.0
+DEFAULT_GROUP_RATE = 20 / 60
+DEFAULT_GROUP_BURST = 20
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_MAX_WAIT = 5.0
+DEFAULT_BACKGROUND_MAX_WAIT = 600.0
+POOL_SIZE = 10
+
+
+class TokenBucket:
+    """Token bucket в форме GCRA: слот резервируется на конкретный момент.
+
+    ``tat`` — теоретическое время следующего слота при равномерной подаче;
+    ведро позволяет опережать его на ``capacity - 1`` интервалов (всплеск).
+    Резерв на будущий момент (после ожидания чата или блокировки) сдвигает
+    очередь от этого момента, а не от текущего.
+    """
+
+    def __init__(self, rate: float, capacity: float, now: float) -> None:
+        self.interval = 1.0 / rate
+        self.tolerance = (capacity - 1) * self.interval
+        self.tat = now
+
+    def ready_at(self, earliest: float) -> float:
+        """Ближайший момент не раньше ``earliest``, когда есть свободный токен."""
+        return max(earliest, self.tat - self.tolerance)
+
+    def take(self, at: float) -> None:
+        self.tat = max(self.tat, at) + self.interval
+
+
+def _is_group_chat(chat_id) -> bool:
+    return str(chat_id).startswith("-")
+
+
+_web_request = threading.local()
+
+
+def _mark_request_started(**kwargs) -> None:
+    _web_request.active = True
+
+
+def _mark_request_finished(**kwargs) -> None:
+    _web_request.active = False
+
+
+request_started.connect(_mark_request_started, dispatch_uid="telegram_client_request_started")
+request_finished.connect(_mark_request_finished, dispatch_uid="telegram_client_request_finished")
+
+
+def in_web_request() -> bool:
+    """Текущий поток обрабатывает HTTP-запрос (а не фоновую отправку)."""
+    return getattr(_web_request, "active", False)
+
+
+def _local_flood_payload(retry_after: float) -> Dict[str, Any]:
+    """Ответ в формате Bot API для запроса, отклонённого локальным лимитом."""
+    return {
+        "ok": False,
+        "error_code": 429,
+        "description": "Too Many Requests: local rate limit queue is full",
+        "parameters": {"retry_after": retry_after},
+    }
+
+
+def _rewind_files(files) -> None:
+    for value in (files or {}).values():
+        handle = value[1] if isinstance(value, (list, tuple)) and len(value) > 1 else value
+        if hasattr(handle, "seek"):
+            handle.seek(0)
+
+
+class TelegramBotClient:
+    """Пул соединений и планировщик лимитов для одного бота."""
+
+    def __init__(
+        self,
+        bot_token: str,
+        *,
+        global_rate: Optional[float] = None,
+        chat_rate: Optional[float] = None,
+        group_rate: Optional[float] = None,
+        group_burst: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        max_wait: Optional[float] = None,
+        background_max_wait: Optional[float] = None,
+        clock=time.monotonic,
+        sleep=time.sleep,
+    ) -> None:
+        self.bot_token = bot_token
+        self.global_rate = global_rate or getattr(settings, "TELEGRAM_GLOBAL_RATE_LIMIT", DEFAULT_GLOBAL_RATE)
+        self.chat_rate = chat_rate or getattr(settings, "TELEGRAM_CHAT_RATE_LIMIT", DEFAULT_CHAT_RATE)
+        self.group_rate = group_rate or getattr(settings, "TELEGRAM_GROUP_RATE_LIMIT", DEFAULT_GROUP_RATE)
+        self.group_burst = max(1, group_burst or getattr(settings, "TELEGRAM_GROUP_BURST", DEFAULT_GROUP_BURST))
+        self.max_retries = max(
+            1, max_retries or getattr(settings, "TELEGRAM_MAX_RETRIES", DEFAULT_MAX_RETRIES)
+        )
+        self.max_wait = max_wait if max_wait is not None else getattr(
+            settings, "TELEGRAM_MAX_WAIT", DEFAULT_MAX_WAIT
+        )
+        self.background_max_wait = background_max_wait if background_max_wait is not None else getattr(
+            settings, "TELEGRAM_BACKGROUND_MAX_WAIT", DEFAULT_BACKGROUND_MAX_WAIT
+        )
+        self._clock = clock
+        self._sleep = sleep
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._lock = threading.Lock()
+        self._global_bucket = TokenBucket(self.global_rate, self.global_rate, clock())
+        self._chat_buckets: Dict[str, TokenBucket] = {}
+        self._blocked_until: Dict[Optional[str], float] = {}
+
+    def _chat_bucket(self, chat_key: str, now: float) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_key)
+        if bucket is None:
+            if _is_group_chat(chat_key):
+                bucket = TokenBucket(self.group_rate, self.group_burst, now)
+            else:
+                bucket = TokenBucket(self.chat_rate, 1, now)
+            self._chat_buckets[chat_key] = bucket
+        return bucket
+
+    def _reserve_chat(self, chat_key: Optional[str], max_wait: float) -> Optional[float]:
+        """Резервирует слот в чате и возвращает, сколько секунд до него ждать.
+
+        None — ждать пришлось бы дольше ``max_wait``; тогда ничего не списано.
+        """
+        if chat_key is None:
+            return 0.0
+        with self._lock:
+            now = self._clock()
+            bucket = self._chat_bucket(chat_key, now)
+            ready = bucket.ready_at(max(now, self._blocked_until.get(chat_key, now)))
+            if ready - now > max_wait:
+                return None
+            bucket.take(ready)
+            return ready - now
+
+    def _reserve_global(self, max_wait: float) -> Optional[float]:
+        """Берёт глобальный токен на момент отправки (после ожидания чата)."""
+        with self._lock:
+            now = self._clock()
+            ready = self._global_bucket.ready_at(max(now, self._blocked_until.get(None, now)))
+            if ready - now > max_wait:
+                return None
+            self._global_bucket.take(ready)
+            return ready - now
+
+    def _block(self, chat_key: Optional[str], retry_after: float) -> None:
+        with self._lock:
+            until = self._clock() + retry_after
+            if until > self._blocked_until.get(chat_key, 0):
+                self._blocked_until[chat_key] = until
+
+    def call(
+        self, method: str, *, data=None, files=None, timeout: float = 10, max_wait: Optional[float] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Вызывает метод Bot API с учётом лимитов; возвращает JSON-ответ или None.
+
+        ``max_wait`` — сколько секунд можно ждать очереди; по умолчанию
+        ``max_wait`` клиента в веб-запросе и ``background_max_wait`` вне его.
+        """
+        if max_wait is None:
+            max_wait = self.max_wait if in_web_request() else self.background_max_wait
+        url = API_URL.format(token=self.bot_token, method=method)
+        chat_id = (data or {}).get("chat_id")
+        chat_key = str(chat_id) if chat_id not in (None, "") else None
+
+        payload = None
+        for attempt in range(1, self.max_retries + 1):
+            chat_wait = self._reserve_chat(chat_key, max_wait)
+            if chat_wait is not None and chat_wait > 0:
+                self._sleep(chat_wait)
+            global_wait = None if chat_wait is None else self._reserve_global(max_wait - chat_wait)
+            if global_wait is None:
+                # Слот чата (если уже взят) не возвращаем: это лишь притормозит чат.
+                logger.warning(
+                    "Telegram %s (chat %s): rate limit queue longer than %s s, not waiting",
+                    method, chat_key, max_wait,
+                )
+                return payload or _local_flood_payload(max_wait)
+            if global_wait > 0:
+                self._sleep(global_wait)
+            if attempt > 1:
+                _rewind_files(files)
+
+            response = self.session.post(url, data=data, files=files, timeout=timeout)
+            try:
+                payload = response.json()
+            except ValueError:
+                return None
+            if response.status_code != 429:
+                return payload
+
+            parameters = payload.get("parameters") if isinstance(payload, dict) else None
+            retry_after = (parameters or {}).get("retry_after") or 1
+            # Блокируем и при отказе ждать: следующие вызовы откажут локально, не дёргая API.
+            self._block(chat_key, retry_after)
+            if retry_after > max_wait or attempt >= self.max_retries:
+                logger.warning(
+                    "Telegram %s flood control (chat %s): retry_after=%s, giving up after %s attempts",
+                    method, chat_key, retry_after, attempt,
+                )
+                return payload
+            logger.info(
+                "Telegram %s flood control (chat %s): waiting %s s", method, chat_key, retry_after,
+            )
+        return payload
+
+
+_clients: Dict[str, TelegramBotClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_telegram_client(bot_token: str) -> TelegramBotClient:
+    """Возвращает общий для процесса клиент бота (Singleton на токен)."""
+    client = _clients.get(bot_token)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(bot_token)
+            if client is None:
+                client = TelegramBotClient(bot_token)
+                _clients[bot_token] = client
+    return client
@@ -7,11 +7,11 @@ import re
 from decimal import Decimal, InvalidOperation
 from pathlib import Path
 
-import requests
 from django.utils import timezone
 
 from orders.nova_poshta_documents import TELEGRAM_CREATE_NP_WAYBILL_ACTION, TELEGRAM_DELETE_NP_WAYBILL_ACTION
 from orders.status_management import get_telegram_status_action
+from orders.telegram_client import get_telegram_client
 from orders.telegram_status_links import build_order_action_url, build_order_status_action_url
 # Import async task
 try:
@@ -138,12 +138,8 @@ class TelegramNotifier:
         return self.chat_ids or self.admin_ids
 
     def _post_json(self, method, *, data=None, files=None, timeout=10):
-        url = f"https://api.telegram.org/bot{self.bot_token}/{method}"
-        response = requests.post(url, data=data, files=files, timeout=timeout)
-        try:
-            return response.json()
-        except ValueError:
-            return None
+        # Общий клиент: пул соединений + лимиты Telegram (глобальный и на чат)
+        return get_telegram_client(self.bot_token).call(method, data=data, files=files, timeout=timeout)
 
     def _post(self, method, *, data=None, files=None, timeout=10):
         payload = self._post_json(method, data=data, files=files, timeout=timeout)
@@ -370,15 +366,13 @@ class TelegramNotifier:
             return True
         else:
             try:
-                url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
                 data = {
                     'chat_id': telegram_id,
                     'text': message,
                     'parse_mode': parse_mode
                 }
-                print(f"🟡 Sending SYNC POST to {url[:50]}... with chat_id={telegram_id}")
-                response = requests.post(url, data=data, timeout=10)
-                return response.status_code == 200
+                print(f"🟡 Sending SYNC sendMessage with chat_id={telegram_id}")
+                return self._post("sendMessage", data=data, timeout=10)
             except Exception as e:
                 print(f"❌ Exception in send_personal_message: {e}")
                 return False
@@ -1101,8 +1095,6 @@ class TelegramNotifier:
             return False
 
         try:
-            url = f"https://api.telegram.org/bot{self.bot_token}/sendDocument"
-
             # Читаем файл
             success = False
             for target_id in target_ids:
@@ -1113,8 +1105,7 @@ class TelegramNotifier:
                         'caption': f"📋 Накладна #{invoice.invoice_number}\n🏢 {invoice.company_name}\n💰 {invoice.total_amount} грн",
                         'parse_mode': 'HTML'
                     }
-                    response = requests.post(url, files=files, data=data, timeout=30)
-                    success = success or response.status_code == 200
+                    success = self._post("sendDocument", data=data, files=files, timeout=30) or success
             return success
         except Exception as e:
             print(f"Ошибка при отправке документа накладной: {e}")
@@ -18,13 +18,25 @@ from django.utils import timezone
 
 from storefront.utils.analytics_helpers import get_offer_id as build_offer_id
 
+from .conversion_dispatcher import BatchOutcome, CoalescingEventDispatcher
+
 logger = logging.getLogger(__name__)
 
 
 class TikTokEventsService:
-    """Сервис для работы с TikTok Events API (server-to-server)."""
+    """
+    Сервис для работы с TikTok Events API (server-to-server).
+
+    События одного пикселя за окно FLUSH_WINDOW_SECONDS отправляются одним
+    запросом в pixel/batch/ (одиночное событие — как раньше, в pixel/track/).
+    """
 
     DEFAULT_ENDPOINT = 'https://business-api.tiktok.com/open_api/v1.3/pixel/track/'
+    DEFAULT_BATCH_ENDPOINT = 'https://business-api.tiktok.com/open_api/v1.3/pixel/batch/'
+    FLUSH_WINDOW_SECONDS = 0.05
+    MAX_BATCH_SIZE = 100
+    DELIVERY_WAIT_TIMEOUT = 60
+    REQUEST_TIMEOUT = 15
 
     def __init__(self) -> None:
         """Инициализация сервиса с настройками из ENV."""
@@ -32,6 +44,15 @@ class TikTokEventsService:
         self.pixel_code = getattr(settings, 'TIKTOK_EVENTS_PIXEL_CODE', None)
         self.test_event_code = getattr(settings, 'TIKTOK_EVENTS_TEST_EVENT_CODE', None)
         self.api_endpoint = getattr(settings, 'TIKTOK_EVENTS_API_ENDPOINT', self.DEFAULT_ENDPOINT)
+        self.batch_endpoint = getattr(settings, 'TIKTOK_EVENTS_BATCH_ENDPOINT', self.DEFAULT_BATCH_ENDPOINT)
+        self.dispatcher = CoalescingEventDispatcher(
+            'TikTok Events',
+            self._send_batch,
+            flush_window=getattr(settings, 'TIKTOK_EVENTS_FLUSH_WINDOW', self.FLUSH_WINDOW_SECONDS),
+            max_batch_size=self.MAX_BATCH_SIZE,
+            max_attempts=getattr(settings, 'TIKTOK_EVENTS_MAX_RETRIES', 3),
+            retry_delay=getattr(settings, 'TIKTOK_EVENTS_RETRY_DELAY', 1),
+        )
 
         if not self.access_token or not self.pixel_code:
             logger.error(
@@ -234,31 +255,67 @@ class TikTokEventsService:
 
         return payload
 
-    def _send_payload(self, payload: Dict[str, Any]) -> bool:
-        """Отправляет подготовленный payload в TikTok Events API."""
-        if not self.enabled or not self.session:
-            logger.debug("TikTok Events API disabled, skipping payload: %s", payload)
-            return False
+    @staticmethod
+    def _failed_batch_event_ids(data: Dict[str, Any], event_ids: List[str]) -> set:
+        """event_id событий, которые batch-ответ перечислил как неуспешные."""
+        details = data.get('data') if isinstance(data.get('data'), dict) else {}
+        failed = set()
+        for key in ('failed_events', 'partial_failures', 'errors'):
+            for item in details.get(key) or []:
+                if not isinstance(item, dict):
+                    continue
+                if item.get('event_id') in event_ids:
+                    failed.add(item['event_id'])
+                elif isinstance(item.get('index'), int) and 0 <= item['index'] < len(event_ids):
+                    failed.add(event_ids[item['index']])
+        return failed
+
+    def _send_batch(self, key, payloads: List[Dict[str, Any]]) -> BatchOutcome:
+        """Отправляет пачку событий одного пикселя одним запросом.
+
+        Сетевые ошибки, 429 и 5xx — исключение, диспетчер повторит всю пачку;
+        ошибка Events API (code != 0) — отказ без повторов; события, которые
+        batch-ответ перечислил как неуспешные, повторяются отдельно.
+        """
+        event_ids = [payload.get('event_id') for payload in payloads]
+        if len(payloads) == 1:
+            url, body = self.api_endpoint, payloads[0]
+        else:
+            pixel_code, test_event_code = key
+            body = {
+                'pixel_code': pixel_code,
+                'batch': [
+                    {name: value for name, value in payload.items() if name not in ('pixel_code', 'test_event_code')}
+                    for payload in payloads
+                ],
+            }
+            if test_event_code:
+                body['test_event_code'] = test_event_code
+            url = self.batch_endpoint
 
-        try:
-            response = self.session.post(self.api_endpoint, json=payload, timeout=15)
+        response = self.session.post(url, json=body, timeout=self.REQUEST_TIMEOUT)
+        if response.status_code == 429 or response.status_code >= 500:
             response.raise_for_status()
-        except requests.RequestException as exc:
-            logger.error("❌ TikTok Events API request failed: %s", exc, exc_info=True)
-            return False
 
         try:
+            response.raise_for_status()
             data = response.json()
+        except requests.RequestException as exc:
+            logger.error("❌ TikTok Events API request failed: %s", exc, exc_info=True)
+            return BatchOutcome(rejected=set(event_ids))
         except ValueError:
             logger.error("❌ TikTok Events API returned non-JSON response: %s", response.text)
-            return False
+            return BatchOutcome(rejected=set(event_ids))
 
-        if data.get('code') == 0:
-            logger.info("✅ TikTok Events API accepted event: %s", payload.get('event_id'))
-            return True
+        if data.get('code') != 0:
+            logger.error("❌ TikTok Events API responded with error: %s", data)
+            return BatchOutcome(rejected=set(event_ids))
 
-        logger.error("❌ TikTok Events API responded with error: %s", data)
-        return False
+        failed = self._failed_batch_event_ids(data, event_ids)
+        if failed:
+            logger.warning("⚠️ TikTok Events API did not accept events %s: %s", sorted(failed), data)
+        logger.info("✅ TikTok Events API accepted %s events", len(event_ids) - len(failed))
+        return BatchOutcome(retry=failed)
 
     def send_event(
         self,
@@ -274,7 +331,12 @@ class TikTokEventsService:
             return False
 
         payload = self._build_payload(order, event_name, event_id, source_url, test_event_code)
-        return self._send_payload(payload)
+        ticket = self.dispatcher.submit(
+            (self.pixel_code, payload.get('test_event_code') or ''),
+            event_id,
+            payload,
+        )
+        return ticket.wait(self.DELIVERY_WAIT_TIMEOUT)
 
     def send_purchase_event(
         self,
@@ -16,6 +16,7 @@ from django.contrib import admin
 from django.utils import timezone
 
 from .models import Review, ReviewImage, ReviewStatus, ReviewVote
+from .services.aggregate import schedule_rating_refresh
 
 
 class ReviewImageInline(admin.TabularInline):
@@ -87,21 +88,28 @@ class ReviewAdmin(admin.ModelAdmin):
     @admin.action(description="Опублікувати вибрані відгуки")
     def approve_selected(self, request, queryset):
         now = timezone.now()
-        updated = queryset.exclude(status=ReviewStatus.APPROVED).update(
+        changed = queryset.exclude(status=ReviewStatus.APPROVED)
+        product_ids = set(changed.values_list("product_id", flat=True))
+        updated = changed.update(
             status=ReviewStatus.APPROVED,
             moderated_at=now,
             moderated_by=request.user if request.user.is_authenticated else None,
         )
+        # ``QuerySet.update`` skips signals — refresh the summaries here.
+        schedule_rating_refresh(product_ids)
         self.message_user(request, f"Опубліковано: {updated}.")
 
     @admin.action(description="Відхилити вибрані відгуки")
     def reject_selected(self, request, queryset):
         now = timezone.now()
-        updated = queryset.exclude(status=ReviewStatus.REJECTED).update(
+        changed = queryset.exclude(status=ReviewStatus.REJECTED)
+        product_ids = set(changed.values_list("product_id", flat=True))
+        updated = changed.update(
             status=ReviewStatus.REJECTED,
             moderated_at=now,
             moderated_by=request.user if request.user.is_authenticated else None,
         )
+        schedule_rating_refresh(product_ids)
         self.message_user(request, f"Відхилено: {updated}.")
 
 
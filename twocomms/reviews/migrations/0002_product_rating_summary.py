@@ -0,0 +1,53 @@
+# Generated by Django 5.2.11 on 2026-10-19 00:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_rating_summaries(apps, schema_editor):
+    Review = apps.get_model('reviews', 'Review')
+    ProductRatingSummary = apps.get_model('reviews', 'ProductRatingSummary')
+    rows = (
+        Review.objects.filter(status='approved')
+        .values('product_id')
+        .annotate(
+            approved_count=Count('id'),
+            rating_sum=Sum('rating'),
+            **{f'stars_{star}': Count('id', filter=Q(rating=star)) for star in range(1, 6)},
+        )
+    )
+    ProductRatingSummary.objects.bulk_create(
+        [ProductRatingSummary(**row) for row in rows],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0001_initial'),
+        ('storefront', '0078_qrdevicegrant'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductRatingSummary',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating_summary', serialize=False, to='storefront.product', verbose_name='Товар')),
+                ('approved_count', models.PositiveIntegerField(default=0, verbose_name='Опубліковано відгуків')),
+                ('rating_sum', models.PositiveIntegerField(default=0, verbose_name='Сума оцінок')),
+                ('stars_1', models.PositiveIntegerField(default=0)),
+                ('stars_2', models.PositiveIntegerField(default=0)),
+                ('stars_3', models.PositiveIntegerField(default=0)),
+                ('stars_4', models.PositiveIntegerField(default=0)),
+                ('stars_5', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Рейтинг товару',
+                'verbose_name_plural': 'Рейтинги товарів',
+            },
+        ),
+        migrations.RunPython(backfill_rating_summaries, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,6 @@
 """Phase 21 (2026-05-10) — product review models.
 
-Three tables:
+Four tables:
 
 * ``Review``       — one row per submission. Always created with
   ``status='pending'`` and only surfaces on the PDP after a moderator
@@ -19,12 +19,16 @@ Three tables:
   ``user`` so guests can vote without authentication while still
   giving us a deduping key.
 
+* ``ProductRatingSummary`` — denormalised approved-review count, star
+  sum and per-star histogram, one row per product that has at least one
+  approved review. Maintained by ``reviews.signals`` (and the admin
+  bulk actions) through ``reviews.services.aggregate``, so catalogue
+  grids, feeds and list JSON-LD can read ratings for a whole page in
+  one query. The row is always *recomputed* from ``Review`` rather than
+  incremented, so an un-approve or delete can never make it drift.
+
 The aggregate rating helper lives in ``reviews.services.aggregate``
-and is the only piece the SEO/schema layer talks to. Models therefore
-intentionally avoid denormalised ``rating_avg`` / ``rating_count``
-columns: they would drift the moment an admin un-approves a review,
-and the helper is cheap (``GROUP BY product_id``) on the indexes
-declared below.
+and is the only piece the SEO/schema layer talks to.
 """
 
 from __future__ import annotations
@@ -272,3 +276,34 @@ class ReviewVote(models.Model):
                 name="rev_vote_user_or_anon_required",
             ),
         ]
+
+
+class ProductRatingSummary(models.Model):
+    """Approved-review aggregates for one product (see module docstring).
+
+    No row means "no approved reviews". Written only by
+    ``reviews.services.aggregate.refresh_rating_summaries``.
+    """
+
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="rating_summary",
+        verbose_name="Товар",
+    )
+    approved_count = models.PositiveIntegerField(default=0, verbose_name="Опубліковано відгуків")
+    rating_sum = models.PositiveIntegerField(default=0, verbose_name="Сума оцінок")
+    stars_1 = models.PositiveIntegerField(default=0)
+    stars_2 = models.PositiveIntegerField(default=0)
+    stars_3 = models.PositiveIntegerField(default=0)
+    stars_4 = models.PositiveIntegerField(default=0)
+    stars_5 = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Рейтинг товару"
+        verbose_name_plural = "Рейтинги товарів"
+
+    def __str__(self) -> str:  # pragma: no cover — admin display
+        return f"{self.product_id}: {self.approved_count} / {self.rating_sum}"
@@ -5,16 +5,25 @@ The single source of truth for "what does the PDP / Product schema
 generator, admin dashboards) MUST go through this module so the
 business rule "AggregateRating only at ≥3 approved reviews" is
 enforced exactly once.
+
+Reads go through the denormalised ``ProductRatingSummary`` table:
+``aggregate_rating_for_product`` is a single primary-key lookup and
+``aggregate_ratings_for_products`` serves a whole catalogue page (cards,
+feeds, ItemList JSON-LD) in one query. ``refresh_rating_summaries``
+rebuilds rows from approved ``Review`` rows; ``reviews.signals`` calls it
+whenever a review enters or leaves ``approved`` (or changes rating /
+product while approved).
 """
 
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Optional
+from typing import Iterable, Optional
 
-from django.db.models import Avg, Count
+from django.db import transaction
+from django.db.models import Count, Q, Sum
 
-from reviews.models import Review, ReviewStatus
+from reviews.models import ProductRatingSummary, Review, ReviewStatus
 
 
 # Threshold below which we deliberately HIDE the rating block and
@@ -69,33 +78,11 @@ class ProductReviewSummary:
         return [{"star": s, "count": int(self.histogram.get(s, 0))} for s in (5, 4, 3, 2, 1)]
 
 
-def aggregate_rating_for_product(product) -> ProductReviewSummary:
-    """Compute the public review summary for a single product.
-
-    Cheap query: one ``COUNT`` + one ``AVG`` plus a histogram via
-    ``values('rating').annotate(Count('id'))`` — all hitting the
-    ``rev_status_product_idx`` index.
-    """
-
-    qs = Review.objects.filter(
-        product=product,
-        status=ReviewStatus.APPROVED,
-    )
-
-    agg = qs.aggregate(count=Count("id"), avg=Avg("rating"))
-    count = int(agg["count"] or 0)
-    avg_value = agg["avg"]
-    avg = round(float(avg_value), 1) if avg_value is not None else None
+STARS = (1, 2, 3, 4, 5)
 
-    # Histogram: always include keys 1..5 even if empty so the
-    # template can render bars without conditionals.
-    histogram = {k: 0 for k in range(1, 6)}
-    if count:
-        for row in qs.values("rating").annotate(n=Count("id")):
-            rating = int(row["rating"])
-            if 1 <= rating <= 5:
-                histogram[rating] = int(row["n"])
 
+def _summary_from_counts(count: int, rating_sum: int, histogram: dict[int, int]) -> ProductReviewSummary:
+    avg = round(rating_sum / count, 1) if count else None
     return ProductReviewSummary(
         count=count,
         avg=avg,
@@ -104,8 +91,88 @@ def aggregate_rating_for_product(product) -> ProductReviewSummary:
     )
 
 
+def _empty_summary() -> ProductReviewSummary:
+    return _summary_from_counts(0, 0, {star: 0 for star in STARS})
+
+
+def _summary_from_row(row: ProductRatingSummary) -> ProductReviewSummary:
+    histogram = {star: int(getattr(row, f"stars_{star}")) for star in STARS}
+    return _summary_from_counts(int(row.approved_count), int(row.rating_sum), histogram)
+
+
+def aggregate_ratings_for_products(product_ids: Iterable[int]) -> dict[int, ProductReviewSummary]:
+    """Summaries for many products in ONE query.
+
+    Every requested id is present in the result; products without
+    approved reviews map to the zero summary.
+    """
+
+    ids = {int(pk) for pk in product_ids if pk is not None}
+    if not ids:
+        return {}
+    summaries = {pk: _empty_summary() for pk in ids}
+    for row in ProductRatingSummary.objects.filter(product_id__in=ids):
+        summaries[row.product_id] = _summary_from_row(row)
+    return summaries
+
+
+def aggregate_rating_for_product(product) -> ProductReviewSummary:
+    """The public review summary for a single product (one PK lookup)."""
+
+    product_id = getattr(product, "pk", product)
+    return aggregate_ratings_for_products([product_id]).get(product_id, _empty_summary())
+
+
+def refresh_rating_summaries(product_ids: Iterable[int]) -> None:
+    """Rebuild ``ProductRatingSummary`` rows from approved reviews.
+
+    One grouped query over ``rev_status_product_idx`` for all ids, then
+    an upsert per product that has approved reviews and a delete for the
+    rest. Recomputing (instead of incrementing) keeps it idempotent, so
+    callers may safely run it twice.
+    """
+
+    ids = {int(pk) for pk in product_ids if pk is not None}
+    if not ids:
+        return
+    rows = (
+        Review.objects
+        .filter(product_id__in=ids, status=ReviewStatus.APPROVED)
+        .values("product_id")
+        .annotate(
+            approved_count=Count("id"),
+            rating_sum=Sum("rating"),
+            **{f"stars_{star}": Count("id", filter=Q(rating=star)) for star in STARS},
+        )
+    )
+    seen = set()
+    for row in rows:
+        product_id = row.pop("product_id")
+        seen.add(product_id)
+        ProductRatingSummary.objects.update_or_create(product_id=product_id, defaults=row)
+    if ids - seen:
+        ProductRatingSummary.objects.filter(product_id__in=ids - seen).delete()
+
+
+def schedule_rating_refresh(product_ids: Iterable[int]) -> None:
+    """Refresh now and once more after commit.
+
+    The second pass picks up approvals committed concurrently by another
+    transaction between our recompute and our commit.
+    """
+
+    ids = {int(pk) for pk in product_ids if pk is not None}
+    if not ids:
+        return
+    refresh_rating_summaries(ids)
+    transaction.on_commit(lambda: refresh_rating_summaries(ids))
+
+
 __all__ = [
     "MIN_APPROVED_REVIEWS_FOR_RATING",
     "ProductReviewSummary",
     "aggregate_rating_for_product",
+    "aggregate_ratings_for_products",
+    "refresh_rating_summaries",
+    "schedule_rating_refresh",
 ]
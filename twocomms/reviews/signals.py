@@ -14,8 +14,14 @@ Two responsibilities:
    page; their renderer will pick up the new aggregateRating + Review
    nested JSON-LD on the next visit.
 
-Both handlers fail safely: any exception is logged and swallowed —
-review submission must NEVER block on a flaky external service.
+3. ``refresh_rating_summary_on_change`` / ``refresh_rating_summary_on_delete``
+   — keep ``ProductRatingSummary`` in step whenever an approved review
+   appears, disappears, or changes its rating / product, and invalidate
+   the product's cached JSON-LD (aggregateRating + nested reviews).
+
+The external-service handlers fail safely: any exception is logged and
+swallowed — review submission must NEVER block on a flaky external
+service. The summary refresh is a local DB write and is allowed to raise.
 """
 
 from __future__ import annotations
@@ -23,9 +29,11 @@ from __future__ import annotations
 import logging
 
 from django.conf import settings
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 
+from storefront.services.structured_data_cache import bump_product_jsonld_version
+
 from .models import Review, ReviewStatus
 
 
@@ -37,6 +45,8 @@ logger = logging.getLogger(__name__)
 # status and stamps an attribute on the instance which post_save
 # checks. Cheap and request-local.
 _STATUS_CHANGED_ATTR = "_phase21_status_was"
+# Same trick for the rating summary: (status, rating, product_id) before save.
+_RATING_STATE_ATTR = "_rating_summary_state_was"
 
 
 @receiver(pre_save, sender=Review)
@@ -44,12 +54,15 @@ def _capture_previous_status(sender, instance: Review, **kwargs):
     """Stash the pre-save status so post_save can detect transitions."""
     if not instance.pk:
         setattr(instance, _STATUS_CHANGED_ATTR, None)
+        setattr(instance, _RATING_STATE_ATTR, None)
         return
     try:
-        prev = Review.objects.only("status").get(pk=instance.pk)
+        prev = Review.objects.only("status", "rating", "product_id").get(pk=instance.pk)
         setattr(instance, _STATUS_CHANGED_ATTR, prev.status)
+        setattr(instance, _RATING_STATE_ATTR, (prev.status, prev.rating, prev.product_id))
     except Review.DoesNotExist:
         setattr(instance, _STATUS_CHANGED_ATTR, None)
+        setattr(instance, _RATING_STATE_ATTR, None)
 
 
 @receiver(post_save, sender=Review)
@@ -80,6 +93,41 @@ def ping_indexnow_on_first_approval(sender, instance: Review, created: bool, **k
         )
 
 
+@receiver(post_save, sender=Review)
+def refresh_rating_summary_on_change(sender, instance: Review, created: bool, **kwargs):
+    """Recompute the product summary when the approved set may have changed."""
+    previous = getattr(instance, _RATING_STATE_ATTR, None)
+    current = (instance.status, instance.rating, instance.product_id)
+    was_approved = bool(previous) and previous[0] == ReviewStatus.APPROVED
+    is_approved = instance.status == ReviewStatus.APPROVED
+    if not (was_approved or is_approved):
+        return
+    if previous == current:
+        return  # e.g. a helpful-vote or moderation-note save.
+    product_ids = {instance.product_id}
+    if was_approved:
+        product_ids.add(previous[2])
+    from .services.aggregate import schedule_rating_refresh
+
+    schedule_rating_refresh(product_ids)
+    bump_product_jsonld_version(*product_ids)
+
+
+@receiver(post_delete, sender=Review)
+def refresh_rating_summary_on_delete(sender, instance: Review, **kwargs):
+    """Drop the review from its product summary.
+
+    Also fires for the cascade when a product is deleted; by then every
+    review of that product is gone, so the refresh just deletes the row.
+    """
+    if instance.status != ReviewStatus.APPROVED:
+        return
+    from .services.aggregate import schedule_rating_refresh
+
+    schedule_rating_refresh([instance.product_id])
+    bump_product_jsonld_version(instance.product_id)
+
+
 # --------------------------------------------------------------------
 # Internal helpers
 # --------------------------------------------------------------------
@@ -7,13 +7,17 @@ only count approved rows (pending and rejected never leak).
 from __future__ import annotations
 
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from storefront.models import Category, Product
-from reviews.models import Review, ReviewStatus
+from reviews.models import ProductRatingSummary, Review, ReviewStatus
 from reviews.services.aggregate import (
     MIN_APPROVED_REVIEWS_FOR_RATING,
     aggregate_rating_for_product,
+    aggregate_ratings_for_products,
+    refresh_rating_summaries,
 )
 
 
@@ -148,3 +152,77 @@ class ReviewModelLifecycleTests(TestCase):
         self.assertEqual(r.moderated_by, admin_user)
         self.assertIsNotNone(r.moderated_at)
         self.assertEqual(r.moderation_note, "ok")
+
+
+class ProductRatingSummaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(
+            name="Reviews Summary", slug="rev-summary", is_active=True,
+        )
+        cls.products = [
+            Product.objects.create(
+                title=f"Summary Tee {i}", slug=f"summary-tee-{i}",
+                category=cls.category, price=300, status="published",
+            )
+            for i in range(3)
+        ]
+
+    def _make_review(self, product, rating, status=ReviewStatus.PENDING):
+        return Review.objects.create(
+            product=product, author_name="Anon", anon_key="k",
+            rating=rating, body="x" * 30, status=status,
+        )
+
+    def test_approve_reject_and_delete_keep_summary_in_step(self):
+        product = self.products[0]
+        review = self._make_review(product, 4)
+        self.assertFalse(ProductRatingSummary.objects.filter(product=product).exists())
+
+        review.mark_approved()
+        row = ProductRatingSummary.objects.get(product=product)
+        self.assertEqual((row.approved_count, row.rating_sum, row.stars_4), (1, 4, 1))
+
+        self._make_review(product, 2, status=ReviewStatus.APPROVED)
+        review.rating = 5
+        review.save()
+        s = aggregate_rating_for_product(product)
+        self.assertEqual(s.count, 2)
+        self.assertEqual(s.avg, 3.5)
+        self.assertEqual(s.histogram, {1: 0, 2: 1, 3: 0, 4: 0, 5: 1})
+
+        review.mark_rejected()
+        self.assertEqual(aggregate_rating_for_product(product).count, 1)
+
+        Review.objects.filter(product=product).delete()
+        self.assertFalse(ProductRatingSummary.objects.filter(product=product).exists())
+        self.assertEqual(aggregate_rating_for_product(product).count, 0)
+
+    def test_bulk_accessor_uses_one_query(self):
+        first, second, empty = self.products
+        for rating in (5, 4):
+            self._make_review(first, rating, status=ReviewStatus.APPROVED)
+        self._make_review(second, 3, status=ReviewStatus.APPROVED)
+
+        with CaptureQueriesContext(connection) as ctx:
+            summaries = aggregate_ratings_for_products([first.pk, second.pk, empty.pk])
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(summaries[first.pk].avg, 4.5)
+        self.assertEqual(summaries[second.pk].count, 1)
+        self.assertFalse(summaries[empty.pk].has_any_approved)
+        self.assertEqual(aggregate_ratings_for_products([]), {})
+
+    def test_refresh_repairs_rows_written_behind_signals(self):
+        product = self.products[1]
+        review = self._make_review(product, 5)
+        Review.objects.filter(pk=review.pk).update(status=ReviewStatus.APPROVED)
+        self.assertEqual(aggregate_rating_for_product(product).count, 0)
+
+        refresh_rating_summaries([product.pk])
+        self.assertEqual(aggregate_rating_for_product(product).avg, 5.0)
+
+    def test_deleting_product_cascades_cleanly(self):
+        product = self.products[2]
+        self._make_review(product, 5, status=ReviewStatus.APPROVED)
+        product.delete()
+        self.assertFalse(ProductRatingSummary.objects.filter(product_id=product.pk).exists())
@@ -9,23 +9,44 @@ from cache_utils import get_fragment_cache
 from productcolors.models import Color, ProductColorImage, ProductColorVariant
 
 from .analytics_exclusions import invalidate_snapshot as invalidate_analytics_exclusions
-from .models import AnalyticsExclusion, Category, Product
+from .models import AnalyticsExclusion, Category, Product, ProductImage, PromoCode
+from .services.cart_pricing import bump_cart_price_version
+from .services.color_filter import bump_color_facet_version
 from .services.catalog_helpers import (
     bump_public_category_version,
     bump_public_product_order_version,
 )
 from .services.indexnow import enqueue_indexnow_urls, get_category_public_url
+from .services.structured_data_cache import bump_product_jsonld_version
 from .services.google_indexing import enqueue_google_indexing_urls
 
 
+# name + перекладені name_<lang> і slug — усе, що з категорії потрапляє в JSON-LD товару.
+CATEGORY_JSONLD_FIELDS = tuple(
+    field.attname
+    for field in Category._meta.concrete_fields
+    if field.name in ("name", "slug") or field.name.startswith("name_")
+)
+
+
+def _category_jsonld_snapshot(category):
+    return tuple(getattr(category, field, None) for field in CATEGORY_JSONLD_FIELDS)
+
+
 @receiver(pre_save, sender=Category)
 def remember_previous_category_public_url(sender, instance, **kwargs):
     if not instance.pk:
         instance._indexnow_previous_public_url = None
+        instance._jsonld_previous_snapshot = None
         return
 
-    previous = Category.objects.filter(pk=instance.pk).only("slug", "is_active").first()
+    previous = (
+        Category.objects.filter(pk=instance.pk)
+        .only("is_active", *CATEGORY_JSONLD_FIELDS)
+        .first()
+    )
     instance._indexnow_previous_public_url = get_category_public_url(previous)
+    instance._jsonld_previous_snapshot = _category_jsonld_snapshot(previous) if previous else None
 
 
 @receiver([post_save, post_delete], sender=Category)
@@ -56,6 +77,49 @@ def invalidate_public_product_listing_cache_for_color_data(sender, **kwargs):
     transaction.on_commit(bump_public_product_order_version)
 
 
+@receiver(post_save, sender=Product)
+def invalidate_own_product_jsonld(sender, instance, **kwargs):
+    """
+    save(update_fields=[...]) does not refresh updated_at, so bump explicitly.
+    """
+    bump_product_jsonld_version(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=ProductImage)
+@receiver([post_save, post_delete], sender=ProductColorVariant)
+def invalidate_product_jsonld(sender, instance, **kwargs):
+    """
+    Related rows feed Product JSON-LD but do not touch Product.updated_at.
+    """
+    bump_product_jsonld_version(instance.product_id)
+
+
+@receiver([post_save, post_delete], sender=ProductColorImage)
+def invalidate_product_jsonld_for_color_image(sender, instance, **kwargs):
+    product_id = (
+        ProductColorVariant.objects.filter(pk=instance.variant_id)
+        .values_list("product_id", flat=True)
+        .first()
+    )
+    bump_product_jsonld_version(product_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Color)
+def invalidate_product_jsonld_for_shared_rows(sender, instance, **kwargs):
+    """
+    Category and colour names are embedded in every related product schema.
+    """
+    if sender is Category:
+        previous = getattr(instance, "_jsonld_previous_snapshot", None)
+        if previous is not None and previous == _category_jsonld_snapshot(instance):
+            return
+        product_ids = Product.objects.filter(category=instance).values_list("id", flat=True)
+    else:
+        product_ids = ProductColorVariant.objects.filter(color=instance).values_list("product_id", flat=True)
+    bump_product_jsonld_version(*product_ids)
+
+
 @receiver(post_save, sender=Category)
 def submit_category_to_indexnow_on_save(sender, instance, **kwargs):
     previous_url = getattr(instance, "_indexnow_previous_public_url", None)
@@ -84,3 +148,34 @@ def submit_category_to_indexnow_on_delete(sender, instance, **kwargs):
 def invalidate_analytics_exclusion_cache(sender, **kwargs):
     """Drop the cached exclusion snapshot whenever the admin edits the list."""
     invalidate_analytics_exclusions()
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=ProductColorVariant)
+@receiver([post_save, post_delete], sender=ProductColorImage)
+@receiver([post_save, post_delete], sender=Color)
+def invalidate_priced_cart_snapshots(sender, **kwargs):
+    """
+    Цены и подписи позиций в снимке корзины (cart_pricing).
+    """
+    bump_cart_price_version()
+
+
+@receiver([post_save, post_delete], sender=PromoCode)
+def invalidate_priced_cart_snapshots_for_promo(sender, created=False, **kwargs):
+    """
+    Новый промокод ещё не применён ни в одной корзине — снимки не трогаем.
+    """
+    if not created:
+        bump_cart_price_version()
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=ProductColorVariant)
+@receiver([post_save, post_delete], sender=Color)
+def invalidate_color_facet_index(sender, **kwargs):
+    """
+    Счётчики, подписи и hex чипов цветового фильтра (color_filter).
+    """
+    bump_color_facet_version()
@@ -1,16 +1,30 @@
 import gc
+import os
 import time
 from pathlib import Path
 
+from django.conf import settings
 from django.core.management.base import BaseCommand
-from django.db import close_old_connections
+from django.db import close_old_connections, connections
 
-from image_optimizer import ImageOptimizer
 from storefront.models import Product, ProductImage, Category, CatalogOptionValue, SizeGrid
-from storefront.services.image_variants import optimized_variants_are_current
+from storefront.services.image_pipeline import (
+    KIND_ICON,
+    KIND_PRODUCT,
+    MANIFEST_FILENAME,
+    STATUS_FAILED,
+    STATUS_OPTIMIZED,
+    STATUS_SKIPPED,
+    ImageJob,
+    OptimizationManifest,
+    iter_job_results,
+)
 from productcolors.models import ProductColorImage
 
 
+ALL_STEPS = 'product_main,product_extra,color,category,option,size,proposal'
+
+
 class Command(BaseCommand):
     help = 'Optimizes images for all products and categories using ImageOptimizer'
 
@@ -24,7 +38,7 @@ class Command(BaseCommand):
         parser.add_argument(
             '--steps',
             type=str,
-            default='product_main,product_extra,color,category,option,size,proposal',
+            default=ALL_STEPS,
             help='Comma-separated steps to run: product_main,product_extra,color,category,option,size,proposal'
         )
         parser.add_argument(
@@ -50,44 +64,31 @@ class Command(BaseCommand):
             default=None,
             help='Only process objects with id less than or equal to this value.'
         )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=getattr(settings, 'IMAGE_OPTIMIZE_WORKERS', 1),
+            help='Worker processes for encoding (0 = one per CPU core, 1 = sequential, no pool).'
+        )
+        parser.add_argument(
+            '--max-memory-mb',
+            type=int,
+            default=getattr(settings, 'IMAGE_OPTIMIZE_MAX_MEMORY_MB', None),
+            help='Address-space cap per worker process in MB (pool mode only).'
+        )
+        parser.add_argument(
+            '--manifest',
+            type=str,
+            default=None,
+            help=f'Path to the content-hash manifest used to resume runs (default: MEDIA_ROOT/{MANIFEST_FILENAME}).'
+        )
 
-    def handle(self, *args, **options):
-        optimizer = ImageOptimizer()
-        limit = options.get('limit')
-        steps = {step.strip() for step in (options.get('steps') or '').split(',') if step.strip()}
-        if not steps:
-            steps = {
-                'product_main', 'product_extra', 'color',
-                'category', 'option', 'size', 'proposal'
-            }
-        sleep = float(options.get('sleep') or 0)
-        force = bool(options.get('force'))
-        min_id = options.get('min_id')
-        max_id = options.get('max_id')
-
-        self.stdout.write('Starting image optimization...')
-        self.stdout.flush()
-
-        def _already_optimized(image_path: Path) -> bool:
-            """
-            Быстрый пропуск, если оптимизированные версии уже есть и не старее исходника.
-            """
-            return optimized_variants_are_current(image_path)
-
-        saved_total = 0
-        processed = 0
-
-        def _refresh_connection():
-            # Долгая CPU-оптимизация может пережить wait_timeout MySQL на shared-хостинге.
-            close_old_connections()
-
-        def _pause():
-            gc.collect()
-            if sleep > 0:
-                time.sleep(sleep)
-
-        def _should_stop() -> bool:
-            return limit is not None and processed >= limit
+    def _collect_jobs(self, steps, min_id, max_id, manifest, force):
+        """
+        Собирает задания по шагам (только пути из БД, без открытия изображений).
+        """
+        media_root = Path(settings.MEDIA_ROOT)
+        seen = set()
 
         def _id_range(queryset):
             if min_id is not None:
@@ -96,214 +97,172 @@ class Command(BaseCommand):
                 queryset = queryset.filter(pk__lte=max_id)
             return queryset
 
-        # 1. Products Main Images
-        if 'product_main' in steps:
-            _refresh_connection()
-            products = _id_range(Product.objects.exclude(main_image='').defer('catalog'))
-            total_products = products.count()
-            self.stdout.write(f'Found {total_products} products with main images')
-            self.stdout.flush()
+        def _job(field_file, label, kind=KIND_PRODUCT):
+            if not field_file:
+                return None
+            path = Path(field_file.path)
+            if not path.exists():
+                return None
+            try:
+                relative = path.relative_to(media_root).as_posix()
+            except ValueError:
+                relative = str(path)
+            key = f'{kind}:{relative}'
+            if key in seen:
+                return None
+            seen.add(key)
+            known = manifest.get(key)
+            return ImageJob(
+                key=key,
+                label=label,
+                path=str(path),
+                kind=kind,
+                known_hash=known.get('sha256'),
+                known_outputs=tuple(known.get('outputs') or ()),
+                force=force,
+            )
 
-            for i, product in enumerate(products.iterator(chunk_size=1000), 1):
-                if product.main_image:
-                    path = Path(product.main_image.path)
-                    if path.exists():
-                        if not force and _already_optimized(path):
-                            continue
-                        self.stdout.write(f'[{i}/{total_products}] Optimizing Product {product.id}: {product.title}')
-                        self.stdout.flush()
-                        variants = optimizer.optimize_product_image(str(path))
-                        if variants:
-                            optimizer.save_optimized_images(variants, path.parent / "optimized")
-                            saved_total += len(variants)
-                            processed += 1
-                            _pause()
-                            if _should_stop():
-                                self.stdout.write(self.style.WARNING(f'Reached limit {limit}, stopping early.'))
-                                self.stdout.write(self.style.SUCCESS(f'Saved {saved_total} optimized files.'))
-                                return
-            _refresh_connection()
-
-        # 2. Product Extra Images
-        if 'product_extra' in steps:
-            _refresh_connection()
-            product_images = _id_range(ProductImage.objects.all())
-            total_p_images = product_images.count()
-            self.stdout.write(f'\nFound {total_p_images} extra product images')
+        def _step(title, queryset, describe):
+            # Долгая выборка может пережить wait_timeout MySQL на shared-хостинге.
+            close_old_connections()
+            queryset = _id_range(queryset)
+            self.stdout.write(f'Found {queryset.count()} {title}')
             self.stdout.flush()
+            step_jobs = []
+            for obj in queryset.iterator(chunk_size=1000):
+                for field_file, label, kind in describe(obj):
+                    job = _job(field_file, label, kind)
+                    if job is not None:
+                        step_jobs.append(job)
+            return step_jobs
 
-            for i, img in enumerate(product_images.iterator(chunk_size=1000), 1):
-                if img.image:
-                    path = Path(img.image.path)
-                    if path.exists():
-                        if not force and _already_optimized(path):
-                            continue
-                        self.stdout.write(f'[{i}/{total_p_images}] Optimizing ProductImage {img.id}')
-                        self.stdout.flush()
-                        variants = optimizer.optimize_product_image(str(path))
-                        if variants:
-                            optimizer.save_optimized_images(variants, path.parent / "optimized")
-                            saved_total += len(variants)
-                            processed += 1
-                            _pause()
-                            if _should_stop():
-                                self.stdout.write(self.style.WARNING(f'Reached limit {limit}, stopping early.'))
-                                self.stdout.write(self.style.SUCCESS(f'Saved {saved_total} optimized files.'))
-                                return
-            _refresh_connection()
-
-        # 3. Product Color Images
+        jobs = []
+        if 'product_main' in steps:
+            jobs += _step(
+                'products with main images',
+                Product.objects.exclude(main_image='').defer('catalog'),
+                lambda product: [(product.main_image, f'Product {product.id}: {product.title}', KIND_PRODUCT)],
+            )
+        if 'product_extra' in steps:
+            jobs += _step(
+                'extra product images',
+                ProductImage.objects.all(),
+                lambda img: [(img.image, f'ProductImage {img.id}', KIND_PRODUCT)],
+            )
         if 'color' in steps:
-            _refresh_connection()
-            color_images = _id_range(ProductColorImage.objects.all())
-            total_c_images = color_images.count()
-            self.stdout.write(f'\nFound {total_c_images} product color images')
-            self.stdout.flush()
-
-            for i, img in enumerate(color_images.iterator(chunk_size=1000), 1):
-                if img.image:
-                    path = Path(img.image.path)
-                    if path.exists():
-                        if not force and _already_optimized(path):
-                            continue
-                        self.stdout.write(f'[{i}/{total_c_images}] Optimizing ProductColorImage {img.id}')
-                        self.stdout.flush()
-                        variants = optimizer.optimize_product_image(str(path))
-                        if variants:
-                            optimizer.save_optimized_images(variants, path.parent / "optimized")
-                            saved_total += len(variants)
-                            processed += 1
-                            _pause()
-                            if _should_stop():
-                                self.stdout.write(self.style.WARNING(f'Reached limit {limit}, stopping early.'))
-                                self.stdout.write(self.style.SUCCESS(f'Saved {saved_total} optimized files.'))
-                                return
-            _refresh_connection()
-
-        # 4. Categories
+            jobs += _step(
+                'product color images',
+                ProductColorImage.objects.all(),
+                lambda img: [(img.image, f'ProductColorImage {img.id}', KIND_PRODUCT)],
+            )
         if 'category' in steps:
-            _refresh_connection()
-            categories = _id_range(Category.objects.all())
-            self.stdout.write(f'\nFound {categories.count()} categories')
-            self.stdout.flush()
+            # Обложка категории режется как изображение товара (responsive-размеры)
+            jobs += _step(
+                'categories',
+                Category.objects.all(),
+                lambda cat: [
+                    (cat.icon, f'Category Icon: {cat.name}', KIND_ICON),
+                    (cat.cover, f'Category Cover: {cat.name}', KIND_PRODUCT),
+                ],
+            )
+        if 'option' in steps:
+            jobs += _step(
+                'catalog options with images',
+                CatalogOptionValue.objects.exclude(image=''),
+                lambda opt: [(opt.image, f'Option Image: {opt.display_name}', KIND_PRODUCT)],
+            )
+        if 'size' in steps:
+            jobs += _step(
+                'size grids with images',
+                SizeGrid.objects.exclude(image=''),
+                lambda grid: [(grid.image, f'SizeGrid: {grid.name}', KIND_PRODUCT)],
+            )
+        if 'proposal' in steps:
+            from storefront.models import PrintProposal
+            jobs += _step(
+                'print proposals with images',
+                PrintProposal.objects.exclude(image=''),
+                lambda proposal: [(proposal.image, f'PrintProposal: {proposal.id}', KIND_PRODUCT)],
+            )
+        return jobs
 
-            for cat in categories.iterator(chunk_size=1000):
-                # Icon
-                if cat.icon:
-                    path = Path(cat.icon.path)
-                    if path.exists():
-                        if force or not _already_optimized(path):
-                            self.stdout.write(f'Optimizing Category Icon: {cat.name}')
-                            self.stdout.flush()
-                            variants = optimizer.optimize_category_icon(str(path))
-                            if variants:
-                                optimizer.save_optimized_images(variants, path.parent / "optimized")
-                                saved_total += len(variants)
-                                processed += 1
-                                _pause()
-                                if _should_stop():
-                                    self.stdout.write(self.style.WARNING(f'Reached limit {limit}, stopping early.'))
-                                    self.stdout.write(self.style.SUCCESS(f'Saved {saved_total} optimized files.'))
-                                    return
+    def handle(self, *args, **options):
+        limit = options.get('limit')
+        steps = {step.strip() for step in (options.get('steps') or '').split(',') if step.strip()}
+        if not steps:
+            steps = set(ALL_STEPS.split(','))
+        sleep = float(options.get('sleep') or 0)
+        force = bool(options.get('force'))
+        workers = options.get('workers')
+        if workers is None or workers <= 0:
+            workers = os.cpu_count() or 1
+        manifest = OptimizationManifest(
+            Path(options.get('manifest') or Path(settings.MEDIA_ROOT) / MANIFEST_FILENAME)
+        )
+
+        self.stdout.write('Starting image optimization...')
+        self.stdout.flush()
 
-                # Cover
-                if cat.cover:
-                    path = Path(cat.cover.path)
-                    if path.exists():
-                        if force or not _already_optimized(path):
-                            self.stdout.write(f'Optimizing Category Cover: {cat.name}')
-                            self.stdout.flush()
-                            variants = optimizer.optimize_product_image(str(path))  # Treat cover as product image for responsive sizes
-                            if variants:
-                                optimizer.save_optimized_images(variants, path.parent / "optimized")
-                                saved_total += len(variants)
-                                processed += 1
-                                _pause()
-                                if _should_stop():
-                                    self.stdout.write(self.style.WARNING(f'Reached limit {limit}, stopping early.'))
-                                    self.stdout.write(self.style.SUCCESS(f'Saved {saved_total} optimized files.'))
-                                    return
-            _refresh_connection()
+        jobs = self._collect_jobs(steps, options.get('min_id'), options.get('max_id'), manifest, force)
+        total = len(jobs)
+        self.stdout.write(f'\nQueued {total} source images, workers: {workers}')
+        self.stdout.flush()
+        # Воркеры пула форкаются от этого процесса — не тянем в них открытые соединения БД
+        connections.close_all()
 
-        # 5. Catalog Options
-        if 'option' in steps:
-            _refresh_connection()
-            options = _id_range(CatalogOptionValue.objects.exclude(image=''))
-            self.stdout.write(f'\nFound {options.count()} catalog options with images')
-            self.stdout.flush()
+        saved_total = 0
+        processed = 0
+        skipped = 0
+        failed = 0
+        source_bytes = 0
+        started = time.monotonic()
 
-            for opt in options.iterator(chunk_size=1000):
-                if opt.image:
-                    path = Path(opt.image.path)
-                    if path.exists():
-                        if not force and _already_optimized(path):
-                            continue
-                        self.stdout.write(f'Optimizing Option Image: {opt.display_name}')
-                        self.stdout.flush()
-                        variants = optimizer.optimize_product_image(str(path))
-                        if variants:
-                            optimizer.save_optimized_images(variants, path.parent / "optimized")
-                            saved_total += len(variants)
-                            processed += 1
-                            _pause()
-                            if _should_stop():
-                                self.stdout.write(self.style.WARNING(f'Reached limit {limit}, stopping early.'))
-                                self.stdout.write(self.style.SUCCESS(f'Saved {saved_total} optimized files.'))
-                                return
-            _refresh_connection()
+        def _can_submit(in_flight):
+            return limit is None or processed + in_flight < limit
 
-        # 6. Size Grids
-        if 'size' in steps:
-            _refresh_connection()
-            grids = _id_range(SizeGrid.objects.exclude(image=''))
-            self.stdout.write(f'\nFound {grids.count()} size grids with images')
-            self.stdout.flush()
+        try:
+            results = iter_job_results(
+                jobs,
+                workers=workers,
+                max_memory_mb=options.get('max_memory_mb'),
+                can_submit=_can_submit,
+            )
+            for index, result in enumerate(results, 1):
+                if result.status == STATUS_SKIPPED:
+                    skipped += 1
+                    manifest.record(result.job.key, result.digest, result.outputs)
+                    continue
+                if result.status == STATUS_FAILED:
+                    failed += 1
+                    self.stdout.write(self.style.ERROR(
+                        f'[{index}/{total}] Failed {result.job.label}: {result.error}'
+                    ))
+                    continue
+                if result.status != STATUS_OPTIMIZED:
+                    continue
 
-            for grid in grids.iterator(chunk_size=1000):
-                if grid.image:
-                    path = Path(grid.image.path)
-                    if path.exists():
-                        if not force and _already_optimized(path):
-                            continue
-                        self.stdout.write(f'Optimizing SizeGrid: {grid.name}')
-                        self.stdout.flush()
-                        variants = optimizer.optimize_product_image(str(path))
-                        if variants:
-                            optimizer.save_optimized_images(variants, path.parent / "optimized")
-                            saved_total += len(variants)
-                            processed += 1
-                            _pause()
-                            if _should_stop():
-                                self.stdout.write(self.style.WARNING(f'Reached limit {limit}, stopping early.'))
-                                self.stdout.write(self.style.SUCCESS(f'Saved {saved_total} optimized files.'))
-                                return
-            _refresh_connection()
+                manifest.record(result.job.key, result.digest, result.outputs)
+                saved_total += len(result.outputs)
+                source_bytes += result.source_bytes
+                processed += 1
+                self.stdout.write(
+                    f'[{index}/{total}] Optimized {result.job.label} ({len(result.outputs)} files)'
+                )
+                self.stdout.flush()
+                if workers <= 1:
+                    gc.collect()
+                if sleep > 0:
+                    time.sleep(sleep)
+        finally:
+            manifest.save()
 
-        # 7. Print Proposals (если есть)
-        if 'proposal' in steps:
-            _refresh_connection()
-            from storefront.models import PrintProposal
-            proposals = _id_range(PrintProposal.objects.exclude(image=''))
-            self.stdout.write(f'\nFound {proposals.count()} print proposals with images')
-            self.stdout.flush()
-            for proposal in proposals.iterator(chunk_size=1000):
-                if proposal.image:
-                    path = Path(proposal.image.path)
-                    if path.exists():
-                        if not force and _already_optimized(path):
-                            continue
-                        self.stdout.write(f'Optimizing PrintProposal: {proposal.id}')
-                        self.stdout.flush()
-                        variants = optimizer.optimize_product_image(str(path))
-                        if variants:
-                            optimizer.save_optimized_images(variants, path.parent / "optimized")
-                            saved_total += len(variants)
-                            processed += 1
-                            _pause()
-                            if _should_stop():
-                                self.stdout.write(self.style.WARNING(f'Reached limit {limit}, stopping early.'))
-                                self.stdout.write(self.style.SUCCESS(f'Saved {saved_total} optimized files.'))
-                                return
-            _refresh_connection()
+        if limit is not None and processed >= limit:
+            self.stdout.write(self.style.WARNING(f'Reached limit {limit}, stopping early.'))
 
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(
+            f'Throughput: {processed} images ({source_bytes / (1024 * 1024):.1f} MB source) '
+            f'in {elapsed:.1f} s — {processed / elapsed:.2f} images/s, '
+            f'{source_bytes / (1024 * 1024) / elapsed:.2f} MB/s; skipped {skipped}, failed {failed}.'
+        )
         self.stdout.write(self.style.SUCCESS(f'Image optimization completed. Saved {saved_total} optimized files.'))
@@ -9,6 +9,14 @@ Options:
     --min-age-sec=N wait at least N seconds after the flag was set before
                     rebuilding (default: 120). Acts as debounce — rapid bulk
                     edits do not spam rebuilds.
+    --full          bypass the per-product fragment cache and run the
+                    ``generate_*_feed`` commands (full re-render).
+    --verify        build incrementally, diff against a full rebuild and
+                    write the full output; a mismatch drops the fragment
+                    cache of that feed and is reported as a failure.
+
+By default feeds are assembled incrementally (see services/feed_fragments.py):
+only products whose content hash changed are re-rendered.
 """
 
 from __future__ import annotations
@@ -22,6 +30,11 @@ from django.conf import settings
 from django.core.management import call_command
 from django.core.management.base import BaseCommand
 
+from storefront.services.feed_fragments import (
+    build_feed_xml_incremental,
+    clear_fragment_store,
+    verify_incremental_feed,
+)
 from storefront.services.feeds_queue import (
     are_feeds_dirty,
     dirty_since_seconds,
@@ -38,6 +51,14 @@ FEED_COMMANDS = {
     "generate_prom_feed": "prom-feed.xml",
 }
 
+FEED_FORMAT_KEYS = {
+    "generate_google_merchant_feed": "google",
+    "generate_rozetka_feed": "rozetka",
+    "generate_kasta_feed": "kasta",
+    "generate_buyme_feed": "buyme",
+    "generate_prom_feed": "prom",
+}
+
 
 class Command(BaseCommand):
     help = "Regenerate marketplace feeds iff the dirty flag is set and debounce expired."
@@ -55,11 +76,23 @@ class Command(BaseCommand):
             default="",
             help="Comma-separated list of feed command names to run (default: all).",
         )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Full re-render via generate_* commands, ignoring the fragment cache.",
+        )
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Diff incremental output against a full rebuild (writes the full output).",
+        )
 
     def handle(self, *args, **options):
         force: bool = options["force"]
         min_age: int = max(0, int(options["min_age_sec"]))
         only: str = (options.get("only") or "").strip()
+        full: bool = options.get("full", False)
+        verify: bool = options.get("verify", False)
 
         if not force:
             if not are_feeds_dirty():
@@ -84,8 +117,19 @@ class Command(BaseCommand):
                 continue
             out_path = media_root / filename
             try:
-                call_command(command_name, output=str(out_path), verbosity=0)
-                self.stdout.write(f"ok {command_name} -> {out_path}")
+                if full:
+                    call_command(command_name, output=str(out_path), verbosity=0)
+                    self.stdout.write(f"ok {command_name} -> {out_path}")
+                elif verify:
+                    if not self._verify_feed(command_name, out_path):
+                        failures += 1
+                else:
+                    payload, stats = build_feed_xml_incremental(FEED_FORMAT_KEYS[command_name])
+                    self._write_atomic(out_path, payload)
+                    self.stdout.write(
+                        f"ok {command_name} -> {out_path} "
+                        f"(rendered {stats.rendered}/{stats.products}, reused {stats.reused})"
+                    )
             except Exception as exc:
                 failures += 1
                 logger.error("Feed %s failed: %s", command_name, exc, exc_info=True)
@@ -100,3 +144,24 @@ class Command(BaseCommand):
             self.stderr.write(
                 f"{failures} feed(s) failed after {elapsed:.1f}s; dirty flag kept for retry"
             )
+
+    def _verify_feed(self, command_name: str, out_path: Path) -> bool:
+        format_key = FEED_FORMAT_KEYS[command_name]
+        payload, diff = verify_incremental_feed(format_key)
+        self._write_atomic(out_path, payload)
+        if not diff:
+            self.stdout.write(f"ok {command_name} -> {out_path} (incremental == full)")
+            return True
+        clear_fragment_store(format_key)
+        self.stderr.write(f"MISMATCH {command_name}: incremental output differs from full rebuild")
+        for line in diff[:200]:
+            self.stderr.write(line)
+        if len(diff) > 200:
+            self.stderr.write(f"... {len(diff) - 200} more diff lines")
+        return False
+
+    @staticmethod
+    def _write_atomic(path: Path, payload: bytes) -> None:
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        tmp_path.write_bytes(payload)
+        os.replace(tmp_path, path)
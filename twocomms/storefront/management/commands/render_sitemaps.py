@@ -0,0 +1,45 @@
+"""Pre-render every sitemap document to disk (see services/sitemap_store.py).
+
+Usage (cron, every 10 minutes):
+
+    */10 * * * * cd /home/.../twocomms && /.../python manage.py render_sitemaps --if-dirty >> /.../logs/sitemaps_cron.log 2>&1
+
+Options:
+    --if-dirty  render only when catalogue signals flagged a change since the
+                last render (or nothing was rendered yet).
+    --force     rewrite every document even if its content did not change
+                (resets Last-Modified / ETag for all of them).
+
+Documents whose content hash is unchanged keep their ETag and Last-Modified,
+so crawlers revalidating with If-None-Match / If-Modified-Since get 304s.
+"""
+
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from storefront.services.sitemap_store import are_sitemaps_dirty, render_sitemaps, store_dir
+
+
+class Command(BaseCommand):
+    help = "Render sitemap.xml, its section sitemaps and pages to disk with gzip variants."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--if-dirty", action="store_true", help="Skip when the catalogue did not change.")
+        parser.add_argument("--force", action="store_true", help="Rewrite documents even when unchanged.")
+
+    def handle(self, *args, **options):
+        if options.get("if_dirty") and not options.get("force") and not are_sitemaps_dirty():
+            self.stdout.write("sitemaps clean; nothing to do")
+            return
+        started = time.time()
+        stats = render_sitemaps(force=bool(options.get("force")))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"sitemaps -> {store_dir()}: {stats['written']} written, "
+                f"{stats['unchanged']} unchanged, {stats['removed']} removed "
+                f"in {time.time() - started:.1f}s"
+            )
+        )
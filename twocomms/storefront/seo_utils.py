@@ -14,6 +14,7 @@ from django.utils.translation import gettext as _
 from django.utils.translation import get_language
 from .models import Product, Category
 from .services.size_guides import resolve_product_sizes
+from .services import structured_data_cache as jsonld_cache
 from .services.policy import (
     APPLICABLE_COUNTRY,
     CURRENCY,
@@ -1886,15 +1887,27 @@ def get_product_schema(
     ``review_summary`` to the underlying generator so the rendered
     Product schema's ``url``, ``image`` and ``aggregateRating`` always
     match what the page declares as canonical / approved.
+
+    The serialized blob is cached per product content version (see
+    ``services.structured_data_cache``).
     """
     try:
-        schema = StructuredDataGenerator.generate_product_schema(
+        key = jsonld_cache.product_jsonld_key(
+            "product",
             product,
-            canonical_path=canonical_path,
-            selected_variant=selected_variant,
-            review_summary=review_summary,
+            canonical_path,
+            getattr(selected_variant, "pk", None),
+            jsonld_cache.review_summary_key(review_summary),
+        )
+        return jsonld_cache.cached_jsonld(
+            key,
+            lambda: StructuredDataGenerator.generate_product_schema(
+                product,
+                canonical_path=canonical_path,
+                selected_variant=selected_variant,
+                review_summary=review_summary,
+            ),
         )
-        return json.dumps(schema, ensure_ascii=False, indent=2)
     except Exception:
         return ""
 
@@ -1903,7 +1916,7 @@ def get_breadcrumb_schema(breadcrumbs: List[Dict]) -> str:
     """Возвращает JSON-LD schema для хлебных крошек"""
     try:
         schema = StructuredDataGenerator.generate_breadcrumb_schema(breadcrumbs)
-        return json.dumps(schema, ensure_ascii=False, indent=2)
+        return jsonld_cache.dump_jsonld(schema)
     except Exception as e:
         # Возвращаем пустую строку в случае ошибки
         return ""
@@ -1912,8 +1925,42 @@ def get_breadcrumb_schema(breadcrumbs: List[Dict]) -> str:
 def get_google_merchant_schema(product: Product) -> str:
     """Возвращает JSON-LD schema для Google Merchant Center"""
     try:
-        schema = StructuredDataGenerator.generate_google_merchant_schema(product)
-        return json.dumps(schema, ensure_ascii=False, indent=2)
+        return jsonld_cache.cached_jsonld(
+            jsonld_cache.product_jsonld_key("merchant", product),
+            lambda: StructuredDataGenerator.generate_google_merchant_schema(product),
+        )
     except Exception as e:
         # Возвращаем пустую строку в случае ошибки
         return ""
+
+
+def get_organization_schema() -> str:
+    """Organization JSON-LD; re-rendered only when the catalogue changes (priceRange)."""
+    return jsonld_cache.cached_jsonld(
+        jsonld_cache.site_jsonld_key("organization", SITE_BASE_URL, jsonld_cache.catalogue_fingerprint()),
+        StructuredDataGenerator.generate_organization_schema,
+    )
+
+
+def get_homepage_storefront_schema() -> str:
+    """Homepage ``OnlineStore`` JSON-LD; keyed like the Organization block."""
+    return jsonld_cache.cached_jsonld(
+        jsonld_cache.site_jsonld_key("storefront", SITE_BASE_URL, jsonld_cache.catalogue_fingerprint()),
+        StructuredDataGenerator.generate_homepage_storefront_schema,
+    )
+
+
+def get_website_schema() -> str:
+    """WebSite JSON-LD; static per deploy and language."""
+    return jsonld_cache.memoized_jsonld(
+        jsonld_cache.site_jsonld_key("website", SITE_BASE_URL),
+        StructuredDataGenerator.generate_website_schema,
+    )
+
+
+def get_founder_schema() -> str:
+    """Founder ``Person`` JSON-LD; static per deploy and language."""
+    return jsonld_cache.memoized_jsonld(
+        jsonld_cache.site_jsonld_key("founder", SITE_BASE_URL),
+        StructuredDataGenerator.generate_founder_schema,
+    )
@@ -0,0 +1,296 @@
+"""Shared priced-cart snapshot for the cart endpoints.
+
+``view_cart``, ``cart_summary``, ``cart_mini``, ``cart_items_api``,
+``add_to_cart``, ``update_cart`` and ``remove_from_cart`` used to price the
+session cart on their own: ``Product.objects.in_bulk``, colour-variant
+lookups, ``PromoCode.objects.get`` and the subtotal / discount arithmetic on
+every call. ``get_priced_cart()`` now builds one immutable ``PricedCart``
+and keeps it in the default cache under a per-session key, tagged with a
+fingerprint of
+
+* the cart lines (key, product, variant, size, fit, qty),
+* the applied promo code id,
+* the catalogue price version — bumped by ``storefront.cache_signals``
+  whenever a product, colour variant / image, colour, category or promo
+  code is saved or deleted,
+* the active language (titles, category and colour names are translated).
+
+Mini-cart / summary polling therefore costs one cache read while nothing
+changed. A snapshot also expires when the promo code crosses its
+``valid_from`` / ``valid_until`` boundary.
+
+Amounts follow the previous per-view arithmetic: ``Product.final_price``
+per unit, promo discount on the subtotal, totals quantized to kopecks.
+"""
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import get_language
+
+CART_PRICING_CACHE_KEY = "cart_pricing:{session_key}"
+CART_PRICING_CACHE_TTL = 15 * 60
+CART_PRICE_VERSION_CACHE_KEY = "cart_pricing:price_version"
+
+_CENT = Decimal("0.01")
+_ZERO = Decimal("0")
+
+
+@dataclass(frozen=True)
+class PricedCartLine:
+    key: str
+    product_id: int
+    qty: int
+    unit_price: Decimal
+    original_unit_price: Decimal
+    line_total: Decimal
+    original_line_total: Decimal
+    site_discount_amount: Decimal
+    size: str
+    fit_option_code: str
+    fit_option_label: str
+    color_variant_id: int | None
+    color_label: str | None
+    color_primary_hex: str
+    color_secondary_hex: str
+    offer_id: str
+    title: str
+    slug: str
+    category_name: str
+    image_url: str | None
+    points_reward: int
+    discount_percent: int
+
+
+@dataclass(frozen=True)
+class PricedCart:
+    lines: tuple[PricedCartLine, ...]
+    missing_keys: tuple[str, ...]
+    subtotal: Decimal
+    original_subtotal: Decimal
+    site_discount_total: Decimal
+    discount: Decimal
+    total: Decimal
+    total_savings: Decimal
+    total_quantity: int
+    total_points: int
+    promo_code_id: int | None
+    promo_code: str | None
+    promo_invalid: bool
+    expires_at: datetime | None = None
+
+    def line(self, key: str) -> PricedCartLine | None:
+        for line in self.lines:
+            if line.key == key:
+                return line
+        return None
+
+    @property
+    def product_ids(self) -> list[int]:
+        return [line.product_id for line in self.lines]
+
+    @property
+    def color_variant_ids(self) -> list[int]:
+        return [line.color_variant_id for line in self.lines if line.color_variant_id]
+
+
+def get_cart_price_version() -> int:
+    version = cache.get(CART_PRICE_VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(CART_PRICE_VERSION_CACHE_KEY, 1, timeout=None)
+        version = cache.get(CART_PRICE_VERSION_CACHE_KEY)
+    try:
+        return max(int(version), 1)
+    except (TypeError, ValueError):
+        cache.set(CART_PRICE_VERSION_CACHE_KEY, 1, timeout=None)
+        return 1
+
+
+def _bump_now() -> None:
+    current = get_cart_price_version()
+    try:
+        cache.incr(CART_PRICE_VERSION_CACHE_KEY)
+    except Exception:
+        cache.set(CART_PRICE_VERSION_CACHE_KEY, current + 1, timeout=None)
+
+
+def bump_cart_price_version() -> None:
+    """Invalidate every cached snapshot (now and again after commit)."""
+    _bump_now()
+    transaction.on_commit(_bump_now)
+
+
+def _to_int(value) -> int | None:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def cart_fingerprint(cart: dict, promo_code_id) -> str:
+    lines = []
+    for key, item in sorted((cart or {}).items()):
+        if not isinstance(item, dict):
+            continue
+        lines.append((
+            key,
+            item.get("product_id"),
+            item.get("color_variant_id"),
+            item.get("size"),
+            _fit_display(item),
+            item.get("qty"),
+        ))
+    parts = (lines, promo_code_id, get_cart_price_version(), (get_language() or "uk").lower())
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+
+
+def _fit_display(item: dict) -> tuple[str, str]:
+    code = str(item.get("fit_option_code") or item.get("fit") or "").strip()
+    label = str(item.get("fit_option_label") or item.get("fit_label") or "").strip()
+    return code, label or code
+
+
+def _promo_expiry(promo_code) -> datetime | None:
+    now = timezone.now()
+    boundaries = [
+        moment for moment in (promo_code.valid_from, promo_code.valid_until)
+        if moment and moment > now
+    ]
+    return min(boundaries) if boundaries else None
+
+
+def build_priced_cart(cart: dict, promo_code_id=None) -> PricedCart:
+    """Prices the session cart from the current catalogue (no caching)."""
+    from productcolors.models import ProductColorVariant
+    from storefront.models import Product, PromoCode
+    from storefront.services.size_guides import normalize_requested_size
+    from storefront.views.utils import _color_label_from_variant
+
+    cart = cart if isinstance(cart, dict) else {}
+    items = [(key, item) for key, item in cart.items() if isinstance(item, dict)]
+    product_ids = {_to_int(item.get("product_id")) for _, item in items} - {None}
+    variant_ids = {_to_int(item.get("color_variant_id")) for _, item in items} - {None}
+    products = Product.objects.select_related("category").in_bulk(product_ids) if product_ids else {}
+    variants = (
+        ProductColorVariant.objects.select_related("color").prefetch_related("images").in_bulk(variant_ids)
+        if variant_ids else {}
+    )
+
+    lines: list[PricedCartLine] = []
+    missing: list[str] = []
+    subtotal = original_subtotal = _ZERO
+    total_quantity = total_points = 0
+    for key, item in items:
+        product = products.get(_to_int(item.get("product_id")))
+        if product is None:
+            missing.append(key)
+            continue
+        qty = _to_int(item.get("qty", 1))
+        if qty is None:
+            qty = 1
+        unit_price = Decimal(product.final_price)
+        original_unit_price = Decimal(product.price)
+        line_total = unit_price * qty
+        original_line_total = original_unit_price * qty
+
+        variant = variants.get(_to_int(item.get("color_variant_id")))
+        color = getattr(variant, "color", None)
+        size = normalize_requested_size(product, item.get("size"))
+        fit_code, fit_label = _fit_display(item)
+        variant_images = list(variant.images.all()) if variant else []
+        if variant_images:
+            image_url = variant_images[0].image.url
+        elif product.main_image:
+            image_url = product.main_image.url
+        else:
+            image_url = None
+        points_reward = int(product.points_reward or 0)
+
+        lines.append(PricedCartLine(
+            key=key,
+            product_id=product.id,
+            qty=qty,
+            unit_price=unit_price,
+            original_unit_price=original_unit_price,
+            line_total=line_total,
+            original_line_total=original_line_total,
+            site_discount_amount=max(original_line_total - line_total, _ZERO),
+            size=size,
+            fit_option_code=fit_code,
+            fit_option_label=fit_label,
+            color_variant_id=variant.id if variant else None,
+            color_label=_color_label_from_variant(variant),
+            color_primary_hex=getattr(color, "primary_hex", "") or "",
+            color_secondary_hex=getattr(color, "secondary_hex", "") or "",
+            offer_id=product.get_offer_id(
+                variant.id if variant else None, size, color_name=getattr(color, "name", None)
+            ),
+            title=product.title,
+            slug=product.slug,
+            category_name=product.category.name if product.category_id else "",
+            image_url=image_url,
+            points_reward=points_reward,
+            discount_percent=product.discount_percent or 0,
+        ))
+        subtotal += line_total
+        original_subtotal += original_line_total
+        total_quantity += qty
+        total_points += points_reward * qty
+
+    promo_code = None
+    promo_invalid = False
+    discount = _ZERO
+    if promo_code_id:
+        promo_code = PromoCode.objects.filter(pk=_to_int(promo_code_id)).first()
+        if promo_code is not None and promo_code.can_be_used():
+            discount = promo_code.calculate_discount(subtotal)
+        else:
+            promo_invalid = True
+
+    site_discount_total = (original_subtotal - subtotal).quantize(_CENT) if original_subtotal >= subtotal else _ZERO
+    total = (subtotal - discount).quantize(_CENT)
+    discount = discount.quantize(_CENT)
+    return PricedCart(
+        lines=tuple(lines),
+        missing_keys=tuple(missing),
+        subtotal=subtotal.quantize(_CENT),
+        original_subtotal=original_subtotal.quantize(_CENT),
+        site_discount_total=site_discount_total,
+        discount=discount,
+        total=total,
+        total_savings=(site_discount_total + discount).quantize(_CENT),
+        total_quantity=total_quantity,
+        total_points=total_points,
+        promo_code_id=promo_code.pk if promo_code is not None and not promo_invalid else None,
+        promo_code=promo_code.code if promo_code is not None and not promo_invalid else None,
+        promo_invalid=promo_invalid,
+        expires_at=_promo_expiry(promo_code) if promo_code is not None else None,
+    )
+
+
+def get_priced_cart(request, cart: dict | None = None) -> PricedCart:
+    """Cached ``PricedCart`` for the request's session cart."""
+    if cart is None:
+        cart = request.session.get("cart", {})
+    promo_code_id = request.session.get("promo_code_id")
+    session_key = request.session.session_key
+    if not session_key:
+        return build_priced_cart(cart, promo_code_id)
+
+    cache_key = CART_PRICING_CACHE_KEY.format(session_key=session_key)
+    fingerprint = cart_fingerprint(cart, promo_code_id)
+    cached = cache.get(cache_key)
+    if cached and cached[0] == fingerprint:
+        snapshot = cached[1]
+        if snapshot.expires_at is None or snapshot.expires_at > timezone.now():
+            return snapshot
+
+    snapshot = build_priced_cart(cart, promo_code_id)
+    cache.set(cache_key, (fingerprint, snapshot), CART_PRICING_CACHE_TTL)
+    return snapshot
@@ -12,18 +12,30 @@ Slugs are global identifiers — ``ProductColorVariant.slug`` is unique
 per product, but the *value* (e.g. ``black``, ``coyote``) is shared
 across the catalogue thanks to the EN translation map from Phase 7.1,
 which is exactly what we want for faceted browsing.
+
+Chips are rendered from a colour facet index: ``get_color_facets``
+aggregates the variants of a pre-filter queryset in the database (one
+grouped query over a sub-select, no product-id list in Python) and keeps
+the slug → count / label / hex summary in the fragment cache, keyed by
+the queryset SQL (so per category, per search query, per theme) and a
+facet version that ``storefront.cache_signals`` bumps whenever a
+product, colour variant or colour changes. Rendering chips is then a
+cache lookup plus per-request URL building.
 """
 from __future__ import annotations
 
+import hashlib
 from collections import defaultdict
 from typing import Iterable, List, Dict, Any
 from urllib.parse import urlencode
 
 from django.apps import apps
-from django.db import DatabaseError
-from django.db.models import QuerySet
+from django.db import DatabaseError, transaction
+from django.db.models import Count, QuerySet
 from django.utils.translation import gettext_lazy as _
 
+from cache_utils import get_fragment_cache
+
 
 # 2026-05-16 — Phase 17v. The Color model is shared with admin tools and
 # does not use ``django-modeltranslation`` (Color rows store a single
@@ -74,6 +86,132 @@ MAX_COLOR_SLUGS = 10
 _VALID_SLUG_CHARS = set("abcdefghijklmnopqrstuvwxyz0123456789-")
 
 
+COLOR_FACET_VERSION_CACHE_KEY = "color_facets:version"
+COLOR_FACET_CACHE_KEY = "color_facets:v{version}:{scope}"
+COLOR_FACET_CACHE_TTL = 60 * 60
+
+
+def get_color_facet_version() -> int:
+    cache_backend = get_fragment_cache()
+    version = cache_backend.get(COLOR_FACET_VERSION_CACHE_KEY)
+    if version is None:
+        cache_backend.add(COLOR_FACET_VERSION_CACHE_KEY, 1, timeout=None)
+        version = cache_backend.get(COLOR_FACET_VERSION_CACHE_KEY)
+    try:
+        return max(int(version), 1)
+    except (TypeError, ValueError):
+        cache_backend.set(COLOR_FACET_VERSION_CACHE_KEY, 1, timeout=None)
+        return 1
+
+
+def _bump_color_facet_version_now() -> None:
+    cache_backend = get_fragment_cache()
+    current = get_color_facet_version()
+    try:
+        cache_backend.incr(COLOR_FACET_VERSION_CACHE_KEY)
+    except Exception:
+        cache_backend.set(COLOR_FACET_VERSION_CACHE_KEY, current + 1, timeout=None)
+
+
+def bump_color_facet_version() -> None:
+    """Invalidate every cached facet summary (now and again after commit)."""
+    _bump_color_facet_version_now()
+    transaction.on_commit(_bump_color_facet_version_now)
+
+
+def _aggregate_color_facets(base_queryset: QuerySet) -> List[Dict[str, Any]]:
+    ProductColorVariant = apps.get_model("productcolors", "ProductColorVariant")
+    rows = (
+        ProductColorVariant.objects
+        .filter(product_id__in=base_queryset.order_by().values("id"))
+        .exclude(slug="")
+        .values(
+            "slug",
+            "color__name",
+            "color__primary_hex",
+            "color__secondary_hex",
+        )
+        .annotate(variants=Count("id"))
+        .order_by()
+    )
+
+    # Aggregate by slug. Pick the most common (primary, secondary) hex pair
+    # and the most common non-empty colour name as the canonical label.
+    bucket: Dict[str, Dict[str, Any]] = defaultdict(lambda: {
+        "count": 0,
+        "names": defaultdict(int),
+        "hexes": defaultdict(int),
+    })
+    for row in rows:
+        slug = row["slug"]
+        if not slug:
+            continue
+        entry = bucket[slug]
+        entry["count"] += row["variants"]
+        name = (row.get("color__name") or "").strip()
+        if name:
+            entry["names"][name] += row["variants"]
+        primary = (row.get("color__primary_hex") or "").strip()
+        secondary = (row.get("color__secondary_hex") or "").strip()
+        entry["hexes"][(primary, secondary)] += row["variants"]
+
+    facets: List[Dict[str, Any]] = []
+    for slug, entry in bucket.items():
+        # Most common label / hex-pair wins; ties resolved alphabetically.
+        label = ""
+        if entry["names"]:
+            label = max(sorted(entry["names"].items()), key=lambda kv: kv[1])[0]
+        if not label:
+            # Fall back to a humanised slug ("dark-olive" -> "Dark Olive").
+            label = slug.replace("-", " ").title()
+        primary, secondary = ("", "")
+        if entry["hexes"]:
+            primary, secondary = max(sorted(entry["hexes"].items()), key=lambda kv: kv[1])[0]
+        facets.append({
+            "slug": slug,
+            "label": label,
+            "primary_hex": primary,
+            "secondary_hex": secondary,
+            "count": entry["count"],
+        })
+
+    facets.sort(key=lambda f: (-f["count"], f["slug"]))
+    return facets
+
+
+def get_color_facets(base_queryset: QuerySet) -> List[Dict[str, Any]]:
+    """Slug → count / raw label / hex summaries for ``base_queryset``, cached."""
+    try:
+        apps.get_model("productcolors", "ProductColorVariant")
+    except LookupError:
+        return []
+
+    try:
+        scope_sql = str(base_queryset.order_by().values("id").query)
+    except Exception:
+        scope_sql = None
+
+    cache_backend = get_fragment_cache()
+    cache_key = None
+    if scope_sql is not None:
+        cache_key = COLOR_FACET_CACHE_KEY.format(
+            version=get_color_facet_version(),
+            scope=hashlib.sha1(scope_sql.encode("utf-8")).hexdigest(),
+        )
+        facets = cache_backend.get(cache_key)
+        if facets is not None:
+            return facets
+
+    try:
+        facets = _aggregate_color_facets(base_queryset)
+    except DatabaseError:
+        return []
+
+    if cache_key is not None:
+        cache_backend.set(cache_key, facets, COLOR_FACET_CACHE_TTL)
+    return facets
+
+
 def _normalise_slug(value: str) -> str:
     value = (value or "").strip().lower()
     if not value:
@@ -150,55 +288,10 @@ def build_available_colors(
     selected = list(selected_slugs or [])
     selected_set = set(selected)
 
-    try:
-        ProductColorVariant = apps.get_model("productcolors", "ProductColorVariant")
-    except LookupError:
-        return []
-
-    try:
-        product_ids = list(base_queryset.values_list("id", flat=True))
-    except DatabaseError:
+    facets = get_color_facets(base_queryset)
+    if not facets:
         return []
 
-    if not product_ids:
-        return []
-
-    try:
-        variants = (
-            ProductColorVariant.objects
-            .filter(product_id__in=product_ids)
-            .exclude(slug="")
-            .select_related("color")
-            .values(
-                "slug",
-                "color__name",
-                "color__primary_hex",
-                "color__secondary_hex",
-            )
-        )
-    except DatabaseError:
-        return []
-
-    # Aggregate by slug. Pick the most common (primary, secondary) hex pair
-    # and the first non-empty colour name as the canonical label source.
-    bucket: Dict[str, Dict[str, Any]] = defaultdict(lambda: {
-        "count": 0,
-        "names": defaultdict(int),
-        "hexes": defaultdict(int),
-    })
-    for row in variants:
-        slug = row["slug"]
-        if not slug:
-            continue
-        entry = bucket[slug]
-        entry["count"] += 1
-        name = (row.get("color__name") or "").strip()
-        if name:
-            entry["names"][name] += 1
-        primary = (row.get("color__primary_hex") or "").strip()
-        secondary = (row.get("color__secondary_hex") or "").strip()
-        entry["hexes"][(primary, secondary)] += 1
-
     chips: List[Dict[str, Any]] = []
     # Look up which colour slugs in this category have a published
     # landing page; chips for those slugs link to the landing URL
@@ -224,18 +317,8 @@ def build_available_colors(
             except DatabaseError:
                 landing_url_by_slug = {}
 
-    for slug, entry in bucket.items():
-        # Most common label / hex-pair wins; ties resolved by sort stability.
-        label = ""
-        if entry["names"]:
-            label = max(entry["names"].items(), key=lambda kv: kv[1])[0]
-        if not label:
-            # Fall back to a humanised slug ("dark-olive" -> "Dark Olive").
-            label = slug.replace("-", " ").title()
-        primary, secondary = ("", "")
-        if entry["hexes"]:
-            primary, secondary = max(entry["hexes"].items(), key=lambda kv: kv[1])[0]
-
+    for facet in facets:
+        slug = facet["slug"]
         is_selected = slug in selected_set
         if is_selected:
             next_slugs = [s for s in selected if s != slug]
@@ -254,16 +337,15 @@ def build_available_colors(
 
         chips.append({
             "slug": slug,
-            "label": _translate_color_label(label),
-            "primary_hex": primary,
-            "secondary_hex": secondary,
-            "count": entry["count"],
+            "label": _translate_color_label(facet["label"]),
+            "primary_hex": facet["primary_hex"],
+            "secondary_hex": facet["secondary_hex"],
+            "count": facet["count"],
             "is_selected": is_selected,
             "url": chip_url,
             "is_landing": bool(landing_url and not is_selected),
         })
 
-    chips.sort(key=lambda c: (-c["count"], c["slug"]))
     return chips
 
 
@@ -284,72 +366,15 @@ def build_home_color_chips(
     pre-filtered catalogue page. Each chip points to a single colour
     (no toggling, since the homepage itself is not filtered).
     """
-    try:
-        ProductColorVariant = apps.get_model("productcolors", "ProductColorVariant")
-    except LookupError:
-        return []
-
-    try:
-        product_ids = list(base_queryset.values_list("id", flat=True))
-    except DatabaseError:
-        return []
-
-    if not product_ids:
-        return []
-
-    try:
-        variants = (
-            ProductColorVariant.objects
-            .filter(product_id__in=product_ids)
-            .exclude(slug="")
-            .select_related("color")
-            .values(
-                "slug",
-                "color__name",
-                "color__primary_hex",
-                "color__secondary_hex",
-            )
-        )
-    except DatabaseError:
-        return []
-
-    bucket: Dict[str, Dict[str, Any]] = defaultdict(lambda: {
-        "count": 0,
-        "names": defaultdict(int),
-        "hexes": defaultdict(int),
-    })
-    for row in variants:
-        slug = row["slug"]
-        if not slug:
-            continue
-        entry = bucket[slug]
-        entry["count"] += 1
-        name = (row.get("color__name") or "").strip()
-        if name:
-            entry["names"][name] += 1
-        primary = (row.get("color__primary_hex") or "").strip()
-        secondary = (row.get("color__secondary_hex") or "").strip()
-        entry["hexes"][(primary, secondary)] += 1
-
     chips: List[Dict[str, Any]] = []
-    for slug, entry in bucket.items():
-        label = ""
-        if entry["names"]:
-            label = max(entry["names"].items(), key=lambda kv: kv[1])[0]
-        if not label:
-            label = slug.replace("-", " ").title()
-        primary, secondary = ("", "")
-        if entry["hexes"]:
-            primary, secondary = max(entry["hexes"].items(), key=lambda kv: kv[1])[0]
-        url = f"{target_path}?{urlencode([('color', slug)])}"
+    for facet in get_color_facets(base_queryset)[:limit]:
+        url = f"{target_path}?{urlencode([('color', facet['slug'])])}"
         chips.append({
-            "slug": slug,
-            "label": _translate_color_label(label),
-            "primary_hex": primary,
-            "secondary_hex": secondary,
-            "count": entry["count"],
+            "slug": facet["slug"],
+            "label": _translate_color_label(facet["label"]),
+            "primary_hex": facet["primary_hex"],
+            "secondary_hex": facet["secondary_hex"],
+            "count": facet["count"],
             "url": url,
         })
-
-    chips.sort(key=lambda c: (-c["count"], c["slug"]))
-    return chips[:limit]
+    return chips
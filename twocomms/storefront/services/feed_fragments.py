@@ -0,0 +1,346 @@
+"""Per-product fragment cache for marketplace feeds.
+
+A single product edit marks every feed dirty (see ``feeds_queue``), and a
+full rebuild re-renders thousands of offers for all products. This module
+keeps the rendered offer XML of every product per feed format on disk,
+keyed by a content hash of the rows that feed into the offers. An
+incremental build then:
+
+1. hashes the published catalogue with a handful of flat ``values()``
+   queries (no model instances, no prefetch);
+2. re-renders only the products whose hash changed;
+3. splices the cached fragments for the rest into a freshly built
+   document skeleton (header + categories).
+
+The output is byte-identical to ``marketplace_feeds.build_feed_xml``;
+``verify_incremental_feed`` diffs the two and is wired into
+``regenerate_feeds_if_dirty --verify``.
+"""
+
+from __future__ import annotations
+
+import difflib
+import hashlib
+import json
+import logging
+import os
+import re
+import xml.etree.ElementTree as ET
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from productcolors.models import Color, ProductColorImage, ProductColorVariant
+from storefront.models import (
+    Catalog,
+    CatalogOption,
+    CatalogOptionValue,
+    Category,
+    Product,
+    ProductImage,
+    SizeGrid,
+)
+from storefront.services.catalog_helpers import apply_public_product_order
+from storefront.services.feeds_queue import _state_dir
+from storefront.services.marketplace_feeds import (
+    FEED_FORMATS,
+    FeedFormat,
+    _restore_cdata,
+    build_feed_xml,
+    iter_feed_offers,
+    published_products_queryset,
+    resolve_base_url,
+)
+
+logger = logging.getLogger(__name__)
+
+# Bump when the rendering code changes so stale fragments are discarded.
+FRAGMENT_SCHEMA_VERSION = 1
+
+SENTINEL_TAG = "twc-fragments"
+SENTINEL_RE = re.compile(rb"<(?:[\w.-]+:)?" + SENTINEL_TAG.encode() + rb" />")
+
+
+@dataclass
+class IncrementalBuildStats:
+    format_key: str
+    products: int = 0
+    rendered: int = 0
+    reused: int = 0
+    pruned: int = 0
+    rendered_ids: list[int] = field(default_factory=list)
+
+
+def _fragments_dir() -> Path:
+    target = _state_dir() / "fragments"
+    target.mkdir(parents=True, exist_ok=True)
+    return target
+
+
+def _store_path(format_key: str) -> Path:
+    return _fragments_dir() / f"{format_key}.json"
+
+
+def _digest(payload) -> str:
+    raw = json.dumps(payload, cls=DjangoJSONEncoder, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _rows_by(queryset, key: str) -> dict[int, list[dict]]:
+    grouped: dict[int, list[dict]] = defaultdict(list)
+    for row in queryset.values():
+        grouped[row[key]].append(row)
+    return grouped
+
+
+def _format_salt(fmt: FeedFormat, base_url: str) -> str:
+    parts = [
+        str(FRAGMENT_SCHEMA_VERSION),
+        fmt.key,
+        base_url,
+        str(getattr(settings, "FEED_PLACEHOLDER_IMAGE_URL", "")),
+    ]
+    if fmt.daily:
+        parts.append(timezone.localdate().isoformat())
+    return "|".join(parts)
+
+
+def product_content_versions(base_url: str, fmt: FeedFormat) -> dict[int, tuple[str, int | None]]:
+    """Map published product id -> (content hash, category id), in feed order.
+
+    The hash covers every row ``iter_feed_offers`` reads for a product:
+    the product itself, its category/catalog/size grid, gallery images,
+    colour variants with their colour and images. Rows are read with
+    ``values()`` so no model instances are built for unchanged products.
+    """
+    products = list(
+        apply_public_product_order(Product.objects.filter(status="published")).values()
+    )
+    if not products:
+        return {}
+
+    product_ids = [row["id"] for row in products]
+    images = _rows_by(ProductImage.objects.filter(product_id__in=product_ids).order_by("order", "id"), "product_id")
+    variants = _rows_by(
+        ProductColorVariant.objects.filter(product_id__in=product_ids).order_by("order", "id"),
+        "product_id",
+    )
+    variant_ids = [row["id"] for rows in variants.values() for row in rows]
+    variant_images = _rows_by(
+        ProductColorImage.objects.filter(variant_id__in=variant_ids).order_by("order", "id"),
+        "variant_id",
+    )
+    colors = {row["id"]: row for row in Color.objects.filter(variants__product_id__in=product_ids).distinct().values()}
+    categories = {row["id"]: row for row in Category.objects.values()}
+    size_grids = {row["id"]: row for row in SizeGrid.objects.order_by("order", "id").values()}
+
+    catalog_rows = {row["id"]: row for row in Catalog.objects.values()}
+    options = _rows_by(CatalogOption.objects.order_by("id"), "catalog_id")
+    option_values = _rows_by(CatalogOptionValue.objects.order_by("id"), "option_id")
+    grids_by_catalog: dict[int, list[dict]] = defaultdict(list)
+    for row in size_grids.values():
+        grids_by_catalog[row["catalog_id"]].append(row)
+    catalog_digests = {
+        catalog_id: _digest(
+            {
+                "catalog": row,
+                "options": [
+                    {"option": option, "values": option_values.get(option["id"], [])}
+                    for option in options.get(catalog_id, [])
+                ],
+                "size_grids": grids_by_catalog.get(catalog_id, []),
+            }
+        )
+        for catalog_id, row in catalog_rows.items()
+    }
+
+    salt = _format_salt(fmt, base_url)
+    versions: dict[int, tuple[str, int | None]] = {}
+    for row in products:
+        product_variants = variants.get(row["id"], [])
+        payload = {
+            "salt": salt,
+            "product": row,
+            "category": categories.get(row.get("category_id")),
+            "catalog": catalog_digests.get(row.get("catalog_id")),
+            "size_grid": size_grids.get(row.get("size_grid_id")),
+            "images": images.get(row["id"], []),
+            "variants": [
+                {
+                    "variant": variant,
+                    "color": colors.get(variant["color_id"]),
+                    "images": variant_images.get(variant["id"], []),
+                }
+                for variant in product_variants
+            ],
+        }
+        versions[row["id"]] = (_digest(payload), row.get("category_id"))
+    return versions
+
+
+class FragmentStore:
+    """On-disk JSON map ``product_id -> {"v": version, "xml": fragment}`` for one format."""
+
+    def __init__(self, format_key: str, entries: dict[str, dict] | None = None):
+        self.format_key = format_key
+        self.entries: dict[str, dict] = entries or {}
+
+    @classmethod
+    def load(cls, format_key: str) -> "FragmentStore":
+        path = _store_path(format_key)
+        try:
+            payload = json.loads(path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return cls(format_key)
+        except (OSError, ValueError) as exc:
+            logger.warning("Feed fragment store %s unreadable, starting fresh: %s", path, exc)
+            return cls(format_key)
+        if payload.get("schema") != FRAGMENT_SCHEMA_VERSION:
+            return cls(format_key)
+        return cls(format_key, payload.get("products") or {})
+
+    def get(self, product_id: int, version: str) -> str | None:
+        entry = self.entries.get(str(product_id))
+        if entry and entry.get("v") == version:
+            return entry.get("xml", "")
+        return None
+
+    def put(self, product_id: int, version: str, fragment: str) -> None:
+        self.entries[str(product_id)] = {"v": version, "xml": fragment}
+
+    def prune(self, keep_ids) -> int:
+        keep = {str(pk) for pk in keep_ids}
+        stale = [key for key in self.entries if key not in keep]
+        for key in stale:
+            del self.entries[key]
+        return len(stale)
+
+    def save(self) -> None:
+        path = _store_path(self.format_key)
+        tmp_path = path.with_suffix(".json.tmp")
+        tmp_path.write_text(
+            json.dumps({"schema": FRAGMENT_SCHEMA_VERSION, "products": self.entries}, ensure_ascii=False),
+            encoding="utf-8",
+        )
+        os.replace(tmp_path, path)
+
+
+def clear_fragment_store(format_key: str | None = None) -> None:
+    keys = [format_key] if format_key else list(FEED_FORMATS)
+    for key in keys:
+        try:
+            _store_path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _indent(level: int) -> str:
+    return "\n" + "  " * level
+
+
+def render_product_fragment(fmt: FeedFormat, offers) -> str:
+    """Render the offers of one product exactly as they appear in the full document.
+
+    The offers are indented as children of the container at
+    ``fmt.container_level`` and returned as the serialized children, each
+    prefixed with its newline + indentation, without the trailing
+    close-indentation of the container.
+    """
+    container = ET.Element("fragment")
+    for offer in offers:
+        fmt.append_offer(container, offer)
+    if not len(container):
+        return ""
+    ET.indent(container, space="  ", level=fmt.container_level)
+    payload = _restore_cdata(ET.tostring(container, encoding="utf-8")).decode("utf-8")
+    inner = payload[payload.index(">") + 1 : payload.rindex("</fragment>")]
+    closing = _indent(fmt.container_level)
+    if inner.endswith(closing):
+        inner = inner[: -len(closing)]
+    return inner
+
+
+def _assemble(fmt: FeedFormat, base_url: str, categories, fragments: list[str], generated_at) -> bytes:
+    root, container = fmt.document(base_url, categories, generated_at=generated_at)
+    body = "".join(fragments)
+    if not body:
+        return fmt.finalize(root)
+
+    sentinel_tag = f"{{{fmt.namespace}}}{SENTINEL_TAG}" if fmt.namespace else SENTINEL_TAG
+    ET.SubElement(container, sentinel_tag)
+    payload = fmt.finalize(root)
+    match = SENTINEL_RE.search(payload)
+    if match is None:  # pragma: no cover - defensive
+        raise RuntimeError(f"feed skeleton for {fmt.key} lost its fragment sentinel")
+    prefix = _indent(fmt.container_level + 1).encode("utf-8")
+    start = match.start()
+    if payload[start - len(prefix) : start] == prefix:
+        start -= len(prefix)
+    return payload[:start] + body.encode("utf-8") + payload[match.end():]
+
+
+def build_feed_xml_incremental(
+    format_key: str,
+    base_url: str | None = None,
+    *,
+    generated_at=None,
+) -> tuple[bytes, IncrementalBuildStats]:
+    """Build one feed, re-rendering only products whose content hash changed."""
+    fmt = FEED_FORMATS[format_key]
+    base_url = resolve_base_url(base_url)
+    stats = IncrementalBuildStats(format_key=format_key)
+
+    versions = product_content_versions(base_url, fmt)
+    stats.products = len(versions)
+    store = FragmentStore.load(format_key)
+
+    stale_ids = [pk for pk, (version, _category_id) in versions.items() if store.get(pk, version) is None]
+    if stale_ids:
+        products = published_products_queryset().filter(id__in=stale_ids)
+        offers_by_product = defaultdict(list)
+        for offer in iter_feed_offers(base_url, products=products):
+            offers_by_product[offer.product.id].append(offer)
+        for pk in stale_ids:
+            store.put(pk, versions[pk][0], render_product_fragment(fmt, offers_by_product.get(pk, [])))
+    stats.rendered = len(stale_ids)
+    stats.rendered_ids = stale_ids
+    stats.reused = stats.products - stats.rendered
+    stats.pruned = store.prune(versions.keys())
+    if stale_ids or stats.pruned:
+        store.save()
+
+    fragments = [store.get(pk, version) or "" for pk, (version, _category_id) in versions.items()]
+    category_ids = {
+        category_id
+        for pk, (_version, category_id) in versions.items()
+        if category_id is not None and store.get(pk, versions[pk][0])
+    }
+    categories = list(Category.objects.filter(id__in=category_ids).order_by("id"))
+    return _assemble(fmt, base_url, categories, fragments, generated_at), stats
+
+
+def verify_incremental_feed(format_key: str, base_url: str | None = None) -> tuple[bytes, list[str]]:
+    """Build incrementally and diff against a full rebuild.
+
+    Returns the full-build payload (always correct) and the unified diff
+    lines; an empty diff means the fragment cache is consistent.
+    """
+    generated_at = timezone.now()
+    incremental, _stats = build_feed_xml_incremental(format_key, base_url, generated_at=generated_at)
+    full = build_feed_xml(format_key, base_url, generated_at=generated_at)
+    if incremental == full:
+        return full, []
+    diff = list(
+        difflib.unified_diff(
+            full.decode("utf-8").splitlines(),
+            incremental.decode("utf-8").splitlines(),
+            fromfile=f"{format_key}:full",
+            tofile=f"{format_key}:incremental",
+            lineterm="",
+        )
+    )
+    return full, diff
@@ -3,7 +3,9 @@
 Signals mark the feeds as "dirty" by touching a flag file. A cron job runs
 ``manage.py regenerate_feeds_if_dirty`` every few minutes and rebuilds all
 marketplace feeds if (and only if) the flag is newer than the last successful
-build timestamp.
+build timestamp. The rebuild itself is incremental: per-product offer
+fragments are cached by content hash (see ``feed_fragments``), so a single
+product edit only re-renders that product.
 
 This replaces the Celery-backed debounce that was using
 ``.apply_async(countdown=300)``; the project's shared hosting has no broker.
@@ -0,0 +1,267 @@
+"""
+Параллельный и возобновляемый конвейер для ``manage.py optimize_images``.
+
+Команда раньше кодировала WebP/AVIF/responsive-варианты по одному
+изображению на одном ядре. Теперь:
+
+* команда собирает ``ImageJob`` из БД (только пути, без Pillow), а
+  ``iter_job_results`` раздаёт их в пул процессов (``--workers``) с
+  ограниченным окном в полёте; ``--workers 1`` — прежний последовательный
+  режим без пула;
+* каждый воркер может получить лимит адресного пространства
+  (``--max-memory-mb``, RLIMIT_AS): «бомба» из огромного PNG падает с
+  MemoryError в своём задании, а не роняет хост;
+* ``OptimizationManifest`` хранит SHA-256 содержимого каждого исходника и
+  список созданных файлов. Прерванный запуск продолжается без повторного
+  кодирования: совпал хеш и файлы на месте — задание пропускается, даже если
+  mtime исходника изменился (rsync, восстановление из бэкапа). Манифест
+  сохраняется атомарно каждые ``MANIFEST_SAVE_EVERY`` результатов;
+* если воркер умер (OOM-killer, сегфолт в кодеке), пул ломается и все
+  задания в полёте получают ``BrokenProcessPool``. Такие задания
+  перезапускаются в новом пуле по одному: то, что ломает пул и в одиночку,
+  отдаётся как ``failed``, остальные доделываются, а прогон продолжается.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from .image_variants import optimized_variants_are_current
+
+MANIFEST_FILENAME = ".optimize_images_manifest.json"
+MANIFEST_SAVE_EVERY = 20
+HASH_CHUNK_SIZE = 1024 * 1024
+
+KIND_PRODUCT = "product"
+KIND_ICON = "icon"
+
+STATUS_OPTIMIZED = "optimized"
+STATUS_SKIPPED = "skipped"
+STATUS_EMPTY = "empty"
+STATUS_FAILED = "failed"
+
+
+@dataclass(frozen=True)
+class ImageJob:
+    key: str
+    label: str
+    path: str
+    kind: str = KIND_PRODUCT
+    known_hash: Optional[str] = None
+    known_outputs: tuple = ()
+    force: bool = False
+
+
+@dataclass
+class JobResult:
+    job: ImageJob
+    status: str
+    digest: Optional[str] = None
+    outputs: List[str] = field(default_factory=list)
+    source_bytes: int = 0
+    error: str = ""
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as stream:
+        for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class OptimizationManifest:
+    """JSON ``{key: {"sha256": ..., "outputs": [...]}}`` рядом с MEDIA_ROOT."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.entries: Dict[str, dict] = {}
+        self._dirty = 0
+        try:
+            with open(self.path, encoding="utf-8") as stream:
+                data = json.load(stream)
+        except (OSError, ValueError):
+            data = {}
+        if isinstance(data, dict):
+            self.entries = {key: value for key, value in data.items() if isinstance(value, dict)}
+
+    def get(self, key: str) -> dict:
+        return self.entries.get(key) or {}
+
+    def record(self, key: str, digest: str, outputs: Iterable[str]) -> None:
+        self.entries[key] = {"sha256": digest, "outputs": sorted(set(outputs))}
+        self._dirty += 1
+        if self._dirty >= MANIFEST_SAVE_EVERY:
+            self.save()
+
+    def save(self) -> None:
+        if not self._dirty and self.path.exists():
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as stream:
+            json.dump(self.entries, stream, ensure_ascii=False, sort_keys=True)
+        os.replace(tmp_path, self.path)
+        self._dirty = 0
+
+
+_optimizer = None
+
+
+def _get_optimizer():
+    global _optimizer
+    if _optimizer is None:
+        from image_optimizer import ImageOptimizer
+
+        _optimizer = ImageOptimizer()
+    return _optimizer
+
+
+def _outputs_exist(path: Path, outputs: Iterable[str]) -> bool:
+    optimized_dir = path.parent / "optimized"
+    outputs = list(outputs)
+    return bool(outputs) and all((optimized_dir / name).exists() for name in outputs)
+
+
+def process_image_job(job: ImageJob) -> JobResult:
+    """Кодирует варианты одного исходника (выполняется в воркере пула)."""
+    path = Path(job.path)
+    try:
+        digest = file_sha256(path)
+        source_bytes = path.stat().st_size
+    except OSError as exc:
+        return JobResult(job, STATUS_FAILED, error=str(exc))
+
+    if not job.force:
+        if job.known_hash == digest and _outputs_exist(path, job.known_outputs):
+            return JobResult(job, STATUS_SKIPPED, digest, list(job.known_outputs))
+        if job.kind == KIND_PRODUCT and optimized_variants_are_current(path):
+            return JobResult(job, STATUS_SKIPPED, digest, [f"{path.stem}.webp", f"{path.stem}.avif"])
+
+    try:
+        optimizer = _get_optimizer()
+        if job.kind == KIND_ICON:
+            variants = optimizer.optimize_category_icon(str(path))
+        else:
+            variants = optimizer.optimize_product_image(str(path))
+        if not variants:
+            return JobResult(job, STATUS_EMPTY, digest, source_bytes=source_bytes)
+        saved = optimizer.save_optimized_images(variants, path.parent / "optimized")
+    except Exception as exc:  # MemoryError при лимите памяти тоже сюда
+        return JobResult(job, STATUS_FAILED, digest, error=f"{type(exc).__name__}: {exc}")
+
+    return JobResult(
+        job,
+        STATUS_OPTIMIZED,
+        digest,
+        [Path(saved_path).name for saved_path in saved],
+        source_bytes=source_bytes,
+    )
+
+
+def _init_worker(max_memory_mb: Optional[int]) -> None:
+    if not max_memory_mb:
+        return
+    try:
+        import resource
+    except ImportError:  # pragma: no cover - не POSIX
+        return
+    limit = int(max_memory_mb) * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _pool_context():
+    # fork: воркеры наследуют настроенный Django и не импортируют проект заново
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return None
+
+
+def _new_pool(workers: int, max_memory_mb: Optional[int]) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=_pool_context(),
+        initializer=_init_worker,
+        initargs=(max_memory_mb,),
+    )
+
+
+def iter_job_results(
+    jobs: Iterable[ImageJob],
+    *,
+    workers: int = 1,
+    max_memory_mb: Optional[int] = None,
+    can_submit: Callable[[int], bool] = lambda in_flight: True,
+) -> Iterator[JobResult]:
+    """Выполняет задания и отдаёт результаты по мере готовности.
+
+    ``can_submit(in_flight)`` вызывается перед каждой постановкой — команда
+    через него соблюдает ``--limit``.
+    """
+    jobs = iter(jobs)
+    if workers <= 1:
+        for job in jobs:
+            if not can_submit(0):
+                return
+            yield process_image_job(job)
+        return
+
+    window = workers * 2
+    pool = _new_pool(workers, max_memory_mb)
+    pending: Dict[Future, ImageJob] = {}
+    # Задания из сломанного пула: виновника не отличить, поэтому гоняем их
+    # по одному (``isolated``), пока новых заданий в пул не ставим.
+    suspects: deque = deque()
+    isolated: Optional[ImageJob] = None
+    exhausted = False
+    try:
+        while True:
+            while isolated is None and can_submit(len(pending)):
+                if suspects:
+                    if pending:
+                        break
+                    job = isolated = suspects.popleft()
+                elif exhausted or len(pending) >= window:
+                    break
+                else:
+                    job = next(jobs, None)
+                    if job is None:
+                        exhausted = True
+                        break
+                pending[pool.submit(process_image_job, job)] = job
+            if not pending:
+                return
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            broken = False
+            for future in done:
+                job = pending.pop(future)
+                try:
+                    result = future.result()
+                except BrokenProcessPool as exc:
+                    broken = True
+                    if job is not isolated:
+                        suspects.append(job)
+                        continue
+                    result = JobResult(job, STATUS_FAILED, error=f"{type(exc).__name__}: {exc}")
+                except Exception as exc:
+                    result = JobResult(job, STATUS_FAILED, error=f"{type(exc).__name__}: {exc}")
+                if job is isolated:
+                    isolated = None
+                yield result
+
+            if broken:
+                suspects.extend(pending.values())
+                pending.clear()
+                pool.shutdown(wait=False, cancel_futures=True)
+                pool = _new_pool(workers, max_memory_mb)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from typing import Callable
 from decimal import Decimal, ROUND_HALF_UP
 import re
 import xml.etree.ElementTree as ET
@@ -858,10 +859,7 @@ def _append_cdata(parent: ET.Element, tag: str, html: str) -> ET.Element:
     return element
 
 
-def _finalize_xml(root: ET.Element) -> bytes:
-    ET.indent(root, space="  ", level=0)
-    payload = ET.tostring(root, encoding="utf-8", xml_declaration=True)
-
+def _restore_cdata(payload: bytes) -> bytes:
     def replace_cdata(match: re.Match[bytes]) -> bytes:
         content = match.group(1)
         content = content.replace(b"&lt;", b"<").replace(b"&gt;", b">").replace(b"&amp;", b"&")
@@ -871,11 +869,21 @@ def _finalize_xml(root: ET.Element) -> bytes:
     return CDATA_RE.sub(replace_cdata, payload)
 
 
-def build_rozetka_feed_xml(base_url: str | None = None) -> bytes:
-    base_url = resolve_base_url(base_url)
-    offers = iter_feed_offers(base_url)
-
-    catalog = ET.Element("yml_catalog", {"date": timezone.now().strftime("%Y-%m-%d %H:%M")})
+def _finalize_xml(root: ET.Element) -> bytes:
+    ET.indent(root, space="  ", level=0)
+    payload = ET.tostring(root, encoding="utf-8", xml_declaration=True)
+    return _restore_cdata(payload)
+
+
+def _yml_document(
+    base_url: str,
+    categories: list[Category],
+    *,
+    generated_at=None,
+    with_rz_ids: bool = False,
+) -> tuple[ET.Element, ET.Element]:
+    generated_at = generated_at or timezone.now()
+    catalog = ET.Element("yml_catalog", {"date": generated_at.strftime("%Y-%m-%d %H:%M")})
     shop = ET.SubElement(catalog, "shop")
     ET.SubElement(shop, "name").text = SHOP_NAME
     ET.SubElement(shop, "company").text = SHOP_COMPANY
@@ -885,135 +893,127 @@ def build_rozetka_feed_xml(base_url: str | None = None) -> bytes:
     ET.SubElement(currencies, "currency", {"id": DEFAULT_CURRENCY, "rate": "1"})
 
     categories_el = ET.SubElement(shop, "categories")
-    for category in _used_categories(offers):
+    for category in categories:
         attrs = {"id": str(category.id)}
-        rz_id = _category_rz_id(category)
-        if rz_id:
-            attrs["rz_id"] = rz_id
+        if with_rz_ids:
+            rz_id = _category_rz_id(category)
+            if rz_id:
+                attrs["rz_id"] = rz_id
         ET.SubElement(categories_el, "category", attrs).text = _truncate(category.name, 255)
 
     offers_el = ET.SubElement(shop, "offers")
-    for offer in offers:
-        product = offer.product
-        offer_el = ET.SubElement(
-            offers_el,
-            "offer",
-            {"id": offer.rozetka_offer_id, "available": "true" if offer.available else "false"},
-        )
-        ET.SubElement(offer_el, "url").text = _truncate(offer.product_url, 500)
-        ET.SubElement(offer_el, "price").text = _format_yml_price(offer.price)
-        if offer.old_price and offer.old_price > offer.price:
-            ET.SubElement(offer_el, "price_old").text = _format_yml_price(offer.old_price)
-        ET.SubElement(offer_el, "currencyId").text = DEFAULT_CURRENCY
-        ET.SubElement(offer_el, "categoryId").text = str(product.category_id)
-        for image_url in offer.image_urls[:15]:
-            ET.SubElement(offer_el, "picture").text = _truncate(image_url, 1999)
-        ET.SubElement(offer_el, "vendor").text = SHOP_NAME
-        ET.SubElement(offer_el, "article").text = offer.article
-        ET.SubElement(offer_el, "stock_quantity").text = str(_feed_stock_quantity(offer))
-
-        name_ru = _truncate(f"{_uk_text_to_ru(product.title)} {offer.color_ru} {offer.size}", 255)
-        name_ua = _truncate(f"{product.title} {offer.color_ua} {offer.size}", 255)
-        ET.SubElement(offer_el, "name").text = name_ru
-        ET.SubElement(offer_el, "name_ua").text = name_ua
-        _append_cdata(offer_el, "description", offer.description_ru)
-        _append_cdata(offer_el, "description_ua", offer.description_ua)
-        ET.SubElement(offer_el, "state").text = "new"
-
-        params = [
-            ("Розмір", offer.size),
-            ("Колір", offer.color_ua),
-            ("Склад", offer.material_ua),
-            ("Матеріал", offer.material_ua),
-            ("Сезон", "Демісезон"),
-            ("Стать", "Унісекс"),
-            ("Вікова група", "Дорослі"),
-            ("Принт", "Є"),
-            ("Країна-виробник товару", "Україна"),
-        ]
-        for name, value in params:
-            clean_value = _truncate(value, 500)
-            if clean_value:
-                ET.SubElement(offer_el, "param", {"name": name}).text = clean_value
+    return catalog, offers_el
 
-    return _finalize_xml(catalog)
 
+def _rozetka_document(base_url: str, categories: list[Category], *, generated_at=None):
+    return _yml_document(base_url, categories, generated_at=generated_at, with_rz_ids=True)
 
-def build_kasta_feed_xml(base_url: str | None = None) -> bytes:
-    base_url = resolve_base_url(base_url)
-    offers = iter_feed_offers(base_url)
 
-    catalog = ET.Element("yml_catalog", {"date": timezone.now().strftime("%Y-%m-%d %H:%M")})
-    shop = ET.SubElement(catalog, "shop")
-    ET.SubElement(shop, "name").text = SHOP_NAME
-    ET.SubElement(shop, "company").text = SHOP_COMPANY
-    ET.SubElement(shop, "url").text = base_url
+def _append_rozetka_offer(offers_el: ET.Element, offer: FeedOffer) -> None:
+    product = offer.product
+    offer_el = ET.SubElement(
+        offers_el,
+        "offer",
+        {"id": offer.rozetka_offer_id, "available": "true" if offer.available else "false"},
+    )
+    ET.SubElement(offer_el, "url").text = _truncate(offer.product_url, 500)
+    ET.SubElement(offer_el, "price").text = _format_yml_price(offer.price)
+    if offer.old_price and offer.old_price > offer.price:
+        ET.SubElement(offer_el, "price_old").text = _format_yml_price(offer.old_price)
+    ET.SubElement(offer_el, "currencyId").text = DEFAULT_CURRENCY
+    ET.SubElement(offer_el, "categoryId").text = str(product.category_id)
+    for image_url in offer.image_urls[:15]:
+        ET.SubElement(offer_el, "picture").text = _truncate(image_url, 1999)
+    ET.SubElement(offer_el, "vendor").text = SHOP_NAME
+    ET.SubElement(offer_el, "article").text = offer.article
+    ET.SubElement(offer_el, "stock_quantity").text = str(_feed_stock_quantity(offer))
+
+    name_ru = _truncate(f"{_uk_text_to_ru(product.title)} {offer.color_ru} {offer.size}", 255)
+    name_ua = _truncate(f"{product.title} {offer.color_ua} {offer.size}", 255)
+    ET.SubElement(offer_el, "name").text = name_ru
+    ET.SubElement(offer_el, "name_ua").text = name_ua
+    _append_cdata(offer_el, "description", offer.description_ru)
+    _append_cdata(offer_el, "description_ua", offer.description_ua)
+    ET.SubElement(offer_el, "state").text = "new"
+
+    params = [
+        ("Розмір", offer.size),
+        ("Колір", offer.color_ua),
+        ("Склад", offer.material_ua),
+        ("Матеріал", offer.material_ua),
+        ("Сезон", "Демісезон"),
+        ("Стать", "Унісекс"),
+        ("Вікова група", "Дорослі"),
+        ("Принт", "Є"),
+        ("Країна-виробник товару", "Україна"),
+    ]
+    for name, value in params:
+        clean_value = _truncate(value, 500)
+        if clean_value:
+            ET.SubElement(offer_el, "param", {"name": name}).text = clean_value
 
-    currencies = ET.SubElement(shop, "currencies")
-    ET.SubElement(currencies, "currency", {"id": DEFAULT_CURRENCY, "rate": "1"})
 
-    categories_el = ET.SubElement(shop, "categories")
-    for category in _used_categories(offers):
-        attrs = {"id": str(category.id)}
-        rz_id = _category_rz_id(category)
-        if rz_id:
-            attrs["rz_id"] = rz_id
-        ET.SubElement(categories_el, "category", attrs).text = _truncate(category.name, 255)
+def build_rozetka_feed_xml(base_url: str | None = None) -> bytes:
+    return build_feed_xml("rozetka", base_url)
 
-    offers_el = ET.SubElement(shop, "offers")
-    for offer in offers:
-        product = offer.product
-        offer_el = ET.SubElement(
-            offers_el,
-            "offer",
-            {"id": offer.rozetka_offer_id, "available": "true" if offer.available else "false"},
-        )
-        ET.SubElement(offer_el, "url").text = _truncate(offer.product_url, 500)
-        ET.SubElement(offer_el, "price").text = _format_yml_price(offer.price)
-        price_old = offer.old_price if offer.old_price and offer.old_price > offer.price else offer.price
-        ET.SubElement(offer_el, "price_old").text = _format_yml_price(price_old)
-        ET.SubElement(offer_el, "currencyId").text = DEFAULT_CURRENCY
-        ET.SubElement(offer_el, "categoryId").text = str(product.category_id)
-        for image_url in offer.image_urls[:20]:
-            ET.SubElement(offer_el, "picture").text = _truncate(image_url, 1999)
-        ET.SubElement(offer_el, "vendor").text = SHOP_NAME
-        ET.SubElement(offer_el, "article").text = _kasta_article_for_product(product)
-        ET.SubElement(offer_el, "stock_quantity").text = str(_feed_stock_quantity(offer))
-
-        base_title = _truncate(_clean_xml_text(product.title) or f"{SHOP_NAME} одяг", 255)
-        name_ru = _truncate(_kasta_name_ru(base_title) or base_title, 255)
-        ET.SubElement(offer_el, "name").text = name_ru
-        ET.SubElement(offer_el, "name_ua").text = base_title
-        ET.SubElement(offer_el, "name_ru").text = name_ru
-        _append_cdata(offer_el, "description", _kasta_description(offer.description_ru))
-        _append_cdata(offer_el, "description_ua", _kasta_description(offer.description_ua))
-        ET.SubElement(offer_el, "state").text = "new"
-
-        params = [
-            ("Колір", offer.color_ua),
-            ("Розмір", offer.size),
-            ("Склад", offer.material_ua),
-            ("Матеріал", offer.material_ua),
-            ("Сезон", "Демісезон"),
-            ("Стать", "Унісекс"),
-            ("Вікова група", "Дорослі"),
-            ("Принт", "Є"),
-            ("Країна виробництва", "Україна"),
-            ("Повернення", "Підлягає поверненню"),
-        ]
-        for name, value in params:
-            clean_value = _truncate(value, 500)
-            if clean_value:
-                ET.SubElement(offer_el, "param", {"name": name}).text = clean_value
 
-    return _finalize_xml(catalog)
+def _kasta_document(base_url: str, categories: list[Category], *, generated_at=None):
+    return _yml_document(base_url, categories, generated_at=generated_at, with_rz_ids=True)
 
 
-def build_buyme_feed_xml(base_url: str | None = None) -> bytes:
-    base_url = resolve_base_url(base_url)
-    offers = iter_feed_offers(base_url)
+def _append_kasta_offer(offers_el: ET.Element, offer: FeedOffer) -> None:
+    product = offer.product
+    offer_el = ET.SubElement(
+        offers_el,
+        "offer",
+        {"id": offer.rozetka_offer_id, "available": "true" if offer.available else "false"},
+    )
+    ET.SubElement(offer_el, "url").text = _truncate(offer.product_url, 500)
+    ET.SubElement(offer_el, "price").text = _format_yml_price(offer.price)
+    price_old = offer.old_price if offer.old_price and offer.old_price > offer.price else offer.price
+    ET.SubElement(offer_el, "price_old").text = _format_yml_price(price_old)
+    ET.SubElement(offer_el, "currencyId").text = DEFAULT_CURRENCY
+    ET.SubElement(offer_el, "categoryId").text = str(product.category_id)
+    for image_url in offer.image_urls[:20]:
+        ET.SubElement(offer_el, "picture").text = _truncate(image_url, 1999)
+    ET.SubElement(offer_el, "vendor").text = SHOP_NAME
+    ET.SubElement(offer_el, "article").text = _kasta_article_for_product(product)
+    ET.SubElement(offer_el, "stock_quantity").text = str(_feed_stock_quantity(offer))
+
+    base_title = _truncate(_clean_xml_text(product.title) or f"{SHOP_NAME} одяг", 255)
+    name_ru = _truncate(_kasta_name_ru(base_title) or base_title, 255)
+    ET.SubElement(offer_el, "name").text = name_ru
+    ET.SubElement(offer_el, "name_ua").text = base_title
+    ET.SubElement(offer_el, "name_ru").text = name_ru
+    _append_cdata(offer_el, "description", _kasta_description(offer.description_ru))
+    _append_cdata(offer_el, "description_ua", _kasta_description(offer.description_ua))
+    ET.SubElement(offer_el, "state").text = "new"
+
+    params = [
+        ("Колір", offer.color_ua),
+        ("Розмір", offer.size),
+        ("Склад", offer.material_ua),
+        ("Матеріал", offer.material_ua),
+        ("Сезон", "Демісезон"),
+        ("Стать", "Унісекс"),
+        ("Вікова група", "Дорослі"),
+        ("Принт", "Є"),
+        ("Країна виробництва", "Україна"),
+        ("Повернення", "Підлягає поверненню"),
+    ]
+    for name, value in params:
+        clean_value = _truncate(value, 500)
+        if clean_value:
+            ET.SubElement(offer_el, "param", {"name": name}).text = clean_value
+
 
-    catalog = ET.Element("yml_catalog", {"date": timezone.now().strftime("%Y-%m-%d %H:%M")})
+def build_kasta_feed_xml(base_url: str | None = None) -> bytes:
+    return build_feed_xml("kasta", base_url)
+
+
+def _buyme_document(base_url: str, categories: list[Category], *, generated_at=None):
+    generated_at = generated_at or timezone.now()
+    catalog = ET.Element("yml_catalog", {"date": generated_at.strftime("%Y-%m-%d %H:%M")})
     shop = ET.SubElement(catalog, "shop")
     ET.SubElement(shop, "name").text = BUYME_SHOP_NAME
     ET.SubElement(shop, "company").text = BUYME_SHOP_NAME
@@ -1022,60 +1022,65 @@ def build_buyme_feed_xml(base_url: str | None = None) -> bytes:
     ET.SubElement(currencies, "currency", {"id": DEFAULT_CURRENCY, "rate": "1"})
 
     categories_el = ET.SubElement(shop, "categories")
-    for category in _used_categories(offers):
+    for category in categories:
         name = _truncate(_sanitize_buyme_text(category.name) or "Одяг", 255)
         ET.SubElement(categories_el, "category", {"id": str(category.id)}).text = name
 
     offers_el = ET.SubElement(shop, "offers")
-    for offer in offers:
-        product = offer.product
-        offer_id = _buyme_offer_id(product.id, offer.variant_id, offer.size, offer.color_ua)
-        retail_price = _buyme_retail_price(offer)
-        drop_price = _buyme_drop_price(product, retail_price)
-        quantity = _buyme_quantity(offer)
-        offer_el = ET.SubElement(
-            offers_el,
-            "offer",
-            {
-                "id": offer_id,
-                "available": "true",
-                "group_id": _buyme_group_id(offer),
-            },
-        )
-        ET.SubElement(offer_el, "name").text = _buyme_base_name(product)
-        ET.SubElement(offer_el, "name_ua").text = _buyme_base_name(product)
-        ET.SubElement(offer_el, "price").text = _format_buyme_price(retail_price)
-        ET.SubElement(offer_el, "priceDrop").text = _format_buyme_price(drop_price)
-        ET.SubElement(offer_el, "currencyId").text = DEFAULT_CURRENCY
-        ET.SubElement(offer_el, "categoryId").text = str(product.category_id)
-
-        for image_url in offer.image_urls[:10]:
-            ET.SubElement(offer_el, "picture").text = _truncate(image_url, 1999)
-
-        ET.SubElement(offer_el, "vendorCode").text = offer_id
-        ET.SubElement(offer_el, "quantity_in_stock").text = str(quantity)
-        ET.SubElement(offer_el, "country_of_origin").text = "Україна"
-        ET.SubElement(offer_el, "pickup").text = "false"
-        ET.SubElement(offer_el, "delivery").text = "true"
-        _append_cdata(offer_el, "description", _buyme_description(product, offer))
-        _append_cdata(offer_el, "description_ua", _buyme_description(product, offer))
-
-        params = [
-            ("Колір", offer.color_ua),
-            ("Розмір", offer.size),
-            ("Матеріал", offer.material_ua),
-            ("Сезон", "Демісезон"),
-            ("Стать", "Унісекс"),
-            ("Вікова група", "Дорослі"),
-            ("Принт", "Є"),
-            ("Країна виробництва", "Україна"),
-        ]
-        for name, value in params[:50]:
-            clean_value = _truncate(_sanitize_buyme_text(value), 500)
-            if clean_value:
-                ET.SubElement(offer_el, "param", {"name": name}).text = clean_value
+    return catalog, offers_el
 
-    return _finalize_xml(catalog)
+
+def _append_buyme_offer(offers_el: ET.Element, offer: FeedOffer) -> None:
+    product = offer.product
+    offer_id = _buyme_offer_id(product.id, offer.variant_id, offer.size, offer.color_ua)
+    retail_price = _buyme_retail_price(offer)
+    drop_price = _buyme_drop_price(product, retail_price)
+    quantity = _buyme_quantity(offer)
+    offer_el = ET.SubElement(
+        offers_el,
+        "offer",
+        {
+            "id": offer_id,
+            "available": "true",
+            "group_id": _buyme_group_id(offer),
+        },
+    )
+    ET.SubElement(offer_el, "name").text = _buyme_base_name(product)
+    ET.SubElement(offer_el, "name_ua").text = _buyme_base_name(product)
+    ET.SubElement(offer_el, "price").text = _format_buyme_price(retail_price)
+    ET.SubElement(offer_el, "priceDrop").text = _format_buyme_price(drop_price)
+    ET.SubElement(offer_el, "currencyId").text = DEFAULT_CURRENCY
+    ET.SubElement(offer_el, "categoryId").text = str(product.category_id)
+
+    for image_url in offer.image_urls[:10]:
+        ET.SubElement(offer_el, "picture").text = _truncate(image_url, 1999)
+
+    ET.SubElement(offer_el, "vendorCode").text = offer_id
+    ET.SubElement(offer_el, "quantity_in_stock").text = str(quantity)
+    ET.SubElement(offer_el, "country_of_origin").text = "Україна"
+    ET.SubElement(offer_el, "pickup").text = "false"
+    ET.SubElement(offer_el, "delivery").text = "true"
+    _append_cdata(offer_el, "description", _buyme_description(product, offer))
+    _append_cdata(offer_el, "description_ua", _buyme_description(product, offer))
+
+    params = [
+        ("Колір", offer.color_ua),
+        ("Розмір", offer.size),
+        ("Матеріал", offer.material_ua),
+        ("Сезон", "Демісезон"),
+        ("Стать", "Унісекс"),
+        ("Вікова група", "Дорослі"),
+        ("Принт", "Є"),
+        ("Країна виробництва", "Україна"),
+    ]
+    for name, value in params[:50]:
+        clean_value = _truncate(_sanitize_buyme_text(value), 500)
+        if clean_value:
+            ET.SubElement(offer_el, "param", {"name": name}).text = clean_value
+
+
+def build_buyme_feed_xml(base_url: str | None = None) -> bytes:
+    return build_feed_xml("buyme", base_url)
 
 
 def _build_merchant_custom_labels(product, offer) -> list[str]:
@@ -1137,159 +1142,206 @@ def _build_merchant_custom_labels(product, offer) -> list[str]:
     return [theme_key, category_slug, price_tier, discount_flag, age_cohort]
 
 
-def build_google_merchant_feed_xml(base_url: str | None = None) -> bytes:
-    base_url = resolve_base_url(base_url)
-    offers = iter_feed_offers(base_url)
-
+def _google_merchant_document(base_url: str, categories: list[Category], *, generated_at=None):
     rss = ET.Element("rss", {"version": "2.0"})
     channel = ET.SubElement(rss, "channel")
     ET.SubElement(channel, "title").text = "TwoComms - Стріт & Мілітарі Одяг"
     ET.SubElement(channel, "link").text = base_url
     ET.SubElement(channel, "description").text = "Магазин стріт та мілітарі одягу з ексклюзивним дизайном"
+    return rss, channel
 
-    for offer in offers:
-        product = offer.product
-        item = ET.SubElement(channel, "item")
-        ET.SubElement(item, f"{G}id").text = _truncate(offer.google_offer_id, 50)
-        ET.SubElement(item, f"{G}item_group_id").text = _truncate(offer.group_id, 50)
-        ET.SubElement(item, f"{G}title").text = _truncate(
-            f"{product.title} - {offer.color_ua} - {offer.size}",
-            150,
-        )
-        ET.SubElement(item, f"{G}description").text = offer.google_description
-        ET.SubElement(item, f"{G}link").text = offer.product_url
-        ET.SubElement(item, f"{G}image_link").text = offer.image_urls[0]
-        for image_url in offer.image_urls[1:11]:
-            ET.SubElement(item, f"{G}additional_image_link").text = image_url
-        ET.SubElement(item, f"{G}availability").text = "in_stock" if offer.available else "out_of_stock"
-
-        if getattr(product, "has_discount", False) and offer.base_price > offer.price:
-            ET.SubElement(item, f"{G}price").text = _format_google_price(offer.base_price)
-            ET.SubElement(item, f"{G}sale_price").text = _format_google_price(offer.price)
-        else:
-            ET.SubElement(item, f"{G}price").text = _format_google_price(offer.price)
-
-        ET.SubElement(item, f"{G}condition").text = "new"
-        ET.SubElement(item, f"{G}brand").text = SHOP_NAME
-        ET.SubElement(item, f"{G}mpn").text = _truncate(f"{offer.article}-{product.id}", 70)
-        if is_valid_gtin(offer.barcode):
-            ET.SubElement(item, f"{G}gtin").text = offer.barcode
-        ET.SubElement(item, f"{G}product_type").text = _truncate(getattr(product.category, "name", "Одяг"), 750)
-        ET.SubElement(item, f"{G}google_product_category").text = DEFAULT_GOOGLE_PRODUCT_CATEGORY
-        ET.SubElement(item, f"{G}age_group").text = "adult"
-        ET.SubElement(item, f"{G}gender").text = "unisex"
-        ET.SubElement(item, f"{G}size").text = _truncate(offer.size, 100)
-        ET.SubElement(item, f"{G}size_system").text = "EU"
-        ET.SubElement(item, f"{G}color").text = _truncate(offer.color_ua, 100)
-        ET.SubElement(item, f"{G}material").text = _truncate(offer.material_ua, 200)
-
-        if offer.video_link:
-            ET.SubElement(item, f"{G}video_link").text = offer.video_link
-
-        # Phase 21 (PR-6, T17.2) — custom_label_0..4 for Merchant
-        # Center segmentation. These don't appear in PLAs / shopping
-        # results, but power smart-bidding rules and report filters.
-        # Order is stable so saved-segments don't drift between feed
-        # rebuilds:
-        #   0: theme key  (military / streetwear / patriotic / generic)
-        #   1: category slug (tshirts / hoodie / long-sleeve / …)
-        #   2: price tier (sub_500 / 500_1000 / 1000_plus)
-        #   3: discount flag (on_sale / regular)
-        #   4: age cohort (new_2026 / classic)
-        for idx, label in enumerate(_build_merchant_custom_labels(product, offer)):
-            if not label:
-                continue
-            ET.SubElement(item, f"{G}custom_label_{idx}").text = _truncate(label, 100)
-
-        for highlight in [
-            "Ексклюзивний дизайн TwoComms",
-            f"Матеріал: {offer.material_ua}",
-            "Виробництво: Україна",
-            "Підходить для щоденного носіння",
-            f"Колір: {offer.color_ua}; розмір: {offer.size}",
-        ]:
-            ET.SubElement(item, f"{G}product_highlight").text = _truncate(highlight, 150)
-
-        for section, name, value in [
-            ("Характеристики", "Бренд", SHOP_NAME),
-            ("Характеристики", "Матеріал", offer.material_ua),
-            ("Характеристики", "Колір", offer.color_ua),
-            ("Характеристики", "Розмір", offer.size),
-            ("Характеристики", "Країна виробництва", "Україна"),
-            ("Характеристики", "Сезон", "Демісезон"),
-        ]:
-            detail = ET.SubElement(item, f"{G}product_detail")
-            ET.SubElement(detail, f"{G}section_name").text = _truncate(section, 140)
-            ET.SubElement(detail, f"{G}attribute_name").text = _truncate(name, 140)
-            ET.SubElement(detail, f"{G}attribute_value").text = _truncate(value, 1000)
-
-    ET.indent(rss, space="  ", level=0)
-    return ET.tostring(rss, encoding="utf-8", xml_declaration=True)
-
-
-def _build_yml_feed_xml(*, base_url: str | None, bezzet_mode: bool = False) -> bytes:
-    base_url = resolve_base_url(base_url)
-    offers = iter_feed_offers(base_url)
 
-    catalog = ET.Element("yml_catalog", {"date": timezone.now().strftime("%Y-%m-%d %H:%M")})
-    shop = ET.SubElement(catalog, "shop")
-    ET.SubElement(shop, "name").text = SHOP_NAME
-    ET.SubElement(shop, "company").text = SHOP_COMPANY
-    ET.SubElement(shop, "url").text = base_url
-    currencies = ET.SubElement(shop, "currencies")
-    ET.SubElement(currencies, "currency", {"id": DEFAULT_CURRENCY, "rate": "1"})
-    categories_el = ET.SubElement(shop, "categories")
-    for category in _used_categories(offers):
-        ET.SubElement(categories_el, "category", {"id": str(category.id)}).text = _truncate(category.name, 255)
+def _append_google_merchant_item(channel: ET.Element, offer: FeedOffer) -> None:
+    product = offer.product
+    item = ET.SubElement(channel, "item")
+    ET.SubElement(item, f"{G}id").text = _truncate(offer.google_offer_id, 50)
+    ET.SubElement(item, f"{G}item_group_id").text = _truncate(offer.group_id, 50)
+    ET.SubElement(item, f"{G}title").text = _truncate(
+        f"{product.title} - {offer.color_ua} - {offer.size}",
+        150,
+    )
+    ET.SubElement(item, f"{G}description").text = offer.google_description
+    ET.SubElement(item, f"{G}link").text = offer.product_url
+    ET.SubElement(item, f"{G}image_link").text = offer.image_urls[0]
+    for image_url in offer.image_urls[1:11]:
+        ET.SubElement(item, f"{G}additional_image_link").text = image_url
+    ET.SubElement(item, f"{G}availability").text = "in_stock" if offer.available else "out_of_stock"
+
+    if getattr(product, "has_discount", False) and offer.base_price > offer.price:
+        ET.SubElement(item, f"{G}price").text = _format_google_price(offer.base_price)
+        ET.SubElement(item, f"{G}sale_price").text = _format_google_price(offer.price)
+    else:
+        ET.SubElement(item, f"{G}price").text = _format_google_price(offer.price)
+
+    ET.SubElement(item, f"{G}condition").text = "new"
+    ET.SubElement(item, f"{G}brand").text = SHOP_NAME
+    ET.SubElement(item, f"{G}mpn").text = _truncate(f"{offer.article}-{product.id}", 70)
+    if is_valid_gtin(offer.barcode):
+        ET.SubElement(item, f"{G}gtin").text = offer.barcode
+    ET.SubElement(item, f"{G}product_type").text = _truncate(getattr(product.category, "name", "Одяг"), 750)
+    ET.SubElement(item, f"{G}google_product_category").text = DEFAULT_GOOGLE_PRODUCT_CATEGORY
+    ET.SubElement(item, f"{G}age_group").text = "adult"
+    ET.SubElement(item, f"{G}gender").text = "unisex"
+    ET.SubElement(item, f"{G}size").text = _truncate(offer.size, 100)
+    ET.SubElement(item, f"{G}size_system").text = "EU"
+    ET.SubElement(item, f"{G}color").text = _truncate(offer.color_ua, 100)
+    ET.SubElement(item, f"{G}material").text = _truncate(offer.material_ua, 200)
+
+    if offer.video_link:
+        ET.SubElement(item, f"{G}video_link").text = offer.video_link
+
+    # Phase 21 (PR-6, T17.2) — custom_label_0..4 for Merchant
+    # Center segmentation. These don't appear in PLAs / shopping
+    # results, but power smart-bidding rules and report filters.
+    # Order is stable so saved-segments don't drift between feed
+    # rebuilds:
+    #   0: theme key  (military / streetwear / patriotic / generic)
+    #   1: category slug (tshirts / hoodie / long-sleeve / …)
+    #   2: price tier (sub_500 / 500_1000 / 1000_plus)
+    #   3: discount flag (on_sale / regular)
+    #   4: age cohort (new_2026 / classic)
+    for idx, label in enumerate(_build_merchant_custom_labels(product, offer)):
+        if not label:
+            continue
+        ET.SubElement(item, f"{G}custom_label_{idx}").text = _truncate(label, 100)
+
+    for highlight in [
+        "Ексклюзивний дизайн TwoComms",
+        f"Матеріал: {offer.material_ua}",
+        "Виробництво: Україна",
+        "Підходить для щоденного носіння",
+        f"Колір: {offer.color_ua}; розмір: {offer.size}",
+    ]:
+        ET.SubElement(item, f"{G}product_highlight").text = _truncate(highlight, 150)
+
+    for section, name, value in [
+        ("Характеристики", "Бренд", SHOP_NAME),
+        ("Характеристики", "Матеріал", offer.material_ua),
+        ("Характеристики", "Колір", offer.color_ua),
+        ("Характеристики", "Розмір", offer.size),
+        ("Характеристики", "Країна виробництва", "Україна"),
+        ("Характеристики", "Сезон", "Демісезон"),
+    ]:
+        detail = ET.SubElement(item, f"{G}product_detail")
+        ET.SubElement(detail, f"{G}section_name").text = _truncate(section, 140)
+        ET.SubElement(detail, f"{G}attribute_name").text = _truncate(name, 140)
+        ET.SubElement(detail, f"{G}attribute_value").text = _truncate(value, 1000)
+
+
+def _finalize_google_xml(root: ET.Element) -> bytes:
+    ET.indent(root, space="  ", level=0)
+    return ET.tostring(root, encoding="utf-8", xml_declaration=True)
 
-    offers_el = ET.SubElement(shop, "offers")
+
+def build_google_merchant_feed_xml(base_url: str | None = None) -> bytes:
+    return build_feed_xml("google", base_url)
+
+
+def _prom_document(base_url: str, categories: list[Category], *, generated_at=None):
+    return _yml_document(base_url, categories, generated_at=generated_at)
+
+
+def _append_prom_offer(offers_el: ET.Element, offer: FeedOffer, *, bezzet_mode: bool = False) -> None:
+    product = offer.product
+    stock_quantity = _bezzet_quantity(offer) if bezzet_mode else _feed_stock_quantity(offer)
+    available = True
+    group_id = _bezzet_group_id(offer) if bezzet_mode else str(product.id)
+    offer_el = ET.SubElement(
+        offers_el,
+        "offer",
+        {
+            "id": offer.yml_offer_id,
+            "available": "true" if available else "false",
+            "group_id": group_id,
+        },
+    )
+    ET.SubElement(offer_el, "url").text = offer.product_url
+    ET.SubElement(offer_el, "price").text = _format_yml_price(offer.price)
+    if getattr(product, "has_discount", False) and offer.base_price > offer.price:
+        ET.SubElement(offer_el, "oldprice").text = _format_yml_price(offer.base_price)
+    ET.SubElement(offer_el, "currencyId").text = DEFAULT_CURRENCY
+    ET.SubElement(offer_el, "categoryId").text = str(product.category_id)
+    for image_url in offer.image_urls[:10]:
+        ET.SubElement(offer_el, "picture").text = image_url
+    ET.SubElement(offer_el, "name").text = _truncate(f"{product.title} {offer.color_ua} {offer.size}", 255)
+    ET.SubElement(offer_el, "name_ua").text = _truncate(f"{product.title} {offer.color_ua} {offer.size}", 255)
+    ET.SubElement(offer_el, "vendor").text = SHOP_NAME
+    ET.SubElement(offer_el, "vendorCode").text = offer.article
+    ET.SubElement(offer_el, "stock_quantity").text = str(stock_quantity)
+    if bezzet_mode:
+        ET.SubElement(offer_el, "quantity_in_stock").text = str(stock_quantity)
+    ET.SubElement(offer_el, "country_of_origin").text = "Україна"
+    _append_cdata(offer_el, "description", offer.description_ua)
+    _append_cdata(offer_el, "description_ua", offer.description_ua)
+    for name, value in [
+        ("Розмір", offer.size),
+        ("Колір", offer.color_ua),
+        ("Матеріал", offer.material_ua),
+        ("Сезон", "Демісезон"),
+        ("Країна-виробник товару", "Україна"),
+    ]:
+        ET.SubElement(offer_el, "param", {"name": name}).text = value
+
+
+def _append_uaprom_offer(offers_el: ET.Element, offer: FeedOffer) -> None:
+    _append_prom_offer(offers_el, offer, bezzet_mode=True)
+
+
+@dataclass(frozen=True)
+class FeedFormat:
+    """How one marketplace feed is laid out.
+
+    ``document`` builds the skeleton (header + categories) and returns the
+    root plus the element offers are appended to; ``append_offer`` renders a
+    single offer into that container. Keeping the two apart lets
+    ``feed_fragments`` cache rendered offers per product and splice them
+    into a freshly built skeleton.
+    """
+
+    key: str
+    document: Callable[..., tuple[ET.Element, ET.Element]]
+    append_offer: Callable[[ET.Element, FeedOffer], None]
+    finalize: Callable[[ET.Element], bytes]
+    # Depth of the offers container below the root (used for indentation).
+    container_level: int
+    # Namespace of the offer elements; declared on the root of the document.
+    namespace: str = ""
+    # Date-dependent output (e.g. Merchant age cohorts) must not outlive the day.
+    daily: bool = False
+
+
+FEED_FORMATS: dict[str, FeedFormat] = {
+    "google": FeedFormat(
+        "google",
+        _google_merchant_document,
+        _append_google_merchant_item,
+        _finalize_google_xml,
+        container_level=1,
+        namespace=GOOGLE_NS,
+        daily=True,
+    ),
+    "rozetka": FeedFormat("rozetka", _rozetka_document, _append_rozetka_offer, _finalize_xml, container_level=2),
+    "kasta": FeedFormat("kasta", _kasta_document, _append_kasta_offer, _finalize_xml, container_level=2),
+    "buyme": FeedFormat("buyme", _buyme_document, _append_buyme_offer, _finalize_xml, container_level=2),
+    "prom": FeedFormat("prom", _prom_document, _append_prom_offer, _finalize_xml, container_level=2),
+    "uaprom": FeedFormat("uaprom", _prom_document, _append_uaprom_offer, _finalize_xml, container_level=2),
+}
+
+
+def build_feed_xml(format_key: str, base_url: str | None = None, *, generated_at=None) -> bytes:
+    """Full (non-incremental) build of one feed format."""
+    fmt = FEED_FORMATS[format_key]
+    base_url = resolve_base_url(base_url)
+    offers = iter_feed_offers(base_url)
+    root, container = fmt.document(base_url, _used_categories(offers), generated_at=generated_at)
     for offer in offers:
-        product = offer.product
-        stock_quantity = _bezzet_quantity(offer) if bezzet_mode else _feed_stock_quantity(offer)
-        available = True
-        group_id = _bezzet_group_id(offer) if bezzet_mode else str(product.id)
-        offer_el = ET.SubElement(
-            offers_el,
-            "offer",
-            {
-                "id": offer.yml_offer_id,
-                "available": "true" if available else "false",
-                "group_id": group_id,
-            },
-        )
-        ET.SubElement(offer_el, "url").text = offer.product_url
-        ET.SubElement(offer_el, "price").text = _format_yml_price(offer.price)
-        if getattr(product, "has_discount", False) and offer.base_price > offer.price:
-            ET.SubElement(offer_el, "oldprice").text = _format_yml_price(offer.base_price)
-        ET.SubElement(offer_el, "currencyId").text = DEFAULT_CURRENCY
-        ET.SubElement(offer_el, "categoryId").text = str(product.category_id)
-        for image_url in offer.image_urls[:10]:
-            ET.SubElement(offer_el, "picture").text = image_url
-        ET.SubElement(offer_el, "name").text = _truncate(f"{product.title} {offer.color_ua} {offer.size}", 255)
-        ET.SubElement(offer_el, "name_ua").text = _truncate(f"{product.title} {offer.color_ua} {offer.size}", 255)
-        ET.SubElement(offer_el, "vendor").text = SHOP_NAME
-        ET.SubElement(offer_el, "vendorCode").text = offer.article
-        ET.SubElement(offer_el, "stock_quantity").text = str(stock_quantity)
-        if bezzet_mode:
-            ET.SubElement(offer_el, "quantity_in_stock").text = str(stock_quantity)
-        ET.SubElement(offer_el, "country_of_origin").text = "Україна"
-        _append_cdata(offer_el, "description", offer.description_ua)
-        _append_cdata(offer_el, "description_ua", offer.description_ua)
-        for name, value in [
-            ("Розмір", offer.size),
-            ("Колір", offer.color_ua),
-            ("Матеріал", offer.material_ua),
-            ("Сезон", "Демісезон"),
-            ("Країна-виробник товару", "Україна"),
-        ]:
-            ET.SubElement(offer_el, "param", {"name": name}).text = value
-
-    return _finalize_xml(catalog)
+        fmt.append_offer(container, offer)
+    return fmt.finalize(root)
 
 
 def build_uaprom_products_feed_xml(base_url: str | None = None) -> bytes:
-    return _build_yml_feed_xml(base_url=base_url, bezzet_mode=True)
+    return build_feed_xml("uaprom", base_url)
 
 
 def build_prom_feed_xml(base_url: str | None = None) -> bytes:
-    return _build_yml_feed_xml(base_url=base_url, bezzet_mode=False)
+    return build_feed_xml("prom", base_url)
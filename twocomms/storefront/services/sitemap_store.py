@@ -0,0 +1,276 @@
+"""Pre-rendered sitemap store (disk files + conditional GET).
+
+Every sitemap document (``/sitemap.xml`` index, per-section children and
+their ``?p=N`` pages) is rendered by ``manage.py render_sitemaps`` into
+``tmp/sitemaps`` together with a ``.gz`` variant and a ``manifest.json``
+carrying the ETag (content hash) and Last-Modified (time the content last
+*changed*, not the time of the last run).
+
+The sitemap views are wrapped with :func:`prerendered_sitemap`: when the
+store has the requested document it is streamed from disk with
+ETag/Last-Modified, gzip when the client accepts it, and 304 for matching
+conditional requests — no ORM access at all. A missing document falls
+back to the live view, so a fresh deploy keeps working before the first
+render.
+
+Catalogue signals touch a dirty flag (``mark_sitemaps_dirty``); cron runs
+``render_sitemaps --if-dirty``. Unchanged documents keep their ETag and
+Last-Modified, so crawlers keep getting 304s.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+from functools import wraps
+from pathlib import Path
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.http import FileResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+logger = logging.getLogger(__name__)
+
+SITEMAP_CONTENT_TYPE = "application/xml; charset=utf-8"
+SITEMAP_CACHE_CONTROL = "public, max-age=3600"
+MANIFEST_NAME = "manifest.json"
+
+_manifest_cache: dict = {"key": None, "documents": {}}
+
+
+def store_dir() -> Path:
+    configured = getattr(settings, "SITEMAP_STORE_DIR", "")
+    if configured:
+        return Path(configured)
+    return Path(getattr(settings, "BASE_DIR", Path(__file__).resolve().parents[3])) / "tmp" / "sitemaps"
+
+
+def document_key(name: str, page=None) -> str | None:
+    """Manifest key for ``name`` and ``?p=`` value; ``None`` for invalid pages."""
+    if page in (None, "", 1, "1"):
+        return name
+    try:
+        number = int(page)
+    except (TypeError, ValueError):
+        return None
+    if number < 1:
+        return None
+    return name if number == 1 else f"{name}?p={number}"
+
+
+def _file_name(key: str) -> str:
+    if "?p=" not in key:
+        return key
+    name, page = key.split("?p=", 1)
+    stem = name[:-4] if name.endswith(".xml") else name
+    return f"{stem}.p{page}.xml"
+
+
+def load_manifest() -> dict:
+    """Documents from ``manifest.json``; re-read only when the file changes."""
+    path = store_dir() / MANIFEST_NAME
+    try:
+        stat = path.stat()
+    except OSError:
+        return {}
+    cache_key = (str(path), stat.st_mtime_ns, stat.st_size)
+    if _manifest_cache["key"] != cache_key:
+        try:
+            documents = json.loads(path.read_text(encoding="utf-8")).get("documents", {})
+        except (OSError, ValueError):
+            documents = {}
+        _manifest_cache.update(key=cache_key, documents=documents)
+    return _manifest_cache["documents"]
+
+
+def _accepts_gzip(request) -> bool:
+    accept = request.META.get("HTTP_ACCEPT_ENCODING", "")
+    return any(part.split(";")[0].strip().lower() == "gzip" for part in accept.split(","))
+
+
+def serve_prerendered_sitemap(request, name: str):
+    """Response for a pre-rendered document, or ``None`` to fall back to live."""
+    key = document_key(name, request.GET.get("p"))
+    if key is None:
+        return None
+    entry = load_manifest().get(key)
+    if not entry:
+        return None
+
+    use_gzip = _accepts_gzip(request)
+    path = store_dir() / (entry["file"] + (".gz" if use_gzip else ""))
+    etag = f'"{entry["etag"]}{"-gz" if use_gzip else ""}"'
+    last_modified = int(entry["last_modified"])
+
+    def _headers(response):
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        response["Cache-Control"] = SITEMAP_CACHE_CONTROL
+        response["Vary"] = "Accept-Encoding"
+        return response
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return _headers(not_modified)
+    try:
+        handle = open(path, "rb")
+    except OSError:
+        return None
+    response = FileResponse(handle, content_type=SITEMAP_CONTENT_TYPE)
+    if use_gzip:
+        response["Content-Encoding"] = "gzip"
+    return _headers(response)
+
+
+def prerendered_sitemap(name: str):
+    """Serve ``name`` from the store when available; the live view otherwise."""
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = serve_prerendered_sitemap(request, name)
+            if response is not None:
+                return response
+            return view(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+# --------------------------------------------------------------------------
+# Rendering
+# --------------------------------------------------------------------------
+
+
+def _render_request(page: int):
+    from django.contrib.auth.models import AnonymousUser
+    from django.test import RequestFactory
+
+    parsed = urlparse((getattr(settings, "SITE_BASE_URL", "") or "https://twocomms.shop"))
+    query = {"p": str(page)} if page > 1 else {}
+    request = RequestFactory().get(
+        "/",
+        query,
+        HTTP_HOST=parsed.netloc or "twocomms.shop",
+        secure=(parsed.scheme or "https") == "https",
+    )
+    request.user = AnonymousUser()
+    return request
+
+
+def _render_live(view, page: int) -> bytes:
+    live_view = getattr(view, "__wrapped__", view)
+    response = live_view(_render_request(page))
+    if hasattr(response, "render"):
+        response.render()
+    return bytes(response.content)
+
+
+def _write_atomic(path: Path, payload: bytes) -> None:
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_bytes(payload)
+    os.replace(tmp_path, path)
+
+
+def render_sitemaps(*, force: bool = False) -> dict:
+    """Render every sitemap document into the store.
+
+    Returns counters: ``written`` (content changed), ``unchanged``,
+    ``removed`` (pages that no longer exist).
+    """
+    from storefront.views import static_pages
+
+    # Момент старту: зміни каталогу під час рендеру новіші за нього, тож
+    # наступний --if-dirty прогін їх не пропустить.
+    started_at = time.time()
+    target = store_dir()
+    target.mkdir(parents=True, exist_ok=True)
+    previous = dict(load_manifest())
+    documents: dict[str, dict] = {}
+    stats = {"written": 0, "unchanged": 0, "removed": 0}
+
+    for name, view in static_pages.sitemap_documents():
+        pages = 1 if name == "sitemap.xml" else static_pages.sitemap_page_count(name)
+        for page in range(1, pages + 1):
+            key = document_key(name, page)
+            payload = _render_live(view, page)
+            digest = hashlib.sha1(payload).hexdigest()
+            file_name = _file_name(key)
+            old = previous.get(key)
+            if (
+                not force
+                and old
+                and old.get("etag") == digest
+                and (target / file_name).exists()
+                and (target / f"{file_name}.gz").exists()
+            ):
+                documents[key] = old
+                stats["unchanged"] += 1
+                continue
+            _write_atomic(target / file_name, payload)
+            _write_atomic(target / f"{file_name}.gz", gzip.compress(payload, mtime=0))
+            documents[key] = {
+                "file": file_name,
+                "etag": digest,
+                "last_modified": int(time.time()),
+                "size": len(payload),
+            }
+            stats["written"] += 1
+
+    for key, entry in previous.items():
+        if key in documents:
+            continue
+        stats["removed"] += 1
+        for suffix in ("", ".gz"):
+            try:
+                (target / f"{entry['file']}{suffix}").unlink()
+            except OSError:
+                pass
+
+    manifest = {"built_at": int(time.time()), "started_at": started_at, "documents": documents}
+    _write_atomic(target / MANIFEST_NAME, json.dumps(manifest, indent=1, sort_keys=True).encode("utf-8"))
+    return stats
+
+
+# --------------------------------------------------------------------------
+# Dirty flag (same scheme as services/feeds_queue.py)
+# --------------------------------------------------------------------------
+
+
+def _dirty_flag_path() -> Path:
+    return store_dir() / "sitemaps_dirty.flag"
+
+
+def mark_sitemaps_dirty() -> None:
+    try:
+        path = _dirty_flag_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.touch(exist_ok=True)
+        now = time.time()
+        os.utime(path, (now, now))
+    except Exception as exc:  # pragma: no cover - fs edge cases
+        logger.warning("Could not mark sitemaps dirty: %s", exc)
+
+
+def are_sitemaps_dirty() -> bool:
+    """True when the flag is newer than the start of the last render (or nothing was rendered yet)."""
+    manifest = store_dir() / MANIFEST_NAME
+    if not manifest.exists():
+        return True
+    flag = _dirty_flag_path()
+    if not flag.exists():
+        return False
+    try:
+        started_at = json.loads(manifest.read_text(encoding="utf-8")).get("started_at")
+        if started_at is None:
+            started_at = manifest.stat().st_mtime
+        return flag.stat().st_mtime > float(started_at)
+    except (OSError, TypeError, ValueError):
+        return True
@@ -0,0 +1,140 @@
+"""Versioned cache for JSON-LD structured data.
+
+``StructuredDataGenerator`` rebuilds every schema dict from scratch (image
+rows, colour variants, top reviews, shipping tiers) and the template tags
+used to ``json.dumps(..., indent=2)`` it on each render. The serialized,
+single-line blobs are now cached:
+
+* product-level blobs (Product, ProductGroup, Merchant, the PDP ``@graph``)
+  live in the fragments cache under a key built from the product's
+  ``updated_at`` plus a per-product counter bumped by
+  ``storefront.cache_signals`` when the product (price, discount, stock
+  flags — ``save(update_fields=...)`` skips ``updated_at``), its images,
+  colour variants, category or colours change, the rating summary passed by
+  the caller, the active language and today's date (``priceValidUntil``);
+* ``Organization`` / homepage ``OnlineStore`` embed the live catalogue
+  price range, so they are keyed by a one-query catalogue fingerprint;
+* ``WebSite`` / founder ``Person`` depend only on code and settings and
+  are computed once per process (i.e. once per deploy) and language.
+
+Output keeps the ``", "`` / ``": "`` separators so the JSON stays
+byte-identical to the previous output apart from indentation newlines.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Callable
+
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.translation import get_language
+
+from cache_utils import get_fragment_cache
+
+JSONLD_CACHE_TIMEOUT = 6 * 60 * 60
+PRODUCT_VERSION_CACHE_KEY = "jsonld:product_version:{pk}"
+
+_process_memo: dict[str, str] = {}
+
+
+def dump_jsonld(schema) -> str:
+    """Single-line JSON for ``<script type="application/ld+json">``."""
+    return json.dumps(schema, ensure_ascii=False)
+
+
+def _language() -> str:
+    return (get_language() or "uk").split("-", 1)[0].lower()
+
+
+def _digest(parts) -> str:
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def get_product_jsonld_version(product_id, cache_backend=None) -> int:
+    cache_backend = cache_backend or get_fragment_cache()
+    key = PRODUCT_VERSION_CACHE_KEY.format(pk=product_id)
+    version = cache_backend.get(key)
+    if version is None:
+        cache_backend.add(key, 1, timeout=None)
+        version = cache_backend.get(key)
+    try:
+        return max(int(version), 1)
+    except (TypeError, ValueError):
+        cache_backend.set(key, 1, timeout=None)
+        return 1
+
+
+def _bump_now(product_ids) -> None:
+    cache_backend = get_fragment_cache()
+    for product_id in product_ids:
+        key = PRODUCT_VERSION_CACHE_KEY.format(pk=product_id)
+        current = get_product_jsonld_version(product_id, cache_backend)
+        try:
+            cache_backend.incr(key)
+        except Exception:
+            cache_backend.set(key, current + 1, timeout=None)
+
+
+def bump_product_jsonld_version(*product_ids) -> None:
+    """Invalidate cached blobs of the given products (now and after commit)."""
+    ids = {int(pk) for pk in product_ids if pk}
+    if not ids:
+        return
+    _bump_now(ids)
+    transaction.on_commit(lambda: _bump_now(ids))
+
+
+def review_summary_key(review_summary) -> tuple:
+    if review_summary is None:
+        return ()
+    return (
+        int(getattr(review_summary, "count", 0) or 0),
+        getattr(review_summary, "avg", None),
+        bool(getattr(review_summary, "show_rating", False)),
+    )
+
+
+def product_jsonld_key(kind: str, product, *parts) -> str:
+    updated_at = getattr(product, "updated_at", None)
+    stamp = updated_at.isoformat() if updated_at is not None else ""
+    version = get_product_jsonld_version(product.pk)
+    digest = _digest((stamp, _language(), timezone.localdate().isoformat(), parts))
+    return f"jsonld:{kind}:{product.pk}:{version}:{digest}"
+
+
+def catalogue_fingerprint() -> str:
+    """Changes whenever a product is added, removed or saved (one query)."""
+    from storefront.models import Product
+
+    try:
+        state = Product.objects.aggregate(count=Count("id"), last=Max("updated_at"))
+    except Exception:
+        # Same degradation as ``seo_utils._homepage_price_aggregate``.
+        return ""
+    last = state["last"].isoformat() if state["last"] else ""
+    return f"{state['count']}:{last}"
+
+
+def site_jsonld_key(kind: str, *parts) -> str:
+    return f"jsonld:{kind}:{_digest((_language(), parts))}"
+
+
+def cached_jsonld(key: str, build: Callable[[], object]) -> str:
+    """Serialized ``build()`` from the fragments cache, filling it on a miss."""
+    cache_backend = get_fragment_cache()
+    payload = cache_backend.get(key)
+    if payload is None:
+        payload = dump_jsonld(build())
+        cache_backend.set(key, payload, JSONLD_CACHE_TIMEOUT)
+    return payload
+
+
+def memoized_jsonld(key: str, build: Callable[[], object]) -> str:
+    """Serialized ``build()`` kept for the lifetime of the process."""
+    payload = _process_memo.get(key)
+    if payload is None:
+        payload = dump_jsonld(build())
+        _process_memo[key] = payload
+    return payload
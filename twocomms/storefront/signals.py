@@ -13,9 +13,10 @@ from django.dispatch import receiver
 from django.utils import timezone
 from .tasks import generate_google_merchant_feed_task, optimize_image_field_task  # noqa: F401 — kept for backward-compat with tests that patch signals.generate_google_merchant_feed_task
 
-from .models import Category, CategoryColorLanding, Product, ProductImage
+from .models import BlogCategory, BlogPost, Category, CategoryColorLanding, Product, ProductImage
 from productcolors.models import Color, ProductColorImage, ProductColorVariant
 from .services.feeds_queue import mark_feeds_dirty
+from .services.sitemap_store import mark_sitemaps_dirty
 from .services.indexnow import enqueue_indexnow_urls, get_product_public_url
 from .services.google_indexing import enqueue_google_indexing_urls
 
@@ -92,6 +93,24 @@ def update_marketplace_feeds_on_related_catalog_change(sender, instance, **kwarg
     _schedule_marketplace_feed_update(f"Изменены данные фида: {sender.__name__} (ID: {getattr(instance, 'pk', '-')})")
 
 
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=CategoryColorLanding)
+@receiver([post_save, post_delete], sender=ProductImage)
+@receiver([post_save, post_delete], sender=ProductColorVariant)
+@receiver([post_save, post_delete], sender=ProductColorImage)
+@receiver([post_save, post_delete], sender=BlogPost)
+@receiver([post_save, post_delete], sender=BlogCategory)
+def mark_sitemaps_dirty_on_catalog_change(sender, instance, **kwargs):
+    """Pre-rendered sitemaps are stale; cron re-renders (render_sitemaps --if-dirty)."""
+    if getattr(settings, "TESTING", False):
+        return
+    try:
+        transaction.on_commit(mark_sitemaps_dirty)
+    except Exception:  # pragma: no cover - no active transaction
+        mark_sitemaps_dirty()
+
+
 @receiver(post_delete, sender=Product)
 def submit_product_to_indexnow_on_delete(sender, instance, **kwargs):
     public_url = get_product_public_url(instance)
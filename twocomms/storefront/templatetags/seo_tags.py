@@ -219,7 +219,33 @@ def product_graph(product, breadcrumbs=None, canonical_path=None,
     if not product:
         return ''
 
-    product_node = _seo_utils().StructuredDataGenerator.generate_product_schema(
+    seo_utils = _seo_utils()
+    cache = seo_utils.jsonld_cache
+    key = cache.product_jsonld_key(
+        "graph",
+        product,
+        canonical_path,
+        getattr(selected_variant, "pk", None),
+        cache.review_summary_key(review_summary),
+        [(str(crumb.get("name", "")), str(crumb.get("url", ""))) for crumb in (breadcrumbs or [])],
+    )
+    graph_json = cache.cached_jsonld(
+        key,
+        lambda: _build_product_graph(
+            seo_utils.StructuredDataGenerator,
+            product,
+            breadcrumbs=breadcrumbs,
+            canonical_path=canonical_path,
+            selected_variant=selected_variant,
+            review_summary=review_summary,
+        ),
+    )
+    return mark_safe(f'<script type="application/ld+json">{graph_json}</script>')
+
+
+def _build_product_graph(generator, product, *, breadcrumbs, canonical_path,
+                         selected_variant, review_summary):
+    product_node = generator.generate_product_schema(
         product,
         canonical_path=canonical_path,
         selected_variant=selected_variant,
@@ -238,31 +264,22 @@ def product_graph(product, breadcrumbs=None, canonical_path=None,
     # ``@id``, which together with the ProductGroup emitted on /
     # base/ canonicalises the cluster.
     if selected_variant is None:
-        group_node = (
-            _seo_utils().StructuredDataGenerator.generate_product_group_schema(
-                product, canonical_path=canonical_path
-            )
+        group_node = generator.generate_product_group_schema(
+            product, canonical_path=canonical_path
         )
         if group_node:
             group_node.pop("@context", None)
             nodes.append(group_node)
 
     if breadcrumbs:
-        breadcrumb_node = (
-            _seo_utils().StructuredDataGenerator.generate_breadcrumb_schema(breadcrumbs)
-        )
+        breadcrumb_node = generator.generate_breadcrumb_schema(breadcrumbs)
         breadcrumb_node.pop("@context", None)
         nodes.append(breadcrumb_node)
 
-    graph = {
+    return {
         "@context": "https://schema.org",
         "@graph": nodes,
     }
-    return mark_safe(
-        f'<script type="application/ld+json">'
-        f'{json.dumps(graph, ensure_ascii=False, indent=2)}'
-        f'</script>'
-    )
 
 
 @register.inclusion_tag('partials/breadcrumbs.html')
@@ -414,19 +431,15 @@ def organization_schema():
     tag on every page where you want Knowledge Graph eligibility — the
     stable ``@id`` lets Google deduplicate instances.
     """
-    schema = _seo_utils().StructuredDataGenerator.generate_organization_schema()
-    return mark_safe(
-        f'<script type="application/ld+json">{json.dumps(schema, ensure_ascii=False, indent=2)}</script>'
-    )
+    schema = _seo_utils().get_organization_schema()
+    return mark_safe(f'<script type="application/ld+json">{schema}</script>')
 
 
 @register.simple_tag
 def website_schema():
     """JSON-LD <script> with the WebSite + SearchAction schema (Phase 5)."""
-    schema = _seo_utils().StructuredDataGenerator.generate_website_schema()
-    return mark_safe(
-        f'<script type="application/ld+json">{json.dumps(schema, ensure_ascii=False, indent=2)}</script>'
-    )
+    schema = _seo_utils().get_website_schema()
+    return mark_safe(f'<script type="application/ld+json">{schema}</script>')
 
 
 @register.simple_tag
@@ -437,10 +450,8 @@ def founder_schema():
     emitted by the Organization node on every page. Emit alongside
     ``organization_schema`` / ``website_schema`` in base.html.
     """
-    schema = _seo_utils().StructuredDataGenerator.generate_founder_schema()
-    return mark_safe(
-        f'<script type="application/ld+json">{json.dumps(schema, ensure_ascii=False, indent=2)}</script>'
-    )
+    schema = _seo_utils().get_founder_schema()
+    return mark_safe(f'<script type="application/ld+json">{schema}</script>')
 
 
 @register.simple_tag
@@ -456,10 +467,8 @@ def homepage_storefront_schema():
     See ``StructuredDataGenerator.generate_homepage_storefront_schema``
     for the full rationale (US-16 in the seo-molecular-upgrade spec).
     """
-    schema = _seo_utils().StructuredDataGenerator.generate_homepage_storefront_schema()
-    return mark_safe(
-        f'<script type="application/ld+json">{json.dumps(schema, ensure_ascii=False, indent=2)}</script>'
-    )
+    schema = _seo_utils().get_homepage_storefront_schema()
+    return mark_safe(f'<script type="application/ld+json">{schema}</script>')
 
 
 @register.inclusion_tag(
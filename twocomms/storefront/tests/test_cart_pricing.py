@@ -0,0 +1,97 @@
+"""
+Shared priced-cart snapshot reused by the cart endpoints.
+"""
+
+from __future__ import annotations
+
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from storefront.models import Category, Product, PromoCode
+
+
+class CartPricingSnapshotTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.category = Category.objects.create(name="Pricing Category", slug="pricing-category")
+        self.product = Product.objects.create(
+            title="Priced Product",
+            slug="priced-product",
+            category=self.category,
+            price=100,
+            discount_percent=10,
+            status="published",
+        )
+        self.key = f"{self.product.id}:M:default"
+        session = self.client.session
+        session["cart"] = {
+            self.key: {"product_id": self.product.id, "qty": 2, "size": "M", "color_variant_id": None},
+        }
+        session.save()
+
+    def _catalog_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        tables = ("storefront_product", "storefront_promocode", "productcolors_")
+        return response, [q["sql"] for q in ctx.captured_queries if any(t in q["sql"] for t in tables)]
+
+    def test_repeated_polling_is_served_from_snapshot(self):
+        self.client.get(reverse("cart_summary"))
+
+        response, queries = self._catalog_queries(reverse("cart_summary"))
+        self.assertEqual(response.json(), {"ok": True, "count": 2, "total": 180.0})
+        self.assertEqual(queries, [])
+
+        response, queries = self._catalog_queries(reverse("cart_mini"))
+        self.assertContains(response, "Priced Product")
+        self.assertEqual(queries, [])
+
+        response, queries = self._catalog_queries(reverse("cart_items_api"))
+        self.assertEqual(response.json()["items"][0]["line_total"], 180.0)
+        self.assertEqual(queries, [])
+
+    def test_price_change_invalidates_snapshot(self):
+        self.client.get(reverse("cart_summary"))
+
+        self.product.discount_percent = 50
+        self.product.save()
+
+        self.assertEqual(self.client.get(reverse("cart_summary")).json()["total"], 100.0)
+
+    def test_endpoints_agree_on_promo_totals(self):
+        promo = PromoCode.objects.create(
+            code="PRICED10",
+            discount_type="percentage",
+            discount_value=Decimal("10.00"),
+            is_active=True,
+        )
+        session = self.client.session
+        session["promo_code_id"] = promo.id
+        session.save()
+
+        payload = self.client.get(reverse("cart_items_api")).json()
+        self.assertEqual((payload["subtotal"], payload["discount"], payload["total"]), (180.0, 18.0, 162.0))
+        self.assertEqual(payload["applied_promo"], "PRICED10")
+
+        update = self.client.post(reverse("update_cart"), {"cart_key": self.key, "qty": 3}).json()
+        self.assertEqual((update["line_total"], update["discount"], update["total"]), (270.0, 27.0, 243.0))
+
+        promo.is_active = False
+        promo.save()
+        payload = self.client.get(reverse("cart_items_api")).json()
+        self.assertEqual((payload["discount"], payload["total"]), (0.0, 270.0))
+        self.assertNotIn("promo_code_id", self.client.session)
+
+    def test_deleted_product_is_dropped_from_session(self):
+        self.client.get(reverse("cart_summary"))
+
+        self.product.delete()
+
+        self.assertEqual(self.client.get(reverse("cart_summary")).json()["count"], 0)
+        self.assertEqual(self.client.session["cart"], {})
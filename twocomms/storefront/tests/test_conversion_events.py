@@ -0,0 +1,260 @@
+"""Batched delivery of server-side conversion events (Facebook CAPI, TikTok)."""
+from __future__ import annotations
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from django.test import SimpleTestCase, override_settings
+from facebook_business.exceptions import FacebookRequestError
+
+from orders.conversion_dispatcher import BatchOutcome, CoalescingEventDispatcher
+from orders.facebook_conversions_service import FacebookConversionsService
+from orders.tiktok_events_service import TikTokEventsService
+
+
+class _Recorder:
+    def __init__(self, outcomes=()):
+        self.calls = []
+        self.outcomes = list(outcomes)
+        self.lock = threading.Lock()
+
+    def __call__(self, key, events):
+        with self.lock:
+            self.calls.append((key, list(events)))
+            return self.outcomes.pop(0) if self.outcomes else BatchOutcome()
+
+
+def _submit_concurrently(dispatcher, key, event_ids):
+    tickets = {}
+    barrier = threading.Barrier(len(event_ids))
+
+    def worker(event_id):
+        barrier.wait()
+        tickets[event_id] = dispatcher.submit(key, event_id, {'event_id': event_id})
+
+    threads = [threading.Thread(target=worker, args=(event_id,)) for event_id in event_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return tickets
+
+
+class CoalescingEventDispatcherTests(SimpleTestCase):
+    def test_concurrent_events_share_one_request(self):
+        send = _Recorder()
+        dispatcher = CoalescingEventDispatcher('test', send, flush_window=0.2)
+
+        tickets = _submit_concurrently(dispatcher, 'pixel', [f'e{i}' for i in range(8)])
+
+        self.assertTrue(all(ticket.wait(5) for ticket in tickets.values()))
+        self.assertEqual(len(send.calls), 1)
+        self.assertEqual(sorted(event['event_id'] for event in send.calls[0][1]), sorted(tickets))
+
+    def test_duplicate_event_ids_are_sent_once(self):
+        send = _Recorder()
+        dispatcher = CoalescingEventDispatcher('test', send, flush_window=10)
+
+        first = dispatcher.submit('pixel', 'purchase-1', {'n': 1})
+        second = dispatcher.submit('pixel', 'purchase-1', {'n': 2})
+        dispatcher.flush()
+        again = dispatcher.submit('pixel', 'purchase-1', {'n': 3})
+
+        self.assertIs(first, second)
+        self.assertTrue(first.wait(1) and again.wait(1))
+        self.assertEqual([len(events) for _, events in send.calls], [1])
+
+    def test_groups_by_key_and_caps_batch_size(self):
+        send = _Recorder()
+        dispatcher = CoalescingEventDispatcher('test', send, flush_window=10, max_batch_size=2)
+
+        dispatcher.submit('a', '1', 1)
+        dispatcher.submit('b', '2', 2)
+        dispatcher.submit('a', '3', 3)
+        self.assertEqual(send.calls, [('a', [1, 3])])
+        dispatcher.flush()
+        self.assertEqual(send.calls[1], ('b', [2]))
+
+    def test_only_failed_subset_is_retried(self):
+        send = _Recorder([BatchOutcome(retry={'2'}, rejected={'3'})])
+        dispatcher = CoalescingEventDispatcher('test', send, flush_window=10, retry_delay=0)
+
+        tickets = {event_id: dispatcher.submit('pixel', event_id, event_id) for event_id in ('2', '3', '4')}
+        dispatcher.flush()
+
+        self.assertEqual([events for _, events in send.calls], [['2', '3', '4'], ['2']])
+        self.assertEqual({k: t.wait(1) for k, t in tickets.items()}, {'2': True, '3': False, '4': True})
+
+    def test_exceptions_retry_whole_batch_until_attempts_run_out(self):
+        send = MagicMock(side_effect=ConnectionError('down'))
+        dispatcher = CoalescingEventDispatcher('test', send, flush_window=0, max_attempts=3, retry_delay=0)
+
+        self.assertFalse(dispatcher.submit('pixel', 'e1', {}).wait(1))
+        self.assertEqual(send.call_count, 3)
+
+
+class _FakeTikTokHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.requests.append((self.path, body))
+        failed = [
+            {'event_id': item['event_id']} for item in body.get('batch', [])
+            if item['event_id'] in self.server.fail_once and not self.server.fail_once.remove(item['event_id'])
+        ]
+        payload = json.dumps({'code': 0, 'message': 'OK', 'data': {'failed_events': failed}}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class TikTokBatchDeliveryTests(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _FakeTikTokHandler)
+        self.server.requests = []
+        self.server.fail_once = set()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        base = f'http://127.0.0.1:{self.server.server_address[1]}'
+        overrides = override_settings(
+            TIKTOK_EVENTS_ACCESS_TOKEN='token',
+            TIKTOK_EVENTS_PIXEL_CODE='PIXEL',
+            TIKTOK_EVENTS_TEST_EVENT_CODE=None,
+            TIKTOK_EVENTS_API_ENDPOINT=f'{base}/pixel/track/',
+            TIKTOK_EVENTS_BATCH_ENDPOINT=f'{base}/pixel/batch/',
+            TIKTOK_EVENTS_FLUSH_WINDOW=0.2,
+            TIKTOK_EVENTS_RETRY_DELAY=0,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        self.service = TikTokEventsService()
+        self.service.session.trust_env = False
+        self.service._build_payload = lambda order, event_name, event_id, *args: {
+            'pixel_code': 'PIXEL',
+            'event': event_name,
+            'event_id': event_id,
+            'properties': {'value': order.value},
+        }
+
+    def _send_concurrently(self, event_ids):
+        results = {}
+        barrier = threading.Barrier(len(event_ids))
+
+        def worker(event_id):
+            barrier.wait()
+            order = SimpleNamespace(value=len(event_id))
+            results[event_id] = self.service.send_event(order, 'Purchase', event_id)
+
+        threads = [threading.Thread(target=worker, args=(event_id,)) for event_id in event_ids]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        return results
+
+    def test_concurrent_events_are_posted_as_one_batch(self):
+        results = self._send_concurrently(['p1', 'p2', 'p3', 'p4', 'p5'])
+
+        self.assertEqual(results, dict.fromkeys(['p1', 'p2', 'p3', 'p4', 'p5'], True))
+        self.assertEqual(len(self.server.requests), 1)
+        path, body = self.server.requests[0]
+        self.assertEqual(path, '/pixel/batch/')
+        self.assertEqual(body['pixel_code'], 'PIXEL')
+        self.assertEqual(sorted(item['event_id'] for item in body['batch']), ['p1', 'p2', 'p3', 'p4', 'p5'])
+        self.assertNotIn('pixel_code', body['batch'][0])
+
+    def test_single_event_uses_track_endpoint(self):
+        self.assertTrue(self.service.send_event(SimpleNamespace(value=1), 'Lead', 'lead-1'))
+        self.assertEqual([path for path, _ in self.server.requests], ['/pixel/track/'])
+
+    def test_failed_events_are_resent_alone(self):
+        self.server.fail_once.add('p2')
+
+        results = self._send_concurrently(['p1', 'p2', 'p3'])
+
+        self.assertTrue(all(results.values()))
+        self.assertEqual([path for path, _ in self.server.requests], ['/pixel/batch/', '/pixel/track/'])
+        self.assertEqual(self.server.requests[1][1]['event_id'], 'p2')
+
+
+@override_settings(FACEBOOK_CONVERSIONS_API_TOKEN='token', FACEBOOK_PIXEL_ID='123', FACEBOOK_CAPI_FLUSH_WINDOW=0)
+class FacebookBatchDeliveryTests(SimpleTestCase):
+    def _events(self, *event_ids):
+        return [SimpleNamespace(event_name='Purchase', event_id=event_id) for event_id in event_ids]
+
+    def test_batch_is_sent_as_one_event_request(self):
+        service = FacebookConversionsService()
+        service.EventRequest = MagicMock()
+        service.EventRequest.return_value.execute.return_value = {'events_received': 2}
+        events = self._events('a', 'b')
+
+        outcome = service._send_batch(('123', 'TEST1'), events)
+
+        self.assertEqual(outcome, BatchOutcome())
+        service.EventRequest.assert_called_once_with(pixel_id='123', events=events)
+        self.assertEqual(service.EventRequest.return_value.test_event_code, 'TEST1')
+
+    def _service_rejecting(self, bad_ids, error=None):
+        service = FacebookConversionsService()
+        sent = []
+
+        def make_request(pixel_id, events):
+            request = MagicMock()
+            ids = [event.event_id for event in events]
+            sent.append(ids)
+            if not bad_ids.intersection(ids):
+                request.execute.return_value = {'events_received': len(ids)}
+            elif error is not None:
+                request.execute.side_effect = error
+            else:
+                request.execute.return_value = {'errors': ['Invalid parameter']}
+            return request
+
+        service.EventRequest = MagicMock(side_effect=make_request)
+        return service, sent
+
+    def _request_error(self, status, body=None):
+        return FacebookRequestError('failed', {}, status, {}, json.dumps(body or {'error': {'code': 100}}))
+
+    def test_graph_api_errors_reject_only_the_bad_event(self):
+        service, sent = self._service_rejecting({'c'})
+
+        outcome = service._send_batch(('123', ''), self._events('a', 'b', 'c', 'd'))
+
+        self.assertEqual(outcome.rejected, {'c'})
+        self.assertEqual(outcome.retry, set())
+        self.assertEqual(sent, [['a', 'b', 'c', 'd'], ['a', 'b'], ['c', 'd'], ['c'], ['d']])
+
+    def test_client_error_is_not_retried_and_bisected(self):
+        service, sent = self._service_rejecting({'b'}, error=self._request_error(400))
+
+        outcome = service._send_batch(('123', ''), self._events('a', 'b'))
+
+        self.assertEqual(outcome, BatchOutcome(rejected={'b'}))
+        self.assertEqual(sent, [['a', 'b'], ['a'], ['b']])
+
+    def test_server_and_rate_limit_errors_retry_the_whole_batch(self):
+        for status in (429, 500):
+            with self.subTest(status=status):
+                service, sent = self._service_rejecting({'a'}, error=self._request_error(status))
+
+                with self.assertRaises(FacebookRequestError):
+                    service._send_batch(('123', ''), self._events('a', 'b'))
+                self.assertEqual(sent, [['a', 'b']])
+
+    def test_transient_client_error_is_retried(self):
+        error = self._request_error(400, {'error': {'code': 2, 'is_transient': True}})
+        service, _ = self._service_rejecting({'a'}, error=error)
+
+        with self.assertRaises(FacebookRequestError):
+            service._send_batch(('123', ''), self._events('a'))
@@ -0,0 +1,142 @@
+"""Інкрементальна статистика дропшипера та агрегатна сверка."""
+from __future__ import annotations
+
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+
+from orders.models import DropshipperOrder, DropshipperOrderItem, DropshipperStats
+from orders.services.dropshipper_stats import LOYALTY_DISCOUNT_MAX
+from storefront.models import Category, Product
+
+User = get_user_model()
+
+_FIELDS = (
+    'total_orders', 'completed_orders', 'cancelled_orders', 'total_revenue', 'total_drop_cost',
+    'total_profit', 'total_items_sold', 'successful_orders', 'loyalty_discount', 'last_order_date',
+)
+
+
+class DropshipperStatsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('partner', 'p@example.com', 'pw')
+        category = Category.objects.create(name='Футболки', slug='drop-stats-cat')
+        self.product = Product.objects.create(
+            title='Футболка', slug='drop-stats-product', category=category, price=1000, recommended_price=1500,
+        )
+
+    def _order(self, quantity=2, status='draft'):
+        order = DropshipperOrder.objects.create(
+            dropshipper=self.user, client_name='Клієнт', client_phone='+380501112233',
+            client_np_address='Київ, 1', status=status,
+        )
+        DropshipperOrderItem.objects.create(
+            order=order, product=self.product, size='M', quantity=quantity,
+            drop_price=Decimal('600'), selling_price=Decimal('900'), recommended_price=Decimal('1000'),
+        )
+        order.total_drop_price = Decimal('600') * quantity
+        order.total_selling_price = Decimal('900') * quantity
+        order.save()
+        return order
+
+    def _snapshot(self):
+        stats = DropshipperStats.objects.get(dropshipper=self.user)
+        return {field: getattr(stats, field) for field in _FIELDS}
+
+    def _recomputed(self):
+        stats = DropshipperStats.objects.get(dropshipper=self.user)
+        stats.update_stats()
+        return {field: getattr(stats, field) for field in _FIELDS}
+
+    def _set_status(self, order, status):
+        order.status = status
+        order.save()
+
+    def test_status_transitions_keep_stats_equal_to_recompute(self):
+        first, second, third = self._order(2), self._order(1), self._order(3)
+        self._set_status(first, 'received')
+        self._set_status(second, 'received')
+        self._set_status(third, 'cancelled')
+
+        stats = self._snapshot()
+        self.assertEqual(
+            (stats['total_orders'], stats['completed_orders'], stats['cancelled_orders']), (3, 2, 1)
+        )
+        self.assertEqual(stats['total_revenue'], Decimal('2700'))
+        self.assertEqual(stats['total_profit'], Decimal('900'))
+        self.assertEqual(stats['total_items_sold'], 3)
+        self.assertEqual(stats['loyalty_discount'], Decimal('20'))
+        self.assertEqual(stats, self._recomputed())
+
+        # Повернення з received, зміна товару отриманого заказу, видалення.
+        self._set_status(second, 'refused')
+        item = first.items.get()
+        item.quantity = 5
+        item.save()
+        third.delete()
+        stats = self._snapshot()
+        self.assertEqual((stats['total_orders'], stats['completed_orders']), (2, 1))
+        self.assertEqual(stats['total_items_sold'], 5)
+        self.assertEqual(stats['loyalty_discount'], Decimal('10'))
+        self.assertEqual(stats, self._recomputed())
+
+    def test_loyalty_discount_is_capped(self):
+        for _ in range(13):
+            self._order(1, status='received')
+        self.assertEqual(self._snapshot()['loyalty_discount'], LOYALTY_DISCOUNT_MAX)
+
+    def _status_change_queries(self):
+        order = self._order(1)
+        with CaptureQueriesContext(connection) as ctx:
+            self._set_status(order, 'received')
+        return len(ctx.captured_queries)
+
+    def test_status_change_cost_does_not_grow_with_order_count(self):
+        self._order(1)
+        few = self._status_change_queries()
+        for _ in range(25):
+            self._order(1, status='received')
+        self.assertEqual(self._status_change_queries(), few)
+
+    def test_reconcile_command_fixes_drift_from_queryset_updates(self):
+        order = self._order(2)
+        DropshipperOrder.objects.filter(pk=order.pk).update(status='received')
+        self.assertEqual(self._snapshot()['completed_orders'], 0)
+
+        out = StringIO()
+        call_command('reconcile_dropshipper_stats', stdout=out)
+
+        stats = self._snapshot()
+        self.assertEqual((stats['completed_orders'], stats['total_items_sold']), (1, 2))
+        self.assertIn('исправлено: 1', out.getvalue())
+
+    def test_backfill_migration_recomputes_stale_rows_and_keeps_payout_balance(self):
+        from importlib import import_module
+
+        from django.apps import apps
+
+        order = self._order(2)
+        DropshipperOrder.objects.filter(pk=order.pk).update(status='received')
+        DropshipperStats.objects.filter(dropshipper=self.user).update(available_for_payout=Decimal('450'))
+
+        migration = import_module('orders.migrations.0050_recompute_dropshipper_stats')
+        migration.recompute_dropshipper_stats(apps, None)
+
+        stats = DropshipperStats.objects.get(dropshipper=self.user)
+        self.assertEqual((stats.completed_orders, stats.total_items_sold), (1, 2))
+        self.assertEqual(stats.available_for_payout, Decimal('450'))
+
+    def test_recompute_does_not_overwrite_concurrent_payout_balance(self):
+        stale = DropshipperStats.objects.get_or_create(dropshipper=self.user)[0]
+        DropshipperStats.objects.filter(pk=stale.pk).update(available_for_payout=Decimal('300'))
+
+        stale.update_stats()
+
+        self.assertEqual(
+            DropshipperStats.objects.get(pk=stale.pk).available_for_payout, Decimal('300')
+        )
@@ -446,3 +446,95 @@ class MarketplaceFeedServiceTests(TestCase):
         self.assertNotIn("<g:id>", buyme_xml)
         self.assertIn("<oldprice>1500</oldprice>", prom_xml)
         self.assertNotIn("<article>", prom_xml)
+
+
+@override_settings(
+    SITE_BASE_URL="https://twocomms.shop",
+    FEED_BASE_URL="https://twocomms.shop",
+    ROZETKA_CATEGORY_RZ_ID_MAP={"futbolki": "4637839"},
+)
+class IncrementalFeedFragmentTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        indexnow_patcher = patch("storefront.signals.enqueue_indexnow_urls")
+        self.addCleanup(indexnow_patcher.stop)
+        indexnow_patcher.start()
+
+        tmp_dir = TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        base_dir_override = override_settings(BASE_DIR=Path(tmp_dir.name), MEDIA_ROOT=str(Path(tmp_dir.name) / "media"))
+        base_dir_override.enable()
+        self.addCleanup(base_dir_override.disable)
+
+        self.category = Category.objects.create(name="Футболки", slug="futbolki", is_active=True)
+        other_category = Category.objects.create(name="Худі", slug="hoodie", is_active=True)
+        black = Color.objects.create(name="Чорний", primary_hex="#000000")
+        self.products = []
+        for idx, category in enumerate((self.category, self.category, other_category)):
+            product = Product.objects.create(
+                title=f"Футболка TwoComms {idx}",
+                slug=f"twocomms-incremental-{idx}",
+                category=category,
+                price=1000 + idx * 100,
+                discount_percent=10 if idx == 0 else 0,
+                description="Опис <b>товару</b> & деталі.",
+                main_image=f"products/incremental-{idx}.jpg",
+                status=ProductStatus.PUBLISHED,
+            )
+            ProductColorVariant.objects.create(product=product, color=black, sku=f"TWC-INC-{idx}", stock=3)
+            self.products.append(product)
+
+    def test_incremental_output_is_byte_identical_to_full_build(self):
+        from django.utils import timezone
+
+        from storefront.services.feed_fragments import build_feed_xml_incremental
+        from storefront.services.marketplace_feeds import FEED_FORMATS, build_feed_xml
+
+        generated_at = timezone.now()
+        for format_key in FEED_FORMATS:
+            with self.subTest(feed=format_key):
+                cold, cold_stats = build_feed_xml_incremental(format_key, generated_at=generated_at)
+                warm, warm_stats = build_feed_xml_incremental(format_key, generated_at=generated_at)
+                full = build_feed_xml(format_key, generated_at=generated_at)
+
+                self.assertEqual(cold, full)
+                self.assertEqual(warm, full)
+                self.assertEqual(cold_stats.rendered, 3)
+                self.assertEqual(warm_stats.rendered, 0)
+                self.assertEqual(warm_stats.reused, 3)
+
+    def test_product_edit_rerenders_only_that_product(self):
+        from storefront.services.feed_fragments import build_feed_xml_incremental
+
+        build_feed_xml_incremental("rozetka")
+        edited = self.products[1]
+        edited.price = 1999
+        edited.save()
+
+        payload, stats = build_feed_xml_incremental("rozetka")
+
+        self.assertEqual(stats.rendered_ids, [edited.id])
+        prices = {offer.findtext("price") for offer in ET.fromstring(payload).findall("shop/offers/offer")}
+        self.assertIn("1999", prices)
+
+    def test_unpublished_product_is_pruned_from_fragments(self):
+        from storefront.services.feed_fragments import build_feed_xml_incremental
+
+        build_feed_xml_incremental("prom")
+        Product.objects.filter(pk=self.products[2].pk).update(status=ProductStatus.DRAFT)
+
+        payload, stats = build_feed_xml_incremental("prom")
+
+        self.assertEqual(stats.rendered, 0)
+        self.assertEqual(stats.pruned, 1)
+        root = ET.fromstring(payload)
+        self.assertEqual({c.attrib["id"] for c in root.findall("shop/categories/category")}, {str(self.category.id)})
+
+    def test_regenerate_command_verify_mode_reports_match(self):
+        from io import StringIO
+
+        stdout = StringIO()
+        call_command("regenerate_feeds_if_dirty", force=True, verify=True, only="generate_rozetka_feed", stdout=stdout)
+
+        self.assertIn("incremental == full", stdout.getvalue())
+        self.assertIn("done; all feeds rebuilt", stdout.getvalue())
@@ -0,0 +1,170 @@
+"""Local Nova Poshta directory replica used by checkout lookups."""
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+from datetime import timedelta
+from importlib import import_module
+from io import StringIO
+from unittest.mock import patch
+
+from django.apps import apps
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from orders.models import NovaPoshtaSettlement, NovaPoshtaWarehouse, NovaPoshtaWarehouseToken
+from orders.nova_poshta_lookup import NovaPoshtaDirectoryService, NovaPoshtaLookupUnavailable
+
+BRANCH_TYPE = 'type-branch'
+POSTOMAT_TYPE = 'type-postomat'
+
+
+def _warehouse(ref, number, address, *, settlement='settl-kyiv', city='city-kyiv', name='Київ', postomat=False):
+    return {
+        'Ref': ref,
+        'Number': str(number),
+        'ShortAddress': address,
+        'Description': f"{'Поштомат' if postomat else 'Відділення'} №{number}: {address}",
+        'TypeOfWarehouse': POSTOMAT_TYPE if postomat else BRANCH_TYPE,
+        'SettlementRef': settlement,
+        'CityRef': city,
+        'SettlementDescription': name,
+        'SettlementTypeDescription': 'місто',
+        'SettlementAreaDescription': 'Київська',
+        'SettlementRegionsDescription': '',
+    }
+
+
+def _dump(*warehouses):
+    return {
+        'warehouse_types': [
+            {'Ref': BRANCH_TYPE, 'Description': 'Відділення'},
+            {'Ref': POSTOMAT_TYPE, 'Description': 'Поштомат'},
+        ],
+        'warehouses': list(warehouses),
+    }
+
+
+KYIV = [
+    _warehouse('wh-1', 1, 'Київ, вул. Пирогівський шлях, 135'),
+    _warehouse('wh-2', 2, "Київ, вул. Б. Гмирі, 9"),
+    _warehouse('wh-12', 12, "Київ, вул. Пʼятницька, 12"),
+    _warehouse('wh-21', 21, 'Київ, просп. Перемоги, 21'),
+    _warehouse('pm-5', 5005, 'Київ, вул. Хрещатик, 22', postomat=True),
+]
+KYIVETS = [
+    _warehouse('wh-k1', 1, 'Київець, вул. Центральна, 1', settlement='settl-kyivets', city='city-kyivets', name='Київець'),
+]
+
+
+class NovaPoshtaDirectoryReplicaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.service = NovaPoshtaDirectoryService()
+
+    def _sync(self, dump):
+        handle, path = tempfile.mkstemp(suffix='.json')
+        with os.fdopen(handle, 'w', encoding='utf-8') as stream:
+            json.dump(dump, stream, ensure_ascii=False)
+        self.addCleanup(os.remove, path)
+        out = StringIO()
+        call_command('sync_nova_poshta_directory', from_file=path, stdout=out)
+        return out.getvalue()
+
+    def test_sync_builds_settlements_from_warehouses(self):
+        output = self._sync(_dump(*KYIV, *KYIVETS))
+
+        self.assertIn('Отделений: 6', output)
+        kyiv = NovaPoshtaSettlement.objects.get(settlement_ref='settl-kyiv')
+        self.assertEqual((kyiv.city_ref, kyiv.warehouses_count, kyiv.search_name), ('city-kyiv', 5, 'київ'))
+        self.assertEqual(NovaPoshtaWarehouse.objects.get(ref='pm-5').kind, 'postomat')
+        self.assertEqual(NovaPoshtaWarehouse.objects.get(ref='wh-12').number_sort, 12)
+
+    def test_lookups_are_answered_locally_while_api_is_down(self):
+        self._sync(_dump(*KYIV, *KYIVETS))
+
+        with patch.object(NovaPoshtaDirectoryService, '_request', side_effect=NovaPoshtaLookupUnavailable('down')) as request:
+            settlements = self.service.search_settlements('киї')
+            branches = self.service.search_warehouses(settlement_ref='settl-kyiv', kind='branch')
+            postomats = self.service.search_warehouses(city_ref='city-kyiv', kind='postomat')
+            nothing = self.service.search_warehouses(settlement_ref='settl-kyiv', query='неіснуюча')
+
+        request.assert_not_called()
+        self.assertEqual([item['settlement_ref'] for item in settlements], ['settl-kyiv', 'settl-kyivets'])
+        self.assertEqual(settlements[0]['label'], 'м. Київ, Київська обл.')
+        self.assertEqual(settlements[0]['city_ref'], 'city-kyiv')
+        self.assertEqual([item['number'] for item in branches], ['1', '2', '12', '21'])
+        self.assertEqual([item['ref'] for item in postomats], ['pm-5'])
+        self.assertEqual(nothing, [])
+
+    def test_warehouse_query_matching_and_number_ranking(self):
+        self._sync(_dump(*KYIV))
+
+        by_number = self.service.search_warehouses(settlement_ref='settl-kyiv', query='12')
+        self.assertEqual(by_number[0]['ref'], 'wh-12')
+        by_street = self.service.search_warehouses(settlement_ref='settl-kyiv', query="п'ятницька")
+        self.assertEqual([item['ref'] for item in by_street], ['wh-12'])
+
+    def test_street_prefix_is_matched_and_limited_in_sql(self):
+        self._sync(_dump(*KYIV))
+
+        with CaptureQueriesContext(connection) as queries:
+            by_prefix = self.service.search_warehouses(settlement_ref='settl-kyiv', query='вул перем', limit=5)
+            first = self.service.search_warehouses(settlement_ref='settl-kyiv', query='київ', limit=2)
+
+        self.assertEqual([item['ref'] for item in by_prefix], [])
+        self.assertEqual([item['ref'] for item in first], ['wh-1', 'wh-2'])
+        self.assertEqual(
+            [item['ref'] for item in self.service.search_warehouses(settlement_ref='settl-kyiv', query='перем')],
+            ['wh-21'],
+        )
+        warehouse_selects = [q['sql'] for q in queries.captured_queries if 'novaposhtawarehousetoken' in q['sql']]
+        self.assertTrue(warehouse_selects)
+        self.assertTrue(all('LIMIT' in sql for sql in warehouse_selects))
+
+    def test_migration_fills_tokens_for_an_existing_replica(self):
+        self._sync(_dump(*KYIV))
+        NovaPoshtaWarehouseToken.objects.all().delete()
+
+        migration = import_module('orders.migrations.0051_nova_poshta_search_indexes')
+        migration.fill_warehouse_tokens(apps, None)
+
+        by_street = self.service.search_warehouses(settlement_ref='settl-kyiv', query='гмирі')
+        self.assertEqual([item['ref'] for item in by_street], ['wh-2'])
+
+    def test_unknown_settlement_falls_back_to_api(self):
+        self._sync(_dump(*KYIV))
+        remote = [{'ref': 'remote-1', 'label': 'Львів, 1', 'kind': 'branch'}]
+
+        with patch.object(NovaPoshtaDirectoryService, '_search_warehouses_uncached', return_value=remote) as uncached:
+            result = self.service.search_warehouses(settlement_ref='settl-lviv')
+
+        uncached.assert_called_once()
+        self.assertEqual(result, remote)
+
+    def test_stale_replica_prefers_api_but_survives_outage(self):
+        self._sync(_dump(*KYIV))
+        NovaPoshtaSettlement.objects.update(synced_at=timezone.now() - timedelta(days=30))
+        cache.clear()
+        remote = [{'label': 'Київ (API)', 'settlement_ref': 'settl-kyiv'}]
+
+        with patch.object(NovaPoshtaDirectoryService, '_search_settlements_uncached', return_value=remote):
+            self.assertEqual(self.service.search_settlements('Київ'), remote)
+        cache.clear()
+        with patch.object(NovaPoshtaDirectoryService, '_request', side_effect=NovaPoshtaLookupUnavailable('down')):
+            local = self.service.search_settlements('Київ')
+        self.assertEqual(local[0]['settlement_ref'], 'settl-kyiv')
+
+    def test_resync_updates_and_removes_stale_rows(self):
+        self._sync(_dump(*KYIV, *KYIVETS))
+        moved = dict(KYIV[0], ShortAddress='Київ, вул. Нова, 1')
+        output = self._sync(_dump(moved, *KYIV[1:]))
+
+        self.assertIn('удалено 1', output)
+        self.assertFalse(NovaPoshtaSettlement.objects.filter(settlement_ref='settl-kyivets').exists())
+        self.assertEqual(NovaPoshtaWarehouse.objects.get(ref='wh-1').short_address, 'Київ, вул. Нова, 1')
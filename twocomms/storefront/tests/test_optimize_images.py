@@ -0,0 +1,126 @@
+"""Parallel, resumable ``optimize_images`` pipeline."""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from storefront.models import Category
+from storefront.services.image_pipeline import (
+    MANIFEST_FILENAME,
+    STATUS_FAILED,
+    STATUS_OPTIMIZED,
+    ImageJob,
+    JobResult,
+    iter_job_results,
+    process_image_job,
+)
+
+
+def _crash_on_bomb(job):
+    """Воркер «умирает» на одном задании (как при OOM-killer)."""
+    if job.label == "bomb":
+        os._exit(1)
+    return JobResult(job, STATUS_OPTIMIZED, "digest", [f"{job.label}.webp"])
+
+
+class OptimizeImagesPipelineTests(TestCase):
+    def setUp(self):
+        self.media_root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=str(self.media_root))
+        override.enable()
+        self.addCleanup(override.disable)
+
+        (self.media_root / "categories").mkdir()
+        for index in range(3):
+            Image.new("RGB", (64, 48), (index * 60, 90, 30)).save(self.media_root / f"categories/cover{index}.jpg")
+            Category.objects.create(
+                name=f"Cat {index}", slug=f"cat-{index}", cover=f"categories/cover{index}.jpg",
+            )
+
+    def _run(self, **options):
+        out = StringIO()
+        call_command("optimize_images", steps="category", stdout=out, **options)
+        return out.getvalue()
+
+    def _manifest(self):
+        return json.loads((self.media_root / MANIFEST_FILENAME).read_text(encoding="utf-8"))
+
+    def test_run_records_hashes_and_reports_throughput(self):
+        output = self._run()
+
+        self.assertIn("Queued 3 source images", output)
+        self.assertIn("Throughput: 3 images", output)
+        manifest = self._manifest()
+        self.assertEqual(sorted(manifest), [f"product:categories/cover{i}.jpg" for i in range(3)])
+        entry = manifest["product:categories/cover0.jpg"]
+        self.assertIn("cover0.webp", entry["outputs"])
+        self.assertTrue((self.media_root / "categories/optimized/cover0.avif").exists())
+
+    def test_interrupted_run_resumes_without_re_encoding(self):
+        self._run(limit=2)
+        self.assertEqual(len(self._manifest()), 2)
+        # The sources were copied again (newer mtime) but their content is unchanged.
+        for index in range(3):
+            os.utime(self.media_root / f"categories/cover{index}.jpg")
+
+        def fake_encode(optimizer, path):
+            stem = Path(path).stem
+            return {f"{stem}.webp": b"x", f"{stem}.avif": b"x"}
+
+        with patch("image_optimizer.ImageOptimizer.optimize_product_image", autospec=True,
+                   side_effect=fake_encode) as encode:
+            output = self._run()
+
+        self.assertEqual(encode.call_count, 1)
+        self.assertTrue(encode.call_args.args[1].endswith("cover2.jpg"))
+        self.assertIn("skipped 2", output)
+        self.assertEqual(len(self._manifest()), 3)
+
+    def test_changed_content_is_re_encoded(self):
+        self._run()
+        Image.new("RGB", (64, 48), (255, 0, 0)).save(self.media_root / "categories/cover1.jpg")
+        before = self._manifest()["product:categories/cover1.jpg"]["sha256"]
+
+        output = self._run()
+
+        self.assertIn("Throughput: 1 images", output)
+        self.assertNotEqual(self._manifest()["product:categories/cover1.jpg"]["sha256"], before)
+
+    def test_process_pool_produces_same_results(self):
+        output = self._run(workers=2, max_memory_mb=1024)
+
+        self.assertIn("workers: 2", output)
+        self.assertIn("Throughput: 3 images", output)
+        for index in range(3):
+            self.assertTrue((self.media_root / f"categories/optimized/cover{index}.webp").exists())
+
+    def test_unreadable_source_is_reported_as_failed(self):
+        job = ImageJob(key="product:missing.jpg", label="missing", path=str(self.media_root / "missing.jpg"))
+
+        result = process_image_job(job)
+
+        self.assertEqual(result.status, "failed")
+
+    def test_broken_pool_fails_only_the_crashing_job_and_finishes_the_rest(self):
+        labels = ["a", "b", "bomb", "c", "d", "e"]
+        jobs = [ImageJob(key=f"product:{label}", label=label, path=f"/{label}.jpg") for label in labels]
+
+        with patch("storefront.services.image_pipeline.process_image_job", _crash_on_bomb):
+            results = list(iter_job_results(jobs, workers=2))
+
+        statuses = {result.job.label: result.status for result in results}
+        self.assertEqual(sorted(statuses), sorted(labels))
+        self.assertEqual(statuses.pop("bomb"), STATUS_FAILED)
+        self.assertEqual(set(statuses.values()), {STATUS_OPTIMIZED})
+        failed = next(result for result in results if result.job.label == "bomb")
+        self.assertIn("BrokenProcessPool", failed.error)
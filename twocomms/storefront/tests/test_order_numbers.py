@@ -0,0 +1,132 @@
+"""Номери замовлень і виплат з лічильника NumberSequence."""
+from __future__ import annotations
+
+import threading
+import time
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, OperationalError, close_old_connections, transaction
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from orders.models import DropshipperOrder, DropshipperPayout, NumberSequence, Order
+
+User = get_user_model()
+
+
+def _order(**fields):
+    return Order.objects.create(
+        full_name='Клієнт Тест', phone='+380501112233',
+        city='Київ', np_office='Відділення №1',
+        pay_type='cod', payment_status='unpaid', total_sum=Decimal('880.00'),
+        **fields,
+    )
+
+
+class NumberSequenceTests(TestCase):
+    def setUp(self):
+        self.date_str = timezone.localdate().strftime('%d%m%Y')
+
+    def test_order_numbers_continue_after_existing_orders(self):
+        # Замовлення, створене до появи лічильника.
+        _order(order_number=f'TWC{self.date_str}N07')
+        NumberSequence.objects.all().delete()
+
+        numbers = [_order().order_number for _ in range(3)]
+
+        self.assertEqual(numbers, [f'TWC{self.date_str}N{n:02d}' for n in (8, 9, 10)])
+        self.assertEqual(NumberSequence.objects.get(prefix=f'TWC{self.date_str}N').value, 10)
+
+    def test_dropshipper_order_and_payout_numbers(self):
+        user = User.objects.create_user('drop', 'd@example.com', 'pw')
+        orders = [
+            DropshipperOrder.objects.create(
+                dropshipper=user, client_name='Клієнт', client_phone='+380501112233', client_np_address='Київ, 1',
+            )
+            for _ in range(2)
+        ]
+        payouts = [DropshipperPayout.objects.create(dropshipper=user, amount=Decimal('100')) for _ in range(2)]
+
+        self.assertEqual([o.order_number for o in orders], [f'DS{self.date_str}001', f'DS{self.date_str}002'])
+        self.assertEqual([p.payout_number for p in payouts], [f'PY{self.date_str}001', f'PY{self.date_str}002'])
+
+    def test_seed_compares_counters_numerically(self):
+        _order(order_number=f'TWC{self.date_str}N99')
+        _order(order_number=f'TWC{self.date_str}N100')
+        NumberSequence.objects.all().delete()
+
+        self.assertEqual(_order().order_number, f'TWC{self.date_str}N101')
+
+    def test_allocation_is_constant_query_count(self):
+        NumberSequence.next_value('X')
+        with self.assertNumQueries(4):  # savepoint, UPDATE, SELECT, release
+            self.assertEqual(NumberSequence.next_value('X'), 2)
+
+
+class NumberSequenceDeadlockTests(TransactionTestCase):
+    def test_deadlock_outside_transaction_is_retried(self):
+        real_increment = NumberSequence._increment.__func__
+        calls = []
+
+        def flaky(cls, prefix):
+            calls.append(prefix)
+            if len(calls) == 1:
+                raise OperationalError(1213, 'Deadlock found when trying to get lock')
+            return real_increment(cls, prefix)
+
+        with patch.object(NumberSequence, '_increment', classmethod(flaky)), patch('orders.models.time.sleep'):
+            self.assertEqual(NumberSequence.next_value('D', seed=lambda: 4), 5)
+        self.assertEqual(NumberSequence.objects.get(prefix='D').value, 5)
+
+    def test_deadlock_inside_outer_transaction_is_raised(self):
+        def deadlock(cls, prefix):
+            raise OperationalError(1213, 'Deadlock found when trying to get lock')
+
+        with patch.object(NumberSequence, '_increment', classmethod(deadlock)):
+            with self.assertRaises(OperationalError), transaction.atomic():
+                NumberSequence.next_value('D')
+
+
+class ConcurrentCheckoutNumberTests(TransactionTestCase):
+    THREADS = 8
+    ORDERS_PER_THREAD = 5
+
+    def test_parallel_checkouts_get_unique_consecutive_numbers(self):
+        numbers = []
+        integrity_errors = []
+        lock = threading.Lock()
+
+        def checkout():
+            try:
+                for _ in range(self.ORDERS_PER_THREAD):
+                    while True:
+                        try:
+                            # Як у checkout: номер і замовлення в одній транзакції.
+                            with transaction.atomic():
+                                order = _order()
+                        except OperationalError:  # SQLite: таблиця зайнята іншим записом
+                            time.sleep(0.001)
+                            continue
+                        except IntegrityError as exc:
+                            with lock:
+                                integrity_errors.append(exc)
+                            break
+                        with lock:
+                            numbers.append(order.order_number)
+                        break
+            finally:
+                close_old_connections()
+
+        threads = [threading.Thread(target=checkout) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        total = self.THREADS * self.ORDERS_PER_THREAD
+        prefix = f"TWC{timezone.localdate().strftime('%d%m%Y')}N"
+        self.assertEqual(integrity_errors, [])
+        self.assertEqual(sorted(numbers), sorted(f'{prefix}{n:02d}' for n in range(1, total + 1)))
+        self.assertEqual(Order.objects.count(), total)
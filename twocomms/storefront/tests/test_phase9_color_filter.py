@@ -13,7 +13,9 @@ from __future__ import annotations
 from unittest.mock import patch
 
 from django.core.cache import cache, caches
+from django.db import connection
 from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from productcolors.models import Color, ProductColorVariant
@@ -23,6 +25,7 @@ from storefront.services.color_filter import (
     build_available_colors,
     build_home_color_chips,
     build_reset_url,
+    get_color_facets,
     parse_color_filter,
 )
 
@@ -154,6 +157,55 @@ class ColorFilterServiceTests(_BaseColorFilterTests):
             self.assertTrue(chip["url"].startswith("/catalog/?color="))
 
 
+class ColorFacetIndexTests(_BaseColorFilterTests):
+    def _variant_queries(self, callback):
+        with CaptureQueriesContext(connection) as ctx:
+            result = callback()
+        return result, [q["sql"] for q in ctx.captured_queries if "productcolors_" in q["sql"]]
+
+    def test_chips_are_served_from_facet_index(self):
+        qs = Product.objects.filter(category=self.category, status="published")
+        request = self._request("/catalog/category-1/")
+        first = build_available_colors(qs, request, [])
+
+        second, queries = self._variant_queries(lambda: build_available_colors(qs, request, []))
+
+        self.assertEqual(queries, [])
+        self.assertEqual(first, second)
+        self.assertEqual([(c["slug"], c["count"], c["primary_hex"]) for c in second],
+                         [("black", 2, "#000000"), ("coyote", 2, "#7A5A3A")])
+
+    def test_facets_are_aggregated_in_a_single_query(self):
+        qs = Product.objects.filter(status="published")
+
+        facets, queries = self._variant_queries(lambda: get_color_facets(qs))
+
+        self.assertEqual(len(queries), 1)
+        self.assertEqual({f["slug"]: f["label"] for f in facets}, {"black": "black", "coyote": "coyote"})
+
+    def test_search_result_sets_are_indexed_separately(self):
+        tees = get_color_facets(Product.objects.filter(status="published", title__icontains="tee"))
+        hoodies = get_color_facets(Product.objects.filter(status="published", title__icontains="hoodie"))
+
+        self.assertEqual({f["slug"]: f["count"] for f in tees}, {"black": 2, "coyote": 1})
+        self.assertEqual({f["slug"]: f["count"] for f in hoodies}, {"coyote": 1})
+
+    def test_variant_changes_refresh_the_index(self):
+        qs = Product.objects.filter(status="published")
+        get_color_facets(qs)
+
+        ProductColorVariant.objects.create(product=self.uncoloured_product, color=self.black_color)
+        self.assertEqual({f["slug"]: f["count"] for f in get_color_facets(qs)}["black"], 3)
+
+        self.black_color.primary_hex = "#111111"
+        self.black_color.save()
+        self.assertEqual(get_color_facets(qs)[0]["primary_hex"], "#111111")
+
+        self.coyote_product.status = "draft"
+        self.coyote_product.save()
+        self.assertEqual({f["slug"]: f["count"] for f in get_color_facets(qs)}["coyote"], 1)
+
+
 class CatalogColorFilterIntegrationTests(_BaseColorFilterTests):
     def test_catalog_filters_by_single_color(self):
         response = self.client.get(reverse("catalog") + "?color=coyote")
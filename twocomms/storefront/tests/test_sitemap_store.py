@@ -0,0 +1,131 @@
+"""Pre-rendered sitemap store: render command, conditional GET, gzip, paging."""
+
+from __future__ import annotations
+
+import gzip
+import shutil
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from django.http import Http404
+from django.test import RequestFactory, TestCase, override_settings
+
+from storefront.models import Category, Product
+from storefront.services import sitemap_store
+from storefront.views import static_pages
+
+
+class SitemapStoreTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Худі", slug="hoodies", is_active=True)
+        for idx in range(3):
+            Product.objects.create(
+                title=f"Hoodie {idx}",
+                slug=f"hoodie-{idx}",
+                category=cls.category,
+                price=1200,
+                status="published",
+            )
+
+    def setUp(self):
+        self.store = tempfile.mkdtemp(prefix="sitemaps-")
+        self.addCleanup(shutil.rmtree, self.store, ignore_errors=True)
+        override = override_settings(SITEMAP_STORE_DIR=self.store, SITE_BASE_URL="https://twocomms.shop")
+        override.enable()
+        self.addCleanup(override.disable)
+        self.factory = RequestFactory()
+
+    def _get(self, path, data=None, **extra):
+        request = self.factory.get(path, data or {}, **extra)
+        request.user = AnonymousUser()
+        return request
+
+    def _render(self, *args):
+        call_command("render_sitemaps", *args, stdout=StringIO())
+
+    def test_prerendered_documents_match_live_output_without_orm(self):
+        live_index = static_pages.custom_sitemap(self._get("/sitemap.xml")).content
+        live_products = static_pages.sitemap_section_products(self._get("/sitemap-products.xml")).content
+        self._render()
+
+        with self.assertNumQueries(0):
+            index = static_pages.custom_sitemap(self._get("/sitemap.xml"))
+            products = static_pages.sitemap_section_products(self._get("/sitemap-products.xml"))
+        self.assertEqual(b"".join(index.streaming_content), live_index)
+        self.assertEqual(b"".join(products.streaming_content), live_products)
+        self.assertTrue(index["ETag"])
+        self.assertTrue(index["Last-Modified"])
+        self.assertIn(b"/product/hoodie-2/", live_products)
+
+    def test_conditional_get_and_gzip_variant(self):
+        self._render()
+        first = static_pages.sitemap_section_products(self._get("/sitemap-products.xml"))
+        etag, last_modified = first["ETag"], first["Last-Modified"]
+
+        revalidated = static_pages.sitemap_section_products(
+            self._get("/sitemap-products.xml", HTTP_IF_NONE_MATCH=etag)
+        )
+        self.assertEqual(revalidated.status_code, 304)
+        by_date = static_pages.sitemap_section_products(
+            self._get("/sitemap-products.xml", HTTP_IF_MODIFIED_SINCE=last_modified)
+        )
+        self.assertEqual(by_date.status_code, 304)
+
+        gz = static_pages.sitemap_section_products(
+            self._get("/sitemap-products.xml", HTTP_ACCEPT_ENCODING="gzip, deflate")
+        )
+        self.assertEqual(gz["Content-Encoding"], "gzip")
+        self.assertEqual(gz["Vary"], "Accept-Encoding")
+        self.assertEqual(gzip.decompress(b"".join(gz.streaming_content)), b"".join(first.streaming_content))
+
+    def test_unchanged_render_keeps_etag_and_change_rewrites(self):
+        self._render()
+        before = dict(sitemap_store.load_manifest())
+        self._render()
+        self.assertEqual(sitemap_store.load_manifest(), before)
+
+        Product.objects.create(title="Hoodie new", slug="hoodie-new", category=self.category, price=1300, status="published")
+        self._render()
+        after = sitemap_store.load_manifest()
+        self.assertNotEqual(after["sitemap-products.xml"]["etag"], before["sitemap-products.xml"]["etag"])
+        self.assertEqual(after["sitemap-thematic.xml"], before["sitemap-thematic.xml"])
+
+    def test_index_lists_pages_above_url_limit(self):
+        with patch.object(static_pages, "SITEMAP_PAGE_LIMIT", 2), \
+                patch("storefront.sitemaps.ProductSitemap.limit", 2, create=True):
+            self._render()
+            manifest = sitemap_store.load_manifest()
+            self.assertIn("sitemap-products.xml?p=2", manifest)
+            self.assertIn("sitemap-images.xml?p=2", manifest)
+            index = (sitemap_store.store_dir() / "sitemap.xml").read_bytes()
+            self.assertIn(b"https://twocomms.shop/sitemap-products.xml?p=2</loc>", index)
+            page_two = static_pages.sitemap_section_products(self._get("/sitemap-products.xml", {"p": "2"}))
+            self.assertIn(b"/product/hoodie-", b"".join(page_two.streaming_content))
+            with self.assertRaises(Http404):
+                static_pages.sitemap_images(self._get("/sitemap-images.xml", {"p": "9"}))
+
+    def test_if_dirty_skips_until_flagged(self):
+        self._render()
+        out = StringIO()
+        call_command("render_sitemaps", "--if-dirty", stdout=out)
+        self.assertIn("nothing to do", out.getvalue())
+        sitemap_store.mark_sitemaps_dirty()
+        self.assertTrue(sitemap_store.are_sitemaps_dirty())
+
+    def test_change_during_render_keeps_sitemaps_dirty(self):
+        render_live = sitemap_store._render_live
+
+        def render_and_flag(view, page):
+            sitemap_store.mark_sitemaps_dirty()
+            return render_live(view, page)
+
+        with patch.object(sitemap_store, "_render_live", side_effect=render_and_flag):
+            self._render()
+        self.assertTrue(sitemap_store.are_sitemaps_dirty())
+
+        self._render("--if-dirty")
+        self.assertFalse(sitemap_store.are_sitemaps_dirty())
@@ -0,0 +1,90 @@
+import json
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from cache_utils import get_fragment_cache
+from storefront.models import Category, Product, ProductImage
+from storefront.seo_utils import (
+    StructuredDataGenerator,
+    get_organization_schema,
+    get_product_schema,
+    get_website_schema,
+)
+from storefront.services import structured_data_cache
+
+
+class StructuredDataCacheTests(TestCase):
+    def setUp(self):
+        get_fragment_cache().clear()
+        structured_data_cache._process_memo.clear()
+        self.category = Category.objects.create(name="JSON-LD Cat", slug="jsonld-cat", is_active=True)
+        self.product = Product.objects.create(
+            title="JSON-LD Tee",
+            slug="jsonld-tee",
+            category=self.category,
+            price=900,
+            status="published",
+        )
+
+    def test_product_schema_is_single_line_and_matches_generator(self):
+        payload = get_product_schema(self.product)
+
+        self.assertNotIn("\n", payload)
+        self.assertIn('"@type": "Product"', payload)
+        self.assertEqual(json.loads(payload), json.loads(json.dumps(
+            StructuredDataGenerator.generate_product_schema(self.product), ensure_ascii=False,
+        )))
+
+    def test_product_schema_is_served_from_cache_until_content_changes(self):
+        first = get_product_schema(self.product)
+        with patch.object(
+            StructuredDataGenerator,
+            "generate_product_schema",
+            side_effect=AssertionError("schema should come from cache"),
+        ):
+            self.assertEqual(get_product_schema(self.product), first)
+
+        self.product.price = 1200
+        self.product.save()
+        self.assertIn('"price": "1200"', get_product_schema(self.product))
+
+        ProductImage.objects.create(product=self.product, image="products/extra/jsonld.jpg")
+        self.assertIn("jsonld.jpg", get_product_schema(self.product))
+
+    def test_review_summary_is_part_of_the_key(self):
+        from reviews.services.aggregate import ProductReviewSummary
+
+        summary = ProductReviewSummary(count=2, avg=4.5, histogram={5: 1, 4: 1}, show_rating=True)
+        self.assertNotIn("aggregateRating", get_product_schema(self.product))
+        self.assertIn('"ratingValue": "4.5"', get_product_schema(self.product, review_summary=summary))
+
+    def test_site_schemas_are_cached(self):
+        organization = get_organization_schema()
+        self.assertIn('"@type": ["Organization", "OnlineStore"]', organization)
+        self.assertIn('"priceRange": "900-900 UAH"', organization)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(get_organization_schema(), organization)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+        Product.objects.create(
+            title="JSON-LD Hoodie", slug="jsonld-hoodie", category=self.category, price=1500, status="published",
+        )
+        self.assertIn('"priceRange": "900-1500 UAH"', get_organization_schema())
+
+        website = get_website_schema()
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(get_website_schema(), website)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+    def test_category_edit_bumps_product_schema_only_when_embedded_fields_change(self):
+        with patch("storefront.cache_signals.bump_product_jsonld_version") as bump:
+            self.category.description = "Only the category page text changed"
+            self.category.save()
+            bump.assert_not_called()
+
+            self.category.name = "JSON-LD Renamed"
+            self.category.save()
+            bump.assert_called_once_with(self.product.id)
@@ -0,0 +1,178 @@
+"""Pooled Telegram Bot API client with flood-control scheduling."""
+from __future__ import annotations
+
+import io
+from unittest.mock import MagicMock, patch
+
+from django.core.signals import request_finished, request_started
+from django.test import SimpleTestCase
+
+from orders.telegram_client import TelegramBotClient, get_telegram_client
+from orders.telegram_notifications import TelegramNotifier
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _response(status=200, payload=None):
+    response = MagicMock(status_code=status)
+    response.json.return_value = payload if payload is not None else {"ok": True, "result": {}}
+    return response
+
+
+class TelegramBotClientTests(SimpleTestCase):
+    def _client(self, **kwargs):
+        clock = _FakeClock()
+        client = TelegramBotClient("TOKEN", clock=clock, sleep=clock.sleep, **kwargs)
+        client.session = MagicMock()
+        sent_at = []
+
+        def post(url, **_):
+            sent_at.append((url.rsplit("/", 1)[-1], clock.now))
+            return _response()
+
+        client.session.post.side_effect = post
+        return client, clock, sent_at
+
+    def test_per_chat_burst_drains_at_chat_rate(self):
+        client, clock, sent_at = self._client(global_rate=30, chat_rate=1)
+
+        for _ in range(4):
+            self.assertTrue(client.call("sendMessage", data={"chat_id": 42})["ok"])
+
+        self.assertEqual([moment - 1000.0 for _, moment in sent_at], [0.0, 1.0, 2.0, 3.0])
+
+    def test_global_limit_spans_chats(self):
+        client, clock, sent_at = self._client(global_rate=2, chat_rate=1)
+
+        for chat_id in range(5):
+            client.call("sendMessage", data={"chat_id": chat_id})
+
+        offsets = [round(moment - 1000.0, 3) for _, moment in sent_at]
+        self.assertEqual(offsets, [0.0, 0.0, 0.5, 1.0, 1.5])
+
+    def test_chat_wait_does_not_hold_a_global_token(self):
+        client, clock, sent_at = self._client(global_rate=2, chat_rate=1)
+        client.call("sendMessage", data={"chat_id": 42})
+
+        # Второе сообщение в чат 42 стоит в очереди чата на 1 с…
+        self.assertEqual(client._reserve_chat("42", max_wait=5), 1.0)
+        # …и не занимает глобальный токен: другой чат уходит сразу.
+        client.call("sendMessage", data={"chat_id": 43})
+        self.assertEqual(sent_at[-1], ("sendMessage", 1000.0))
+        # Глобальный токен для 42 берётся в момент его отправки.
+        clock.sleep(1.0)
+        self.assertEqual(client._reserve_global(max_wait=5), 0.0)
+
+    def test_blocked_chat_queue_starts_after_block(self):
+        client, clock, sent_at = self._client(global_rate=30, chat_rate=1, max_wait=10)
+        client._block("42", 3)
+
+        client.call("sendMessage", data={"chat_id": 42})
+        client.call("sendMessage", data={"chat_id": 42})
+
+        self.assertEqual([moment - 1000.0 for _, moment in sent_at], [3.0, 4.0])
+
+    def test_group_chats_burst_then_refill_at_group_rate(self):
+        client, clock, sent_at = self._client(global_rate=30, chat_rate=1, group_rate=0.25, group_burst=3)
+
+        for _ in range(4):
+            client.call("sendMessage", data={"chat_id": "-100500"})
+
+        self.assertEqual([moment - 1000.0 for _, moment in sent_at], [0.0, 0.0, 0.0, 4.0])
+
+    def test_default_group_burst_is_twenty_messages(self):
+        client, clock, sent_at = self._client(global_rate=30, chat_rate=1)
+
+        for _ in range(21):
+            client.call("sendMessage", data={"chat_id": "-100500"})
+
+        self.assertEqual({moment for _, moment in sent_at[:20]}, {1000.0})
+        self.assertAlmostEqual(sent_at[20][1] - 1000.0, 3.0)
+
+    def _in_web_request(self):
+        request_started.send(sender=self.__class__)
+        self.addCleanup(request_finished.send, sender=self.__class__)
+
+    def test_web_request_fails_fast_when_queue_is_longer_than_max_wait(self):
+        client, clock, sent_at = self._client(global_rate=30, chat_rate=0.1, max_wait=5)
+        self._in_web_request()
+
+        self.assertTrue(client.call("sendMessage", data={"chat_id": 42})["ok"])
+        payload = client.call("sendMessage", data={"chat_id": 42})
+
+        self.assertFalse(payload["ok"])
+        self.assertEqual(payload["error_code"], 429)
+        self.assertEqual(len(sent_at), 1)
+        self.assertEqual(clock.sleeps, [])
+        # Отказ ничего не списал: другой чат уходит сразу.
+        self.assertTrue(client.call("sendMessage", data={"chat_id": 43})["ok"])
+        self.assertEqual(sent_at[-1][1], 1000.0)
+
+    def test_retry_after_is_honoured_and_files_rewound(self):
+        client, clock, _ = self._client(global_rate=30, chat_rate=1, max_wait=10)
+        flood = _response(429, {"ok": False, "error_code": 429, "parameters": {"retry_after": 7}})
+        client.session.post.side_effect = [flood, _response()]
+        handle = io.BytesIO(b"pdf")
+        handle.read()
+
+        payload = client.call("sendDocument", data={"chat_id": 42}, files={"document": ("a.pdf", handle)})
+
+        self.assertTrue(payload["ok"])
+        self.assertEqual(client.session.post.call_count, 2)
+        self.assertEqual(clock.sleeps, [7.0])
+        self.assertEqual(handle.tell(), 0)
+
+    def test_background_burst_drains_without_drops(self):
+        client, clock, sent_at = self._client(global_rate=30, chat_rate=1, max_wait=5)
+
+        payloads = [client.call("sendMessage", data={"chat_id": 42}) for _ in range(12)]
+
+        self.assertTrue(all(payload["ok"] for payload in payloads))
+        self.assertEqual([moment - 1000.0 for _, moment in sent_at], [float(n) for n in range(12)])
+
+    def test_per_call_max_wait_overrides_the_default(self):
+        client, clock, sent_at = self._client(global_rate=30, chat_rate=0.1)
+        client.call("sendMessage", data={"chat_id": 42})
+
+        self.assertFalse(client.call("sendMessage", data={"chat_id": 42}, max_wait=1)["ok"])
+        self.assertEqual(len(sent_at), 1)
+
+    def test_long_retry_after_is_not_waited(self):
+        client, clock, _ = self._client(background_max_wait=30)
+        flood = {"ok": False, "error_code": 429, "parameters": {"retry_after": 600}}
+        client.session.post.side_effect = [_response(429, flood)]
+
+        self.assertEqual(client.call("sendMessage", data={"chat_id": 1}), flood)
+        self.assertEqual(clock.sleeps, [])
+        # Чат заблокирован: следующий вызов отказывает локально, не обращаясь к API.
+        self.assertFalse(client.call("sendMessage", data={"chat_id": 1})["ok"])
+        self.assertEqual(client.session.post.call_count, 1)
+
+    def test_client_is_shared_per_token(self):
+        self.assertIs(get_telegram_client("shared-token"), get_telegram_client("shared-token"))
+        self.assertIsNot(get_telegram_client("shared-token"), get_telegram_client("other-token"))
+
+
+class TelegramNotifierClientTests(SimpleTestCase):
+    def test_notifier_sends_through_pooled_client(self):
+        notifier = TelegramNotifier(bot_token="notifier-token", chat_id="1", admin_id="2,3", async_enabled=False)
+        client = MagicMock()
+        client.call.return_value = {"ok": True, "result": {"message_id": 5}}
+
+        with patch("orders.telegram_notifications.get_telegram_client", return_value=client) as factory:
+            self.assertTrue(notifier.send_message("hello"))
+            self.assertTrue(notifier.send_personal_message(77, "hi"))
+
+        factory.assert_called_with("notifier-token")
+        self.assertEqual([call.kwargs["data"]["chat_id"] for call in client.call.call_args_list], ["2", "3", 77])
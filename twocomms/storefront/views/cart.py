@@ -48,13 +48,12 @@ from storefront.custom_print_config import (
     ZONE_LABELS,
 )
 from storefront.custom_print_notifications import notify_custom_print_moderation_request
+from storefront.services.cart_pricing import get_priced_cart
 from storefront.services.size_guides import normalize_requested_size
 from .utils import (
     get_cart_from_session,
     save_cart_to_session,
-    calculate_cart_total,
     _reset_monobank_session,
-    _color_label_from_variant,
 )
 from ..utm_tracking import record_add_to_cart, record_remove_from_cart
 
@@ -77,27 +76,6 @@ LOOKUP_RATE_LIMIT = '60/m'
 # ==================== CART VIEWS ====================
 
 
-def _calculate_original_subtotal(cart):
-    """
-    Подсчитывает сумму корзины по базовым ценам (без скидок сайта).
-    """
-    if not cart:
-        return Decimal('0')
-    ids = [item.get('product_id') for item in cart.values() if item.get('product_id')]
-    products = Product.objects.in_bulk(ids)
-    total = Decimal('0')
-    for item in cart.values():
-        product = products.get(item.get('product_id'))
-        if not product:
-            continue
-        try:
-            qty = int(item.get('qty', 1))
-        except (TypeError, ValueError):
-            qty = 1
-        total += Decimal(product.price) * qty
-    return total
-
-
 def _resolve_product_fit_payload(product, requested_code):
     """
     Resolve an editable product fit option for cart/order snapshots.
@@ -127,6 +105,15 @@ def _resolve_product_fit_payload(product, requested_code):
     return selected.code, selected.label
 
 
+def _drop_missing_cart_lines(request, cart, priced):
+    """Убирает из сессионной корзины позиции удалённых товаров."""
+    for key in priced.missing_keys:
+        cart.pop(key, None)
+    _reset_monobank_session(request, drop_pending=True)
+    request.session['cart'] = cart
+    request.session.modified = True
+
+
 def _fit_display_from_cart_item(item_data):
     code = str(item_data.get('fit_option_code') or item_data.get('fit') or '').strip()
     label = str(item_data.get('fit_option_label') or item_data.get('fit_label') or '').strip()
@@ -529,121 +516,63 @@ def view_cart(request):
             from storefront import views as legacy_views
             return legacy_views.order_create(request)
 
-    cart = get_cart_from_session(request)
+    priced = get_priced_cart(request)
+
+    # Цены и суммы — из снимка корзины; объекты товаров и цветов нужны только
+    # шаблону (изображения, ссылки), поэтому грузим их одним запросом каждый.
+    products_map = Product.objects.select_related('category').prefetch_related('color_variants__images').in_bulk(priced.product_ids)
+    color_variants_map = ProductColorVariant.objects.select_related('color').in_bulk(priced.color_variant_ids)
+
     cart_items = []
-    subtotal = Decimal('0')
-    original_subtotal = Decimal('0')
-    total_points = 0
     content_ids = []
     contents = []
-    total_quantity = 0
-
-    # Optimization: Fetch all products at once to avoid N+1
-    product_ids = [item_data.get('product_id') for item_data in cart.values() if item_data.get('product_id')]
-    products_map = Product.objects.select_related('category').prefetch_related('color_variants__images').in_bulk(product_ids)
-
-    # Optimization: Fetch all color variants at once
-    color_variant_ids = [item_data.get('color_variant_id') for item_data in cart.values() if item_data.get('color_variant_id')]
-    from productcolors.models import ProductColorVariant
-    color_variants_map = ProductColorVariant.objects.select_related('color').in_bulk(color_variant_ids)
-
-    for item_key, item_data in cart.items():
-        try:
-            product_id = item_data.get('product_id')
-            # product = Product.objects.select_related('category').get(id=product_id) # OLD N+1
-            product = products_map.get(int(product_id))
-
-            if not product:
-                continue
-
-            # Цена всегда берется из Product (актуальная цена)
-            price = product.final_price
-            original_price = Decimal(product.price)
-            qty = int(item_data.get('qty', 1))
-            line_total = price * qty
-            original_line_total = original_price * qty
-            site_line_discount = original_line_total - line_total
-            if site_line_discount < 0:
-                site_line_discount = Decimal('0.00')
-
-            # Информация о цвете из color_variant_id
-            # color_variant = _get_color_variant_safe(item_data.get('color_variant_id')) # OLD N+1 risk
-            color_variant_id = item_data.get('color_variant_id')
-            color_variant = color_variants_map.get(int(color_variant_id)) if color_variant_id else None
-
-            color_label = _color_label_from_variant(color_variant)
-            size_value = normalize_requested_size(product, item_data.get('size'))
-            fit_option_code, fit_option_label = _fit_display_from_cart_item(item_data)
-            # color_variant_id = color_variant.id if color_variant else None # Already have it
-            offer_id = product.get_offer_id(color_variant_id, size_value, color_name=color_label)
-            content_ids.append(offer_id)
-            contents.append({
-                'id': offer_id,
-                'quantity': qty,
-                'item_price': float(price),
-                'item_name': product.title,
-                'item_category': product.category.name if getattr(product, 'category', None) else '',
-                'brand': 'TwoComms'
-            })
-            total_quantity += qty
-
-            # Считаем баллы за товар
-            try:
-                if getattr(product, 'points_reward', 0):
-                    total_points += int(product.points_reward) * qty
-            except Exception:
-                pass
-
-            cart_items.append({
-                'key': item_key,
-                'product': product,
-                'price': price,  # Для совместимости
-                'unit_price': price,  # Шаблон ожидает unit_price!
-                'original_unit_price': original_price,
-                'qty': qty,
-                'line_total': line_total,
-                'original_line_total': original_line_total,
-                'site_discount_amount': site_line_discount,
-                'size': size_value,
-                'fit_option_code': fit_option_code,
-                'fit_option_label': fit_option_label,
-                'fit_label': fit_option_label,
-                'color_variant': color_variant,
-                'color_label': color_label,  # ДОБАВЛЕНО: для отображения цвета
-                'offer_id': offer_id,
-            })
-
-            subtotal += line_total
-            original_subtotal += original_line_total
-
-        except Product.DoesNotExist:
-            # Товар удален из БД - пропускаем
+    for line in priced.lines:
+        product = products_map.get(line.product_id)
+        if not product:
             continue
+        content_ids.append(line.offer_id)
+        contents.append({
+            'id': line.offer_id,
+            'quantity': line.qty,
+            'item_price': float(line.unit_price),
+            'item_name': line.title,
+            'item_category': line.category_name,
+            'brand': 'TwoComms'
+        })
+        cart_items.append({
+            'key': line.key,
+            'product': product,
+            'price': line.unit_price,  # Для совместимости
+            'unit_price': line.unit_price,  # Шаблон ожидает unit_price!
+            'original_unit_price': line.original_unit_price,
+            'qty': line.qty,
+            'line_total': line.line_total,
+            'original_line_total': line.original_line_total,
+            'site_discount_amount': line.site_discount_amount,
+            'size': line.size,
+            'fit_option_code': line.fit_option_code,
+            'fit_option_label': line.fit_option_label,
+            'fit_label': line.fit_option_label,
+            'color_variant': color_variants_map.get(line.color_variant_id),
+            'color_label': line.color_label,  # ДОБАВЛЕНО: для отображения цвета
+            'offer_id': line.offer_id,
+        })
 
-    # Проверяем промокод
+    # Промокод больше не валиден — убираем его из сессии
     promo_code = None
-    discount = Decimal('0')
-    promo_code_id = request.session.get('promo_code_id')
-
-    if promo_code_id:
-        try:
-            promo_code = PromoCode.objects.get(id=promo_code_id)
-            if promo_code.can_be_used():
-                discount = promo_code.calculate_discount(subtotal)
-            else:
-                # Промокод больше не валиден
-                del request.session['promo_code_id']
-                promo_code = None
-        except PromoCode.DoesNotExist:
-            del request.session['promo_code_id']
-
-    total = subtotal - discount
-    site_discount_total = (original_subtotal - subtotal).quantize(Decimal('0.01')) if original_subtotal >= subtotal else Decimal('0.00')
-    subtotal = subtotal.quantize(Decimal('0.01'))
-    original_subtotal = original_subtotal.quantize(Decimal('0.01'))
-    discount = discount.quantize(Decimal('0.01'))
-    total = total.quantize(Decimal('0.01'))
-    total_savings = (site_discount_total + discount).quantize(Decimal('0.01'))
+    if priced.promo_invalid:
+        request.session.pop('promo_code_id', None)
+    elif priced.promo_code_id:
+        promo_code = PromoCode.objects.filter(id=priced.promo_code_id).first()
+
+    total_quantity = priced.total_quantity
+    total_points = priced.total_points
+    subtotal = priced.subtotal
+    original_subtotal = priced.original_subtotal
+    site_discount_total = priced.site_discount_total
+    discount = priced.discount
+    total = priced.total
+    total_savings = priced.total_savings
 
     # Определяем начальное значение для отображения "До сплати"
     # Если выбран prepay_200, показываем 200 грн, иначе полную сумму
@@ -824,17 +753,9 @@ def add_to_cart(request):
     offer_id = product.get_offer_id(color_variant_int, size)
     item_value = (price * qty).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
 
-    ids = [i['product_id'] for i in cart.values()]
-    prods = Product.objects.in_bulk(ids)
+    priced = get_priced_cart(request, cart)
     total_qty = sum(i['qty'] for i in cart.values())
-    total_sum = Decimal('0')
-    for i in cart.values():
-        p = prods.get(i['product_id'])
-        if p:
-            price_decimal = p.final_price if isinstance(p.final_price, Decimal) else Decimal(str(p.final_price))
-            total_sum += Decimal(i['qty']) * price_decimal
-
-    cart_total = total_sum.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+    cart_total = priced.subtotal
 
     # UTM Tracking: записываем добавление в корзину
     try:
@@ -904,33 +825,19 @@ def update_cart(request):
         cart[cart_key]['qty'] = qty
         save_cart_to_session(request, cart)
 
-        # ИСПРАВЛЕНО: Получаем цену из Product, а не из сессии (в сессии нет поля 'price')
-        product_id = cart[cart_key]['product_id']
-        try:
-            product = Product.objects.get(id=product_id)
-            price = product.final_price
-        except Product.DoesNotExist:
+        # Цена всегда из Product (через снимок корзины), а не из сессии
+        priced = get_priced_cart(request, cart)
+        line = priced.line(cart_key)
+        if line is None:
             return JsonResponse({
                 'success': False,
                 'error': _('Товар не знайдено')
             }, status=404)
 
-        # Рассчитываем новые суммы
-        line_total = price * qty
-        subtotal = calculate_cart_total(cart)
-
-        # Учитываем промокод
-        discount = Decimal('0')
-        promo_code_id = request.session.get('promo_code_id')
-        if promo_code_id:
-            try:
-                promo_code = PromoCode.objects.get(id=promo_code_id)
-                if promo_code.can_be_used():
-                    discount = promo_code.calculate_discount(subtotal)
-            except PromoCode.DoesNotExist:
-                pass
-
-        total = subtotal - discount
+        line_total = line.line_total
+        subtotal = priced.subtotal
+        discount = priced.discount
+        total = priced.total
 
         return JsonResponse({
             'ok': True,
@@ -1007,30 +914,12 @@ def remove_from_cart(request):
     request.session['cart'] = cart
     request.session.modified = True
 
-    # Пересчёт сводки с использованием Decimal и учетом промокодов
-    ids = [i['product_id'] for i in cart.values()]
-    prods = Product.objects.in_bulk(ids)
+    # Пересчёт сводки через снимок корзины (учитывает промокод)
+    priced = get_priced_cart(request, cart)
     total_qty = sum(i['qty'] for i in cart.values())
-    total_sum = Decimal('0')
-    for i in cart.values():
-        p = prods.get(i['product_id'])
-        if p:
-            price_decimal = p.final_price if isinstance(p.final_price, Decimal) else Decimal(str(p.final_price))
-            total_sum += Decimal(i['qty']) * price_decimal
-
-    # Учитываем промокод при расчете итоговой суммы
-    subtotal = total_sum.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-    discount = Decimal('0')
-    promo_code_id = request.session.get('promo_code_id')
-    if promo_code_id:
-        try:
-            promo_code = PromoCode.objects.get(id=promo_code_id)
-            if promo_code.can_be_used():
-                discount = promo_code.calculate_discount(subtotal)
-        except PromoCode.DoesNotExist:
-            pass
-
-    total = (subtotal - discount).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+    subtotal = priced.subtotal
+    discount = priced.discount
+    total = priced.total
 
     # UTM Tracking: записываем удаление из корзины
     if removed:
@@ -1156,9 +1045,9 @@ def apply_promo_code(request):
             }, status=400)
 
         # Рассчитываем скидку
-        cart = get_cart_from_session(request)
-        subtotal = calculate_cart_total(cart)
-        original_subtotal = _calculate_original_subtotal(cart)
+        priced = get_priced_cart(request)
+        subtotal = priced.subtotal
+        original_subtotal = priced.original_subtotal
         discount = promo_code.calculate_discount(subtotal)
 
         if discount <= 0:
@@ -1248,8 +1137,7 @@ def remove_promo_code(request):
 
             request.session.modified = True
 
-        cart = get_cart_from_session(request)
-        subtotal = calculate_cart_total(cart)
+        subtotal = get_priced_cart(request).subtotal
         # После удаления промокода скидка = 0
         total = subtotal
 
@@ -1313,33 +1201,13 @@ def cart_summary(request):
             'total': float(custom_total),
         })
 
-    ids = [i['product_id'] for i in cart.values()]
-    prods = Product.objects.in_bulk(ids)
-
-    # Проверяем, какие товары найдены
-    found_products = set(prods.keys())
-    missing_products = set(ids) - found_products
-
-    if missing_products:
+    priced = get_priced_cart(request, cart)
+    if priced.missing_keys:
         # Удаляем несуществующие товары из корзины
-        cart_to_clean = dict(cart)
-        for key, item in cart_to_clean.items():
-            if item['product_id'] in missing_products:
-                cart.pop(key, None)
-        _reset_monobank_session(request, drop_pending=True)
-        request.session['cart'] = cart
-        request.session.modified = True
+        _drop_missing_cart_lines(request, cart, priced)
 
-    # Пересчитываем с очищенной корзиной
-    total_qty = sum(i['qty'] for i in cart.values())
-    total_sum = Decimal('0')
-    for i in cart.values():
-        p = prods.get(i['product_id'])
-        if p:
-            total_sum += Decimal(str(i['qty'])) * Decimal(str(p.final_price))
-
-    total_sum += custom_total
-    total_qty += custom_qty
+    total_qty = priced.total_quantity + custom_qty
+    total_sum = priced.subtotal + custom_total
 
     return JsonResponse({'ok': True, 'count': total_qty, 'total': float(total_sum)})
 
@@ -1355,78 +1223,40 @@ def cart_mini(request):
     if not isinstance(cart_sess, dict):
         cart_sess = {}
 
-    ids = [i['product_id'] for i in cart_sess.values()]
-    prods = Product.objects.in_bulk(ids)
-
-    # Optimization: Fetch color variants
-    variant_ids = [i.get('color_variant_id') for i in cart_sess.values() if i.get('color_variant_id')]
-    variants_map = ProductColorVariant.objects.select_related('color').in_bulk(variant_ids)
-
-    # Проверяем, какие товары найдены
-    found_products = set(prods.keys())
-    missing_products = set(ids) - found_products
-
-    if missing_products:
+    priced = get_priced_cart(request, cart_sess)
+    if priced.missing_keys:
         # Удаляем несуществующие товары из корзины
-        cart_to_clean = dict(cart_sess)
-        for key, item in cart_to_clean.items():
-            if item['product_id'] in missing_products:
-                cart_sess.pop(key, None)
-        _reset_monobank_session(request, drop_pending=True)
-        request.session['cart'] = cart_sess
-        request.session.modified = True
-
-    items = []
-    total = 0
-    total_points = 0
-
-    for key, it in cart_sess.items():
-        p = prods.get(it['product_id'])
-        if not p:
-            continue
-
-        # Получаем информацию о цвете
-        # Получаем информацию о цвете
-        variant_id = it.get('color_variant_id')
-        color_variant = variants_map.get(int(variant_id)) if variant_id else None
+        _drop_missing_cart_lines(request, cart_sess, priced)
 
-        unit = p.final_price
-        line = unit * it['qty']
-        total += line
-
-        # Баллы за товар, если предусмотрены
-        try:
-            if getattr(p, 'points_reward', 0):
-                total_points += int(p.points_reward) * int(it['qty'])
-        except Exception:
-            pass
-
-        size_value = normalize_requested_size(p, it.get('size'))
-        fit_option_code, fit_option_label = _fit_display_from_cart_item(it)
-        color_variant_id = color_variant.id if color_variant else None
-        offer_id = p.get_offer_id(color_variant_id, size_value)
-
-        items.append({
-            'key': key,
-            'product': p,
-            'size': size_value,
-            'fit_option_code': fit_option_code,
-            'fit_option_label': fit_option_label,
-            'fit_label': fit_option_label,
-            'color_variant': color_variant,
-            'color_label': _color_label_from_variant(color_variant),
-            'qty': it['qty'],
-            'unit_price': unit,
-            'line_total': line,
-            'offer_id': offer_id,
-        })
+    items = [
+        {
+            'key': line.key,
+            'title': line.title,
+            'image_url': line.image_url,
+            'size': line.size,
+            'fit_option_code': line.fit_option_code,
+            'fit_option_label': line.fit_option_label,
+            'fit_label': line.fit_option_label,
+            'color_variant_id': line.color_variant_id,
+            'color_label': line.color_label,
+            'color_primary_hex': line.color_primary_hex,
+            'color_secondary_hex': line.color_secondary_hex,
+            'qty': line.qty,
+            'unit_price': line.unit_price,
+            'line_total': line.line_total,
+            'offer_id': line.offer_id,
+        }
+        for line in priced.lines
+    ]
+    total = priced.subtotal
+    total_points = priced.total_points
 
     custom_cart_state = _collect_custom_cart_state(request)
     custom_items = custom_cart_state['custom_items']
     custom_items_total = custom_cart_state['custom_items_total']
     custom_items_qty = custom_cart_state['custom_items_qty']
 
-    combined_total = total + float(custom_items_total)
+    combined_total = float(total) + float(custom_items_total)
 
     return render(request, 'partials/mini_cart.html', {
         'items': items,
@@ -1572,112 +1402,41 @@ def cart_items_api(request):
             'cart_count': int
         }
     """
-    cart = get_cart_from_session(request)
-    cart_items = []
-    subtotal = Decimal('0')
-    original_subtotal = Decimal('0')
-    total_points = 0
-    total_quantity = 0
-
-    # Optimization: Fetch all products and variants at once
-    product_ids = [item.get('product_id') for item in cart.values() if item.get('product_id')]
-    products_map = Product.objects.select_related('category').prefetch_related('color_variants__images').in_bulk(product_ids)
-
-    color_variant_ids = [item.get('color_variant_id') for item in cart.values() if item.get('color_variant_id')]
-    variants_map = ProductColorVariant.objects.select_related('color').prefetch_related('images').in_bulk(color_variant_ids)
-
-    for item_key, item_data in cart.items():
-        try:
-            product_id = item_data.get('product_id')
-            product = products_map.get(int(product_id))
-            if not product:
-                continue
-
-            price = product.final_price
-            original_price = Decimal(product.price)
-            qty = int(item_data.get('qty', 1))
-            line_total = price * qty
-            original_line_total = original_price * qty
-            site_line_discount = original_line_total - line_total
-            if site_line_discount < 0:
-                site_line_discount = Decimal('0.00')
-            total_quantity += qty
-
-            variant_id = item_data.get('color_variant_id')
-            color_variant = variants_map.get(int(variant_id)) if variant_id else None
-            color_label = _color_label_from_variant(color_variant)
-            size_value = normalize_requested_size(product, item_data.get('size'))
-            fit_option_code, fit_option_label = _fit_display_from_cart_item(item_data)
-            color_variant_id = color_variant.id if color_variant else None
-            offer_id = product.get_offer_id(color_variant_id, size_value)
-
-            # Баллы за товар
-            try:
-                if getattr(product, 'points_reward', 0):
-                    total_points += int(product.points_reward) * qty
-            except Exception:
-                pass
-
+    priced = get_priced_cart(request)
+    cart_items = [
+        {
+            'key': line.key,
+            'product_id': line.product_id,
+            'product_title': line.title,
+            'product_slug': line.slug,
+            'unit_price': float(line.unit_price),
+            'original_unit_price': float(line.original_unit_price),
+            'line_total': float(line.line_total),
+            'original_line_total': float(line.original_line_total),
+            'site_discount_amount': float(line.site_discount_amount),
+            'qty': line.qty,
+            'size': line.size,
+            'fit_option_code': line.fit_option_code,
+            'fit_option_label': line.fit_option_label,
+            'fit_label': line.fit_option_label,
+            'color_variant_id': line.color_variant_id,
+            'color_label': line.color_label,
             # Подготовка изображения (полный URL)
-            image_url = None
-            if color_variant and color_variant.images.exists():
-                image_url = request.build_absolute_uri(color_variant.images.first().image.url)
-            elif product.main_image:
-                image_url = request.build_absolute_uri(product.main_image.url)
-
-            cart_items.append({
-                'key': item_key,
-                'product_id': product.id,
-                'product_title': product.title,
-                'product_slug': product.slug,
-                'unit_price': float(price),
-                'original_unit_price': float(original_price),
-                'line_total': float(line_total),
-                'original_line_total': float(original_line_total),
-                'site_discount_amount': float(site_line_discount),
-                'qty': qty,
-                'size': size_value,
-                'fit_option_code': fit_option_code,
-                'fit_option_label': fit_option_label,
-                'fit_label': fit_option_label,
-                'color_variant_id': item_data.get('color_variant_id'),
-                'color_label': color_label,
-                'image_url': image_url,
-                'points_reward': int(getattr(product, 'points_reward', 0) or 0),
-                'offer_id': offer_id,
-                'item_value': float(line_total),
-                'product_category': product.category.name if getattr(product, 'category', None) else '',
-                'discount_percent': product.discount_percent or 0,
-            })
-
-            subtotal += line_total
-            original_subtotal += original_line_total
+            'image_url': request.build_absolute_uri(line.image_url) if line.image_url else None,
+            'points_reward': line.points_reward,
+            'offer_id': line.offer_id,
+            'item_value': float(line.line_total),
+            'product_category': line.category_name,
+            'discount_percent': line.discount_percent,
+        }
+        for line in priced.lines
+    ]
 
-        except Product.DoesNotExist:
-            continue
+    if priced.promo_invalid:
+        request.session.pop('promo_code_id', None)
 
-    promo_code = None
-    discount = Decimal('0')
-    promo_code_id = request.session.get('promo_code_id')
-
-    if promo_code_id:
-        try:
-            promo_code = PromoCode.objects.get(id=promo_code_id)
-            if promo_code.can_be_used():
-                discount = promo_code.calculate_discount(subtotal)
-            else:
-                del request.session['promo_code_id']
-                promo_code = None
-        except PromoCode.DoesNotExist:
-            del request.session['promo_code_id']
-
-    total = subtotal - discount
-    site_discount_total = (original_subtotal - subtotal).quantize(Decimal('0.01')) if original_subtotal >= subtotal else Decimal('0.00')
-    subtotal = subtotal.quantize(Decimal('0.01'))
-    original_subtotal = original_subtotal.quantize(Decimal('0.01'))
-    discount = discount.quantize(Decimal('0.01'))
-    total = total.quantize(Decimal('0.01'))
-    total_savings = (site_discount_total + discount).quantize(Decimal('0.01'))
+    total_quantity = priced.total_quantity
+    total = priced.total
 
     custom_cart_state = _collect_custom_cart_state(request)
     custom_items_total = custom_cart_state['custom_items_total']
@@ -1711,18 +1470,18 @@ def cart_items_api(request):
         'approved_total': float(approved_total),
         'prepay_allowed': not has_custom_items,
         'payment_allowed': (not has_custom_items) or all_approved,
-        'subtotal': float(subtotal),
-        'original_subtotal': float(original_subtotal),
-        'site_discount_total': float(site_discount_total),
-        'discount': float(discount),
+        'subtotal': float(priced.subtotal),
+        'original_subtotal': float(priced.original_subtotal),
+        'site_discount_total': float(priced.site_discount_total),
+        'discount': float(priced.discount),
         'total': float(total),
         'grand_total': float(total),
-        'total_points': total_points,
+        'total_points': priced.total_points,
         'cart_count': total_quantity + custom_items_qty,
         'items_count': total_quantity + custom_items_qty,
         'positions_count': len(cart_items) + len(custom_items_payload),
-        'applied_promo': promo_code.code if promo_code else None,
-        'total_savings': float(total_savings),
+        'applied_promo': priced.promo_code,
+        'total_savings': float(priced.total_savings),
     })
 
 
@@ -1004,6 +1004,7 @@ def monobank_create_invoice(request):
                     payment_amount=float(payment_amount),
                     event_id=add_payment_event_id,
                     source_url=request.build_absolute_uri(request.path),
+                    wait=False,
                 )
             except Exception as capi_err:
                 monobank_logger.warning(f'⚠️ Failed to send AddPaymentInfo to Facebook CAPI: {capi_err}')
@@ -61,6 +61,7 @@ from storefront.services.marketplace_feeds import (
     build_uaprom_products_feed_xml,
 )
 from storefront.services.size_guides import build_public_size_guide_blocks
+from storefront.services.sitemap_store import prerendered_sitemap
 from storefront.support_content import (
     FOOTER_CONTENT,
     PRO_BRAND_FAQ_ITEMS,
@@ -747,6 +748,59 @@ def static_sitemap(request):
     return HttpResponse(xml_payload, content_type="application/xml; charset=utf-8")
 
 
+SITEMAP_PAGE_LIMIT = 50000  # sitemaps.org: max URLs per sitemap file
+
+# Section sitemap document → storefront.sitemaps classes it renders.
+SITEMAP_SECTIONS = {
+    "sitemap-static.xml": ("StaticViewSitemap",),
+    "sitemap-products.xml": ("ProductSitemap",),
+    "sitemap-product-variants.xml": ("ProductVariantSitemap",),
+    "sitemap-categories.xml": ("CategorySitemap",),
+    "sitemap-blog.xml": ("BlogCategorySitemap", "BlogPostSitemap"),
+    "sitemap-color-categories.xml": ("CategoryColorLandingSitemap",),
+    "sitemap-thematic.xml": ("ThematicLandingSitemap",),
+}
+
+
+def _section_sitemap_classes(name):
+    from storefront import sitemaps
+
+    return [getattr(sitemaps, class_name) for class_name in SITEMAP_SECTIONS[name]]
+
+
+def _image_sitemap_products():
+    return Product.objects.filter(status="published").order_by("id")
+
+
+def sitemap_page_count(name):
+    """Number of ``?p=N`` pages of a sitemap document (at least 1)."""
+    if name == "sitemap-images.xml":
+        total = _image_sitemap_products().count()
+        return max(1, -(-total // SITEMAP_PAGE_LIMIT))
+    if name not in SITEMAP_SECTIONS:
+        return 1
+    return max([1, *(cls().paginator.num_pages for cls in _section_sitemap_classes(name))])
+
+
+def sitemap_documents():
+    """(document name, view) for every sitemap served by the site.
+
+    Used by ``render_sitemaps`` to pre-render the store
+    (services/sitemap_store.py).
+    """
+    return [
+        ("sitemap.xml", custom_sitemap),
+        ("sitemap-static.xml", sitemap_section_static),
+        ("sitemap-products.xml", sitemap_section_products),
+        ("sitemap-product-variants.xml", sitemap_section_product_variants),
+        ("sitemap-categories.xml", sitemap_section_categories),
+        ("sitemap-blog.xml", sitemap_section_blog),
+        ("sitemap-color-categories.xml", sitemap_section_color_categories),
+        ("sitemap-thematic.xml", sitemap_section_thematic),
+        ("sitemap-images.xml", sitemap_images),
+    ]
+
+
 def _sitemap_response(xml_payload):
     """Common headers for all sitemap responses (XML + crawler-safe Cache-Control)."""
     response = HttpResponse(xml_payload, content_type="application/xml; charset=utf-8")
@@ -766,14 +820,20 @@ def _render_django_sitemap(request, sitemap_classes):
     page = request.GET.get("p", 1)
     urls = []
 
+    found_page = False
     for sitemap_cls in sitemap_classes:
         site_map = sitemap_cls()
         try:
             urls.extend(site_map.get_urls(page=page, site=canonical_site, protocol=protocol))
+            found_page = True
         except EmptyPage:
-            raise Http404(f"Sitemap page {page} empty")
+            # Multi-class sections paginate independently: a later page may
+            # exist for one class only.
+            continue
         except PageNotAnInteger:
             raise Http404(f"No sitemap page {page}")
+    if not found_page:
+        raise Http404(f"Sitemap page {page} empty")
 
     response = TemplateResponse(
         request,
@@ -794,6 +854,7 @@ def _max_lastmod(*candidates):
     return max(valid) if valid else None
 
 
+@prerendered_sitemap("sitemap.xml")
 def custom_sitemap(request):
     """sitemap.xml — sitemap-INDEX referencing per-section children.
 
@@ -866,11 +927,19 @@ def custom_sitemap(request):
         ("/sitemap-images.xml", images_lastmod),
     ]
 
+    # Sections above SITEMAP_PAGE_LIMIT URLs are split into ``?p=N`` pages;
+    # each page is listed as its own index entry.
+    paged_children = []
+    for path, lastmod in children:
+        pages = sitemap_page_count(path.lstrip("/"))
+        paged_children.append((path, lastmod))
+        paged_children.extend((f"{path}?p={page}", lastmod) for page in range(2, pages + 1))
+
     root = ET.Element(
         "sitemapindex",
         {"xmlns": "http://www.sitemaps.org/schemas/sitemap/0.9"},
     )
-    for path, lastmod in children:
+    for path, lastmod in paged_children:
         sm_el = ET.SubElement(root, "sitemap")
         ET.SubElement(sm_el, "loc").text = f"{base_url}{path}"
         if lastmod is not None:
@@ -890,20 +959,19 @@ def custom_sitemap(request):
     return _sitemap_response(xml_payload)
 
 
+@prerendered_sitemap("sitemap-static.xml")
 def sitemap_section_static(request):
     """Section sitemap for curated static landing pages."""
-    from storefront.sitemaps import StaticViewSitemap
-
-    return _render_django_sitemap(request, [StaticViewSitemap])
+    return _render_django_sitemap(request, _section_sitemap_classes("sitemap-static.xml"))
 
 
+@prerendered_sitemap("sitemap-products.xml")
 def sitemap_section_products(request):
     """Section sitemap for published products (lastmod from updated_at)."""
-    from storefront.sitemaps import ProductSitemap
-
-    return _render_django_sitemap(request, [ProductSitemap])
+    return _render_django_sitemap(request, _section_sitemap_classes("sitemap-products.xml"))
 
 
+@prerendered_sitemap("sitemap-product-variants.xml")
 def sitemap_section_product_variants(request):
     """Phase 7.4 — section sitemap for 1-segment path-style variant URLs
     (``/product/<slug>/<color>/``, ``/<size>/``, ``/<fit>/``).
@@ -912,36 +980,32 @@ def sitemap_section_product_variants(request):
     canonicalise to the base product URL, so listing them would only
     waste crawl budget.
     """
-    from storefront.sitemaps import ProductVariantSitemap
-
-    return _render_django_sitemap(request, [ProductVariantSitemap])
+    return _render_django_sitemap(request, _section_sitemap_classes("sitemap-product-variants.xml"))
 
 
+@prerendered_sitemap("sitemap-categories.xml")
 def sitemap_section_categories(request):
     """Section sitemap for active categories (lastmod from updated_at)."""
-    from storefront.sitemaps import CategorySitemap
-
-    return _render_django_sitemap(request, [CategorySitemap])
+    return _render_django_sitemap(request, _section_sitemap_classes("sitemap-categories.xml"))
 
 
+@prerendered_sitemap("sitemap-blog.xml")
 def sitemap_section_blog(request):
     """Section sitemap for the dynamic News and Blog hub."""
-    from storefront.sitemaps import BlogCategorySitemap, BlogPostSitemap
-
-    return _render_django_sitemap(request, [BlogCategorySitemap, BlogPostSitemap])
+    return _render_django_sitemap(request, _section_sitemap_classes("sitemap-blog.xml"))
 
 
+@prerendered_sitemap("sitemap-color-categories.xml")
 def sitemap_section_color_categories(request):
     """Section sitemap for indexable colour×category landing pages.
 
     Spec: ``.kiro/specs/color-category-landings``. Includes only
     ``CategoryColorLanding`` rows with ``is_published=True``.
     """
-    from storefront.sitemaps import CategoryColorLandingSitemap
-
-    return _render_django_sitemap(request, [CategoryColorLandingSitemap])
+    return _render_django_sitemap(request, _section_sitemap_classes("sitemap-color-categories.xml"))
 
 
+@prerendered_sitemap("sitemap-thematic.xml")
 def sitemap_section_thematic(request):
     """Section sitemap for thematic landings (US-5).
 
@@ -949,11 +1013,10 @@ def sitemap_section_thematic(request):
     ``storefront.views.catalog.THEMATIC_LANDINGS_CONFIG`` —
     military / streetwear / patriotic / kharkiv-edition.
     """
-    from storefront.sitemaps import ThematicLandingSitemap
-
-    return _render_django_sitemap(request, [ThematicLandingSitemap])
+    return _render_django_sitemap(request, _section_sitemap_classes("sitemap-thematic.xml"))
 
 
+@prerendered_sitemap("sitemap-images.xml")
 def sitemap_images(request):
     """Google Image Sitemap.
 
@@ -972,12 +1035,20 @@ def sitemap_images(request):
     #   * ``display_image`` (catalog card image, if different)
     #   * ``ProductImage`` gallery rows
     #   * ``ProductColorVariant.images`` for every active colour variant
+    try:
+        page = int(request.GET.get("p", 1))
+    except (TypeError, ValueError):
+        raise Http404("No sitemap page")
+    if page < 1:
+        raise Http404("No sitemap page")
+    offset = (page - 1) * SITEMAP_PAGE_LIMIT
     products = (
-        Product.objects.filter(status="published")
+        _image_sitemap_products()
         .prefetch_related("images", "color_variants__images")
-        .only("slug", "title", "main_image")
-        .order_by("id")
+        .only("slug", "title", "main_image")[offset:offset + SITEMAP_PAGE_LIMIT]
     )
+    if page > 1 and not products:
+        raise Http404(f"Sitemap page {page} empty")
 
     urlset = ET.Element(
         "urlset",
@@ -1,4 +1,8 @@
+import atexit
 import os
+import shutil
+import tempfile
+from pathlib import Path
 
 """
 Django Test Settings для запуска тестов с SQLite вместо MySQL.
@@ -35,6 +39,12 @@ class DisableMigrations:
 
 MIGRATION_MODULES = DisableMigrations()
 
+# Файлы, которые создают тесты (загрузки, отчёты, превью), — во временный
+# каталог, а не в рабочий media/ проекта.
+MEDIA_ROOT = Path(tempfile.mkdtemp(prefix='twocomms-test-media-'))
+SURVEY_REPORTS_DIR = MEDIA_ROOT / 'survey_reports'
+atexit.register(shutil.rmtree, MEDIA_ROOT, ignore_errors=True)
+
 # Детерминированный профиль тестового окружения.
 DEBUG = False
 SECURE_SSL_REDIRECT = False
@@ -13,42 +13,69 @@ from warehouse.models import (
     StockMovement,
     StorageCategory,
 )
+from warehouse.services.rollups import STRUCTURE, VALUATION, cached_rollup
 
 
-def total_frozen_value() -> Decimal:
-    """Сума всіх позицій складу + всіх принтів."""
+def _grouped_valuation(qs, group_by: str) -> dict[int, dict]:
+    rows = qs.order_by().values(group_by).annotate(qty=Sum("quantity"), value=Sum(F("quantity") * F("cost_price")))
+    return {
+        row[group_by]: {"qty": row["qty"] or 0, "value": Decimal(row["value"] or 0)}
+        for row in rows
+    }
+
+
+def stock_valuation(category_ids=None) -> dict[int, dict]:
+    """``{category_id: {"qty", "value"}}`` одним GROUP BY-запитом."""
+    qs = StockItem.objects.all()
+    if category_ids is not None:
+        qs = qs.filter(subcategory__category_id__in=category_ids)
+    return _grouped_valuation(qs, "subcategory__category_id")
+
+
+def print_valuation(print_ids=None) -> dict[int, dict]:
+    """``{print_id: {"qty", "value"}}`` одним GROUP BY-запитом."""
+    qs = PrintColorVariant.objects.all()
+    if print_ids is not None:
+        qs = qs.filter(print_id__in=print_ids)
+    return _grouped_valuation(qs, "print_id")
+
+
+def _total_frozen_value() -> Decimal:
     stock_agg = StockItem.objects.aggregate(v=Sum(F("quantity") * F("cost_price")))
     print_agg = PrintColorVariant.objects.aggregate(v=Sum(F("quantity") * F("cost_price")))
     return Decimal(stock_agg["v"] or 0) + Decimal(print_agg["v"] or 0)
 
 
+def total_frozen_value() -> Decimal:
+    """Сума всіх позицій складу + всіх принтів."""
+    return cached_rollup("total_frozen", (VALUATION,), _total_frozen_value)
+
+
+def _frozen_value_by_category() -> list[dict]:
+    categories = list(StorageCategory.objects.filter(is_active=True).order_by("order", "name"))
+    valuation = stock_valuation(category_ids=[cat.pk for cat in categories])
+    return [
+        {"category": cat, **valuation.get(cat.pk, {"qty": 0, "value": Decimal("0")})}
+        for cat in categories
+    ]
+
+
 def frozen_value_by_category() -> list[dict]:
     """Розбивка замороженого по складських категоріях."""
-    results = []
-    for cat in StorageCategory.objects.filter(is_active=True).order_by("order", "name"):
-        value = cat.total_frozen_value
-        qty = cat.total_quantity
-        results.append(
-            {
-                "category": cat,
-                "qty": qty,
-                "value": value,
-            }
-        )
-    return results
+    return cached_rollup("by_category", (STRUCTURE, VALUATION), _frozen_value_by_category)
+
+
+def _frozen_value_by_print() -> list[dict]:
+    prints = list(Print.objects.filter(is_active=True).order_by("name"))
+    valuation = print_valuation(print_ids=[pr.pk for pr in prints])
+    return [
+        {"print": pr, **valuation.get(pr.pk, {"qty": 0, "value": Decimal("0")})}
+        for pr in prints
+    ]
 
 
 def frozen_value_by_print() -> list[dict]:
-    results = []
-    for pr in Print.objects.filter(is_active=True).order_by("name"):
-        results.append(
-            {
-                "print": pr,
-                "qty": pr.total_quantity,
-                "value": pr.total_frozen_value,
-            }
-        )
-    return results
+    return cached_rollup("by_print", (STRUCTURE, VALUATION), _frozen_value_by_print)
 
 
 def movements_chart_data(days: int = 30) -> dict:
@@ -1,11 +1,14 @@
 """Бізнес-операції зі складом: запис рухів, коригування, списання."""
 from __future__ import annotations
 
+from dataclasses import dataclass
 from decimal import Decimal, ROUND_HALF_UP
-from typing import Optional
+from typing import Optional, Union
 
 from django.contrib.contenttypes.models import ContentType
 from django.db import transaction
+from django.db.models import Case, DecimalField, F, IntegerField, Q, Value, When
+from django.utils import timezone
 
 from warehouse.models import (
     MovementReason,
@@ -14,6 +17,7 @@ from warehouse.models import (
     StockMovement,
     WriteOffRequest,
 )
+from warehouse.services.rollups import bump_stock_versions
 
 
 def weighted_average_cost(
@@ -42,7 +46,176 @@ def weighted_average_cost(
     return (total_value / new_qty).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
 
 
-@transaction.atomic
+@dataclass(frozen=True)
+class StockAdjustment:
+    """Одна зміна кількості в пакеті ``apply_stock_adjustments``."""
+
+    target: Union[StockItem, PrintColorVariant]
+    delta: int
+    comment: str = ""
+    cost_price_override: Optional[Decimal] = None
+
+
+class InsufficientStock(ValueError):
+    """Залишку не вистачає — весь пакет відкочено.
+
+    ``shortages`` — список ``(target, available, requested)``.
+    """
+
+    def __init__(self, shortages):
+        self.shortages = list(shortages)
+        super().__init__("; ".join(message for _target, message in self.messages()))
+
+    def messages(self):
+        """Пари ``(target, повідомлення)`` — по одній на кожну нестачу."""
+        return [(target, _shortage_message(target, available, requested)) for target, available, requested in self.shortages]
+
+
+def _shortage_message(target, available: int, requested: int) -> str:
+    if isinstance(target, PrintColorVariant):
+        return f"Недостатньо принтів: маємо {available}, спроба списати {requested}"
+    return f"Недостатньо залишку: маємо {available}, спроба списати {requested}"
+
+
+def _requested(adjustments: list[StockAdjustment]) -> int:
+    return -sum(adj.delta for adj in adjustments if adj.delta < 0)
+
+
+# Поля, які пакетне коригування оновлює для кожної моделі (окрім quantity).
+_COST_FIELDS = {
+    StockItem: ("cost_price", "last_cost_price"),
+    PrintColorVariant: ("cost_price",),
+}
+# Поле, за яким рух інвалідує кешовані зведення (services.rollups).
+_SCOPE_FIELDS = {StockItem: "subcategory_id", PrintColorVariant: "print_id"}
+
+
+def apply_stock_adjustments(
+    adjustments,
+    *,
+    user=None,
+    reason: str = MovementReason.MANUAL_ADD,
+    order=None,
+    write_off_request: Optional[WriteOffRequest] = None,
+) -> list[StockMovement]:
+    """Застосувати набір змін кількостей однією транзакцією.
+
+    Рядки блокуються ``select_for_update`` у детермінованому порядку
+    (модель, pk) — два паралельні списання не взаємоблокуються і не
+    гублять оновлень. Кількість пишеться умовним UPDATE
+    (``quantity = quantity + delta`` лише якщо не піде в мінус) — один на
+    модель; усі StockMovement — одним ``bulk_create``. Тож кількість
+    запитів не залежить від кількості позицій замовлення.
+
+    Якщо хоч одній позиції не вистачає залишку — ``InsufficientStock``
+    з усіма нестачами, нічого не записано. cost_price — як у
+    ``adjust_stock_item``. Об'єкти ``target`` оновлюються в памʼяті.
+    Повертає рухи в порядку ``adjustments``.
+    """
+    adjustments = list(adjustments)
+    if not adjustments:
+        return []
+    grouped: dict[type, dict[int, list[StockAdjustment]]] = {}
+    for adj in adjustments:
+        if adj.delta == 0:
+            raise ValueError("Delta cannot be zero")
+        model = type(adj.target)
+        if model not in _COST_FIELDS:
+            raise TypeError(f"Unsupported stock target: {model.__name__}")
+        grouped.setdefault(model, {}).setdefault(adj.target.pk, []).append(adj)
+
+    now = timezone.now()
+    with transaction.atomic():
+        quantity_after: dict[int, int] = {}
+        final: dict[tuple[type, int], dict] = {}
+        shortages = []
+        updates = []
+        scopes = {StockItem: set(), PrintColorVariant: set()}
+        for model in sorted(grouped, key=lambda m: m._meta.label):
+            by_pk = grouped[model]
+            cost_fields = _COST_FIELDS[model]
+            rows = {
+                row.pk: row
+                for row in model.objects.select_for_update()
+                .filter(pk__in=by_pk.keys())
+                .order_by("pk")
+                .only("pk", "quantity", _SCOPE_FIELDS[model], *cost_fields)
+            }
+            scopes[model].update(getattr(row, _SCOPE_FIELDS[model]) for row in rows.values())
+            qty_whens, guard = [], Q()
+            cost_whens = {field: [] for field in cost_fields}
+            for pk in sorted(by_pk):
+                if pk not in rows:
+                    raise model.DoesNotExist(f"{model.__name__} #{pk} не знайдено")
+                row = rows[pk]
+                values = {field: getattr(row, field) for field in cost_fields}
+                running = lowest = row.quantity
+                for adj in by_pk[pk]:
+                    if adj.cost_price_override is not None and adj.delta > 0:
+                        values["cost_price"] = weighted_average_cost(
+                            old_qty=running,
+                            old_cost=values["cost_price"],
+                            add_qty=adj.delta,
+                            add_cost=Decimal(adj.cost_price_override),
+                        )
+                        # Запам'ятовуємо ціну останньої партії (UI підсвічує спред).
+                        if "last_cost_price" in values:
+                            values["last_cost_price"] = Decimal(adj.cost_price_override)
+                    running += adj.delta
+                    lowest = min(lowest, running)
+                    quantity_after[id(adj)] = running
+                if lowest < 0:
+                    shortages.append((by_pk[pk][0].target, row.quantity, _requested(by_pk[pk])))
+                    continue
+                final[(model, pk)] = {"quantity": running, **values}
+                qty_whens.append(When(pk=pk, then=Value(running - row.quantity)))
+                guard |= Q(pk=pk, quantity__gte=row.quantity - lowest)
+                for field in cost_fields:
+                    if values[field] != getattr(row, field):
+                        cost_whens[field].append(When(pk=pk, then=Value(values[field])))
+            updates.append((model, by_pk, rows, qty_whens, guard, cost_whens))
+        if shortages:
+            raise InsufficientStock(shortages)
+
+        for model, by_pk, rows, qty_whens, guard, cost_whens in updates:
+            fields = {
+                "quantity": F("quantity") + Case(*qty_whens, default=Value(0), output_field=IntegerField()),
+                "updated_at": now,
+            }
+            for field, whens in cost_whens.items():
+                if whens:
+                    fields[field] = Case(*whens, default=F(field), output_field=DecimalField(max_digits=10, decimal_places=2))
+            if model.objects.filter(guard).update(**fields) != len(by_pk):
+                # Рядок змінився між блокуванням і записом (БД без row-lock).
+                raise InsufficientStock(
+                    [(by_pk[pk][0].target, rows[pk].quantity, _requested(by_pk[pk])) for pk in sorted(by_pk)]
+                )
+
+        movements = StockMovement.objects.bulk_create(
+            [
+                StockMovement(
+                    content_type=ContentType.objects.get_for_model(type(adj.target)),
+                    object_id=adj.target.pk,
+                    delta=adj.delta,
+                    quantity_after=quantity_after[id(adj)],
+                    reason=reason,
+                    comment=adj.comment,
+                    order=order,
+                    write_off_request=write_off_request,
+                    created_by=user,
+                )
+                for adj in adjustments
+            ]
+        )
+        bump_stock_versions(subcategory_ids=scopes[StockItem], print_ids=scopes[PrintColorVariant])
+
+    for adj in adjustments:
+        for field, value in final[(type(adj.target), adj.target.pk)].items():
+            setattr(adj.target, field, value)
+        adj.target.updated_at = now
+    return movements
+
+
 def adjust_stock_item(
     *,
     stock_item: StockItem,
@@ -64,44 +237,19 @@ def adjust_stock_item(
     - delta > 0 без override → cost_price лишається без змін.
     - delta < 0 (списання/продаж) → cost_price НЕ змінюється
       (override ігнорується, бо ми не «купуємо» позицію).
-    """
-    if delta == 0:
-        raise ValueError("Delta cannot be zero")
-
-    old_qty = stock_item.quantity
-    new_qty = old_qty + delta
-    if new_qty < 0:
-        raise ValueError(
-            f"Недостатньо залишку: маємо {old_qty}, спроба списати {-delta}"
-        )
 
-    stock_item.quantity = new_qty
-    if cost_price_override is not None and delta > 0:
-        stock_item.cost_price = weighted_average_cost(
-            old_qty=old_qty,
-            old_cost=stock_item.cost_price,
-            add_qty=delta,
-            add_cost=Decimal(cost_price_override),
-        )
-        # Запам'ятовуємо ціну саме цієї (останньої) партії, щоб у UI
-        # підсвітити розбіжність із середньозваженою ціною.
-        stock_item.last_cost_price = Decimal(cost_price_override)
-    stock_item.save(update_fields=["quantity", "cost_price", "last_cost_price", "updated_at"])
-
-    return StockMovement.objects.create(
-        content_type=ContentType.objects.get_for_model(StockItem),
-        object_id=stock_item.pk,
-        delta=delta,
-        quantity_after=new_qty,
+    Кількість рахується від актуального рядка в БД (під блокуванням), а не
+    від значення в памʼяті. Для кількох позицій — ``apply_stock_adjustments``.
+    """
+    return apply_stock_adjustments(
+        [StockAdjustment(stock_item, delta, comment, cost_price_override)],
+        user=user,
         reason=reason,
-        comment=comment,
         order=order,
         write_off_request=write_off_request,
-        created_by=user,
-    )
+    )[0]
 
 
-@transaction.atomic
 def adjust_print_variant(
     *,
     variant: PrintColorVariant,
@@ -114,36 +262,13 @@ def adjust_print_variant(
     cost_price_override: Optional[Decimal] = None,
 ) -> StockMovement:
     """Змінити кількість PrintColorVariant та зафіксувати StockMovement."""
-    if delta == 0:
-        raise ValueError("Delta cannot be zero")
-
-    old_qty = variant.quantity
-    new_qty = old_qty + delta
-    if new_qty < 0:
-        raise ValueError(
-            f"Недостатньо принтів: маємо {old_qty}, спроба списати {-delta}"
-        )
-    variant.quantity = new_qty
-    if cost_price_override is not None and delta > 0:
-        variant.cost_price = weighted_average_cost(
-            old_qty=old_qty,
-            old_cost=variant.cost_price,
-            add_qty=delta,
-            add_cost=Decimal(cost_price_override),
-        )
-    variant.save(update_fields=["quantity", "cost_price", "updated_at"])
-
-    return StockMovement.objects.create(
-        content_type=ContentType.objects.get_for_model(PrintColorVariant),
-        object_id=variant.pk,
-        delta=delta,
-        quantity_after=new_qty,
+    return apply_stock_adjustments(
+        [StockAdjustment(variant, delta, comment, cost_price_override)],
+        user=user,
         reason=reason,
-        comment=comment,
         order=order,
         write_off_request=write_off_request,
-        created_by=user,
-    )
+    )[0]
 
 
 @transaction.atomic
@@ -166,30 +291,39 @@ def reverse_write_off(*, write_off_request, user=None) -> int:
     order_no = getattr(order, "order_number", "") if order else ""
     # Матеріалізуємо список ДО створення зворотних рухів, щоб не зациклитись.
     originals = list(
-        write_off_request.movements.select_related("content_type").filter(delta__lt=0)
+        write_off_request.movements.select_related("content_type")
+        .prefetch_related("target")
+        .filter(delta__lt=0)
     )
 
-    reversed_count = 0
+    comment = f"Відміна продажу · Замовлення #{order_no}"
+    adjustments = []
+    consumables = []
     for mv in originals:
         target = mv.target
         if target is None:
             continue
         reverse_delta = -mv.delta  # додатнє — повертаємо на склад
-        comment = f"Відміна продажу · Замовлення #{order_no}"
-        if isinstance(target, StockItem):
-            adjust_stock_item(
-                stock_item=target,
-                delta=reverse_delta,
-                user=user,
-                reason=MovementReason.RETURN,
-                comment=comment,
-                order=order,
-                write_off_request=write_off_request,
-            )
-            reversed_count += 1
-        elif isinstance(target, PrintColorVariant):
-            adjust_print_variant(
-                variant=target,
+        if isinstance(target, (StockItem, PrintColorVariant)):
+            adjustments.append(StockAdjustment(target, reverse_delta, comment))
+        else:
+            consumables.append((target, reverse_delta))
+
+    apply_stock_adjustments(
+        adjustments,
+        user=user,
+        reason=MovementReason.RETURN,
+        order=order,
+        write_off_request=write_off_request,
+    )
+    reversed_count = len(adjustments)
+    # Розхідники (ConsumableItem) — через окремий сервіс.
+    for target, reverse_delta in consumables:
+        try:
+            from warehouse.services.consumables import adjust_consumable
+
+            adjust_consumable(
+                consumable=target,
                 delta=reverse_delta,
                 user=user,
                 reason=MovementReason.RETURN,
@@ -198,23 +332,8 @@ def reverse_write_off(*, write_off_request, user=None) -> int:
                 write_off_request=write_off_request,
             )
             reversed_count += 1
-        else:
-            # Розхідники (ConsumableItem) — через окремий сервіс.
-            try:
-                from warehouse.services.consumables import adjust_consumable
-
-                adjust_consumable(
-                    consumable=target,
-                    delta=reverse_delta,
-                    user=user,
-                    reason=MovementReason.RETURN,
-                    comment=comment,
-                    order=order,
-                    write_off_request=write_off_request,
-                )
-                reversed_count += 1
-            except Exception:
-                continue
+        except Exception:
+            continue
 
     write_off_request.status = WriteOffRequest.STATUS_CANCELLED
     write_off_request.save(update_fields=["status", "updated_at"])
@@ -152,6 +152,9 @@ def find_prints_for_order_item(order_item) -> list[Print]:
 def stock_matrix_for_category(category: StorageCategory) -> dict:
     """Побудувати матрицю остатків для категорії.
 
+    Читає всі позиції категорії; сторінки беруть кешовану копію через
+    ``warehouse.services.rollups.stock_matrix``.
+
     Повертає структуру:
         {
             "sizes": ["S", "M", "L", ...],
@@ -189,21 +192,19 @@ def stock_matrix_for_category(category: StorageCategory) -> dict:
     for item in items:
         sub = item.subcategory
         if sub.id not in subcat_buckets:
-            allowed = list(
-                sub.colors.all().values("id", "name", "primary_hex", "secondary_hex")
-            )
+            # sub.colors.all() — з prefetch, без запиту на кожну підкатегорію.
             subcat_buckets[sub.id] = {
                 "id": sub.id,
                 "name": sub.name,
                 "slug": sub.slug,
                 "allowed_colors": [
                     {
-                        "id": c["id"],
-                        "name": c["name"] or c["primary_hex"],
-                        "hex": c["primary_hex"],
-                        "secondary_hex": c.get("secondary_hex") or "",
+                        "id": c.id,
+                        "name": c.name or c.primary_hex,
+                        "hex": c.primary_hex,
+                        "secondary_hex": c.secondary_hex or "",
                     }
-                    for c in allowed
+                    for c in sub.colors.all()
                 ],
                 "rows": {},  # (color_id, color_name, hex) -> {size: qty}
             }
@@ -0,0 +1,139 @@
+"""Кешовані зведення складу: матриця залишків і вартість замороженого.
+
+Дашборд, фінанси, список категорій і картка категорії щоразу перечитували
+всі StockItem / PrintColorVariant. Тепер готові зведення лежать у кеші під
+ключем із лічильників-версій:
+
+* ``category:<id>`` / ``print:<id>`` — залишки конкретної категорії чи
+  принта (рухи, нові/видалені позиції);
+* ``valuation`` — будь-яка зміна кількості чи собівартості (загальні суми);
+* ``structure`` — довідники, що потрапляють у зведення: категорії,
+  підкатегорії та їх кольори, принти, кольори.
+
+Лічильники піднімає ``bump_stock_versions`` — з ``apply_stock_adjustments``
+(пише через ``update()``/``bulk_create``, тож сигнали не спрацьовують) і з
+сигналів ``warehouse.signals`` для звичайних save/delete. Як і в
+``storefront.services.structured_data_cache``, піднімаємо двічі: одразу і
+після коміту, щоб паралельний запит не закешував стан до коміту.
+"""
+from __future__ import annotations
+
+from decimal import Decimal
+from typing import Callable, Iterable
+
+from django.core.cache import cache
+from django.db import transaction
+
+ROLLUP_CACHE_TIMEOUT = 6 * 60 * 60
+VERSION_KEY = "warehouse:rollups:version:{scope}"
+
+STRUCTURE = "structure"
+VALUATION = "valuation"
+
+_EMPTY = {"qty": 0, "value": Decimal("0")}
+
+
+def category_scope(category_id) -> str:
+    return f"category:{int(category_id)}"
+
+
+def print_scope(print_id) -> str:
+    return f"print:{int(print_id)}"
+
+
+def _coerce_version(raw) -> int:
+    try:
+        return max(int(raw), 1)
+    except (TypeError, ValueError):
+        return 1
+
+
+def versions(*scopes: str) -> tuple[int, ...]:
+    """Поточні версії scope'ів одним зверненням до кешу."""
+    keys = [VERSION_KEY.format(scope=scope) for scope in scopes]
+    found = cache.get_many(keys)
+    return tuple(_coerce_version(found.get(key)) for key in keys)
+
+
+def _bump_now(scopes: Iterable[str]) -> None:
+    for scope in scopes:
+        key = VERSION_KEY.format(scope=scope)
+        cache.add(key, 1, timeout=None)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 2, timeout=None)
+
+
+def bump_stock_versions(
+    *,
+    category_ids: Iterable = (),
+    subcategory_ids: Iterable = (),
+    print_ids: Iterable = (),
+    structure: bool = False,
+) -> None:
+    """Інвалідувати зведення, яких торкнулась зміна (зараз і після коміту).
+
+    ``subcategory_ids`` зводяться до категорій одним запитом.
+    """
+    from warehouse.models import StorageSubcategory
+
+    category_ids = {int(pk) for pk in category_ids if pk}
+    subcategory_ids = {int(pk) for pk in subcategory_ids if pk}
+    if subcategory_ids:
+        category_ids.update(
+            StorageSubcategory.objects.filter(pk__in=subcategory_ids).values_list("category_id", flat=True)
+        )
+    scopes = {VALUATION}
+    scopes.update(category_scope(pk) for pk in category_ids)
+    scopes.update(print_scope(pk) for pk in print_ids if pk)
+    if structure:
+        scopes.add(STRUCTURE)
+    _bump_now(scopes)
+    transaction.on_commit(lambda: _bump_now(scopes))
+
+
+def cached_rollup(name: str, scopes: Iterable[str], builder: Callable):
+    """Повертає ``builder()`` з кешу під ключем поточних версій ``scopes``."""
+    scopes = tuple(scopes)
+    stamp = ":".join(str(v) for v in versions(*scopes))
+    key = f"warehouse:rollups:{name}:{stamp}"
+    value = cache.get(key)
+    if value is None:
+        value = builder()
+        cache.set(key, value, ROLLUP_CACHE_TIMEOUT)
+    return value
+
+
+def stock_matrix(category) -> dict:
+    """Матриця розмір × колір категорії (див. ``matching.stock_matrix_for_category``)."""
+    from warehouse.services.matching import stock_matrix_for_category
+
+    return cached_rollup(
+        f"matrix:{category.pk}",
+        (STRUCTURE, category_scope(category.pk)),
+        lambda: stock_matrix_for_category(category),
+    )
+
+
+def category_summary(category) -> dict:
+    """``{"qty", "value"}`` однієї категорії."""
+    from warehouse.services.finance import stock_valuation
+
+    return cached_rollup(
+        f"category_summary:{category.pk}",
+        (category_scope(category.pk),),
+        lambda: stock_valuation(category_ids=[category.pk]).get(category.pk, _EMPTY),
+    )
+
+
+def print_summary(print_obj) -> dict:
+    """``{"qty", "value"}`` одного принта."""
+    from warehouse.services.finance import print_valuation
+
+    return cached_rollup(
+        f"print_summary:{print_obj.pk}",
+        (print_scope(print_obj.pk),),
+        lambda: print_valuation(print_ids=[print_obj.pk]).get(print_obj.pk, _EMPTY),
+    )
+
@@ -5,16 +5,19 @@
    (PNG/JPEG → WebP зі збереженням прозорості), видалення попереднього
    файлу при заміні та видалення файлу при видаленні запису. Економить
    місце на сервері й уніфікує превʼю принтів.
+3. Інвалідація кешованих зведень складу (матриця, вартість замороженого).
 """
 from __future__ import annotations
 
 import logging
 
 from django.apps import apps
-from django.db.models.signals import post_delete, post_migrate, post_save, pre_save
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save, pre_save
 from django.dispatch import receiver
 
+from warehouse.models import StorageSubcategory
 from warehouse.permissions import WAREHOUSE_GROUP_NAME
+from warehouse.services.rollups import bump_stock_versions
 
 logger = logging.getLogger(__name__)
 
@@ -143,3 +146,40 @@ def warehouse_delete_print_images(sender, instance, **kwargs):
                 field.storage.delete(name)
         except Exception as exc:  # pragma: no cover
             logger.warning("Failed to delete image %s on delete: %s", name, exc)
+
+
+# ---------------------------------------------------------------------------
+# Інвалідація кешованих зведень (services.rollups)
+# ---------------------------------------------------------------------------
+
+_STRUCTURE_MODELS = {
+    "warehouse.StorageCategory",
+    "warehouse.StorageSubcategory",
+    "warehouse.Print",
+    "productcolors.Color",
+}
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def warehouse_bump_rollups(sender, instance, raw=False, **kwargs):
+    """Save/delete позицій і довідників складу скидає кешовані зведення.
+
+    Рухи через ``apply_stock_adjustments`` піднімають версії самі.
+    """
+    if raw:
+        return
+    label = sender._meta.label
+    if label == "warehouse.StockItem":
+        bump_stock_versions(subcategory_ids=[instance.subcategory_id])
+    elif label == "warehouse.PrintColorVariant":
+        bump_stock_versions(print_ids=[instance.print_id])
+    elif label in _STRUCTURE_MODELS:
+        bump_stock_versions(structure=True)
+
+
+@receiver(m2m_changed)
+def warehouse_bump_rollups_on_colors(sender, instance, action, **kwargs):
+    """Дозволені кольори підкатегорії показуються в матриці категорії."""
+    if sender is StorageSubcategory.colors.through and action in ("post_add", "post_remove", "post_clear"):
+        bump_stock_versions(structure=True)
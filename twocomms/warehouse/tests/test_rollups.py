@@ -0,0 +1,116 @@
+"""Кешовані зведення складу: матриця категорії та вартість замороженого."""
+from __future__ import annotations
+
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+
+from productcolors.models import Color
+from warehouse.models import (
+    Print,
+    PrintColorVariant,
+    StockItem,
+    StorageCategory,
+    StorageSubcategory,
+)
+from warehouse.services import rollups
+from warehouse.services.finance import (
+    frozen_value_by_category,
+    frozen_value_by_print,
+    total_frozen_value,
+)
+from warehouse.services.inventory import adjust_print_variant, adjust_stock_item
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.black = Color.objects.create(name="Чорний", primary_hex="#000")
+        self.white = Color.objects.create(name="Білий", primary_hex="#fff")
+        self.tees = StorageCategory.objects.create(name="Футболки", slug="tees-rollup")
+        self.hoodies = StorageCategory.objects.create(name="Худі", slug="hoodies-rollup")
+        self.tee_sub = StorageSubcategory.objects.create(category=self.tees, name="Класична")
+        self.hoodie_sub = StorageSubcategory.objects.create(category=self.hoodies, name="Оверсайз")
+        self.tee = StockItem.objects.create(
+            subcategory=self.tee_sub, color=self.black, size="M", quantity=3, cost_price=Decimal("200")
+        )
+        StockItem.objects.create(
+            subcategory=self.hoodie_sub, color=self.white, size="L", quantity=2, cost_price=Decimal("500")
+        )
+        self.print = Print.objects.create(name="Лого")
+        self.variant = PrintColorVariant.objects.create(print=self.print, quantity=5, cost_price=Decimal("40"))
+
+    def _add_skus(self, count):
+        for n in range(count):
+            StockItem.objects.create(
+                subcategory=self.tee_sub, color=self.white, size=f"{n}XL", quantity=1, cost_price=Decimal("10")
+            )
+
+    def _query_count(self, func):
+        with CaptureQueriesContext(connection) as ctx:
+            func()
+        return len(ctx.captured_queries)
+
+    def test_valuation_is_grouped_and_served_from_cache(self):
+        rows = frozen_value_by_category()
+        self.assertEqual(
+            [(row["category"], row["qty"], row["value"]) for row in rows],
+            [(self.tees, 3, Decimal("600")), (self.hoodies, 2, Decimal("1000"))],
+        )
+        self.assertEqual(
+            [(row["print"], row["qty"], row["value"]) for row in frozen_value_by_print()],
+            [(self.print, 5, Decimal("200"))],
+        )
+        self.assertEqual(total_frozen_value(), Decimal("1800"))
+
+        with self.assertNumQueries(0):
+            frozen_value_by_category()
+            frozen_value_by_print()
+            total_frozen_value()
+
+    def test_cold_build_does_not_grow_with_sku_count(self):
+        cache.clear()
+        few = self._query_count(frozen_value_by_category) + self._query_count(lambda: rollups.stock_matrix(self.tees))
+        self._add_skus(12)
+        cache.clear()
+        many = self._query_count(frozen_value_by_category) + self._query_count(lambda: rollups.stock_matrix(self.tees))
+        self.assertEqual(few, many)
+
+    def test_movement_invalidates_only_affected_category(self):
+        matrix = rollups.stock_matrix(self.tees)
+        rollups.stock_matrix(self.hoodies)
+        self.assertEqual(matrix["total"], 3)
+
+        adjust_stock_item(stock_item=self.tee, delta=4, cost_price_override=Decimal("100"))
+        with self.assertNumQueries(0):
+            rollups.stock_matrix(self.hoodies)
+        matrix = rollups.stock_matrix(self.tees)
+        self.assertEqual(matrix["total"], 7)
+        self.assertEqual(
+            matrix["subcategories"][0]["rows_by_color"][0]["by_size_cost"]["M"],
+            str(Decimal("142.86")),
+        )
+        summary = rollups.category_summary(self.tees)
+        self.assertEqual((summary["qty"], summary["value"]), (7, Decimal("1000.02")))
+        self.assertEqual(frozen_value_by_category()[0]["qty"], 7)
+
+        adjust_print_variant(variant=self.variant, delta=-2)
+        self.assertEqual(rollups.print_summary(self.print)["qty"], 3)
+        self.assertEqual(total_frozen_value(), Decimal("1000.02") + Decimal("1000") + Decimal("120"))
+
+    def test_reference_edits_invalidate_matrix(self):
+        self.assertEqual(rollups.stock_matrix(self.tees)["subcategories"][0]["allowed_colors"], [])
+        self.tee_sub.colors.add(self.black)
+        allowed = rollups.stock_matrix(self.tees)["subcategories"][0]["allowed_colors"]
+        self.assertEqual([c["id"] for c in allowed], [self.black.id])
+
+        self.black.name = "Графіт"
+        self.black.save()
+        row = rollups.stock_matrix(self.tees)["subcategories"][0]["rows_by_color"][0]
+        self.assertEqual(row["color_name"], "Графіт")
+
+        StockItem.objects.filter(pk=self.tee.pk).delete()
+        self.assertEqual(rollups.stock_matrix(self.tees)["total"], 0)
@@ -0,0 +1,161 @@
+"""Пакетні коригування складу: одна транзакція на замовлення, сталий набір
+запитів, відсутність втрачених оновлень під паралельними списаннями."""
+from __future__ import annotations
+
+import threading
+import time
+from decimal import Decimal
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import OperationalError, close_old_connections, connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from productcolors.models import Color
+from warehouse.models import (
+    MovementReason,
+    Print,
+    PrintColorVariant,
+    StockItem,
+    StockMovement,
+    StorageCategory,
+    StorageSubcategory,
+)
+from warehouse.services.inventory import (
+    InsufficientStock,
+    StockAdjustment,
+    adjust_stock_item,
+    apply_stock_adjustments,
+)
+
+
+def _stock(sub, color, size, quantity, **fields):
+    return StockItem.objects.create(subcategory=sub, color=color, size=size, quantity=quantity, **fields)
+
+
+class StockFixtureMixin:
+    def make_fixture(self):
+        self.cat = StorageCategory.objects.create(name="Футболки", slug="t-adj")
+        self.sub = StorageSubcategory.objects.create(category=self.cat, name="Базова")
+        self.color = Color.objects.create(name="Чорний", primary_hex="#000")
+        self.items = [_stock(self.sub, self.color, size, 10) for size in ("S", "M", "L", "XL", "XXL", "3XL")]
+        self.print = Print.objects.create(name="Лого")
+        self.variant = PrintColorVariant.objects.create(print=self.print, quantity=4)
+
+
+class ApplyStockAdjustmentsTests(StockFixtureMixin, TestCase):
+    def setUp(self):
+        self.make_fixture()
+
+    def _write_off(self, targets):
+        return apply_stock_adjustments(
+            [StockAdjustment(target, -1, "Замовлення #1") for target in targets],
+            reason=MovementReason.ORDER_WRITE_OFF,
+        )
+
+    def test_statement_count_does_not_grow_with_order_size(self):
+        ContentType.objects.get_for_models(StockItem, PrintColorVariant)
+        with CaptureQueriesContext(connection) as small:
+            self._write_off(self.items[:1] + [self.variant])
+        with CaptureQueriesContext(connection) as large:
+            self._write_off(self.items + [self.variant])
+        self.assertEqual(len(large.captured_queries), len(small.captured_queries))
+        inserts = [q for q in large.captured_queries if q["sql"].startswith("INSERT")]
+        self.assertEqual(len(inserts), 1)
+
+        for item in self.items:
+            item.refresh_from_db()
+        self.assertEqual([item.quantity for item in self.items], [8, 9, 9, 9, 9, 9])
+        self.variant.refresh_from_db()
+        self.assertEqual(self.variant.quantity, 2)
+        self.assertEqual(StockMovement.objects.count(), 9)
+
+    def test_shortage_rolls_back_whole_batch_and_lists_every_item(self):
+        with self.assertRaises(InsufficientStock) as ctx:
+            apply_stock_adjustments([
+                StockAdjustment(self.items[0], -3),
+                StockAdjustment(self.items[1], -11),
+                StockAdjustment(self.variant, -5),
+            ])
+        self.assertCountEqual(
+            [message for _target, message in ctx.exception.messages()],
+            [
+                "Недостатньо залишку: маємо 10, спроба списати 11",
+                "Недостатньо принтів: маємо 4, спроба списати 5",
+            ],
+        )
+        self.items[0].refresh_from_db()
+        self.assertEqual(self.items[0].quantity, 10)
+        self.assertFalse(StockMovement.objects.exists())
+
+    def test_uses_database_quantity_not_stale_instance(self):
+        stale = StockItem.objects.get(pk=self.items[0].pk)
+        StockItem.objects.filter(pk=stale.pk).update(quantity=1)
+        with self.assertRaises(ValueError):
+            adjust_stock_item(stock_item=stale, delta=-2)
+        movement = adjust_stock_item(stock_item=stale, delta=-1)
+        self.assertEqual((movement.quantity_after, stale.quantity), (0, 0))
+
+    def test_repeated_target_moves_running_quantity_and_cost(self):
+        item = _stock(self.sub, self.color, "4XL", 5, cost_price=Decimal("500"))
+        movements = apply_stock_adjustments([
+            StockAdjustment(item, 7, cost_price_override=Decimal("550")),
+            StockAdjustment(item, -2),
+        ])
+        self.assertEqual([m.quantity_after for m in movements], [12, 10])
+        item.refresh_from_db()
+        self.assertEqual(item.quantity, 10)
+        self.assertEqual(item.cost_price, Decimal("529.17"))
+        self.assertEqual(item.last_cost_price, Decimal("550"))
+
+
+class ConcurrentFulfilmentTests(StockFixtureMixin, TransactionTestCase):
+    THREADS = 6
+    ORDERS_PER_THREAD = 4
+
+    def setUp(self):
+        self.make_fixture()
+        StockItem.objects.filter(pk__in=[i.pk for i in self.items[:2]]).update(quantity=15)
+
+    def test_parallel_orders_never_lose_updates_or_oversell(self):
+        first, second = self.items[:2]
+        outcome = {"ok": 0, "short": 0}
+        guard = threading.Lock()
+
+        def fulfil(reverse):
+            try:
+                for _ in range(self.ORDERS_PER_THREAD):
+                    # Замовлення з тих самих позицій у різному порядку.
+                    pair = [second, first] if reverse else [first, second]
+                    targets = [StockItem(pk=item.pk) for item in pair]
+                    while True:
+                        try:
+                            apply_stock_adjustments([StockAdjustment(t, -1) for t in targets])
+                            result = "ok"
+                        except InsufficientStock:
+                            result = "short"
+                        except OperationalError:  # SQLite: таблиця зайнята — повтор
+                            time.sleep(0.001)
+                            continue
+                        break
+                    with guard:
+                        outcome[result] += 1
+            finally:
+                close_old_connections()
+
+        threads = [threading.Thread(target=fulfil, args=(n % 2,)) for n in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        total = self.THREADS * self.ORDERS_PER_THREAD
+        self.assertEqual(outcome, {"ok": 15, "short": total - 15})
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.quantity, second.quantity), (0, 0))
+        self.assertEqual(StockMovement.objects.count(), 30)
+        self.assertEqual(
+            sorted(StockMovement.objects.filter(object_id=first.pk).values_list("quantity_after", flat=True)),
+            list(range(15)),
+        )
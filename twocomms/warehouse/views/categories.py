@@ -20,14 +20,14 @@ from warehouse.services.inventory import (
     adjust_stock_item,
     set_stock_quantity,
 )
-from warehouse.services.matching import stock_matrix_for_category
+from warehouse.services.finance import frozen_value_by_category
+from warehouse.services.rollups import category_summary, stock_matrix
 
 
 @warehouse_admin_required
 def category_list(request):
-    categories = StorageCategory.objects.filter(is_active=True).order_by("order", "name")
     context = {
-        "categories": categories,
+        "rows": frozen_value_by_category(),
         "active_section": "categories",
     }
     return render(request, "warehouse/category_list.html", context)
@@ -36,7 +36,7 @@ def category_list(request):
 @warehouse_admin_required
 def category_detail(request, slug):
     category = get_object_or_404(StorageCategory, slug=slug)
-    matrix = stock_matrix_for_category(category)
+    matrix = stock_matrix(category)
     subcategories = category.subcategories.filter(is_active=True).order_by("order", "name")
     colors = (
         Color.objects.filter(warehouse_stock_items__subcategory__category=category)
@@ -46,6 +46,7 @@ def category_detail(request, slug):
     context = {
         "category": category,
         "matrix": matrix,
+        "summary": category_summary(category),
         "subcategories": subcategories,
         "colors": colors,
         "active_section": "categories",
@@ -16,6 +16,7 @@ from warehouse.services.inventory import (
     adjust_print_variant,
     set_print_variant_quantity,
 )
+from warehouse.services.rollups import print_summary
 
 
 @warehouse_admin_required
@@ -46,6 +47,8 @@ def print_list(request):
     cat_objs: dict[int, PrintCategory | None] = {}
     none_key = -1
     for pr in prints:
+        # Кількість — з уже prefetch-нутих варіантів, без aggregate на кожен принт.
+        pr.stock_qty = sum(v.quantity for v in pr.color_variants.all())
         key = pr.category_id or none_key
         buckets.setdefault(key, []).append(pr)
         if key != none_key and key not in cat_objs:
@@ -98,6 +101,7 @@ def print_detail(request, slug):
     context = {
         "print": pr,
         "variants": variants,
+        "summary": print_summary(pr),
         "active_section": "prints",
     }
     return render(request, "warehouse/print_detail.html", context)
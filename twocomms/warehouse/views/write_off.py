@@ -20,8 +20,9 @@ from warehouse.models import (
 )
 from warehouse.permissions import warehouse_admin_required
 from warehouse.services.inventory import (
-    adjust_print_variant,
-    adjust_stock_item,
+    InsufficientStock,
+    StockAdjustment,
+    apply_stock_adjustments,
     reverse_write_off,
 )
 from warehouse.services.matching import (
@@ -144,10 +145,6 @@ def _notify_order_writeoff(order):
         pass
 
 
-class _WriteOffAbort(Exception):
-    """Внутрішній сигнал відкату транзакції при помилках залишку."""
-
-
 @warehouse_admin_required
 @require_POST
 def write_off_submit(request, token):
@@ -166,80 +163,71 @@ def write_off_submit(request, token):
     errors = []
     completed = False
 
+    # Спершу розбираємо форму, потім списуємо всі позиції одним пакетом
+    # (apply_stock_adjustments: одна транзакція, блокування в сталому порядку).
+    garment_rows = []  # (stock_id, qty)
+    print_rows = []  # (item, variant_id, qty)
+    for item in order.items.all():
+        prefix = f"item_{item.pk}_"
+
+        # --- Одяг ---
+        stock_id_raw = request.POST.get(prefix + "stock_id") or ""
+        try:
+            garment_qty = int(request.POST.get(prefix + "qty") or "0")
+        except ValueError:
+            garment_qty = 0
+        if stock_id_raw and stock_id_raw.isdigit() and garment_qty > 0:
+            garment_rows.append((int(stock_id_raw), garment_qty))
+
+        # --- Принти (декілька на виріб) ---
+        # Формат: чекбокс name="item_{id}_print_on" value="{variant_id}",
+        # кількість name="item_{id}_print_qty_{variant_id}".
+        for vid_raw in request.POST.getlist(prefix + "print_on"):
+            if not str(vid_raw).isdigit():
+                continue
+            try:
+                qty = int(request.POST.get(f"{prefix}print_qty_{vid_raw}") or "0")
+            except ValueError:
+                qty = 0
+            if qty > 0:
+                print_rows.append((item, int(vid_raw), qty))
+
+    stock_items = StockItem.objects.select_related("subcategory").in_bulk({sid for sid, _ in garment_rows})
+    variants = PrintColorVariant.objects.select_related("print").in_bulk({vid for _, vid, _ in print_rows})
+
+    adjustments = []
+    error_labels = {}
+    for stock_id, qty in garment_rows:
+        stock_item = stock_items.get(stock_id)
+        if stock_item is None:
+            continue
+        adjustments.append(StockAdjustment(stock_item, -qty, f"Замовлення #{order.order_number}"))
+        actions.append(f"одяг {stock_item.subcategory.name} {stock_item.size} ×{qty}")
+        error_labels[(StockItem, stock_id)] = f"одяг {stock_item.subcategory.name}"
+    for item, variant_id, qty in print_rows:
+        variant = variants.get(variant_id)
+        if variant is None:
+            continue
+        adjustments.append(
+            StockAdjustment(variant, -qty, f"Замовлення #{order.order_number} · {item.title}")
+        )
+        placement = variant.print.get_placement_display() if variant.print.placement else ""
+        label = f"{variant.print.name}"
+        if placement:
+            label += f" ({placement})"
+        actions.append(f"принт {label}/{variant.color_name} ×{qty}")
+        error_labels[(PrintColorVariant, variant_id)] = f"принт {variant.print.name}"
+
     try:
         with transaction.atomic():
-            for item in order.items.all():
-                prefix = f"item_{item.pk}_"
-
-                # --- Одяг ---
-                stock_id_raw = request.POST.get(prefix + "stock_id") or ""
-                try:
-                    garment_qty = int(request.POST.get(prefix + "qty") or "0")
-                except ValueError:
-                    garment_qty = 0
-                if stock_id_raw and stock_id_raw.isdigit() and garment_qty > 0:
-                    try:
-                        stock_item = StockItem.objects.get(pk=int(stock_id_raw))
-                    except StockItem.DoesNotExist:
-                        stock_item = None
-                    if stock_item is not None:
-                        try:
-                            adjust_stock_item(
-                                stock_item=stock_item,
-                                delta=-garment_qty,
-                                user=request.user,
-                                reason=MovementReason.ORDER_WRITE_OFF,
-                                comment=f"Замовлення #{order.order_number}",
-                                order=order,
-                                write_off_request=wo_request,
-                            )
-                            actions.append(
-                                f"одяг {stock_item.subcategory.name} {stock_item.size} ×{garment_qty}"
-                            )
-                        except ValueError as exc:
-                            errors.append(f"одяг {stock_item.subcategory.name}: {exc}")
-
-                # --- Принти (декілька на виріб) ---
-                # Формат: чекбокс name="item_{id}_print_on" value="{variant_id}",
-                # кількість name="item_{id}_print_qty_{variant_id}".
-                selected_variant_ids = request.POST.getlist(prefix + "print_on")
-                for vid_raw in selected_variant_ids:
-                    if not str(vid_raw).isdigit():
-                        continue
-                    try:
-                        qty = int(request.POST.get(f"{prefix}print_qty_{vid_raw}") or "0")
-                    except ValueError:
-                        qty = 0
-                    if qty <= 0:
-                        continue
-                    try:
-                        variant = PrintColorVariant.objects.select_related("print").get(pk=int(vid_raw))
-                    except PrintColorVariant.DoesNotExist:
-                        continue
-                    try:
-                        adjust_print_variant(
-                            variant=variant,
-                            delta=-qty,
-                            user=request.user,
-                            reason=MovementReason.ORDER_WRITE_OFF,
-                            comment=f"Замовлення #{order.order_number} · {item.title}",
-                            order=order,
-                            write_off_request=wo_request,
-                        )
-                        placement = variant.print.get_placement_display() if variant.print.placement else ""
-                        label = f"{variant.print.name}"
-                        if placement:
-                            label += f" ({placement})"
-                        actions.append(f"принт {label}/{variant.color_name} ×{qty}")
-                    except ValueError as exc:
-                        errors.append(f"принт {variant.print.name}: {exc}")
-
-            # Якщо є помилки залишку — відкочуємо ВСЕ (без часткових списань,
-            # щоб повторний сабміт не задублював успішні позиції).
-            if errors:
-                raise _WriteOffAbort()
-
-            if actions:
+            if adjustments:
+                apply_stock_adjustments(
+                    adjustments,
+                    user=request.user,
+                    reason=MovementReason.ORDER_WRITE_OFF,
+                    order=order,
+                    write_off_request=wo_request,
+                )
                 wo_request.status = WriteOffRequest.STATUS_COMPLETED
                 wo_request.completed_at = timezone.now()
                 wo_request.completed_by = request.user
@@ -247,9 +235,12 @@ def write_off_submit(request, token):
                     update_fields=["status", "completed_at", "completed_by", "updated_at"]
                 )
                 completed = True
-    except _WriteOffAbort:
-        # Транзакцію відкочено: actions фактично не застосовано.
+    except InsufficientStock as exc:
+        # Транзакцію відкочено цілком (без часткових списань, щоб повторний
+        # сабміт не задублював успішні позиції).
         actions = []
+        for target, message in exc.messages():
+            errors.append(f"{error_labels.get((type(target), target.pk), target)}: {message}")
 
     for err in errors:
         messages.error(request, f"Помилка списання: {err}")